@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+养基宝命令行批量分析
+并发更新本地净值存储中的一批基金（代码列表或自选列表文件），逐只计算波段信号、回撤抄底、
+神奇反转和综合建议，结果以JSONL或CSV流式输出，各阶段耗时和新触发的提醒输出到标准错误，
+退出码可用于定时任务
+
+用法示例：
+    python fund_cli.py 000001 110011 --format csv -o report.csv
+    python fund_cli.py --watchlist ~/.yangjibao/store/watchlist.json --offline
+    python fund_cli.py --serve 0.0.0.0:8765
+    python fund_cli.py sweep 000001 110011 --grid rsi_window=9,14 win_rate_tiers=-20/-15/-10/-5,-25/-18/-12/-6
+"""
+
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time as time_module
+
+import numpy as np
+
+from fund_core import alerts, analysis, backtest, service, sweep
+from fund_core.recovery import load_universe_table, use_universe
+from fund_core.screener import align
+from fund_core.store import NavStore
+from fund_core.watchlist import WatchlistRefresher, load_watchlist, watchlist_path
+
+# 退出码：全部成功 / 部分基金失败 / 参数错误 / 没有任何基金分析成功
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_FAILED = 3
+
+FORMAT_JSONL = 'jsonl'
+FORMAT_CSV = 'csv'
+
+# 输出字段（JSONL与CSV相同）
+FIELDS = (
+    'code', 'name', 'date', 'nav', 'today_change', 'one_year_change',
+    'band', 'rsi', 'band_advice',
+    'current_drawdown', 'max_drawdown', 'win_rate', 'win_source', 'drawdown_advice',
+    'streak', 'reversal_probability', 'reversal_advice',
+    'summary', 'summary_advice', 'purchase_score', 'purchase_level',
+    'status', 'error',
+)
+
+# 参数扫描子命令
+SWEEP_COMMAND = 'sweep'
+
+# 刷新状态：ok/cached 为成功，error 表示网络失败后使用了本地数据
+FAILED_STATUSES = ('error', 'missing', 'failed')
+
+
+def _round(value, digits=4):
+    """数值保留小数位（缺失值为None）"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def report_row(code, result=None, status='ok', error=''):
+    """把 analysis.analyze_fund 的结果展开为一行输出"""
+    row = dict.fromkeys(FIELDS)
+    row.update({'code': code, 'status': status, 'error': error})
+    if result is None:
+        return row
+    band = result['band_signal']
+    drawdown = result['drawdown']
+    reversal = result['magic_reversal']
+    purchase = result['purchase']
+    row.update({
+        'name': result['name'],
+        'date': result['date'],
+        'nav': _round(result['nav']),
+        'today_change': _round(result['overview']['today_change'], 2),
+        'one_year_change': _round(result['overview']['one_year_change'], 2),
+        'band': band['status'],
+        'rsi': _round(band['rsi'], 2),
+        'band_advice': band['advice'],
+        'current_drawdown': _round(drawdown['current_drawdown'], 2),
+        'max_drawdown': _round(drawdown['max_drawdown'], 2),
+        'win_rate': _round(drawdown['win_rate'], 2),
+        'win_source': drawdown['win_source'],
+        'drawdown_advice': drawdown['advice'],
+        'streak': reversal['streak'],
+        'reversal_probability': _round(reversal['probability'], 2),
+        'reversal_advice': reversal['advice'],
+        'summary': result['summary_key'],
+        'summary_advice': result['summary_advice'],
+        'purchase_score': purchase['score'],
+        'purchase_level': purchase['level_key'],
+    })
+    return row
+
+
+class ReportWriter:
+    """逐行写出结果（每行立即刷新，便于管道和tail查看）"""
+
+    def __init__(self, stream, fmt=FORMAT_JSONL):
+        """stream为文本输出流"""
+        self.stream = stream
+        self.fmt = fmt
+        self._csv = None
+        if fmt == FORMAT_CSV:
+            self._csv = csv.DictWriter(stream, fieldnames=FIELDS)
+            self._csv.writeheader()
+
+    def write(self, row):
+        """写出一行"""
+        if self._csv is not None:
+            self._csv.writerow(row)
+        else:
+            self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+
+class StageTimer:
+    """各阶段累计耗时（秒）"""
+
+    def __init__(self):
+        """初始化计时器（可在多个线程中累加）"""
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        """累加一个阶段的耗时"""
+        with self._lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+
+    def format(self):
+        """生成耗时摘要"""
+        return "，".join(f"{stage} {seconds:.3f}s" for stage, seconds in self.totals.items())
+
+
+def collect_codes(codes, watchlist=None):
+    """合并命令行代码和自选列表文件中的代码（去重并保持顺序）"""
+    merged = list(codes or [])
+    if watchlist:
+        merged.extend(load_watchlist(watchlist))
+    return list(dict.fromkeys(code.strip() for code in merged if code.strip()))
+
+
+def analyze_code(store, code, universe, timer, status='ok', error=''):
+    """读取本地数据并分析一只基金，返回输出行"""
+    started = time_module.perf_counter()
+    series = store.load(code)
+    timer.add('load', time_module.perf_counter() - started)
+    if series is None or series.empty:
+        return report_row(code, status='missing', error=error or "本地没有净值数据")
+
+    started = time_module.perf_counter()
+    try:
+        result = analysis.analyze_fund(series, universe)
+    except Exception as e:
+        return report_row(code, status='failed', error=str(e)[:70])
+    finally:
+        timer.add('analyze', time_module.perf_counter() - started)
+    return report_row(code, result, status, error)
+
+
+def run(codes, store, writer, offline=False, force=False, workers=8, max_age=6 * 3600, log=None):
+    """更新并分析全部基金，结果按更新完成的顺序逐行写出；返回 (成功数, 失败数, 计时器)"""
+    timer = StageTimer()
+    started = time_module.perf_counter()
+    universe = load_universe_table(store)
+    use_universe(universe)
+    timer.add('universe', time_module.perf_counter() - started)
+
+    if offline:
+        updates = queue.Queue()
+        for code in codes:
+            updates.put({'code': code, 'status': 'ok'})
+        updates.put(None)
+    else:
+        # 更新在后台线程池中进行，每完成一只就交给主线程分析和输出
+        updates = queue.Queue()
+        refresher = WatchlistRefresher(store=store, max_workers=workers, max_age=max_age)
+
+        def refresh():
+            refresh_started = time_module.perf_counter()
+            try:
+                refresher.refresh(codes, progress=lambda done, total, row: updates.put(row), force=force)
+            except Exception as e:
+                if log is not None:
+                    print(f"更新失败: {e}", file=log)
+            finally:
+                timer.add('fetch', time_module.perf_counter() - refresh_started)
+                updates.put(None)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    ok = failed = 0
+    pending = set(codes)
+    while True:
+        update = updates.get()
+        if update is None:
+            break
+        code = update['code']
+        pending.discard(code)
+        row = analyze_code(store, code, universe, timer, update.get('status', 'ok'), update.get('error', ''))
+        started = time_module.perf_counter()
+        writer.write(row)
+        timer.add('write', time_module.perf_counter() - started)
+        if row['status'] in FAILED_STATUSES:
+            failed += 1
+        else:
+            ok += 1
+        if log is not None and row['status'] in FAILED_STATUSES:
+            print(f"{code}: {row['status']} {row['error']}", file=log)
+
+    # 更新线程异常退出时，未返回的基金按本地数据分析
+    for code in codes:
+        if code in pending:
+            row = analyze_code(store, code, universe, timer, 'error', "更新未完成")
+            writer.write(row)
+            failed += 1
+    return ok, failed, timer
+
+
+def check_alerts(store, codes, timer, log=None):
+    """按存储目录中的规则检查新增交易日（没有规则文件时跳过），返回新触发的提醒"""
+    if not os.path.exists(alerts.rules_path(store)):
+        return []
+    started = time_module.perf_counter()
+    try:
+        fired = alerts.AlertEngine(store).sync(codes)
+    except ValueError as e:
+        if log is not None:
+            print(f"提醒规则无效: {e}", file=log)
+        return []
+    finally:
+        timer.add('alerts', time_module.perf_counter() - started)
+    if log is not None:
+        for alert in fired:
+            print(f"提醒 {alerts.alert_message(alert)}", file=log)
+    return fired
+
+
+def build_parser():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(description="养基宝批量分析：更新净值并输出波段、回撤、反转和综合建议")
+    parser.add_argument('codes', nargs='*', help="基金代码")
+    parser.add_argument('-w', '--watchlist', nargs='?', const='', default=None,
+                        help="自选列表文件（JSON数组或每行一个代码），不带路径时使用本地存储中的自选列表")
+    parser.add_argument('--store', default=None, help="本地净值存储目录")
+    parser.add_argument('-f', '--format', choices=(FORMAT_JSONL, FORMAT_CSV), default=FORMAT_JSONL,
+                        help="输出格式")
+    parser.add_argument('-o', '--output', default='-', help="输出文件（默认标准输出）")
+    parser.add_argument('--offline', action='store_true', help="不联网，只分析本地数据")
+    parser.add_argument('--force', action='store_true', help="忽略本地数据的有效期，全部重新获取")
+    parser.add_argument('--workers', type=int, default=8, help="并发更新线程数")
+    parser.add_argument('--max-age', type=float, default=6.0, help="本地数据有效期（小时）")
+    parser.add_argument('--no-alerts', action='store_true', help="不检查提醒规则（规则文件为存储目录中的 alerts.json）")
+    parser.add_argument('-q', '--quiet', action='store_true', help="不输出耗时和错误信息")
+    parser.add_argument('--serve', nargs='?', const=f"{service.DEFAULT_HOST}:{service.DEFAULT_PORT}", default=None,
+                        metavar='HOST:PORT', help="以HTTP服务模式运行（客户端设置环境变量 FUND_SERVICE_URL 后使用）")
+    return parser
+
+
+def parse_grid(items):
+    """解析参数网格：每项为 参数名=候选值1,候选值2，分段阈值等多元素参数的元素之间用/分隔
+
+    返回 sweep.param_grid 生成的参数组列表，参数名未知或取值无法解析时抛出ValueError
+    """
+    choices = {}
+    for item in items:
+        key, sep, values = item.partition('=')
+        key = key.strip()
+        if not sep or key not in backtest.DEFAULT_PARAMS or not values.strip():
+            raise ValueError(f"参数网格无效: {item}")
+        multiple = isinstance(backtest.DEFAULT_PARAMS[key], (tuple, list))
+        choices[key] = [tuple(_number(part) for part in value.split('/')) if multiple else _number(value)
+                        for value in values.split(',')]
+    return sweep.param_grid(**choices)
+
+
+def _number(text):
+    """整数或小数"""
+    text = text.strip()
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            raise ValueError(f"参数值无效: {text!r}")
+
+
+def build_sweep_parser():
+    """sweep 子命令参数"""
+    parser = argparse.ArgumentParser(prog=f"{os.path.basename(sys.argv[0])} {SWEEP_COMMAND}",
+                                     description="建议规则参数扫描：在本地净值上并行回测一组参数并按买入信号胜率排序")
+    parser.add_argument('codes', nargs='*', help="基金代码")
+    parser.add_argument('-w', '--watchlist', nargs='?', const='', default=None,
+                        help="自选列表文件，不带路径时使用本地存储中的自选列表")
+    parser.add_argument('--store', default=None, help="本地净值存储目录")
+    parser.add_argument('--grid', nargs='+', default=[], metavar='NAME=V1,V2',
+                        help="参数候选值，如 rsi_window=9,14 num_std=2,2.5；多元素参数的元素用/分隔")
+    parser.add_argument('--rule', choices=tuple(backtest.RULE_LABELS), default=backtest.RULE_PURCHASE,
+                        help="回测的建议规则")
+    parser.add_argument('--horizon', type=int, default=sweep.DEFAULT_RANK_HORIZON,
+                        choices=backtest.DEFAULT_HORIZONS, help="排序使用的持有期（交易日）")
+    parser.add_argument('--limit', type=int, default=20, help="输出的参数组数")
+    parser.add_argument('--workers', type=int, default=None, help="并行进程数（默认CPU核数减一）")
+    parser.add_argument('--no-cache', action='store_true', help="不读写存储目录中的回测结果缓存")
+    parser.add_argument('-q', '--quiet', action='store_true', help="不输出进度")
+    return parser
+
+
+def sweep_main(argv):
+    """sweep 子命令：只使用本地存储中的净值，排序结果表输出到标准输出，返回退出码"""
+    parser = build_sweep_parser()
+    args = parser.parse_args(argv)
+    log = None if args.quiet else sys.stderr
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers 必须大于0")
+    try:
+        grid = parse_grid(args.grid) if args.grid else [{}]
+    except ValueError as e:
+        parser.error(str(e))
+    if not grid:
+        parser.error("参数网格为空（MACD快线须短于慢线，RSI超卖阈值须低于超买阈值）")
+
+    store = NavStore(args.store)
+    watchlist = watchlist_path(store) if args.watchlist == '' else args.watchlist
+    codes = collect_codes(args.codes, watchlist)
+    if not codes:
+        parser.error("请提供基金代码或自选列表文件")
+
+    series_list = []
+    for code in codes:
+        try:
+            series, message = store.load(code), f"{code}: 本地没有净值数据"
+        except ValueError as e:
+            series, message = None, str(e)
+        if series is None and log is not None:
+            print(message, file=log)
+        series_list.append(series)
+    _, loaded, matrix = align(series_list)
+    if not loaded:
+        return EXIT_FAILED
+
+    def progress(done, total):
+        print(f"\r回测 {done}/{total}", end='' if done < total else '\n', file=log, flush=True)
+
+    started = time_module.perf_counter()
+    runner = sweep.SweepRunner(None if args.no_cache else os.path.join(store.root, 'sweep'), args.workers)
+    rows = runner.run(matrix, grid, args.rule, rank_horizon=args.horizon,
+                      progress=progress if log is not None else None)
+    print(sweep.format_table(rows, args.horizon, args.limit))
+    if log is not None:
+        print(f"{len(loaded)} 只基金，{len(grid)} 组参数，耗时 {time_module.perf_counter() - started:.3f}s", file=log)
+    return EXIT_OK
+
+
+def main(argv=None):
+    """命令行入口，返回退出码"""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] == SWEEP_COMMAND:
+        return sweep_main(argv[1:])
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    log = None if args.quiet else sys.stderr
+    if args.workers < 1:
+        parser.error("--workers 必须大于0")
+
+    store = NavStore(args.store)
+    if args.serve is not None:
+        host, _, port = args.serve.rpartition(':')
+        if not port.isdigit():
+            parser.error("--serve 格式应为 HOST:PORT")
+        service.serve(store, host or service.DEFAULT_HOST, int(port), args.max_age * 3600, args.offline)
+        return EXIT_OK
+
+    watchlist = args.watchlist
+    if watchlist == '':
+        watchlist = watchlist_path(store)
+    codes = collect_codes(args.codes, watchlist)
+    if not codes:
+        parser.error("请提供基金代码或自选列表文件")
+
+    started = time_module.perf_counter()
+    stream = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8', newline='')
+    try:
+        ok, failed, timer = run(codes, store, ReportWriter(stream, args.format), args.offline, args.force,
+                                args.workers, args.max_age * 3600, log)
+        if not args.no_alerts:
+            check_alerts(store, codes, timer, log)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    if log is not None:
+        print(f"完成 {ok}/{len(codes)} 只，失败 {failed} 只，总耗时 {time_module.perf_counter() - started:.3f}s"
+              f"（{timer.format()}）", file=log)
+    if ok == 0:
+        return EXIT_FAILED
+    return EXIT_PARTIAL if failed else EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
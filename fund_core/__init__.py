@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+养基宝分析核心
+与界面无关的基金数据结构与分析功能，供PyQt5和Kivy两个前端共用
+"""
+
+from fund_core.archive import NavArchive
+from fund_core.overlay import ValuationOverlay
+from fund_core.portfolio import Ledger
+from fund_core.ratelimit import RateLimiter, RetryPolicy
+from fund_core.series import FundSeries
+from fund_core.store import NavStore
+
+__all__ = [
+    'FundSeries',
+    'Ledger',
+    'NavArchive',
+    'NavStore',
+    'RateLimiter',
+    'RetryPolicy',
+    'ValuationOverlay',
+]
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+信号与建议
+波段信号、抄底胜率、综合评分、购买评分及建议级别的判定规则以规则字典描述（见 fund_core.scoring），
+导入时编译一次，可对单只基金的某一天、每一天或多只基金同时计算
+"""
+
+import numpy as np
+
+from fund_core import indicators
+from fund_core.scoring import Scorecard, tiers_param
+
+# 波段信号编码
+BAND_LOW = -1
+BAND_NEUTRAL = 0
+BAND_HIGH = 1
+
+BAND_LABELS = {
+    BAND_HIGH: "高位区 - 谨慎",
+    BAND_LOW: "低位区 - 关注",
+    BAND_NEUTRAL: "震荡区 - 观望",
+}
+
+
+# 波段信号：触及布林带上轨或RSI超买为高位区，触及下轨或RSI超卖为低位区（布林带未形成时仅依据RSI）
+BAND_RULES = {
+    'inputs': ['nav', 'rsi', 'upper', 'lower'],
+    'params': {'rsi_high': 70, 'rsi_low': 30},
+    'rules': [
+        {'name': 'band', 'cases': [
+            ['nav >= upper or rsi >= rsi_high', BAND_HIGH],
+            ['nav <= lower or rsi <= rsi_low', BAND_LOW],
+        ], 'default': BAND_NEUTRAL},
+    ],
+    'dtype': 'int8',
+}
+BAND_SCORECARD = Scorecard(BAND_RULES)
+
+
+def band_signal(values, rsi_values, upper, lower, rsi_high=70, rsi_low=30):
+    """波段信号（见 BAND_RULES）"""
+    return BAND_SCORECARD.score({'nav': values, 'rsi': rsi_values, 'upper': upper, 'lower': lower},
+                                {'rsi_high': rsi_high, 'rsi_low': rsi_low})
+
+
+def latest_band_signal(values, rsi_window=14, bb_window=20, num_std=2):
+    """最新一天的波段信号（只取计算所需的尾部数据）"""
+    x = np.asarray(values, dtype=np.float64)
+    tail = x[-max(rsi_window + 1, bb_window):]
+    rsi_values = indicators.rsi(tail, rsi_window)
+    _, upper, lower = indicators.bollinger(tail, bb_window, num_std)
+    return int(band_signal(tail[-1:], rsi_values[-1:], upper[-1:], lower[-1:])[0])
+
+
+# 综合建议级别编码
+ADVICE_STRONG_BUY = 2
+ADVICE_BUY = 1
+ADVICE_NEUTRAL = 0
+ADVICE_SELL = -1
+ADVICE_STRONG_SELL = -2
+
+ADVICE_KEYS = {
+    ADVICE_STRONG_BUY: 'strong_buy',
+    ADVICE_BUY: 'buy',
+    ADVICE_NEUTRAL: 'neutral',
+    ADVICE_SELL: 'sell',
+    ADVICE_STRONG_SELL: 'strong_sell',
+}
+
+ADVICE_LABELS = {
+    ADVICE_STRONG_BUY: '强烈推荐购买',
+    ADVICE_BUY: '推荐购买',
+    ADVICE_NEUTRAL: '观望',
+    ADVICE_SELL: '不推荐购买',
+    ADVICE_STRONG_SELL: '强烈不推荐购买',
+}
+
+
+# 回撤分段（由深到浅）及对应的抄底胜率
+WIN_RATE_TIERS = (-20, -15, -10, -5)
+WIN_RATES = (0.8, 0.65, 0.45, 0.3, 0.1)
+
+WIN_RATE_RULES = {
+    'inputs': ['drawdown'],
+    'params': {'tiers': WIN_RATE_TIERS},
+    'rules': [
+        {'name': 'win_rate', 'cases': [[f'drawdown < tiers[{i}]', rate] for i, rate in enumerate(WIN_RATES[:-1])],
+         'default': WIN_RATES[-1]},
+    ],
+}
+WIN_RATE_SCORECARD = Scorecard(WIN_RATE_RULES)
+
+
+def drawdown_win_rate(drawdown_values, tiers=WIN_RATE_TIERS):
+    """回撤抄底胜率（见 WIN_RATE_RULES，tiers为4个由深到浅的回撤分段）"""
+    return WIN_RATE_SCORECARD.score({'drawdown': drawdown_values},
+                                    {'tiers': tiers_param(tiers, len(WIN_RATES) - 1)})
+
+
+def reversal_probability(streak_length):
+    """神奇反转概率：连续天数 × 0.15，上限0.9（与 analyze_magic_reversal 一致）"""
+    return np.minimum(0.9, np.abs(streak_length) * 0.15)
+
+
+# 综合评分：波段位置、抄底胜率，反转概率达到0.7时反向操作（连涨后减分，连跌后加分）
+SUMMARY_RULES = {
+    'inputs': ['band', 'win_rate', 'streak'],
+    'rules': [
+        {'name': 'band', 'cases': [[f'band == {BAND_LOW}', 2], [f'band == {BAND_HIGH}', -2]]},
+        {'name': 'win_rate', 'cases': [['win_rate >= 0.7', 3], ['win_rate >= 0.4', 1]], 'default': -1},
+        {'name': 'reversal', 'cases': [['min(0.9, abs(streak) * 0.15) >= 0.7', '-2 * sign(streak)']]},
+    ],
+    'dtype': 'int16',
+}
+SUMMARY_SCORECARD = Scorecard(SUMMARY_RULES)
+
+SUMMARY_LEVEL_RULES = {
+    'inputs': ['score'],
+    'rules': [
+        {'name': 'level', 'cases': [
+            ['score >= 5', ADVICE_STRONG_BUY],
+            ['score >= 2', ADVICE_BUY],
+            ['score >= -2', ADVICE_NEUTRAL],
+            ['score >= -5', ADVICE_SELL],
+        ], 'default': ADVICE_STRONG_SELL},
+    ],
+    'dtype': 'int8',
+}
+SUMMARY_LEVEL_SCORECARD = Scorecard(SUMMARY_LEVEL_RULES)
+
+
+def summary_score(band, win_rate, streak_length):
+    """综合评分（见 SUMMARY_RULES，与 generate_summary_advice 一致）"""
+    return SUMMARY_SCORECARD.score({'band': band, 'win_rate': win_rate, 'streak': streak_length})
+
+
+def summary_level(score):
+    """综合评分对应的建议级别"""
+    return SUMMARY_LEVEL_SCORECARD.score({'score': score})
+
+
+def last_streak(streak_length):
+    """当前连续涨跌：持平的日子沿用上一段连续涨跌（与界面中取最后一段连续涨跌的做法一致）"""
+    length = np.asarray(streak_length)
+    t = np.arange(len(length)).reshape((-1,) + (1,) * (length.ndim - 1))
+    last_move = np.maximum.accumulate(np.where(length != 0, t, -1), axis=0)
+    carried = np.take_along_axis(length, np.maximum(last_move, 0), axis=0)
+    return np.where(last_move >= 0, carried, 0)
+
+
+# 购买建议评分的回撤分段（由深到浅）及加分
+PURCHASE_TIERS = (-20, -10, -5)
+PURCHASE_TIER_SCORES = (4, 2, 1)
+
+
+# 购买建议评分（与 update_purchase_advice 的 buy_score 规则一致）：
+# RSI缺失按50计，布林带未形成时以当前净值代替（与界面一致），均线或MACD缺失时该项不计分
+PURCHASE_RULES = {
+    'inputs': ['nav', 'rsi', 'upper', 'lower', 'drawdown', 'ma5', 'ma20', 'ma60', 'macd', 'macd_signal', 'streak'],
+    'params': {'rsi_low': 30, 'rsi_high': 70, 'tiers': PURCHASE_TIERS},
+    'fill': {'rsi': 50, 'upper': 'nav', 'lower': 'nav', 'drawdown': 0},
+    'rules': [
+        {'name': 'rsi', 'cases': [['rsi < rsi_low', 3], ['rsi > rsi_high', -3]]},
+        {'name': 'bollinger', 'cases': [['nav <= lower', 3], ['nav >= upper', -3]]},
+        {'name': 'drawdown', 'cases': [[f'drawdown < tiers[{i}]', points]
+                                       for i, points in enumerate(PURCHASE_TIER_SCORES)]},
+        {'name': 'trend', 'cases': [['ma5 > ma20 > ma60', 2], ['ma5 < ma20 < ma60', -2]]},
+        {'name': 'macd', 'cases': [['macd > macd_signal', 2], ['macd <= macd_signal', -2]]},
+        # 连续3天以上：连涨减分，连跌加分
+        {'name': 'streak', 'cases': [['abs(streak) >= 3', '-sign(streak)']]},
+    ],
+    'dtype': 'int16',
+}
+PURCHASE_SCORECARD = Scorecard(PURCHASE_RULES)
+
+PURCHASE_LEVEL_RULES = {
+    'inputs': ['score'],
+    'rules': [
+        {'name': 'level', 'cases': [
+            ['score >= 6', ADVICE_STRONG_BUY],
+            ['score >= 3', ADVICE_BUY],
+            ['score >= -2', ADVICE_NEUTRAL],
+            ['score >= -4', ADVICE_SELL],
+        ], 'default': ADVICE_STRONG_SELL},
+    ],
+    'dtype': 'int8',
+}
+PURCHASE_LEVEL_SCORECARD = Scorecard(PURCHASE_LEVEL_RULES)
+
+
+def purchase_score(values, rsi_values, upper, lower, drawdown_values, ma5, ma20, ma60,
+                   macd_line, macd_signal, streak_length, rsi_low=30, rsi_high=70,
+                   tiers=PURCHASE_TIERS):
+    """购买建议评分（见 PURCHASE_RULES），可对每一天同时计算"""
+    inputs = {
+        'nav': values, 'rsi': rsi_values, 'upper': upper, 'lower': lower, 'drawdown': drawdown_values,
+        'ma5': ma5, 'ma20': ma20, 'ma60': ma60, 'macd': macd_line, 'macd_signal': macd_signal,
+        'streak': streak_length,
+    }
+    params = {'rsi_low': rsi_low, 'rsi_high': rsi_high, 'tiers': tiers_param(tiers, len(PURCHASE_TIER_SCORES))}
+    return PURCHASE_SCORECARD.score(inputs, params)
+
+
+def purchase_level(score):
+    """购买建议评分对应的建议级别"""
+    return PURCHASE_LEVEL_SCORECARD.score({'score': score})
@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+"""
+指标提醒
+提醒规则保存在本地存储目录的 alerts.json 中，每条规则是若干条件的“与”，例如：
+
+    [
+        {"id": "dd15", "name": "深度回撤且超卖", "when": "drawdown < -15 and rsi < 30"},
+        {"id": "sb", "name": "转为强烈推荐", "when": "level becomes strong_buy", "codes": ["000001"]}
+    ]
+
+条件字段为每日指标（见 FIELDS），级别和波段字段可以直接写名称（strong_buy、low 等）；
+未指定 codes 的规则对全部同步的基金生效。规则在条件由不满足变为满足的那一天触发一次。
+
+全部规则编译成条件表：相同的条件只比较一次，每次同步时把全部基金新增的交易日拼成一个矩阵，
+一次向量化比较得到（交易日 × 规则）的触发结果。每只基金只处理上次同步之后新增的交易日，
+指标状态按天递推（见 scenario.ScenarioState），与检查进度一起保存在 alerts_state.json 中，
+命令行每次运行也只递推新增的几天；触发记录以只追加的 JSON Lines 文件保存
+"""
+
+import json
+import os
+import re
+import threading
+import time as time_module
+
+import numpy as np
+
+from fund_core import advice
+from fund_core.scenario import ScenarioState
+from fund_core.store import NavStore
+from fund_core.timeline import SignalTimeline
+
+RULES_FILE = 'alerts.json'
+HISTORY_FILE = 'alerts_history.jsonl'
+STATE_FILE = 'alerts_state.json'
+
+# 可用的每日指标字段
+FIELDS = (
+    'nav', 'change', 'rsi', 'band', 'drawdown', 'win_rate', 'streak', 'reversal_prob',
+    'score', 'level', 'purchase_score', 'purchase_level',
+)
+FIELD_INDEX = {field: i for i, field in enumerate(FIELDS)}
+
+# 可以写名称的字段
+BAND_NAMES = {'high': advice.BAND_HIGH, 'low': advice.BAND_LOW, 'neutral': advice.BAND_NEUTRAL}
+LEVEL_NAMES = {key: level for level, key in advice.ADVICE_KEYS.items()}
+FIELD_NAMES = {'band': BAND_NAMES, 'level': LEVEL_NAMES, 'purchase_level': LEVEL_NAMES}
+
+# 比较运算（becomes 与 == 相同，规则本身只在条件变为满足时触发）
+OPERATORS = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+    'becomes': np.equal,
+}
+OPERATOR_CODES = {op: i for i, op in enumerate(OPERATORS)}
+
+CONDITION_PATTERN = re.compile(r'^\s*(\w+)\s*(<=|>=|==|!=|<|>|\bbecomes\b)\s*(\S+)\s*$')
+
+
+def rules_path(store):
+    """提醒规则文件路径（与本地存储放在一起）"""
+    return os.path.join(store.root, RULES_FILE)
+
+
+def history_path(store):
+    """触发记录文件路径"""
+    return os.path.join(store.root, HISTORY_FILE)
+
+
+def state_path(store):
+    """各基金已检查到的交易日"""
+    return os.path.join(store.root, STATE_FILE)
+
+
+def parse_value(field, value):
+    """条件取值：数值或字段支持的名称"""
+    names = FIELD_NAMES.get(field, {})
+    if isinstance(value, str) and value.strip().lower() in names:
+        return float(names[value.strip().lower()])
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        allowed = f"（可用名称: {', '.join(names)}）" if names else ''
+        raise ValueError(f"字段 {field} 的取值无效: {value}{allowed}")
+
+
+def parse_condition(condition):
+    """解析一个条件（"rsi < 30" 或 ["rsi", "<", 30]），返回 (字段, 运算, 取值)"""
+    if isinstance(condition, str):
+        match = CONDITION_PATTERN.match(condition)
+        if match is None:
+            raise ValueError(f"无法解析条件: {condition}")
+        field, op, value = match.groups()
+    else:
+        try:
+            field, op, value = condition
+        except (TypeError, ValueError):
+            raise ValueError(f"条件格式应为 [字段, 运算, 取值]: {condition}")
+    field = str(field).strip()
+    op = str(op).strip()
+    if field not in FIELD_INDEX:
+        raise ValueError(f"未知字段: {field}（可用字段: {', '.join(FIELDS)}）")
+    if op not in OPERATORS:
+        raise ValueError(f"未知运算: {op}")
+    return field, op, parse_value(field, value)
+
+
+def compile_rule(rule):
+    """校验并规范化一条规则，返回新字典（clauses 为解析后的条件列表）"""
+    if not isinstance(rule, dict):
+        raise ValueError(f"规则应为对象: {rule}")
+    rule_id = str(rule.get('id', '')).strip()
+    if not rule_id:
+        raise ValueError(f"规则缺少 id: {rule}")
+    when = rule.get('when')
+    if isinstance(when, str):
+        conditions = [part for part in re.split(r'\s+and\s+', when.strip(), flags=re.IGNORECASE) if part]
+    else:
+        conditions = list(when or [])
+    if not conditions:
+        raise ValueError(f"规则 {rule_id} 没有条件")
+    codes = rule.get('codes')
+    if isinstance(codes, str):
+        codes = [codes]
+    return {
+        'id': rule_id,
+        'name': rule.get('name') or rule_id,
+        'when': when if isinstance(when, str) else ' and '.join(' '.join(map(str, c)) for c in conditions),
+        'codes': [str(code).strip() for code in codes] if codes else None,
+        'clauses': [parse_condition(condition) for condition in conditions],
+    }
+
+
+def load_rules(path):
+    """读取规则文件（不存在时返回空列表），规则无效时抛出ValueError"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise ValueError("提醒规则文件应为JSON数组")
+    return rules
+
+
+def save_rules(path, rules):
+    """保存规则（保存前逐条校验）"""
+    for rule in rules:
+        compile_rule(rule)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(list(rules), f, ensure_ascii=False, indent=2)
+
+
+class RuleSet:
+    """编译后的规则集合：相同条件合并为一列，规则为条件列下标的“与”"""
+
+    def __init__(self, rules):
+        """rules为规则字典列表"""
+        self.rules = [compile_rule(rule) for rule in rules]
+        ids = [rule['id'] for rule in self.rules]
+        if len(set(ids)) != len(ids):
+            raise ValueError("规则 id 不能重复")
+
+        clauses = {}
+        for rule in self.rules:
+            for clause in rule['clauses']:
+                clauses.setdefault(clause, len(clauses))
+        self.clauses = list(clauses)
+        self.clause_fields = np.array([FIELD_INDEX[field] for field, _, _ in self.clauses], dtype=np.intp)
+        self.clause_ops = np.array([OPERATOR_CODES[op] for _, op, _ in self.clauses], dtype=np.intp)
+        self.clause_values = np.array([value for _, _, value in self.clauses], dtype=np.float64)
+
+        # 规则 × 条件下标，条件较少的规则用恒为真的补位列（下标为条件总数）补齐
+        width = max((len(rule['clauses']) for rule in self.rules), default=1)
+        self.rule_clauses = np.full((len(self.rules), width), len(self.clauses), dtype=np.intp)
+        for i, rule in enumerate(self.rules):
+            self.rule_clauses[i, :len(rule['clauses'])] = [clauses[clause] for clause in rule['clauses']]
+
+        self.global_mask = np.array([rule['codes'] is None for rule in self.rules], dtype=bool)
+        self._code_rules = {}
+        for i, rule in enumerate(self.rules):
+            for code in rule['codes'] or ():
+                self._code_rules.setdefault(code, []).append(i)
+        self._scopes = {}
+
+    def __len__(self):
+        return len(self.rules)
+
+    def scope(self, code):
+        """对一只基金生效的规则掩码"""
+        mask = self._scopes.get(code)
+        if mask is None:
+            mask = self.global_mask.copy()
+            mask[self._code_rules.get(code, [])] = True
+            self._scopes[code] = mask
+        return mask
+
+    def evaluate(self, values):
+        """values为（交易日 × 字段）矩阵，返回（交易日 × 规则）的条件是否满足"""
+        operands = values[:, self.clause_fields]
+        passed = np.ones((len(values), len(self.clauses) + 1), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for op, code in OPERATOR_CODES.items():
+                columns = np.flatnonzero(self.clause_ops == code)
+                if len(columns):
+                    passed[:, columns] = OPERATORS[op](operands[:, columns], self.clause_values[columns])
+        # 指标缺失（如RSI预热期）时条件不成立
+        passed[:, :-1] &= ~np.isnan(operands)
+        return passed[:, self.rule_clauses].all(axis=2)
+
+
+def _timeline_rows(timeline, start):
+    """时间线中第start个交易日起的每日指标矩阵"""
+    navs = timeline.navs
+    change = np.full(len(navs), np.nan)
+    change[1:] = (navs[1:] / navs[:-1] - 1) * 100
+    columns = {
+        'nav': navs, 'change': change, 'rsi': timeline.rsi, 'band': timeline.band,
+        'drawdown': timeline.drawdown, 'win_rate': timeline.win_rate, 'streak': timeline.streak,
+        'reversal_prob': timeline.reversal_prob, 'score': timeline.score, 'level': timeline.level,
+        'purchase_score': timeline.purchase_score, 'purchase_level': timeline.purchase_level,
+    }
+    return np.column_stack([np.asarray(columns[field][start:], dtype=np.float64) for field in FIELDS])
+
+
+def _state_row(values):
+    """ScenarioState.advance 的结果转为一行指标"""
+    values = dict(values, change=values['total_change'])
+    return np.array([float(values[field]) for field in FIELDS])
+
+
+class _Tracked:
+    """单只基金的递推状态"""
+
+    __slots__ = ('last_date', 'last_nav', 'state', 'row')
+
+    def __init__(self, series, row):
+        """由完整净值序列初始化，row为最后一个交易日的指标"""
+        self.last_date = series.last_date
+        self.last_nav = series.last_nav
+        self.state = ScenarioState(series)
+        self.row = row
+
+    def to_dict(self):
+        """保存到状态文件的内容"""
+        return {
+            'last_date': str(self.last_date),
+            'last_nav': float(self.last_nav),
+            'row': [float(value) for value in self.row],
+            'state': self.state.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """由状态文件恢复，内容不完整时抛出ValueError"""
+        tracked = cls.__new__(cls)
+        try:
+            tracked.last_date = np.datetime64(data['last_date'], 'D')
+            tracked.last_nav = float(data['last_nav'])
+            tracked.row = np.asarray(data['row'], dtype=np.float64)
+            tracked.state = ScenarioState.from_dict(data['state'])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"提醒状态不完整: {e}")
+        if tracked.row.shape != (len(FIELDS),):
+            raise ValueError("提醒状态不完整: row")
+        return tracked
+
+    def continues(self, series, start):
+        """新增的交易日是否紧接在状态之后（历史未被修订）"""
+        return (start > 0 and series.dates[start - 1] == self.last_date
+                and np.isclose(series.navs[start - 1], self.last_nav, rtol=1e-6, atol=1e-8))
+
+
+def _display_value(field, value):
+    """触发记录中的取值（级别和波段写名称）"""
+    if np.isnan(value):
+        return None
+    if field in ('level', 'purchase_level'):
+        return advice.ADVICE_KEYS[int(value)]
+    if field == 'band':
+        return {code: name for name, code in BAND_NAMES.items()}[int(value)]
+    return round(float(value), 4)
+
+
+class AlertEngine:
+    """提醒引擎：每次同步后只检查新增交易日"""
+
+    def __init__(self, store=None, rules=None):
+        """rules为规则列表，默认读取存储目录中的规则文件"""
+        self.store = store or NavStore()
+        self.rules = RuleSet(load_rules(rules_path(self.store)) if rules is None else rules)
+        self.history_path = history_path(self.store)
+        self.state_path = state_path(self.store)
+        self._lock = threading.Lock()
+        self.cursors, self._tracked = self._read_state()
+
+    def _read_state(self):
+        """读取各基金已检查到的交易日和递推状态：返回 (进度, 状态)"""
+        if not os.path.exists(self.state_path):
+            return {}, {}
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                entries = dict(json.load(f))
+        except (ValueError, TypeError):
+            print("提醒状态文件损坏，重新开始检查")
+            return {}, {}
+        cursors, tracked = {}, {}
+        for code, entry in entries.items():
+            if isinstance(entry, str):
+                # 旧版状态文件只有检查进度
+                cursors[code] = entry
+                continue
+            if not isinstance(entry, dict) or 'date' not in entry:
+                continue
+            cursors[code] = entry['date']
+            if 'tracked' in entry:
+                try:
+                    tracked[code] = _Tracked.from_dict(entry['tracked'])
+                except ValueError:
+                    # 状态无法恢复时下次检查完整计算一次
+                    pass
+        return cursors, tracked
+
+    def _write_state(self):
+        """原子写入检查进度和递推状态"""
+        entries = {}
+        for code, cursor in self.cursors.items():
+            entry = {'date': cursor}
+            tracked = self._tracked.get(code)
+            if tracked is not None:
+                entry['tracked'] = tracked.to_dict()
+            entries[code] = entry
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp = f"{self.state_path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.state_path)
+
+    def _new_rows(self, code):
+        """一只基金上次检查之后的新增交易日：返回 (指标矩阵（首行为前一交易日）, 日期) 或None
+
+        首次检查的基金只看最新一个交易日，不对历史补发提醒
+        """
+        series = self.store.load(code)
+        if series is None or len(series) < 2:
+            return None
+        cursor = self.cursors.get(code)
+        if cursor is None:
+            start = len(series) - 1
+        else:
+            start = max(int(np.searchsorted(series.dates, np.datetime64(cursor, 'D'), side='right')), 1)
+        if start >= len(series):
+            return None
+
+        tracked = self._tracked.get(code)
+        if tracked is not None and tracked.continues(series, start):
+            rows = [tracked.row]
+            for i in range(start, len(series)):
+                rows.append(_state_row(tracked.state.advance(series.navs[i:i + 1], series.dates[i])))
+            rows = np.vstack(rows)
+            tracked.last_date = series.last_date
+            tracked.last_nav = series.last_nav
+            tracked.row = rows[-1]
+        else:
+            # 首次检查或历史被修订，完整计算一次
+            rows = _timeline_rows(SignalTimeline(series), start - 1)
+            self._tracked[code] = _Tracked(series, rows[-1])
+        return rows, series.dates[start:]
+
+    def sync(self, codes=None):
+        """检查一批基金（默认本地存储中的全部基金）的新增交易日，返回新触发的提醒列表"""
+        if not len(self.rules):
+            return []
+        codes = self.store.codes() if codes is None else list(codes)
+        with self._lock:
+            blocks, owners, dates = [], [], []
+            for code in codes:
+                new = self._new_rows(code)
+                if new is None:
+                    continue
+                blocks.append(new[0])
+                owners.append(code)
+                dates.append(new[1])
+            if not blocks:
+                return []
+
+            # 全部基金的新增交易日拼成一个矩阵，一次比较
+            values = np.vstack(blocks)
+            passed = self.rules.evaluate(values)
+            lengths = np.array([len(block) for block in blocks])
+            offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+            fund = np.repeat(np.arange(len(blocks)), lengths)
+            scopes = np.vstack([self.rules.scope(code) for code in owners])
+            passed &= scopes[fund]
+
+            # 每段首行为前一交易日，只在条件由不满足变为满足的那天触发
+            current = np.ones(len(values), dtype=bool)
+            current[offsets] = False
+            rows = np.flatnonzero(current)
+            fired = passed[rows] & ~passed[rows - 1]
+
+            alerts = []
+            now = time_module.time()
+            for row_index, rule_index in zip(*np.nonzero(fired)):
+                row = rows[row_index]
+                block = fund[row]
+                rule = self.rules.rules[rule_index]
+                fields = dict.fromkeys(field for field, _, _ in rule['clauses'])
+                alerts.append({
+                    'time': now,
+                    'rule': rule['id'],
+                    'name': rule['name'],
+                    'when': rule['when'],
+                    'code': owners[block],
+                    'date': str(dates[block][row - offsets[block] - 1]),
+                    'values': {field: _display_value(field, values[row, FIELD_INDEX[field]])
+                               for field in fields},
+                })
+            alerts.sort(key=lambda alert: (alert['date'], alert['code'], alert['rule']))
+
+            if alerts:
+                self._append(alerts)
+            for code, block_dates in zip(owners, dates):
+                self.cursors[code] = str(block_dates[-1])
+            self._write_state()
+        return alerts
+
+    def _append(self, alerts):
+        """追加触发记录并落盘"""
+        os.makedirs(os.path.dirname(self.history_path) or '.', exist_ok=True)
+        with open(self.history_path, 'a', encoding='utf-8') as f:
+            for alert in alerts:
+                f.write(json.dumps(alert, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def history(self, code=None, limit=None):
+        """读取触发记录（按时间顺序，可按基金过滤，limit为最近的条数）"""
+        if not os.path.exists(self.history_path):
+            return []
+        alerts = []
+        with open(self.history_path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    alert = json.loads(line)
+                except ValueError:
+                    continue
+                if code is None or alert.get('code') == code:
+                    alerts.append(alert)
+        return alerts[-limit:] if limit else alerts
+
+
+def alert_message(alert):
+    """一条提醒的文字描述"""
+    values = "，".join(f"{field}={value}" for field, value in alert['values'].items())
+    return f"{alert['date']} {alert['code']} {alert['name']}（{values}）"
@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+单只基金分析
+波段信号、回撤抄底、神奇反转、综合建议和购买建议的纯函数实现，输入为净值数组或FundSeries，
+输出为界面和命令行直接使用的字典；两个前端只负责展示，不再各自计算指标
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from fund_core import advice, graph, indicators, risk
+from fund_core.recovery import bottom_win_rate
+
+# 波段信号对应的操作建议（与综合建议评分中的文字一致）
+BAND_ADVICE = {
+    advice.BAND_HIGH: "不建议购买",
+    advice.BAND_LOW: "建议购买",
+    advice.BAND_NEUTRAL: "观望",
+}
+
+SUMMARY_TEXTS = {
+    advice.ADVICE_STRONG_BUY: "综合多个指标分析，当前基金处于较好的买入时机，建议积极购买。",
+    advice.ADVICE_BUY: "综合多个指标分析，当前基金存在买入机会，建议适量购买。",
+    advice.ADVICE_NEUTRAL: "综合多个指标分析，当前基金处于震荡状态，建议观望为主。",
+    advice.ADVICE_SELL: "综合多个指标分析，当前基金不建议购买，建议观望。",
+    advice.ADVICE_STRONG_SELL: "综合多个指标分析，当前基金处于不利状态，强烈不建议购买。",
+}
+
+PURCHASE_TEXTS = {
+    advice.ADVICE_STRONG_BUY: "强烈推荐购买：多指标显示当前为极佳买点，建议积极布局。",
+    advice.ADVICE_BUY: "推荐购买：当前市场处于较好买入区间，建议适量配置。",
+    advice.ADVICE_NEUTRAL: "观望：市场处于震荡区间，建议暂时观望或小额试探性建仓。",
+    advice.ADVICE_SELL: "不推荐购买：市场处于弱势，建议等待更好买点。",
+    advice.ADVICE_STRONG_SELL: "强烈不推荐购买：多指标显示当前风险较高，建议避免入场。",
+}
+
+# 图表使用的指标（见 fund_core.graph）
+CHART_INDICATORS = (
+    'ma5', 'ma20', 'ma60', 'rsi', 'bb_mid', 'upper', 'lower',
+    'macd', 'macd_signal', 'macd_hist', 'drawdown', 'duration',
+)
+
+# 建议级别对应的颜色
+LEVEL_COLORS = {
+    advice.ADVICE_STRONG_BUY: 'green',
+    advice.ADVICE_BUY: 'lightgreen',
+    advice.ADVICE_NEUTRAL: 'blue',
+    advice.ADVICE_SELL: 'orange',
+    advice.ADVICE_STRONG_SELL: 'red',
+}
+
+
+def _last(values, default):
+    """最后一个值，缺失时返回default"""
+    value = float(values[-1]) if len(values) else float('nan')
+    return default if np.isnan(value) else value
+
+
+def chart_indicators(navs):
+    """图表所需的全部指标（与净值等长的数组）；传入FundSeries时与其他分析共用同一份计算结果"""
+    frame = graph.frame_for(navs) if hasattr(navs, 'version') else graph.IndicatorFrame(navs)
+    return frame.get(CHART_INDICATORS)
+
+
+def band_points(navs, ind=None, warmup=14):
+    """历史波段信号点：返回 (高位区布尔数组, 低位区布尔数组)，前warmup天不标注"""
+    x = np.asarray(navs, dtype=np.float64)
+    ind = ind or chart_indicators(x)
+    rsi_values = np.where(np.isnan(ind['rsi']), 50, ind['rsi'])
+    upper = np.where(np.isnan(ind['upper']), x, ind['upper'])
+    lower = np.where(np.isnan(ind['lower']), x, ind['lower'])
+    band = advice.band_signal(x, rsi_values, upper, lower)
+    band[:warmup] = advice.BAND_NEUTRAL
+    return band == advice.BAND_HIGH, band == advice.BAND_LOW
+
+
+def trend_signal(navs, ind=None):
+    """净值走势图的当前信号：返回 (状态文字, 颜色)，震荡区再按MACD和均线细分趋势"""
+    x = np.asarray(navs, dtype=np.float64)
+    ind = ind or chart_indicators(x)
+    band = band_analysis(x, ind)['band']
+    if band == advice.BAND_HIGH:
+        return "高位区 - 谨慎", 'red'
+    if band == advice.BAND_LOW:
+        return "低位区 - 关注", 'green'
+    macd_line, macd_signal = ind['macd'][-1], ind['macd_signal'][-1]
+    ma5, ma20 = ind['ma5'][-1], ind['ma20'][-1]
+    if not np.isnan(macd_line) and not np.isnan(macd_signal):
+        if macd_line > macd_signal and ma5 > ma20:
+            return "上升趋势 - 持有", 'blue'
+        if macd_line < macd_signal and ma5 < ma20:
+            return "下降趋势 - 观望", 'purple'
+    return "震荡区 - 观望", 'orange'
+
+
+def band_analysis(navs, ind=None):
+    """波段信号分析（最新一天）"""
+    x = np.asarray(navs, dtype=np.float64)
+    if ind is None:
+        tail = x[-21:]
+        rsi_value = _last(indicators.rsi(tail), 50)
+        _, upper, lower = indicators.bollinger(tail)
+    else:
+        rsi_value = _last(ind['rsi'], 50)
+        upper, lower = ind['upper'], ind['lower']
+    band = int(advice.band_signal(x[-1], rsi_value, _last(upper, x[-1]), _last(lower, x[-1])))
+    return {
+        'band': band,
+        'status': advice.BAND_LABELS[band],
+        'rsi': rsi_value,
+        'advice': BAND_ADVICE[band],
+    }
+
+
+def run_segments(navs, ind=None):
+    """连续涨跌段：返回 (天数数组, 方向数组, 累计涨跌幅%数组)，持平的日子结束当前段"""
+    x = np.asarray(navs, dtype=np.float64)
+    length, change = ind['streaks'] if ind is not None else indicators.streaks(x)
+    if len(x) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([])
+    # 段在下一天方向改变处（或序列末尾）结束
+    ends = np.ones(len(x), dtype=bool)
+    ends[:-1] = np.sign(length[1:]) != np.sign(length[:-1])
+    ends &= length != 0
+    return np.abs(length[ends]).astype(np.int64), np.sign(length[ends]).astype(np.int64), change[ends]
+
+
+def reversal_probability_detail(streak, direction, total_change, volatility, rsi_value, reversal_streaks):
+    """神奇反转图中的反转概率：基础概率按涨跌幅度、波动率、RSI和历史相似反转调整，限制在0.05~0.95"""
+    base_prob = min(0.9, streak * 0.15)
+
+    magnitude_factor = 1.0
+    if abs(total_change) > 10:
+        magnitude_factor = 1.3
+    elif abs(total_change) < 2:
+        magnitude_factor = 0.7
+
+    volatility_factor = 1.0
+    if volatility > 30:
+        volatility_factor = 1.2
+    elif volatility < 15:
+        volatility_factor = 0.8
+
+    rsi_factor = 1.0
+    if (direction > 0 and rsi_value > 70) or (direction < 0 and rsi_value < 30):
+        rsi_factor = 1.4
+
+    history_factor = 1.0
+    if len(reversal_streaks):
+        similar = reversal_streaks[np.abs(reversal_streaks - streak) <= 2]
+        if len(similar):
+            history_factor = 1.2 if similar.mean() > streak else 0.9
+
+    prob = base_prob * magnitude_factor * volatility_factor * rsi_factor * history_factor
+    return min(0.95, max(0.05, prob))
+
+
+def reversal_analysis(navs, volatility=0.0, ind=None):
+    """神奇反转分析
+
+    probability/advice 为购买建议使用的简单规则（天数 × 0.15），
+    detail_probability/curve 为神奇反转图使用的多因素概率（volatility为年化波动率%）
+    """
+    x = np.asarray(navs, dtype=np.float64)
+    lengths, directions, changes = run_segments(x, ind)
+    rsi_value = _last(ind['rsi'] if ind is not None else indicators.rsi(x[-15:]), 50)
+
+    # 方向与上一段相反的段视为一次反转，记录反转前一段的天数
+    flips = np.flatnonzero(directions[1:] != directions[:-1]) + 1
+    reversal_streaks = lengths[flips - 1].astype(np.float64)
+
+    max_streak = int(lengths.max()) if len(lengths) else 1
+    curve = [reversal_probability_detail(streak, 1, streak * 0.5, volatility, 70, reversal_streaks)
+             for streak in range(1, max_streak + 1)]
+
+    env = "高波动 " if volatility > 30 else ("低波动 " if volatility < 15 else "")
+    env += "超买" if rsi_value > 70 else ("超卖" if rsi_value < 30 else "正常")
+
+    result = {
+        'segments': len(lengths),
+        'curve': curve,
+        'rsi': rsi_value,
+        'volatility': volatility,
+        'market_env': env,
+    }
+    if len(lengths):
+        streak, direction, total_change = int(lengths[-1]), int(directions[-1]), float(changes[-1])
+        probability = min(0.9, streak * 0.15)
+        result.update({
+            'streak': streak * direction,
+            'direction': direction,
+            'total_change': total_change,
+            'streak_text': f"连涨 {streak}天" if direction > 0 else f"连跌 {streak}天",
+            'probability': probability,
+            'detail_probability': reversal_probability_detail(streak, direction, total_change,
+                                                              volatility, rsi_value, reversal_streaks),
+            'advice': "建议反向操作" if probability >= 0.7 else "观望",
+        })
+    else:
+        result.update({
+            'streak': 0,
+            'direction': 0,
+            'total_change': 0.0,
+            'streak_text': "无明显趋势",
+            'probability': 0.5,
+            'detail_probability': 0.5,
+            'advice': "观望",
+        })
+    return result
+
+
+def drawdown_recoveries(drawdown_values):
+    """已结束的回撤区间：[{start, end, duration, max_drawdown}, ...]（end为回到高点的下标）"""
+    dd = np.asarray(drawdown_values, dtype=np.float64)
+    under = dd < 0
+    edges = np.diff(under.astype(np.int8), prepend=0)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    recoveries = []
+    for start, end in zip(starts, ends):
+        recoveries.append({
+            'start': int(start),
+            'end': int(end),
+            'duration': int(end - start),
+            'max_drawdown': float(dd[start:end].min()),
+        })
+    return recoveries
+
+
+def drawdown_analysis(series, universe=None, ind=None):
+    """回撤抄底分析（抄底胜率查历史回撤恢复统计：本基金 -> 全市场 -> 经验规则）"""
+    x = np.asarray(series.navs, dtype=np.float64)
+    ind = ind if ind is not None else graph.frame_for(series)
+    dd = ind['drawdown']
+    current_drawdown = _last(dd, 0.0)
+    win_rate, samples, source = bottom_win_rate(series, universe)
+
+    if win_rate >= 0.7:
+        level_text, color, action = "高胜率", 'green', "强烈建议购买"
+    elif win_rate >= 0.4:
+        level_text, color, action = "中等胜率", 'orange', "建议购买"
+    else:
+        level_text, color, action = "低胜率", 'red', "不建议购买"
+
+    macd_line = _last(ind['macd'], 0.0)
+    macd_signal = _last(ind['macd_signal'], 0.0)
+    market_status = "震荡"
+    if macd_line > macd_signal and current_drawdown > -10:
+        market_status = "上升"
+    elif macd_line < macd_signal and current_drawdown < -15:
+        market_status = "下跌"
+
+    return {
+        'current_drawdown': current_drawdown,
+        'max_drawdown': float(np.nanmin(dd)) if len(dd) else 0.0,
+        'duration': int(ind['duration'][-1]) if len(dd) else 0,
+        'win_rate': float(win_rate),
+        'win_samples': samples,
+        'win_source': source,
+        'win_level': level_text,
+        'win_color': color,
+        'market_status': market_status,
+        'advice': action,
+    }
+
+
+def summary_advice(band, win_rate, streak):
+    """综合建议：返回 (级别, 文字)"""
+    level = int(advice.summary_level(advice.summary_score(band, win_rate, streak)))
+    return level, SUMMARY_TEXTS[level]
+
+
+def purchase_advice(navs, ind=None):
+    """当日购买建议（多指标评分），返回评分、级别、市场状态描述和当前指标"""
+    x = np.asarray(navs, dtype=np.float64)
+    ind = ind if ind is not None else graph.IndicatorFrame(x)
+    rsi_value = _last(ind['rsi'], 50)
+    upper = _last(ind['upper'], x[-1])
+    lower = _last(ind['lower'], x[-1])
+    current_drawdown = _last(ind['drawdown'], 0.0)
+    lengths, directions, changes = run_segments(x, ind)
+    streak = int(lengths[-1]) if len(lengths) else 0
+    direction = int(directions[-1]) if len(lengths) else 0
+    total_change = float(changes[-1]) if len(lengths) else 0.0
+
+    score = int(advice.purchase_score(
+        x[-1], rsi_value, upper, lower, current_drawdown,
+        ind['ma5'][-1], ind['ma20'][-1], ind['ma60'][-1],
+        ind['macd'][-1], ind['macd_signal'][-1], streak * direction
+    ))
+    level = int(advice.purchase_level(score))
+
+    # 市场状态描述（顺序与评分项一致）
+    parts = ["超卖状态" if rsi_value < 30 else ("超买状态" if rsi_value > 70 else "正常状态")]
+    if x[-1] <= lower:
+        parts.append("触及布林带下轨")
+    elif x[-1] >= upper:
+        parts.append("触及布林带上轨")
+    for tier, text in zip(advice.PURCHASE_TIERS, ("深度回撤", "中度回撤", "轻度回撤")):
+        if current_drawdown < tier:
+            parts.append(text)
+            break
+    ma5, ma20, ma60 = ind['ma5'][-1], ind['ma20'][-1], ind['ma60'][-1]
+    if not np.isnan(ma5) and not np.isnan(ma20):
+        if ma5 > ma20 > ma60:
+            parts.append("多头排列")
+        elif ma5 < ma20 < ma60:
+            parts.append("空头排列")
+    if not np.isnan(ind['macd'][-1]) and not np.isnan(ind['macd_signal'][-1]):
+        parts.append("MACD金叉" if ind['macd'][-1] > ind['macd_signal'][-1] else "MACD死叉")
+    if streak >= 3:
+        parts.append(f"连续{'上涨' if direction > 0 else '下跌'}{streak}天")
+
+    return {
+        'score': score,
+        'level': level,
+        'level_key': advice.ADVICE_KEYS[level],
+        'level_text': advice.ADVICE_LABELS[level],
+        'level_color': LEVEL_COLORS[level],
+        'status': "，".join(parts),
+        'advice': PURCHASE_TEXTS[level],
+        'rsi': rsi_value,
+        'drawdown': current_drawdown,
+        'streak': streak,
+        'direction': direction,
+        'total_change': total_change,
+    }
+
+
+def purchase_message(result):
+    """购买建议的纯文本（界面可在此基础上追加带颜色的建议级别）"""
+    lines = [f"{result['status']}。", "", result['advice'], "", "当前指标：",
+             f"RSI: {result['rsi']:.1f}", f"回撤率: {result['drawdown']:.1f}%"]
+    if result['streak'] > 0:
+        lines.append(f"连续{'上涨' if result['direction'] > 0 else '下跌'}: {result['streak']}天")
+        if result['total_change'] != 0:
+            lines.append(f"累计幅度: {result['total_change']:.2f}%")
+    return "\n".join(lines)
+
+
+def fund_overview(series, today=None):
+    """最新净值、今日涨跌幅和近一年涨跌幅（近一年在完整历史中查找）"""
+    overview = {'current_nav': None, 'today_change': None, 'one_year_change': None}
+    if series.empty:
+        return overview
+    navs = series.navs
+    overview['current_nav'] = float(navs[-1])
+    if len(navs) >= 2:
+        overview['today_change'] = float((navs[-1] - navs[-2]) / navs[-2] * 100)
+
+    today = pd.Timestamp.now() if today is None else pd.Timestamp(today)
+    one_year_ago = np.datetime64((today - pd.DateOffset(years=1)).date(), 'D')
+    history = series.history()
+    idx = int(np.searchsorted(history.dates, one_year_ago, side='right'))
+    if idx > 0:
+        base = float(history.navs[idx - 1])
+        overview['one_year_change'] = (overview['current_nav'] - base) / base * 100
+    return overview
+
+
+def analyze_fund(series, universe=None, risk_cache=None):
+    """完整分析一只基金：波段、回撤、反转、综合建议和购买建议"""
+    x = np.asarray(series.navs, dtype=np.float64)
+    # 各项分析共用同一份按需计算的指标
+    ind = graph.frame_for(series)
+    volatility = risk.profile_for(series, risk_cache).metrics(window=21)['volatility']
+    band = band_analysis(x, ind)
+    drawdown = drawdown_analysis(series, universe, ind)
+    reversal = reversal_analysis(x, 0.0 if np.isnan(volatility) else volatility, ind)
+    level, text = summary_advice(band['band'], drawdown['win_rate'], reversal['streak'])
+    return {
+        'code': series.code,
+        'name': series.info.get('基金名称', '') if series.info else '',
+        'date': str(series.last_date),
+        'nav': float(x[-1]),
+        'overview': fund_overview(series),
+        'band_signal': band,
+        'drawdown': drawdown,
+        'magic_reversal': reversal,
+        'summary_level': level,
+        'summary_key': advice.ADVICE_KEYS[level],
+        'summary_advice': text,
+        'purchase': purchase_advice(x, ind),
+    }
+
+
+def advice_report(result):
+    """把 analyze_fund 的结果整理为购买建议对话框使用的文字字典"""
+    band = result['band_signal']
+    drawdown = result['drawdown']
+    reversal = result['magic_reversal']
+    return {
+        'fund_code': result['code'],
+        'fund_name': result['name'] or result['code'],
+        'analysis_date': datetime.now().strftime("%Y-%m-%d"),
+        'band_signal': {
+            'status': band['status'],
+            'rsi': f"{band['rsi']:.2f}",
+            'advice': band['advice'],
+        },
+        'drawdown': {
+            'current_drawdown': f"{drawdown['current_drawdown']:.2f}%",
+            'max_drawdown': f"{drawdown['max_drawdown']:.2f}%",
+            'win_rate': f"{drawdown['win_rate']:.2f}（{drawdown['win_source']}）",
+            'advice': drawdown['advice'],
+        },
+        'magic_reversal': {
+            'streak': reversal['streak_text'],
+            'probability': f"{reversal['probability']:.2f}",
+            'advice': reversal['advice'],
+        },
+        'summary_advice': result['summary_advice'],
+        'advice_level': result['summary_key'],
+    }
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+全市场净值归档
+一个按列存储（Fortran顺序）的 float32 内存映射矩阵（交易日 × 基金），
+加上 int32 日期序号轴、代码索引和每只基金的有效区间，
+筛选、回测和自选刷新可以零拷贝打开，内存占用只与实际访问的列有关
+"""
+
+import json
+import os
+import time as time_module
+
+import numpy as np
+
+from fund_core.series import FundSeries
+from fund_core.store import NavStore
+
+ARCHIVE_VERSION = 1
+
+NAVS_FILE = 'navs.f32'
+DAYS_FILE = 'days.npy'
+INDEX_FILE = 'index.json'
+
+
+def default_archive_path(store):
+    """默认归档目录（位于本地存储目录下）"""
+    return os.path.join(store.root, 'archive')
+
+
+def build_archive(store=None, path=None, codes=None):
+    """从本地存储构建归档，逐列写入，不在内存中生成完整矩阵"""
+    store = store or NavStore()
+    path = path or default_archive_path(store)
+    codes = store.codes() if codes is None else list(codes)
+    os.makedirs(path, exist_ok=True)
+    # 以开始构建的时间为准，构建期间写入存储的数据会在下次打开时触发重建
+    started = time_module.time()
+
+    # 第一遍：收集共同的交易日轴（只保留日期序号）
+    loaded = []
+    day_arrays = []
+    for code in codes:
+        series = store.load(code)
+        if series is not None and not series.empty:
+            loaded.append(code)
+            day_arrays.append(series.days)
+    if not loaded:
+        raise ValueError("本地存储中没有可归档的基金")
+    days = np.unique(np.concatenate(day_arrays)).astype(np.int32)
+
+    # 第二遍：逐列写入内存映射文件
+    tmp_navs = os.path.join(path, NAVS_FILE + '.tmp')
+    matrix = np.memmap(tmp_navs, dtype=np.float32, mode='w+',
+                       shape=(len(days), len(loaded)), order='F')
+    first = np.empty(len(loaded), dtype=np.int32)
+    last = np.empty(len(loaded), dtype=np.int32)
+    meta = {}
+    for column, code in enumerate(loaded):
+        series = store.load(code)
+        rows = np.searchsorted(days, day_arrays[column])
+        day_arrays[column] = None
+        first[column] = rows[0]
+        last[column] = rows[-1] + 1
+        column_view = matrix[:, column]
+        column_view[:] = np.nan
+        column_view[rows] = series.navs
+        meta[code] = {'fund_type': series.fund_type, 'name': series.info.get('基金名称', '')}
+    matrix.flush()
+    del matrix
+
+    # 先写数据文件，最后写索引（索引存在即表示归档完整）
+    tmp_days = os.path.join(path, DAYS_FILE + '.tmp')
+    with open(tmp_days, 'wb') as f:
+        np.save(f, days)
+    index = {
+        'version': ARCHIVE_VERSION,
+        'built': started,
+        'shape': [len(days), len(loaded)],
+        'codes': loaded,
+        'first': first.tolist(),
+        'last': last.tolist(),
+        'meta': meta,
+    }
+    tmp_index = os.path.join(path, INDEX_FILE + '.tmp')
+    with open(tmp_index, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_navs, os.path.join(path, NAVS_FILE))
+    os.replace(tmp_days, os.path.join(path, DAYS_FILE))
+    os.replace(tmp_index, os.path.join(path, INDEX_FILE))
+    return NavArchive(path)
+
+
+class NavArchive:
+    """只读的全市场净值归档"""
+
+    def __init__(self, path):
+        """打开归档（只映射文件，不读取数据）"""
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE), encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != ARCHIVE_VERSION:
+            raise ValueError(f"不支持的归档版本: {index.get('version')}")
+
+        self.built = index['built']
+        self.codes = index['codes']
+        self.meta = index.get('meta', {})
+        self.first = np.asarray(index['first'], dtype=np.int32)
+        self.last = np.asarray(index['last'], dtype=np.int32)
+        self._columns = {code: column for column, code in enumerate(self.codes)}
+        self.days = np.load(os.path.join(path, DAYS_FILE), mmap_mode='r')
+        rows, cols = index['shape']
+        self.navs = np.memmap(os.path.join(path, NAVS_FILE), dtype=np.float32, mode='r',
+                              shape=(rows, cols), order='F')
+
+    @classmethod
+    def open_or_build(cls, store=None, path=None):
+        """打开归档，本地存储有更新或归档不存在时重新构建"""
+        store = store or NavStore()
+        path = path or default_archive_path(store)
+        try:
+            archive = cls(path)
+        except (OSError, ValueError, KeyError):
+            return build_archive(store, path)
+        if archive.is_stale(store):
+            archive.close()
+            return build_archive(store, path)
+        return archive
+
+    def is_stale(self, store):
+        """本地存储中是否有比归档更新的数据"""
+        with os.scandir(store.nav_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.npz') and entry.stat().st_mtime > self.built:
+                    return True
+        return False
+
+    def close(self):
+        """释放内存映射"""
+        mm = getattr(self.navs, '_mmap', None)
+        self.navs = None
+        self.days = None
+        if mm is not None:
+            mm.close()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code):
+        return code in self._columns
+
+    @property
+    def dates(self):
+        """交易日轴（datetime64[D]）"""
+        return self.days.astype('datetime64[D]')
+
+    def column_index(self, code):
+        """基金所在列号"""
+        return self._columns[code]
+
+    def column(self, code):
+        """基金有效区间内的净值（float32只读视图，区间内未公布净值的日期为NaN）"""
+        column = self._columns[code]
+        return self.navs[self.first[column]:self.last[column], column]
+
+    def series(self, code, tail=None):
+        """基金净值序列（只复制有效区间或最近tail条）"""
+        column = self._columns[code]
+        start, end = int(self.first[column]), int(self.last[column])
+        if tail is not None:
+            start = max(start, end - tail)
+        navs = self.navs[start:end, column]
+        valid = ~np.isnan(navs)
+        meta = self.meta.get(code, {})
+        info = {'基金名称': meta['name']} if meta.get('name') else {}
+        return FundSeries(code, self.days[start:end][valid].astype('datetime64[D]'),
+                          navs[valid], meta.get('fund_type', ''), info)
+
+    def matrix(self, codes=None, start=None, end=None):
+        """返回 (交易日, 代码列表, 净值矩阵)；未指定代码时为全部列的零拷贝视图"""
+        row_start, row_end = 0, len(self.days)
+        if start is not None:
+            row_start = int(np.searchsorted(self.days, _day_number(start)))
+        if end is not None:
+            row_end = int(np.searchsorted(self.days, _day_number(end), side='right'))
+        dates = self.days[row_start:row_end].astype('datetime64[D]')
+        if codes is None:
+            return dates, list(self.codes), self.navs[row_start:row_end]
+
+        codes = [code for code in codes if code in self._columns]
+        columns = np.array([self._columns[code] for code in codes], dtype=np.intp)
+        # 只读取选中的列（按列号排序以顺序访问文件）
+        order = np.argsort(columns)
+        matrix = np.empty((row_end - row_start, len(columns)), dtype=np.float32, order='F')
+        for target in order:
+            matrix[:, target] = self.navs[row_start:row_end, columns[target]]
+        return dates, codes, matrix
+
+    def names(self):
+        """代码 -> 名称 映射"""
+        return {code: meta.get('name', '') for code, meta in self.meta.items()}
+
+
+def _day_number(value):
+    """日期转换为日期序号"""
+    return np.datetime64(value, 'D').astype(np.int64)
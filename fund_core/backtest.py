@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+建议规则回测
+在（交易日 × 基金）净值矩阵的每一天同时计算购买建议评分和综合建议级别，
+统计各级别之后20/60/120个交易日的收益、胜率和持有期最大回撤，不逐日循环
+"""
+
+import numpy as np
+
+from fund_core import advice, indicators, recovery
+from fund_core.screener import fill_gaps
+
+DEFAULT_HORIZONS = (20, 60, 120)
+
+# 指标预热期：60日均线形成之前的日期不参与统计
+WARMUP = 60
+
+# 可回测的规则
+RULE_PURCHASE = 'purchase'
+RULE_SUMMARY = 'summary'
+
+RULE_LABELS = {
+    RULE_PURCHASE: '购买建议评分',
+    RULE_SUMMARY: '综合建议',
+}
+
+# 界面中使用的默认参数
+DEFAULT_PARAMS = {
+    'rsi_window': 14,
+    'rsi_low': 30,
+    'rsi_high': 70,
+    'bb_window': 20,
+    'num_std': 2,
+    'macd_fast': 12,
+    'macd_slow': 26,
+    'macd_signal': 9,
+    'purchase_tiers': advice.PURCHASE_TIERS,
+    'win_rate_tiers': advice.WIN_RATE_TIERS,
+}
+
+
+def advice_levels(matrix, rule=RULE_PURCHASE, params=None):
+    """计算每一天的建议级别，返回 (级别矩阵, 有效标记)；params覆盖 DEFAULT_PARAMS 中的指标参数"""
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    x = np.asarray(matrix, dtype=np.float64)
+    rsi_values = indicators.rsi(x, p['rsi_window'])
+    _, upper, lower = indicators.bollinger(x, p['bb_window'], p['num_std'])
+    dd = indicators.drawdown(x)
+    streak = advice.last_streak(indicators.streaks(x)[0])
+
+    if rule == RULE_PURCHASE:
+        macd_line, macd_signal, _ = indicators.macd(x, p['macd_fast'], p['macd_slow'], p['macd_signal'])
+        score = advice.purchase_score(
+            x, rsi_values, upper, lower, dd,
+            indicators.rolling_mean(x, 5), indicators.rolling_mean(x, 20), indicators.rolling_mean(x, 60),
+            macd_line, macd_signal, streak,
+            rsi_low=p['rsi_low'], rsi_high=p['rsi_high'], tiers=p['purchase_tiers']
+        )
+        levels = advice.purchase_level(score)
+    elif rule == RULE_SUMMARY:
+        rsi_filled = np.where(np.isnan(rsi_values), 50, rsi_values)
+        band = advice.band_signal(x, rsi_filled, upper, lower, p['rsi_high'], p['rsi_low'])
+        # 逐日胜率只使用当天已揭晓的本基金恢复样本，没有前视偏差（全市场统计表包含未来数据，不使用）；
+        # win_rate_tiers 作用于样本不足时的经验规则
+        win_rate = recovery.win_rates(x, dd, indicators.duration_from_drawdown(dd),
+                                      indicators.annualized_volatility(x), tiers=p['win_rate_tiers'],
+                                      universe=False)
+        score = advice.summary_score(band, win_rate, streak)
+        levels = advice.summary_level(score)
+    else:
+        raise ValueError(f"未知的回测规则: {rule}")
+
+    # 每只基金自首个净值起满预热期后才有效
+    seen = np.cumsum(~np.isnan(x), axis=0)
+    valid = (seen > WARMUP) & ~np.isnan(x)
+    return levels, valid
+
+
+def forward_returns(matrix, horizon):
+    """持有horizon个交易日的收益率（%），超出数据范围为NaN"""
+    x = np.asarray(matrix, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if horizon < len(x):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[:-horizon] = (x[horizon:] / x[:-horizon] - 1) * 100
+    return out
+
+
+def forward_drawdown(matrix, horizon):
+    """持有期内相对买入净值的最大跌幅（%，不跌时为0），超出数据范围为NaN"""
+    x = np.asarray(matrix, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if horizon < len(x):
+        future_min = _window_min(x[1:], horizon)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[:-horizon] = np.minimum((future_min / x[:-horizon] - 1) * 100, 0)
+    return out
+
+
+def _window_min(values, window):
+    """长度为window的滑动窗口最小值（倍增法，O(n log window)）"""
+    table = values
+    size = 1
+    while size * 2 <= window:
+        table = np.minimum(table[:-size], table[size:])
+        size *= 2
+    # 两个长度为size的区间覆盖整个窗口
+    n = len(values) - window + 1
+    return np.minimum(table[:n], table[window - size:window - size + n])
+
+
+def forward_outcomes(matrix, horizons=DEFAULT_HORIZONS):
+    """各持有期的 (未来收益, 持有期最大跌幅)，与建议规则无关，可在多次回测间复用"""
+    return {horizon: (forward_returns(matrix, horizon), forward_drawdown(matrix, horizon))
+            for horizon in horizons}
+
+
+def signal_entries(levels, valid, min_level=advice.ADVICE_BUY):
+    """买入信号出现的日期：级别由低于min_level变为不低于min_level"""
+    active = valid & (levels >= min_level)
+    entries = active.copy()
+    entries[1:] &= ~active[:-1]
+    return entries
+
+
+def _group_stats(groups, values, n_groups):
+    """按级别分组统计：返回 (样本数, 均值, 正值占比)"""
+    ok = ~np.isnan(values)
+    g = groups[ok]
+    v = values[ok]
+    count = np.bincount(g, minlength=n_groups)
+    total = np.bincount(g, weights=v, minlength=n_groups)
+    wins = np.bincount(g, weights=(v > 0).astype(np.float64), minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return count, total / count, wins / count
+
+
+def _group_min(groups, values, n_groups):
+    """按级别分组取最小值"""
+    ok = ~np.isnan(values)
+    out = np.full(n_groups, np.inf)
+    np.minimum.at(out, groups[ok], values[ok])
+    out[np.isinf(out)] = np.nan
+    return out
+
+
+def prepare(matrix):
+    """转换为float64二维矩阵并填补有效区间内的缺失值"""
+    x = np.asarray(matrix, dtype=np.float64)
+    if x.ndim == 1:
+        x = x[:, None]
+    return fill_gaps(x)
+
+
+def backtest(matrix, horizons=DEFAULT_HORIZONS, rule=RULE_PURCHASE, min_level=advice.ADVICE_BUY,
+             params=None, prepared=False, outcomes=None):
+    """回测建议规则，返回 {'levels': 各级别统计列表, 'entries': 买入信号统计, ...}
+
+    prepared为True表示matrix已经过 prepare 处理，outcomes为 forward_outcomes 的结果（参数扫描时复用）
+    """
+    x = matrix if prepared else prepare(matrix)
+    levels, valid = advice_levels(x, rule, params)
+
+    level_keys = sorted(advice.ADVICE_KEYS, reverse=True)
+    offset = -min(level_keys)
+    n_groups = max(level_keys) + offset + 1
+    groups = levels[valid].astype(np.intp) + offset
+    entries = signal_entries(levels, valid, min_level)
+
+    rows = {level: {'level': advice.ADVICE_KEYS[level], 'label': advice.ADVICE_LABELS[level]}
+            for level in level_keys}
+    samples = np.bincount(groups, minlength=n_groups)
+    for level in level_keys:
+        rows[level]['samples'] = int(samples[level + offset])
+
+    entry_stats = {'count': int(np.count_nonzero(entries))}
+    if outcomes is None:
+        outcomes = forward_outcomes(x, horizons)
+    for horizon in horizons:
+        ret, dd = outcomes[horizon]
+        count, mean_ret, hit = _group_stats(groups, ret[valid], n_groups)
+        _, mean_dd, _ = _group_stats(groups, dd[valid], n_groups)
+        worst_dd = _group_min(groups, dd[valid], n_groups)
+        for level in level_keys:
+            g = level + offset
+            rows[level][f'hit_{horizon}'] = float(hit[g])
+            rows[level][f'return_{horizon}'] = float(mean_ret[g])
+            rows[level][f'drawdown_{horizon}'] = float(mean_dd[g])
+            rows[level][f'worst_{horizon}'] = float(worst_dd[g])
+            rows[level][f'n_{horizon}'] = int(count[g])
+
+        entry_ret = ret[entries]
+        entry_ret = entry_ret[~np.isnan(entry_ret)]
+        entry_stats[f'n_{horizon}'] = int(len(entry_ret))
+        entry_stats[f'hit_{horizon}'] = float(np.mean(entry_ret > 0)) if len(entry_ret) else np.nan
+        entry_stats[f'return_{horizon}'] = float(np.mean(entry_ret)) if len(entry_ret) else np.nan
+
+    return {
+        'rule': rule,
+        'params': dict(DEFAULT_PARAMS, **(params or {})),
+        'horizons': tuple(horizons),
+        'funds': x.shape[1],
+        'levels': [rows[level] for level in level_keys],
+        'entries': entry_stats,
+    }
+
+
+def backtest_archive(archive, codes=None, start=None, end=None, **kwargs):
+    """在全市场归档上回测（只读取选中的基金）"""
+    _, codes, matrix = archive.matrix(codes, start=start, end=end)
+    result = backtest(matrix, **kwargs)
+    result['codes'] = codes
+    return result
+
+
+def format_report(result):
+    """生成文字版回测报告"""
+    horizons = result['horizons']
+    lines = [f"回测规则: {RULE_LABELS.get(result['rule'], result['rule'])}（{result['funds']} 只基金）", ""]
+    header = "建议级别".ljust(10) + "样本数".rjust(10)
+    for horizon in horizons:
+        header += f"{horizon}日胜率".rjust(10) + f"{horizon}日收益".rjust(10) + f"{horizon}日回撤".rjust(10)
+    lines.append(header)
+    for row in result['levels']:
+        line = row['label'].ljust(10) + str(row['samples']).rjust(10)
+        for horizon in horizons:
+            line += format_pct(row[f'hit_{horizon}'] * 100).rjust(10)
+            line += format_pct(row[f'return_{horizon}']).rjust(10)
+            line += format_pct(row[f'drawdown_{horizon}']).rjust(10)
+        lines.append(line)
+
+    entries = result['entries']
+    lines.append("")
+    lines.append(f"买入信号次数: {entries['count']}")
+    for horizon in horizons:
+        lines.append(f"  持有{horizon}日: 胜率 {format_pct(entries[f'hit_{horizon}'] * 100)}，"
+                     f"平均收益 {format_pct(entries[f'return_{horizon}'])}")
+    return "\n".join(lines)
+
+
+def format_pct(value):
+    """格式化百分比"""
+    if value is None or np.isnan(value):
+        return "-"
+    return f"{value:.1f}%"
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+多基金相关性
+由对齐的净值矩阵计算日收益率相关系数矩阵（全区间或最近N个交易日），
+两两相关系数按共同有效日期计算，全部由矩阵乘法一次得到；
+滚动相关系数矩阵序列对这些成对统计量做前缀和，每个窗口只是两次相减（见 rolling_correlation）；
+按平均连接层次聚类排序，使走势相近的基金在热力图中相邻
+"""
+
+import threading
+
+import numpy as np
+
+from fund_core.screener import align, fill_gaps
+
+# 计算相关系数至少需要的共同交易日数
+MIN_OVERLAP = 20
+
+# 可选的滚动窗口（交易日），None 表示全区间
+WINDOWS = (None, 250, 120, 60)
+
+# 滚动相关系数热力图可选的窗口长度（交易日）
+ROLLING_WINDOWS = (60, 120, 250)
+
+# 滚动矩阵序列最多保留的元素数，超过时增大窗口步长
+ROLLING_CELLS = 1_000_000
+
+
+def daily_returns(matrix):
+    """对数日收益率矩阵（基金有效区间之外为NaN）"""
+    x = fill_gaps(np.asarray(matrix, dtype=np.float64))
+    returns = np.full_like(x, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[1:] = np.log(x[1:] / x[:-1])
+    return returns
+
+
+def correlation(returns, min_overlap=MIN_OVERLAP):
+    """收益率相关系数矩阵：每对基金只使用两者都有数据的日期，共同日期不足时为NaN
+
+    返回 (相关系数矩阵, 共同日期数矩阵)
+    """
+    r = np.asarray(returns, dtype=np.float64)
+    valid = ~np.isnan(r)
+    m = valid.astype(np.float64)
+    x = np.where(valid, r, 0.0)
+    x2 = x * x
+
+    # 成对统计量：n[i, j] 为共同日期数，sx[i, j] 为基金i在共同日期上的收益和
+    n = m.T @ m
+    sx = x.T @ m
+    sxx = x2.T @ m
+    sxy = x.T @ x
+    return _corr_from_sums(n, sx, sxx, sxy, min_overlap)
+
+
+def _corr_from_sums(n, sx, sxx, sxy, min_overlap):
+    """由成对统计量计算相关系数（最后两维为 基金 × 基金，前面可以有窗口维）"""
+    def transposed(values):
+        return np.swapaxes(values, -1, -2)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sxy - sx * transposed(sx) / n
+        var_i = sxx - sx * sx / n
+        corr = cov / np.sqrt(var_i * transposed(var_i))
+    corr = np.clip(corr, -1.0, 1.0)
+    corr[n < min_overlap] = np.nan
+    diagonal = np.arange(n.shape[-1])
+    corr[..., diagonal, diagonal] = np.where(n[..., diagonal, diagonal] >= min_overlap, 1.0, np.nan)
+    return corr, np.rint(n).astype(np.int64)
+
+
+def rolling_correlation(returns, window=60, step=1, min_overlap=MIN_OVERLAP):
+    """滚动相关系数矩阵序列：每隔step个交易日取一个长度为window的窗口（最后一个窗口总是以最新交易日结束）
+
+    成对统计量（共同日期数、收益和、平方和、乘积和）按窗口两端累计前缀和，
+    每个窗口的统计量为两个前缀和之差，每行数据只累计两次，计算量不随窗口长度增加。
+    返回 (窗口结束行号（不含）, 相关系数矩阵 (窗口数 × 基金数 × 基金数), 共同日期数矩阵)
+    """
+    r = np.asarray(returns, dtype=np.float64)
+    rows, size = r.shape
+    if window <= 0 or step <= 0:
+        raise ValueError("窗口长度和步长必须大于0")
+    if rows < window:
+        return np.empty(0, dtype=np.int64), np.empty((0, size, size)), np.empty((0, size, size), dtype=np.int64)
+
+    ends = np.arange(rows, window - 1, -step)[::-1]
+    valid = ~np.isnan(r)
+    m = valid.astype(np.float64)
+    x = np.where(valid, r, 0.0)
+    x2 = x * x
+
+    def advance(total, position, target):
+        """把前缀统计量从第position行累计到第target行之前"""
+        if target > position:
+            segment = slice(position, target)
+            total[0] += m[segment].T @ m[segment]
+            total[1] += x[segment].T @ m[segment]
+            total[2] += x2[segment].T @ m[segment]
+            total[3] += x[segment].T @ x[segment]
+        return target
+
+    # 窗口两端各保留一份前缀统计量，随窗口右移只累计新越过端点的数据
+    head, tail = np.zeros((4, size, size)), np.zeros((4, size, size))
+    head_row = tail_row = 0
+    corr = np.empty((len(ends), size, size))
+    overlap = np.empty((len(ends), size, size), dtype=np.int64)
+    min_overlap = min(min_overlap, window)
+    for k, end in enumerate(ends):
+        head_row = advance(head, head_row, end)
+        tail_row = advance(tail, tail_row, end - window)
+        sums = head - tail
+        corr[k], overlap[k] = _corr_from_sums(sums[0], sums[1], sums[2], sums[3], min_overlap)
+    return ends, corr, overlap
+
+
+def rolling_pair(returns, i, j, window=60):
+    """两只基金的滚动相关系数序列（前缀和计算，窗口内共同日期不足时为NaN）"""
+    r = np.asarray(returns, dtype=np.float64)
+    a = r[:, i]
+    b = r[:, j]
+    both = ~np.isnan(a) & ~np.isnan(b)
+    a = np.where(both, a, 0.0)
+    b = np.where(both, b, 0.0)
+
+    def windowed(values):
+        total = np.concatenate([[0.0], np.cumsum(values)])
+        out = total[window:] - total[:-window]
+        return np.concatenate([np.full(min(window - 1, len(values)), np.nan), out])
+
+    n = windowed(both.astype(np.float64))
+    sa, sb = windowed(a), windowed(b)
+    saa, sbb, sab = windowed(a * a), windowed(b * b), windowed(a * b)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sab - sa * sb / n
+        corr = cov / np.sqrt((saa - sa * sa / n) * (sbb - sb * sb / n))
+    return np.where(n >= min(MIN_OVERLAP, window), np.clip(corr, -1.0, 1.0), np.nan)
+
+
+def cluster_order(corr):
+    """平均连接层次聚类（距离 = 1 - 相关系数）的叶子顺序"""
+    size = len(corr)
+    if size <= 2:
+        return np.arange(size)
+    distance = 1.0 - np.nan_to_num(corr, nan=0.0)
+    np.fill_diagonal(distance, np.inf)
+    counts = np.ones(size)
+    members = [[i] for i in range(size)]
+    active = np.ones(size, dtype=bool)
+
+    for _ in range(size - 1):
+        flat = int(np.argmin(distance))
+        a, b = divmod(flat, size)
+        if a > b:
+            a, b = b, a
+        # 合并b到a：新簇到其他簇的平均距离按簇大小加权
+        merged = (counts[a] * distance[a] + counts[b] * distance[b]) / (counts[a] + counts[b])
+        distance[a] = merged
+        distance[:, a] = merged
+        distance[a, a] = np.inf
+        distance[b] = np.inf
+        distance[:, b] = np.inf
+        counts[a] += counts[b]
+        members[a] = members[a] + members[b]
+        members[b] = []
+        active[b] = False
+    return np.array(members[int(np.flatnonzero(active)[0])])
+
+
+class CorrelationResult:
+    """相关性分析结果（已按聚类顺序排列）"""
+
+    def __init__(self, codes, dates, corr, overlap, window):
+        """codes与corr的行列顺序一致"""
+        self.codes = codes
+        self.dates = dates
+        self.corr = corr
+        self.overlap = overlap
+        self.window = window
+
+    def pairs(self, limit=10, highest=True):
+        """相关性最高（或最低）的基金对：[(代码1, 代码2, 相关系数), ...]"""
+        upper = np.triu_indices(len(self.codes), k=1)
+        values = self.corr[upper]
+        ok = ~np.isnan(values)
+        order = np.argsort(values[ok])
+        if highest:
+            order = order[::-1]
+        rows, cols = upper[0][ok][order[:limit]], upper[1][ok][order[:limit]]
+        return [(self.codes[i], self.codes[j], float(self.corr[i, j])) for i, j in zip(rows, cols)]
+
+
+def analyze(dates, codes, matrix, window=None):
+    """计算相关系数矩阵并按聚类排序（window为最近N个交易日，None为全区间）"""
+    returns = daily_returns(matrix)
+    if window is not None:
+        returns = returns[-window:]
+        dates = dates[-window:]
+    corr, overlap = correlation(returns, min_overlap=min(MIN_OVERLAP, len(returns)))
+    order = cluster_order(corr)
+    return CorrelationResult([codes[i] for i in order], dates,
+                             corr[np.ix_(order, order)], overlap[np.ix_(order, order)], window)
+
+
+class RollingCorrelation:
+    """滚动相关系数矩阵序列（行列按最新窗口的聚类顺序排列，拖动窗口时顺序不变）"""
+
+    def __init__(self, dates, codes, matrix, window=60, step=None):
+        """step为None时按基金数自动选择，使矩阵序列不超过ROLLING_CELLS个元素"""
+        returns = daily_returns(matrix)
+        rows, size = returns.shape
+        if step is None:
+            step = max(1, -(-max(rows - window + 1, 0) * size * size // ROLLING_CELLS))
+        ends, corr, overlap = rolling_correlation(returns, window, step)
+        order = cluster_order(corr[-1]) if len(ends) else np.arange(size)
+        self.codes = [codes[i] for i in order]
+        self.window = window
+        self.dates = np.asarray(dates)
+        self.rows = ends
+        self.corr = corr[:, order][:, :, order]
+        self.overlap = overlap[:, order][:, :, order]
+        self._returns = returns[:, order]
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def end_dates(self):
+        """各窗口的最后一个交易日"""
+        return self.dates[self.rows - 1]
+
+    def at(self, k):
+        """第k个窗口的相关性结果"""
+        end = self.rows[k]
+        return CorrelationResult(self.codes, self.dates[end - self.window:end],
+                                 self.corr[k], self.overlap[k], self.window)
+
+    def pair(self, i, j):
+        """第i、j只基金（按codes顺序）逐日的滚动相关系数序列"""
+        return rolling_pair(self._returns, i, j, self.window)
+
+
+# 结果缓存：(类型, 窗口, ((代码, 版本号), ...)) -> 结果，数据版本变化时自动失效
+_cache = {}
+_cache_lock = threading.Lock()
+CACHE_SIZE = 16
+
+
+def _cached(key, compute):
+    """按key缓存compute()的结果"""
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = compute()
+    with _cache_lock:
+        if len(_cache) >= CACHE_SIZE:
+            _cache.pop(next(iter(_cache)))
+        _cache[key] = result
+    return result
+
+
+def _versions(series_list):
+    return tuple((s.code, s.version) for s in series_list)
+
+
+def analyze_series(series_list, window=None):
+    """对多只基金的净值序列做相关性分析（按各序列版本号缓存）"""
+    series_list = [s for s in series_list if s is not None and not s.empty]
+    return _cached(('analyze', window, _versions(series_list)),
+                   lambda: analyze(*align(series_list), window))
+
+
+def rolling_series(series_list, window=60):
+    """多只基金净值序列的滚动相关系数矩阵序列（按各序列版本号缓存）"""
+    series_list = [s for s in series_list if s is not None and not s.empty]
+    return _cached(('rolling', window, _versions(series_list)),
+                   lambda: RollingCorrelation(*align(series_list), window))
+
+
+def _load(store, codes):
+    """从本地存储读取净值序列，返回 (序列列表, 缺少本地数据的代码)"""
+    series_list = []
+    missing = []
+    for code in codes:
+        series = store.load(code)
+        if series is None or series.empty:
+            missing.append(code)
+        else:
+            series_list.append(series)
+    return series_list, missing
+
+
+def analyze_store(store, codes, window=None):
+    """对本地存储中的基金做相关性分析，返回 (结果, 缺少本地数据的代码)"""
+    series_list, missing = _load(store, codes)
+    return analyze_series(series_list, window), missing
+
+
+def rolling_store(store, codes, window=60):
+    """本地存储中基金的滚动相关系数矩阵序列，返回 (结果, 缺少本地数据的代码)"""
+    series_list, missing = _load(store, codes)
+    return rolling_series(series_list, window), missing
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+图表悬停十字线
+HoverTable 在完整分辨率的日期数组上用二分查找定位离鼠标最近的交易日（与图表是否抽样无关），
+Crosshair 只重绘十字线、标记点和提示文字（blitting：恢复缓存的背景后绘制这几个图元），
+不触发整张图表的重绘，桌面鼠标移动和安卓触摸拖动都只需很少的时间
+
+本模块不导入matplotlib，横坐标由界面按图表的日期换算（mdates.date2num）后传入
+"""
+
+import numpy as np
+
+from fund_core import advice, graph
+
+
+class HoverTable:
+    """一只基金逐日的悬停数据：净值、日涨跌幅、RSI、布林带位置和波段信号"""
+
+    def __init__(self, series, x):
+        """series为净值序列，x为与之对应的图表横坐标（升序）"""
+        x = np.asarray(x, dtype=np.float64)
+        if len(x) != len(series):
+            raise ValueError("横坐标与净值序列长度不一致")
+        frame = graph.frame_for(series)
+        self.x = x
+        self.dates = series.dates
+        self.navs = series.navs
+        self.change = series.daily_change()
+        self.rsi = frame['rsi']
+        self.band = frame['band']
+        upper, lower = frame['upper'], frame['lower']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # 布林带位置（%B）：0为下轨，1为上轨
+            self.band_position = (self.navs - lower) / (upper - lower)
+
+    def __len__(self):
+        return len(self.x)
+
+    def nearest(self, xdata):
+        """离横坐标xdata最近的交易日下标（无数据时返回None）"""
+        n = len(self.x)
+        if n == 0 or xdata is None:
+            return None
+        i = int(np.searchsorted(self.x, xdata))
+        if i >= n:
+            return n - 1
+        if i > 0 and xdata - self.x[i - 1] <= self.x[i] - xdata:
+            return i - 1
+        return i
+
+    def text(self, index):
+        """提示文字"""
+        change = self.change[index]
+        rsi = self.rsi[index]
+        position = self.band_position[index]
+        return "\n".join([
+            str(self.dates[index]),
+            f"净值: {self.navs[index]:.4f}",
+            "涨跌: N/A" if np.isnan(change) else f"涨跌: {change:+.2f}%",
+            "RSI: N/A" if np.isnan(rsi) else f"RSI: {rsi:.1f}",
+            ("布林位置: N/A" if np.isnan(position) else f"布林位置: {position:.0%}")
+            + f" {advice.BAND_LABELS[int(self.band[index])]}",
+        ])
+
+
+class Crosshair:
+    """绑定在一个坐标轴上的悬停十字线"""
+
+    def __init__(self, ax, table, y, follow_drag=True):
+        """ax为坐标轴，table为HoverTable，y为十字线纵坐标（与table逐日对应，如净值或回撤率）
+
+        follow_drag为False时按住鼠标拖动期间隐藏十字线（用于已有拖动操作的图表，如区间选择）
+        """
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        self.table = table
+        self.y = np.asarray(y, dtype=np.float64)
+        self.follow_drag = follow_drag
+        self.index = None
+        self.background = None
+
+        style = dict(color='gray', linewidth=0.8, linestyle=':', animated=True, visible=False)
+        self.vline = ax.axvline(table.x[0] if len(table) else 0, **style)
+        self.hline = ax.axhline(self.y[0] if len(self.y) else 0, **style)
+        self.marker, = ax.plot([], [], 'o', color='orange', markersize=5, animated=True, visible=False)
+        self.label = ax.text(0.98, 0.02, '', transform=ax.transAxes, ha='right', va='bottom', fontsize=9,
+                             bbox=dict(facecolor='white', alpha=0.85), animated=True, visible=False)
+        self.artists = (self.vline, self.hline, self.marker, self.label)
+
+        self._callbacks = [
+            self.canvas.mpl_connect('draw_event', self._on_draw),
+            self.canvas.mpl_connect('motion_notify_event', self._on_move),
+            # 触摸屏上按下即显示
+            self.canvas.mpl_connect('button_press_event', self._on_move),
+            self.canvas.mpl_connect('axes_leave_event', self._on_leave),
+            self.canvas.mpl_connect('figure_leave_event', self._on_leave),
+        ]
+
+    def disconnect(self):
+        """解除事件绑定并移除图元（重绘图表前调用）"""
+        for cid in self._callbacks:
+            self.canvas.mpl_disconnect(cid)
+        self._callbacks = []
+        for artist in self.artists:
+            try:
+                artist.remove()
+            except (ValueError, NotImplementedError):
+                # 坐标轴已被清空
+                pass
+        self.background = None
+
+    def _on_draw(self, event):
+        """整张图重绘后缓存背景（不含十字线），并把当前十字线画回去"""
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        if self.index is not None:
+            self._draw_artists()
+
+    def _on_move(self, event):
+        if event.inaxes is not self.ax or (not self.follow_drag and event.button is not None):
+            self._on_leave(event)
+            return
+        index = self.table.nearest(event.xdata)
+        if index is None or index == self.index:
+            # 仍在同一个交易日上，无需重绘
+            return
+        self.index = index
+        x, y = self.table.x[index], self.y[index]
+        self.vline.set_xdata([x, x])
+        self.hline.set_ydata([y, y])
+        self.marker.set_data([x], [y])
+        self.label.set_text(self.table.text(index))
+        for artist in self.artists:
+            artist.set_visible(True)
+        self._blit()
+
+    def _on_leave(self, event):
+        if self.index is None:
+            return
+        self.index = None
+        for artist in self.artists:
+            artist.set_visible(False)
+        self._blit()
+
+    def _draw_artists(self):
+        for artist in self.artists:
+            self.ax.draw_artist(artist)
+
+    def _blit(self):
+        """恢复背景后只绘制十字线图元"""
+        if self.background is None:
+            return
+        self.canvas.restore_region(self.background)
+        self._draw_artists()
+        self.canvas.blit(self.ax.bbox)
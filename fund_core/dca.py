@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+定投模拟
+对每一个可能的开始日期同时计算定投到期末的收益率、年化收益率（IRR）和持仓最大回撤。
+按固定交易日间隔定投时，同一开始日期的买入日属于同一个“余数类”，
+各开始日期的份额和投入都可以由余数类内的前缀和/后缀和直接得到，无需嵌套循环
+"""
+
+import numpy as np
+
+from fund_core import advice
+from fund_core.timeline import SignalTimeline
+
+# 定投频率对应的交易日间隔
+FREQUENCIES = {
+    'weekly': 5,
+    'biweekly': 10,
+    'monthly': 21,
+}
+
+FREQUENCY_LABELS = {
+    'weekly': '每周',
+    'biweekly': '每两周',
+    'monthly': '每月',
+}
+
+# 按建议级别调整定投金额的倍数（智能定投）
+ADVICE_WEIGHTS = {
+    advice.ADVICE_STRONG_BUY: 2.0,
+    advice.ADVICE_BUY: 1.5,
+    advice.ADVICE_NEUTRAL: 1.0,
+    advice.ADVICE_SELL: 0.5,
+    advice.ADVICE_STRONG_SELL: 0.5,
+}
+
+# 年化收益率的搜索网格（年化 -95% 到 +300%）
+IRR_GRID = np.concatenate([np.linspace(-0.95, -0.2, 16), np.linspace(-0.19, 1.0, 120), np.linspace(1.05, 3.0, 40)])
+
+# 计算持仓回撤时每批处理的开始日期数（控制内存）
+DRAWDOWN_CHUNK = 256
+
+
+def _pad(values, period):
+    """在最后一维补零到period的整数倍，并拆成 (..., 轮数, period)"""
+    n = values.shape[-1]
+    rows = -(-n // period)
+    padded = np.zeros(values.shape[:-1] + (rows * period,))
+    padded[..., :n] = values
+    return padded.reshape(values.shape[:-1] + (rows, period)), n
+
+
+def class_suffix_sum(values, period):
+    """余数类后缀和：out[t] = values[t] + values[t+period] + values[t+2*period] + ..."""
+    blocks, n = _pad(values, period)
+    out = np.flip(np.cumsum(np.flip(blocks, axis=-2), axis=-2), axis=-2)
+    return out.reshape(values.shape[:-1] + (-1,))[..., :n]
+
+
+def advice_amounts(series, base_amount=1.0, weights=None):
+    """智能定投：按每日购买建议级别调整的定投金额"""
+    weights = weights or ADVICE_WEIGHTS
+    levels = SignalTimeline(series).purchase_level
+    table = np.array([weights[level] for level in sorted(weights)])
+    return base_amount * table[levels.astype(np.intp) - min(weights)]
+
+
+def simulate(series, frequency='weekly', amount=1.0, amounts=None, drawdown=True):
+    """模拟从每个交易日开始定投到序列最后一天的结果
+
+    amounts为每个交易日的定投金额（如 advice_amounts 的结果），为None时每期固定amount。
+    返回字典：starts(开始日期), invested(投入), value(期末市值), final_return(收益率%),
+    irr(年化收益率%), max_drawdown(持仓收益率曲线的最大回撤%), periods(定投期数)
+    """
+    period = FREQUENCIES.get(frequency, frequency)
+    navs = np.asarray(series.navs, dtype=np.float64)
+    dates = series.dates
+    n = len(navs)
+    if n == 0:
+        empty = np.array([])
+        return {'starts': dates, 'invested': empty, 'value': empty, 'final_return': empty,
+                'irr': empty, 'max_drawdown': empty, 'periods': empty.astype(np.int64)}
+
+    cash = np.full(n, float(amount)) if amounts is None else np.asarray(amounts, dtype=np.float64)
+    units = cash / navs
+
+    # 从t开始定投：买入日为 t, t+period, ...，份额和投入为余数类后缀和
+    invested = class_suffix_sum(cash, period)
+    total_units = class_suffix_sum(units, period)
+    value = total_units * navs[-1]
+    periods = (n - 1 - np.arange(n)) // period + 1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        final_return = (value / invested - 1) * 100
+
+    result = {
+        'starts': dates,
+        'invested': invested,
+        'value': value,
+        'final_return': final_return,
+        'irr': _irr(cash, value, dates, period),
+        'periods': periods,
+    }
+    if drawdown:
+        result['max_drawdown'] = _position_drawdown(navs, cash, units, period)
+    return result
+
+
+def _irr(cash, value, dates, period):
+    """各开始日期的年化收益率（%）：在收益率网格上求期末价值方程的根并线性插值"""
+    # 每笔投入到期末的年数
+    years = (dates[-1] - dates).astype(np.float64) / 365.0
+    growth = 1.0 + IRR_GRID[:, None]
+    # future[g, t]：按网格收益率g计算，从t开始的全部投入在期末的价值
+    future = class_suffix_sum(cash[None, :] * growth ** years[None, :], period)
+    excess = future - value[None, :]
+
+    # 期末价值随收益率单调递增，找第一个由负转正的网格区间
+    positive = excess >= 0
+    upper = np.argmax(positive, axis=0)
+    found = positive.any(axis=0) & (upper > 0)
+    lower = np.maximum(upper - 1, 0)
+    cols = np.arange(excess.shape[1])
+    e0 = excess[lower, cols]
+    e1 = excess[upper, cols]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fraction = e0 / (e0 - e1)
+        rate = IRR_GRID[lower] + fraction * (IRR_GRID[upper] - IRR_GRID[lower])
+
+    # 定投时间过短时年化收益率没有意义
+    return np.where(found & (years >= 30 / 365.0), rate * 100, np.nan)
+
+
+def _position_drawdown(navs, cash, units, period):
+    """各开始日期的持仓收益率曲线（市值/投入）最大回撤（%），按开始日期分批计算"""
+    n = len(navs)
+    t = np.arange(n)
+    residue = t % period
+
+    # 每个余数类的份额和投入前缀和：prefix[r, t] 为余数类r中不晚于t的买入合计
+    class_units = np.zeros((period, n))
+    class_cash = np.zeros((period, n))
+    class_units[residue, t] = units
+    class_cash[residue, t] = cash
+    prefix_units = np.cumsum(class_units, axis=1)
+    prefix_cash = np.cumsum(class_cash, axis=1)
+
+    out = np.empty(n)
+    for start in range(0, n, DRAWDOWN_CHUNK):
+        starts = t[start:start + DRAWDOWN_CHUNK]
+        classes = residue[starts]
+        # 开始日期之前的同类买入不属于本次定投
+        held_units = prefix_units[classes] - (prefix_units[classes, starts] - units[starts])[:, None]
+        held_cash = prefix_cash[classes] - (prefix_cash[classes, starts] - cash[starts])[:, None]
+        # 只看开始日期之后的部分
+        first = starts[0]
+        held_units = held_units[:, first:]
+        held_cash = held_cash[:, first:]
+        active = t[None, first:] >= starts[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = np.where(active, held_units * navs[None, first:] / held_cash, np.nan)
+        peak = np.fmax.accumulate(ratio, axis=1)
+        with np.errstate(invalid='ignore'):
+            dd = np.where(active, (ratio - peak) / peak * 100, 0.0)
+        out[starts] = np.min(dd, axis=1)
+    return out
+
+
+def summarize(result):
+    """汇总全部开始日期的定投结果"""
+    final_return = result['final_return']
+    irr = result['irr']
+    valid = ~np.isnan(final_return)
+    if not valid.any():
+        return {}
+    irr_valid = irr[~np.isnan(irr)]
+    return {
+        'starts': int(valid.sum()),
+        'win_rate': float(np.mean(final_return[valid] > 0)),
+        'median_return': float(np.median(final_return[valid])),
+        'best_return': float(np.max(final_return[valid])),
+        'worst_return': float(np.min(final_return[valid])),
+        'median_irr': float(np.median(irr_valid)) if len(irr_valid) else float('nan'),
+        'median_drawdown': float(np.median(result['max_drawdown'][valid])) if 'max_drawdown' in result else float('nan'),
+    }
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+基金数据获取
+与界面无关的akshare数据获取函数，所有请求共享一个限速器
+"""
+
+import threading
+import time as time_module
+
+try:
+    import akshare as ak
+except ImportError:  # 未安装akshare时仍可使用本地存储和分析功能
+    ak = None
+
+from fund_core.ratelimit import RateLimiter, RetryPolicy
+from fund_core.series import FundSeries
+
+# 全局共享限速器：所有线程合计每秒最多4次请求
+DEFAULT_LIMITER = RateLimiter(rate=4, burst=4)
+
+# 基金名称列表缓存（一次请求覆盖全部基金）
+_names_lock = threading.Lock()
+_names_cache = {'names': None, 'fetched': 0.0}
+NAMES_TTL = 24 * 3600
+
+
+def default_policy():
+    """默认重试策略（共享全局限速器）"""
+    return RetryPolicy(DEFAULT_LIMITER, retries=3, backoff=1.0)
+
+
+def _require_akshare():
+    """检查akshare是否可用"""
+    if ak is None:
+        raise RuntimeError("未安装akshare，无法获取网络数据")
+
+
+def normalize_nav_frame(df):
+    """统一净值数据框的列名为 日期/净值"""
+    if '净值日期' in df.columns:
+        df = df.rename(columns={'净值日期': '日期'})
+    if '单位净值' in df.columns:
+        df = df.rename(columns={'单位净值': '净值'})
+    if '净值' not in df.columns and 'close' in df.columns:
+        df = df.rename(columns={'date': '日期', 'close': '净值'})
+    return df
+
+
+def fetch_nav_history(code, policy=None, info=None):
+    """获取基金全部历史净值，返回FundSeries（场外基金优先，失败时尝试ETF）"""
+    _require_akshare()
+    policy = policy or default_policy()
+
+    fund_type = "场外基金"
+    try:
+        df = policy.call(ak.fund_open_fund_info_em, symbol=code, indicator="单位净值走势")
+    except Exception as e:
+        print(f"获取场外基金净值失败 {code}: {e}")
+        df = None
+
+    if df is None or df.empty or '净值日期' not in df.columns:
+        fund_type = "ETF"
+        df = policy.call(ak.fund_etf_hist_sina, symbol=code)
+
+    if df is None or df.empty:
+        return FundSeries(code, [], [], fund_type, info)
+    return FundSeries.from_frame(normalize_nav_frame(df), code, fund_type, info)
+
+
+def fetch_fund_info(code, policy=None):
+    """获取基金基本信息"""
+    _require_akshare()
+    policy = policy or default_policy()
+    fund_info = {}
+    try:
+        info_df = policy.call(ak.fund_open_fund_info_em, symbol=code, indicator="基本信息")
+        if info_df is not None and not info_df.empty:
+            for key in ('基金名称', '基金类型', '成立日期', '基金经理', '基金规模'):
+                fund_info[key] = info_df.get(key, [''])[0]
+    except Exception as info_error:
+        print(f"获取基金信息失败: {info_error}")
+
+    if not fund_info.get('基金名称'):
+        name = fetch_fund_names(policy).get(code)
+        if name:
+            fund_info['基金名称'] = name
+    return fund_info
+
+
+def fetch_fund_names(policy=None):
+    """获取全部基金的 代码 -> 简称 映射（缓存一天）"""
+    with _names_lock:
+        names = _names_cache['names']
+        if names is not None and time_module.time() - _names_cache['fetched'] < NAMES_TTL:
+            return names
+
+        _require_akshare()
+        policy = policy or default_policy()
+        try:
+            fund_list = policy.call(ak.fund_name_em)
+            names = dict(zip(fund_list['基金代码'].astype(str), fund_list['基金简称'].astype(str)))
+        except Exception as list_error:
+            print(f"获取基金列表失败: {list_error}")
+            return names or {}
+
+        _names_cache['names'] = names
+        _names_cache['fetched'] = time_module.time()
+        return names
+
+
+def fetch_fund(code, start_date=None, end_date=None, policy=None, store=None):
+    """获取单只基金的基本信息和净值，返回FundSeries（store不为空时合并到本地存储，日期范围过滤只影响返回值）"""
+    policy = policy or default_policy()
+    fund_info = fetch_fund_info(code, policy)
+    series = fetch_nav_history(code, policy, info=fund_info)
+    if store is not None and not series.empty:
+        series, _ = store.merge(series)
+    if start_date or end_date:
+        try:
+            series = series.between(start_date, end_date)
+        except Exception as date_error:
+            # 日期过滤失败时使用全部数据
+            print(f"日期过滤失败: {date_error}")
+    return series
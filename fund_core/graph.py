@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+指标依赖图
+每个指标登记自己的输入（其他指标或原始净值 nav），求值时按依赖顺序只计算所需的节点，
+同一份净值数据上的中间结果（涨跌幅、均线、EMA、回撤等）只算一次：
+MA20 即布林带中轨，MACD 的两条EMA 由图表、回撤分析和信号时间线共用。
+按净值序列版本号缓存求值结果，新增自定义指标只需 register，不会重复已有的计算
+
+    from fund_core import graph
+    graph.register('ma10', ('kernel',), lambda kernel: kernel.mean(10))
+    graph.frame_for(series)['ma10']
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from fund_core import advice, indicators, recovery
+from fund_core.ranges import RangeStats
+
+# 原始净值节点
+SOURCE = 'nav'
+
+# 模块级缓存保留的净值序列数（同一基金的不同视图分别计数，按最近使用淘汰）
+FRAME_CACHE_SIZE = 64
+
+
+class Indicator:
+    """登记的指标：func按inputs的顺序接收各输入的计算结果"""
+
+    __slots__ = ('name', 'inputs', 'func', 'doc')
+
+    def __init__(self, name, inputs, func, doc=''):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.func = func
+        self.doc = doc
+
+    def __repr__(self):
+        return f"Indicator({self.name} <- {', '.join(self.inputs) or '-'})"
+
+
+REGISTRY = {}
+_registry_lock = threading.RLock()
+# 登记有替换时递增，已缓存的结果随之失效
+_generation = [0]
+
+
+def ancestors(name):
+    """一个指标直接和间接依赖的全部指标"""
+    seen = set()
+    stack = [name]
+    while stack:
+        node = REGISTRY.get(stack.pop())
+        for parent in node.inputs if node is not None else ():
+            if parent not in seen:
+                seen.add(parent)
+                stack.append(parent)
+    return seen
+
+
+def register(name, inputs, func, doc='', replace=False):
+    """登记指标，输入须已登记；已存在同名指标时需指定replace，返回Indicator"""
+    name = str(name).strip()
+    if not name or name == SOURCE:
+        raise ValueError(f"指标名称无效: {name!r}")
+    inputs = tuple(inputs)
+    with _registry_lock:
+        if name in REGISTRY and not replace:
+            raise ValueError(f"指标 {name} 已存在")
+        unknown = [parent for parent in inputs if parent != SOURCE and parent not in REGISTRY]
+        if unknown:
+            raise ValueError(f"指标 {name} 的输入未登记: {', '.join(unknown)}")
+        if name in inputs or any(name in ancestors(parent) for parent in inputs):
+            raise ValueError(f"指标 {name} 存在循环依赖")
+        replaced = name in REGISTRY
+        indicator = Indicator(name, inputs, func, doc)
+        REGISTRY[name] = indicator
+        if replaced:
+            _generation[0] += 1
+    return indicator
+
+
+def invalidate():
+    """指标的计算依据变化时（如登记了新的全市场统计表）丢弃全部已缓存的结果"""
+    with _registry_lock:
+        _generation[0] += 1
+
+
+def evaluation_order(names):
+    """计算names所需的全部指标（按依赖顺序，不含原始净值）"""
+    order = []
+    done = {SOURCE}
+    for name in names:
+        if name not in REGISTRY and name != SOURCE:
+            raise KeyError(f"未登记的指标: {name}")
+        # 迭代后序遍历
+        stack = [(name, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in done:
+                continue
+            if expanded:
+                done.add(node)
+                order.append(node)
+                continue
+            stack.append((node, True))
+            stack.extend((parent, False) for parent in reversed(REGISTRY[node].inputs) if parent not in done)
+    return order
+
+
+class IndicatorFrame:
+    """一份净值数据（一维序列或 日期 × 基金 矩阵）上按需计算的指标"""
+
+    def __init__(self, navs, version=None):
+        """version为数据版本号（可选，用于缓存比较）"""
+        self.navs = np.asarray(navs, dtype=np.float64)
+        self.version = version
+        self._values = {SOURCE: self.navs}
+        self._generation = _generation[0]
+        self._lock = threading.RLock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if self._generation != _generation[0]:
+                # 有指标被替换，丢弃已计算的结果
+                self._values = {SOURCE: self.navs}
+                self._generation = _generation[0]
+            values = self._values
+            if name not in values:
+                for node in evaluation_order([name]):
+                    if node not in values:
+                        indicator = REGISTRY[node]
+                        values[node] = indicator.func(*(values[parent] for parent in indicator.inputs))
+            return values[name]
+
+    def get(self, names):
+        """一次取多个指标：{名称: 结果}"""
+        return {name: self[name] for name in names}
+
+    def computed(self):
+        """已经计算过的指标名称"""
+        with self._lock:
+            return [name for name in self._values if name != SOURCE]
+
+
+_frames = OrderedDict()
+_frames_lock = threading.Lock()
+
+
+def frame_for(series, cache=None):
+    """获取净值序列的指标（按 (代码, 版本号) 复用，cache为字典时使用调用方的缓存，默认使用模块级LRU缓存）
+
+    同一基金的日期范围视图、估值视图和完整历史版本号不同，各自保留，互不挤占
+    """
+    shared = cache is None
+    cache = _frames if shared else cache
+    key = (series.code, series.version)
+    with _frames_lock:
+        frame = cache.get(key)
+        if frame is not None:
+            if shared:
+                cache.move_to_end(key)
+            return frame
+    frame = IndicatorFrame(series.navs, series.version)
+    with _frames_lock:
+        frame = cache.setdefault(key, frame)
+        if shared:
+            cache.move_to_end(key)
+            while len(cache) > FRAME_CACHE_SIZE:
+                cache.popitem(last=False)
+    return frame
+
+
+def _pick(position):
+    """取元组结果中的一项"""
+    return lambda values: values[position]
+
+
+# 内置指标（参数与界面一致）
+register('gains', (SOURCE,), indicators.gains_losses, "每日上涨幅度与下跌幅度")
+register('rsi', ('gains',), lambda gains: indicators.rsi_from_gains(*gains), "RSI(14)")
+register('kernel', (SOURCE,), indicators.RollingKernel, "滚动统计核（任意窗口的均值、标准差、最大最小值）")
+register('ma5', ('kernel',), lambda kernel: kernel.mean(5), "5日均线")
+register('ma20', ('kernel',), lambda kernel: kernel.mean(20), "20日均线（布林带中轨）")
+register('ma60', ('kernel',), lambda kernel: kernel.mean(60), "60日均线")
+register('std20', ('kernel',), lambda kernel: kernel.std(20), "20日标准差")
+register('bollinger', ('ma20', 'std20'), indicators.bollinger_bands, "布林带(20, 2)")
+register('bb_mid', ('bollinger',), _pick(0), "布林带中轨")
+register('upper', ('bollinger',), _pick(1), "布林带上轨")
+register('lower', ('bollinger',), _pick(2), "布林带下轨")
+register('ema12', (SOURCE,), lambda nav: indicators.ema(nav, 12), "12日EMA")
+register('ema26', (SOURCE,), lambda nav: indicators.ema(nav, 26), "26日EMA")
+register('macd_parts', ('ema12', 'ema26'), indicators.macd_from_emas, "MACD(12, 26, 9)")
+register('macd', ('macd_parts',), _pick(0), "MACD线")
+register('macd_signal', ('macd_parts',), _pick(1), "MACD信号线")
+register('macd_hist', ('macd_parts',), _pick(2), "MACD柱状图")
+register('drawdown', (SOURCE,), indicators.drawdown, "回撤率%")
+register('duration', ('drawdown',), indicators.duration_from_drawdown, "回撤持续天数")
+register('streaks', (SOURCE,), indicators.streaks, "连续涨跌（带符号天数, 本轮累计涨跌幅%）")
+register('streak_length', ('streaks',), _pick(0), "带符号的连续涨跌天数")
+register('streak_change', ('streaks',), _pick(1), "本轮累计涨跌幅%")
+register('returns', (SOURCE,), indicators.simple_returns, "日收益率")
+register('range_stats', (SOURCE,), RangeStats, "区间统计（一维序列，任意区间的收益、回撤、波动率和连续涨跌）")
+register('volatility', ('returns',),
+         lambda ret: indicators.rolling_std(ret, 20) * np.sqrt(252) * 100, "20日年化波动率%")
+
+# 信号（与 timeline.SignalTimeline 的字段一致）
+register('streak', ('streak_length',), advice.last_streak, "当前连续涨跌（持平日沿用上一段）")
+register('band', (SOURCE, 'rsi', 'upper', 'lower'),
+         lambda nav, rsi, upper, lower: advice.band_signal(nav, np.where(np.isnan(rsi), 50, rsi), upper, lower),
+         "波段信号")
+register('win_rate', (SOURCE, 'drawdown', 'duration', 'volatility'), recovery.win_rates,
+         "回撤抄底胜率（与购买建议相同的回撤恢复统计，样本不足时用经验规则）")
+register('reversal_prob', ('streak',), advice.reversal_probability, "神奇反转概率")
+register('score', ('band', 'win_rate', 'streak'), advice.summary_score, "综合评分")
+register('level', ('score',), advice.summary_level, "综合建议级别")
+register('purchase_score',
+         (SOURCE, 'rsi', 'upper', 'lower', 'drawdown', 'ma5', 'ma20', 'ma60', 'macd', 'macd_signal', 'streak'),
+         advice.purchase_score, "购买建议评分")
+register('purchase_level', ('purchase_score',), advice.purchase_level, "购买建议级别")
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+技术指标
+基于NumPy的向量化实现，输入可以是一维净值数组，也可以是（日期 × 基金）二维矩阵（按第0轴计算），
+缺失值（NaN）所在的窗口结果为NaN，语义与pandas的 rolling/ewm 保持一致
+"""
+
+import numpy as np
+
+
+def _as_float(values):
+    """转换为float64数组"""
+    return np.asarray(values, dtype=np.float64)
+
+
+def _shifted_diff(cum, window):
+    """前缀和数组的窗口差：cum[t+1] - cum[t+1-window]"""
+    out = np.empty_like(cum[1:])
+    out[:window - 1] = np.nan
+    out[window - 1:] = cum[window:] - cum[:-window]
+    return out
+
+
+def _prefix(values):
+    """带首行0的前缀和"""
+    pad = np.zeros((1,) + values.shape[1:])
+    return np.concatenate([pad, np.cumsum(values, axis=0)], axis=0)
+
+
+class RollingKernel:
+    """滚动统计核：前缀和、平方前缀和与有效值计数只计算一次，
+    之后任意窗口的滚动均值和标准差都是一次O(n)的相减，拖动窗口长度时无需重新扫描数据"""
+
+    def __init__(self, values):
+        """values为一维净值数组或（日期 × 基金）矩阵"""
+        x = _as_float(values)
+        self.values = x
+        self._valid = ~np.isnan(x)
+        self._sum = _prefix(np.where(self._valid, x, 0.0))
+        self._count = _prefix(self._valid.astype(np.float64))
+        # 标准差所需的平方前缀和在首次使用时计算
+        self._centered = None
+        self._squares = None
+        # 各窗口长度下窗口内净值全部相同的位置
+        self._flat = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def _full(self, window):
+        """窗口内全部为有效值的位置"""
+        return _shifted_diff(self._count, window) == window
+
+    def _flat_mask(self, window):
+        """窗口内最大值等于最小值的位置（货币基金、停牌等净值不变的区间）
+
+        前缀和相减在这些位置会留下约1e-8的舍入残差，均值和标准差需按精确值修正，
+        否则净值会略低于布林带上轨，波段信号随之改变
+        """
+        flat = self._flat.get(window)
+        if flat is None:
+            flat = self.max(window) == self.min(window)
+            self._flat[window] = flat
+        return flat
+
+    def mean(self, window):
+        """滚动均值（窗口内有缺失值时为NaN）"""
+        if window <= 0:
+            raise ValueError("窗口长度必须大于0")
+        if len(self) < window:
+            return np.full(self.values.shape, np.nan)
+        total = _shifted_diff(self._sum, window)
+        with np.errstate(invalid='ignore'):
+            out = np.where(self._full(window), total / window, np.nan)
+        flat = self._flat_mask(window)
+        out[flat] = self.values[flat]
+        return out
+
+    def std(self, window, ddof=1):
+        """滚动标准差（默认样本标准差，与pandas一致）"""
+        if len(self) < window or window <= ddof:
+            return np.full(self.values.shape, np.nan)
+        if self._squares is None:
+            # 先减去整体均值再求平方和，避免大数相减的精度损失
+            valid = self._valid
+            center = np.where(valid, self.values, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+            y = np.where(valid, self.values - center, 0.0)
+            self._centered = _prefix(y)
+            self._squares = _prefix(y * y)
+        s1 = _shifted_diff(self._centered, window)
+        s2 = _shifted_diff(self._squares, window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = (s2 - s1 * s1 / window) / (window - ddof)
+            var = np.maximum(var, 0.0)
+            var[self._flat_mask(window)] = 0.0
+            return np.where(self._full(window), np.sqrt(var), np.nan)
+
+    def max(self, window):
+        """滚动最大值（窗口内有缺失值时为NaN）"""
+        return self._extreme(window, np.maximum, -np.inf)
+
+    def min(self, window):
+        """滚动最小值（窗口内有缺失值时为NaN）"""
+        return self._extreme(window, np.minimum, np.inf)
+
+    def _extreme(self, window, op, pad):
+        """按窗口长度分块，块内前缀极值和后缀极值两两合并（每个位置只比较常数次）"""
+        if window <= 0:
+            raise ValueError("窗口长度必须大于0")
+        n = len(self)
+        if n < window:
+            return np.full(self.values.shape, np.nan)
+        blocks = -(-n // window)
+        padded = np.full((blocks * window,) + self.values.shape[1:], pad)
+        padded[:n] = np.where(self._valid, self.values, pad)
+        shaped = padded.reshape((blocks, window) + self.values.shape[1:])
+        prefix = op.accumulate(shaped, axis=1).reshape(padded.shape)
+        suffix = op.accumulate(shaped[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+        out = np.full(self.values.shape, np.nan)
+        # 窗口 [i-window+1, i] 横跨至多两个块：左块的后缀极值与右块的前缀极值
+        out[window - 1:] = op(suffix[:n - window + 1], prefix[window - 1:n])
+        out[~self._full(window)] = np.nan
+        return out
+
+
+def rolling_mean(values, window):
+    """滚动均值（窗口内有缺失值时为NaN）"""
+    if window <= 0:
+        raise ValueError("窗口长度必须大于0")
+    return RollingKernel(values).mean(window)
+
+
+def rolling_std(values, window, ddof=1):
+    """滚动标准差（默认样本标准差，与pandas一致）"""
+    return RollingKernel(values).std(window, ddof)
+
+
+def ema(values, span):
+    """指数移动平均（adjust=False，从第一个有效值开始，缺失日沿用前值）"""
+    x = _as_float(values)
+    alpha = 2.0 / (span + 1.0)
+    out = np.empty_like(x)
+    state = np.full(x.shape[1:], np.nan)
+    for t in range(len(x)):
+        row = x[t]
+        updated = state + alpha * (row - state)
+        state = np.where(np.isnan(state), row, np.where(np.isnan(row), state, updated))
+        out[t] = state
+    return out
+
+
+def gains_losses(values):
+    """每日上涨幅度与下跌幅度（绝对值）：返回 (gain, loss)，原始净值缺失的位置保持缺失"""
+    x = _as_float(values)
+    delta = np.full(x.shape, np.nan)
+    delta[1:] = x[1:] - x[:-1]
+    with np.errstate(invalid='ignore'):
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+    missing = np.isnan(x)
+    gain[missing] = np.nan
+    loss[missing] = np.nan
+    return gain, loss
+
+
+def rsi_from_gains(gain, loss, window=14):
+    """由 gains_losses 的结果计算RSI"""
+    avg_gain = rolling_mean(gain, window)
+    avg_loss = rolling_mean(loss, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rs = avg_gain / avg_loss
+        return 100 - 100 / (1 + rs)
+
+
+def rsi(values, window=14):
+    """相对强弱指数（简单均值版本，与界面中的 calculate_rsi 一致）"""
+    gain, loss = gains_losses(values)
+    return rsi_from_gains(gain, loss, window)
+
+
+def bollinger(values, window=20, num_std=2):
+    """布林带：返回 (中轨, 上轨, 下轨)"""
+    return bollinger_bands(rolling_mean(values, window), rolling_std(values, window), num_std)
+
+
+def bollinger_bands(mid, std, num_std=2):
+    """由滚动均值和滚动标准差得到布林带：返回 (中轨, 上轨, 下轨)"""
+    return mid, mid + std * num_std, mid - std * num_std
+
+
+def macd(values, fast_period=12, slow_period=26, signal_period=9):
+    """MACD：返回 (MACD线, 信号线, 柱状图)"""
+    return macd_from_emas(ema(values, fast_period), ema(values, slow_period), signal_period)
+
+
+def macd_from_emas(fast_ema, slow_ema, signal_period=9):
+    """由快慢两条EMA计算MACD：返回 (MACD线, 信号线, 柱状图)"""
+    line = fast_ema - slow_ema
+    signal = ema(line, signal_period)
+    return line, signal, line - signal
+
+
+def drawdown(values):
+    """回撤率（百分比，相对历史最高净值）"""
+    x = _as_float(values)
+    peak = np.fmax.accumulate(x, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (x - peak) / peak * 100
+
+
+def underwater_duration(values):
+    """回撤持续天数：距离上一次创新高的交易日数"""
+    return duration_from_drawdown(drawdown(values))
+
+
+def duration_from_drawdown(dd):
+    """由回撤率计算回撤持续天数"""
+    t = np.arange(len(dd)).reshape((-1,) + (1,) * (dd.ndim - 1))
+    at_peak = ~(dd < 0)
+    last_peak = np.maximum.accumulate(np.where(at_peak, t, 0), axis=0)
+    return (t - last_peak).astype(np.int32)
+
+
+def streaks(values):
+    """连续涨跌：返回 (带符号的连续天数, 本轮累计涨跌幅%)，上涨为正、下跌为负、持平为0"""
+    x = _as_float(values)
+    change = np.zeros(x.shape)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change[1:] = (x[1:] - x[:-1]) / x[:-1] * 100
+    change = np.nan_to_num(change)
+    direction = np.sign(change)
+
+    t = np.arange(len(x)).reshape((-1,) + (1,) * (x.ndim - 1))
+    new_run = np.ones(x.shape, dtype=bool)
+    new_run[1:] = direction[1:] != direction[:-1]
+    start = np.maximum.accumulate(np.where(new_run, t, 0), axis=0)
+
+    length = (t - start + 1) * direction
+    cum = np.cumsum(change, axis=0)
+    before = np.take_along_axis(np.concatenate([np.zeros((1,) + x.shape[1:]), cum], axis=0),
+                                np.broadcast_to(start, x.shape), axis=0)
+    run_change = (cum - before) * (direction != 0)
+    return length.astype(np.int32), run_change
+
+
+def simple_returns(values):
+    """日收益率（首日为NaN）"""
+    x = _as_float(values)
+    ret = np.full(x.shape, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ret[1:] = x[1:] / x[:-1] - 1
+    return ret
+
+
+def annualized_volatility(values, window=20):
+    """滚动年化波动率（百分比）"""
+    return rolling_std(simple_returns(values), window) * np.sqrt(252) * 100
+
+
+def fill_gaps(matrix):
+    """在每只基金的有效区间内沿用前一日净值（首个净值之前、最后一个净值之后保持NaN）"""
+    valid = ~np.isnan(matrix)
+    t = np.arange(len(matrix))[:, None]
+    last_seen = np.maximum.accumulate(np.where(valid, t, -1), axis=0)
+    filled = np.take_along_axis(matrix, np.maximum(last_seen, 0), axis=0)
+    filled[last_seen < 0] = np.nan
+    filled[t > last_valid_rows(matrix)[None, :]] = np.nan
+    return filled
+
+
+def last_valid_rows(matrix):
+    """每列最后一个有效值所在的行号（整列缺失时为-1）"""
+    valid = ~np.isnan(matrix)
+    rows = len(matrix) - 1 - np.argmax(valid[::-1], axis=0)
+    return np.where(valid.any(axis=0), rows, -1)
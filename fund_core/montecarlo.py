@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+蒙特卡洛净值路径模拟
+从基金历史日收益率中有放回抽样（逐日抽样或按连续区块抽样，保留波动聚集），
+一次性生成（路径数 × 交易日数）的未来净值矩阵，统计各持有期收益率和自今日起的未来最大回撤分布。
+给定随机种子时结果可复现
+"""
+
+import numpy as np
+
+METHOD_IID = 'iid'
+METHOD_BLOCK = 'block'
+
+METHOD_LABELS = {
+    METHOD_IID: '逐日抽样',
+    METHOD_BLOCK: '分块抽样',
+}
+
+DEFAULT_HORIZONS = (30, 90, 250)
+DEFAULT_PATHS = 10000
+DEFAULT_BLOCK = 20
+DEFAULT_SEED = 42
+
+# 默认只使用最近3年的收益率（约750个交易日）
+DEFAULT_LOOKBACK = 750
+
+# 报告的分位数（%）
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# 至少需要的历史收益率个数
+MIN_RETURNS = 60
+
+
+def log_returns(navs, lookback=DEFAULT_LOOKBACK):
+    """历史对数日收益率（去掉缺失值，只保留最近lookback个）"""
+    x = np.asarray(navs, dtype=np.float64)
+    x = x[~np.isnan(x)]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = np.diff(np.log(x))
+    r = r[np.isfinite(r)]
+    if lookback:
+        r = r[-lookback:]
+    return r
+
+
+def sample_indices(n, horizon, paths, method=METHOD_IID, block=DEFAULT_BLOCK, rng=None):
+    """抽样下标矩阵（路径数 × 交易日数）"""
+    rng = rng if rng is not None else np.random.default_rng()
+    if method == METHOD_IID or block <= 1 or n <= block:
+        return rng.integers(0, n, size=(paths, horizon))
+    blocks = -(-horizon // block)
+    starts = rng.integers(0, n - block + 1, size=(paths, blocks))
+    idx = starts[:, :, None] + np.arange(block)[None, None, :]
+    return idx.reshape(paths, blocks * block)[:, :horizon]
+
+
+def simulate_paths(navs, horizon=max(DEFAULT_HORIZONS), paths=DEFAULT_PATHS, method=METHOD_IID,
+                   block=DEFAULT_BLOCK, seed=DEFAULT_SEED, lookback=DEFAULT_LOOKBACK):
+    """生成未来净值路径（以今日净值为1），返回 (路径数 × 交易日数) 的float32矩阵，历史数据不足时返回None"""
+    r = log_returns(navs, lookback)
+    if len(r) < MIN_RETURNS:
+        return None
+    rng = np.random.default_rng(seed)
+    idx = sample_indices(len(r), horizon, paths, method, block, rng)
+    growth = np.cumsum(r.astype(np.float32)[idx], axis=1)
+    return np.exp(growth, out=growth)
+
+
+def path_statistics(paths, horizons=DEFAULT_HORIZONS):
+    """各持有期的收益率和未来最大回撤分布（均为百分比）
+
+    回撤以今日净值为起点计算，即今日买入后持有期内相对最高点的最大跌幅
+    """
+    # 以今日净值1作为初始高点
+    peak = np.maximum.accumulate(np.maximum(paths, 1.0), axis=1)
+    drawdown = (paths / peak - 1) * 100
+    worst = np.minimum.accumulate(drawdown, axis=1)
+
+    stats = []
+    for horizon in horizons:
+        if horizon > paths.shape[1]:
+            continue
+        final = (paths[:, horizon - 1] - 1) * 100
+        mdd = worst[:, horizon - 1]
+        stats.append({
+            'horizon': horizon,
+            'return_pct': dict(zip(PERCENTILES, np.percentile(final, PERCENTILES).tolist())),
+            'mean_return': float(final.mean()),
+            'loss_prob': float(np.mean(final < 0)),
+            'drawdown_pct': dict(zip(PERCENTILES, np.percentile(mdd, PERCENTILES).tolist())),
+            'mean_drawdown': float(mdd.mean()),
+            'drawdown_10_prob': float(np.mean(mdd <= -10)),
+            'drawdown_20_prob': float(np.mean(mdd <= -20)),
+        })
+    return stats
+
+
+def simulate(navs, horizons=DEFAULT_HORIZONS, paths=DEFAULT_PATHS, method=METHOD_IID,
+             block=DEFAULT_BLOCK, seed=DEFAULT_SEED, lookback=DEFAULT_LOOKBACK):
+    """模拟并汇总：返回结果字典，历史数据不足时返回None"""
+    matrix = simulate_paths(navs, max(horizons), paths, method, block, seed, lookback)
+    if matrix is None:
+        return None
+    return {
+        'method': method,
+        'paths': paths,
+        'block': block if method == METHOD_BLOCK else 1,
+        'seed': seed,
+        'returns_used': len(log_returns(navs, lookback)),
+        'horizons': list(horizons),
+        'stats': path_statistics(matrix, horizons),
+    }
+
+
+def format_summary(result):
+    """生成文字版模拟结果"""
+    if not result:
+        return "历史数据不足，无法模拟"
+    lines = [f"{METHOD_LABELS.get(result['method'], result['method'])} {result['paths']} 条路径"
+             f"（样本 {result['returns_used']} 个交易日，随机种子 {result['seed']}）"]
+    for row in result['stats']:
+        r = row['return_pct']
+        d = row['drawdown_pct']
+        lines.append(
+            f"{row['horizon']}日: 收益中位数 {r[50]:+.2f}%（5%~95%: {r[5]:+.2f}% ~ {r[95]:+.2f}%），"
+            f"亏损概率 {row['loss_prob'] * 100:.1f}%；最大回撤中位数 {d[50]:.2f}%，"
+            f"最差5% {d[5]:.2f}%，回撤超10%概率 {row['drawdown_10_prob'] * 100:.1f}%"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+估值叠加层
+在不可变的基础净值序列之上叠加少量假设净值点（盘中估值），
+应用、叠加多日估值和重置都只写入缓冲区尾部预留空间，不复制基础数据
+"""
+
+import weakref
+
+import numpy as np
+
+from fund_core.series import ESTIMATE_RESERVE, NavBuffer, next_version
+
+
+class ValuationOverlay:
+    """估值叠加层：基础序列 + 假设净值点，视图与指标通过 view() 读取"""
+
+    __slots__ = ('base', '_buf', '_start', '_count', '_view', '__weakref__')
+
+    def __init__(self, base):
+        """初始化叠加层（base为FundSeries，不会被修改）"""
+        self.base = base
+        self._buf = base._buf
+        self._start = base._start
+        self._count = 0
+        self._view = base
+
+    def __len__(self):
+        """已叠加的估值点数量"""
+        return self._count
+
+    @property
+    def active(self):
+        """是否存在估值点"""
+        return self._count > 0
+
+    def push(self, change_pct, date=None):
+        """按涨跌幅（百分比）追加下一交易日的估值点，返回估值净值"""
+        last = self._view
+        if last.empty:
+            raise ValueError("基础数据为空，无法应用估值")
+
+        new_value = last.last_nav * (1 + change_pct / 100)
+        if date is None:
+            date = np.busday_offset(last.last_date, 1, roll='forward')
+        else:
+            date = np.datetime64(date, 'D')
+            if date <= last.last_date:
+                raise ValueError("估值日期必须晚于最新净值日期")
+
+        self._reserve()
+        pos = self._end + self._count
+        self._buf.dates[pos] = date
+        self._buf.navs[pos] = new_value
+        self._count += 1
+        self._refresh()
+        return new_value
+
+    def pop(self):
+        """撤销最后一个估值点"""
+        if self._count:
+            self._count -= 1
+            self._refresh()
+
+    def reset(self):
+        """清空所有估值点，恢复基础数据"""
+        self._count = 0
+        self._view = self.base
+        self._release()
+
+    def view(self):
+        """当前视图：基础数据 + 估值点（零拷贝FundSeries）"""
+        return self._view
+
+    def estimates(self):
+        """估值点（日期数组, 净值数组）"""
+        view = self._view
+        return view.dates[len(self.base):], view.navs[len(self.base):]
+
+    @property
+    def _end(self):
+        """基础数据在缓冲区中的结束位置"""
+        return self._start + len(self.base)
+
+    def _refresh(self):
+        """生成新的视图（新版本号，便于下游缓存失效）"""
+        if self._count == 0:
+            self._view = self.base
+            self._release()
+            return
+        self._view = self.base.from_buffer(
+            self.base, self._buf, self._start, self._end + self._count,
+            estimates=self._count, version=next_version()
+        )
+        self._buf.views.add(self._view)
+
+    def _reserve(self):
+        """确保还能再写入一个估值点，必要时占用或复制缓冲区"""
+        buf = self._buf
+        pos = self._end + self._count
+        if self._owns(buf) and pos < buf.capacity and not self._in_use(buf, pos):
+            buf.holder = weakref.ref(self)
+            return
+
+        # 预留空间被其他叠加层占用、仍被旧视图引用、基础数据并非缓冲区末尾或容量不足：
+        # 复制一份私有缓冲区（每个叠加层仅在首次或容量翻倍时发生）
+        rows = self._end + self._count - self._start
+        reserve = max(rows, ESTIMATE_RESERVE)
+        private = NavBuffer(buf.dates[self._start:self._start + rows],
+                            buf.navs[self._start:self._start + rows], reserve=reserve)
+        private.stop = len(self.base)
+        private.holder = weakref.ref(self)
+        self._buf = private
+        self._start = 0
+
+    def _owns(self, buf):
+        """是否可以使用该缓冲区的预留空间"""
+        if self._end != buf.stop:
+            # 基础数据之后还有真实数据（区间切片），不能覆盖
+            return False
+        holder = buf.holder() if buf.holder is not None else None
+        return holder is None or holder is self or not holder.active
+
+    def _in_use(self, buf, pos):
+        """缓冲区第pos行是否仍被某个含估值的视图引用（如撤销或重置之前取得的视图）
+
+        改写这一行会让旧视图读到新的估值，此时需复制私有缓冲区
+        """
+        return any(view._end > pos for view in buf.views)
+
+    def _release(self):
+        """释放预留空间"""
+        buf = self._buf
+        if buf.holder is not None and buf.holder() is self:
+            buf.holder = None
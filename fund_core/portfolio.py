@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+模拟持仓
+交易记录以只追加的 JSON Lines 文件保存在本地，持仓按买入批次管理（卖出按先进先出扣减）。
+每日市值、盈亏和仓位在（交易日 × 基金）净值矩阵上一次性计算，
+估值变化时只需用新的净值矩阵重新计算一次
+"""
+
+import json
+import os
+import threading
+import time as time_module
+import uuid
+
+import numpy as np
+
+from fund_core.screener import align
+from fund_core.store import NavStore
+
+PORTFOLIO_FILE = 'portfolio.jsonl'
+
+TXN_BUY = 'buy'
+TXN_SELL = 'sell'
+
+
+def portfolio_path(store):
+    """交易记录文件路径（与本地存储放在一起）"""
+    return os.path.join(store.root, PORTFOLIO_FILE)
+
+
+class Lot:
+    """买入批次"""
+
+    __slots__ = ('code', 'date', 'amount', 'nav', 'fee', 'units')
+
+    def __init__(self, code, date, amount, nav, fee=0.0):
+        """amount为买入金额（含手续费），份额 = (金额 - 手续费) / 净值"""
+        self.code = code
+        self.date = date
+        self.amount = amount
+        self.nav = nav
+        self.fee = fee
+        self.units = (amount - fee) / nav
+
+    @property
+    def cost(self):
+        """剩余份额对应的成本（按比例分摊买入金额）"""
+        original = (self.amount - self.fee) / self.nav
+        return self.amount * self.units / original if original else 0.0
+
+    def __repr__(self):
+        return f"Lot({self.code}, {self.date}, 份额={self.units:.2f}, 净值={self.nav:.4f})"
+
+
+class Ledger:
+    """交易记录（只追加）"""
+
+    def __init__(self, path=None, store=None):
+        """打开交易记录文件（不存在时在首次记账时创建）"""
+        self.path = path or portfolio_path(store or NavStore())
+        self._lock = threading.Lock()
+        self.transactions = self._read()
+
+    def _read(self):
+        """读取全部交易（跳过损坏的行）"""
+        if not os.path.exists(self.path):
+            return []
+        transactions = []
+        with open(self.path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    transactions.append(json.loads(line))
+                except ValueError:
+                    print(f"跳过无法解析的交易记录 第{line_number}行")
+        transactions.sort(key=lambda txn: (txn['date'], txn.get('time', 0)))
+        return transactions
+
+    def _append(self, txn):
+        """追加一条交易并立即落盘"""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(txn, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.transactions.append(txn)
+            self.transactions.sort(key=lambda item: (item['date'], item.get('time', 0)))
+        return txn
+
+    def buy(self, code, date, amount, nav, fee=0.0):
+        """记录买入（amount为支付金额，含手续费）"""
+        if amount <= 0 or nav <= 0:
+            raise ValueError("买入金额和净值必须大于0")
+        if fee < 0 or fee >= amount:
+            raise ValueError("手续费必须在0和买入金额之间")
+        return self._append({
+            'id': uuid.uuid4().hex, 'time': time_module.time(), 'type': TXN_BUY,
+            'code': code, 'date': str(np.datetime64(date, 'D')),
+            'amount': float(amount), 'nav': float(nav), 'fee': float(fee),
+        })
+
+    def sell(self, code, date, units, nav, fee=0.0):
+        """记录卖出（units为卖出份额，到账金额 = 份额 × 净值 - 手续费）"""
+        held = sum(lot.units for lot in self.lots(code))
+        if units <= 0 or nav <= 0:
+            raise ValueError("卖出份额和净值必须大于0")
+        if units > held + 1e-9:
+            raise ValueError(f"卖出份额超过持有份额 {held:.2f}")
+        return self._append({
+            'id': uuid.uuid4().hex, 'time': time_module.time(), 'type': TXN_SELL,
+            'code': code, 'date': str(np.datetime64(date, 'D')),
+            'units': float(units), 'nav': float(nav), 'fee': float(fee),
+        })
+
+    def codes(self):
+        """出现过的基金代码"""
+        return list(dict.fromkeys(txn['code'] for txn in self.transactions))
+
+    def lots(self, code=None):
+        """当前持有的买入批次（卖出按先进先出扣减份额）"""
+        open_lots = {}
+        for txn in self.transactions:
+            if code is not None and txn['code'] != code:
+                continue
+            queue = open_lots.setdefault(txn['code'], [])
+            if txn['type'] == TXN_BUY:
+                queue.append(Lot(txn['code'], txn['date'], txn['amount'], txn['nav'], txn.get('fee', 0.0)))
+                continue
+            remaining = txn['units']
+            while remaining > 1e-9 and queue:
+                lot = queue[0]
+                used = min(lot.units, remaining)
+                lot.units -= used
+                remaining -= used
+                if lot.units <= 1e-9:
+                    queue.pop(0)
+        return [lot for queue in open_lots.values() for lot in queue]
+
+
+class PortfolioValuation:
+    """持仓每日估值结果：各数组形状为（交易日 × 基金），total_* 为按日合计"""
+
+    def __init__(self, dates, codes, navs, units, cash_in, cash_out):
+        """由净值、份额和累计现金流计算市值、盈亏和仓位"""
+        self.dates = dates
+        self.codes = codes
+        self.navs = navs
+        self.units = units
+        self.cash_in = cash_in
+        self.cash_out = cash_out
+        self.value = np.where(units > 0, units * np.nan_to_num(navs), 0.0)
+        self.pnl = self.value + cash_out - cash_in
+        self.total_value = self.value.sum(axis=1)
+        self.total_invested = cash_in.sum(axis=1)
+        self.total_pnl = self.pnl.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.weights = np.where(self.total_value[:, None] > 0, self.value / self.total_value[:, None], 0.0)
+            self.total_return = np.where(self.total_invested > 0, self.total_pnl / self.total_invested * 100, 0.0)
+
+    def latest(self, lots=None):
+        """最新一天各基金的持仓汇总（lots用于计算剩余份额的持仓成本）"""
+        cost = {}
+        for lot in lots or []:
+            cost[lot.code] = cost.get(lot.code, 0.0) + lot.cost
+        rows = []
+        if len(self.dates) == 0:
+            return rows
+        for column, code in enumerate(self.codes):
+            units = float(self.units[-1, column])
+            if units <= 1e-9:
+                continue
+            value = float(self.value[-1, column])
+            holding_cost = cost.get(code, float(self.cash_in[-1, column] - self.cash_out[-1, column]))
+            rows.append({
+                'code': code,
+                'units': units,
+                'nav': float(self.navs[-1, column]),
+                'cost': holding_cost,
+                'value': value,
+                'pnl': float(self.pnl[-1, column]),
+                'holding_pnl': value - holding_cost,
+                'holding_return': (value / holding_cost - 1) * 100 if holding_cost > 0 else 0.0,
+                'weight': float(self.weights[-1, column]),
+            })
+        return rows
+
+
+def revalue(ledger, dates, codes, matrix):
+    """在对齐的净值矩阵上计算持仓每日估值（交易日期不是交易日时从下一个交易日生效）"""
+    columns = {code: column for column, code in enumerate(codes)}
+    shape = (len(dates), len(codes))
+    unit_delta = np.zeros(shape)
+    in_delta = np.zeros(shape)
+    out_delta = np.zeros(shape)
+
+    txns = [txn for txn in ledger.transactions if txn['code'] in columns]
+    if txns and len(dates):
+        rows = np.searchsorted(dates, np.array([txn['date'] for txn in txns], dtype='datetime64[D]'))
+        keep = rows < len(dates)
+        rows = rows[keep]
+        txns = [txn for txn, ok in zip(txns, keep) if ok]
+        cols = np.array([columns[txn['code']] for txn in txns], dtype=np.intp)
+        is_buy = np.array([txn['type'] == TXN_BUY for txn in txns], dtype=bool)
+        nav = np.array([txn['nav'] for txn in txns])
+        fee = np.array([txn.get('fee', 0.0) for txn in txns])
+        amount = np.array([txn.get('amount', 0.0) for txn in txns])
+        units = np.array([txn.get('units', 0.0) for txn in txns])
+
+        bought = (amount - fee) / nav
+        np.add.at(unit_delta, (rows, cols), np.where(is_buy, bought, -units))
+        np.add.at(in_delta, (rows, cols), np.where(is_buy, amount, 0.0))
+        np.add.at(out_delta, (rows, cols), np.where(is_buy, 0.0, units * nav - fee))
+
+    # 沿用前一日净值（基金停止公布净值后也沿用最后净值），首个净值之前为NaN
+    navs = np.asarray(matrix, dtype=np.float64).reshape(shape)
+    if len(dates):
+        t = np.arange(len(dates))[:, None]
+        last_seen = np.maximum.accumulate(np.where(~np.isnan(navs), t, -1), axis=0)
+        navs = np.where(last_seen >= 0, np.take_along_axis(navs, np.maximum(last_seen, 0), axis=0), np.nan)
+    return PortfolioValuation(dates, list(codes), navs, np.cumsum(unit_delta, axis=0),
+                              np.cumsum(in_delta, axis=0), np.cumsum(out_delta, axis=0))
+
+
+def revalue_from_store(ledger, store=None, overrides=None, start=None):
+    """从本地存储读取持仓基金净值并估值；overrides为 {代码: FundSeries}（如含估值的序列），优先于存储数据"""
+    store = store or NavStore()
+    overrides = overrides or {}
+    series_list = []
+    for code in ledger.codes():
+        series = overrides.get(code) or store.load(code)
+        if series is not None:
+            series_list.append(series)
+    if start is None and ledger.transactions:
+        start = ledger.transactions[0]['date']
+    dates, codes, matrix = align(series_list, start=start)
+    return revalue(ledger, dates, codes, matrix)
+
+
+def nav_on(series, date):
+    """某日（或之前最近一个交易日）的净值，无数据时返回None"""
+    i = int(np.searchsorted(series.dates, np.datetime64(date, 'D'), side='right')) - 1
+    if i < 0:
+        return None
+    return float(series.navs[i])
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+区间统计
+对一只基金的完整净值序列预先建立前缀和与倍增表，之后任意日期区间的收益率、波动率、
+上涨天数占比为O(1)查询，区间最大回撤和最长连涨/连跌由至多 log2(n) 个预先合并好的块拼接得到，
+拖动选择区间时每次查询只需几十微秒（二十年日线约5000个点）
+"""
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+class RangeStats:
+    """单只基金的区间统计结构（一维净值数组）"""
+
+    def __init__(self, navs):
+        """navs为按日期排列的净值"""
+        x = np.asarray(navs, dtype=np.float64)
+        if x.ndim != 1:
+            raise ValueError("区间统计只支持一维净值序列")
+        self.navs = x
+        n = len(x)
+
+        # 日收益率的前缀和、平方前缀和与上涨天数前缀和（第k项为前k个交易日的累计，首日收益为0）
+        ret = np.zeros(n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ret[1:] = x[1:] / x[:-1] - 1
+        ret = np.nan_to_num(ret)
+        self._ups = np.cumsum(ret > 0)
+        direction = np.sign(ret).astype(np.int8)
+        # 先减去平均收益再求平方和，避免大数相减的精度损失
+        centered = ret - (ret[1:].mean() if n > 1 else 0.0)
+        self._sum = np.cumsum(centered)
+        self._squares = np.cumsum(centered * centered)
+
+        # 倍增表：第k层第i项为从i开始、长度2^k的块的摘要
+        # 净值块：(最高, 最低, 块内最大回撤比例)；涨跌块：连涨和连跌各自的 (前缀长度, 后缀长度, 最长)
+        up = (direction > 0).astype(np.int32)
+        down = (direction < 0).astype(np.int32)
+        self._peak = [x]
+        self._trough = [x]
+        self._dd = [np.zeros(n)]
+        self._runs = [np.stack([up, up, up, down, down, down])]
+        k = 1
+        while (1 << k) <= n:
+            half = 1 << (k - 1)
+            size = n - (1 << k) + 1
+            left, right = slice(0, size), slice(half, half + size)
+            peak, trough, dd = self._peak[-1], self._trough[-1], self._dd[-1]
+            self._peak.append(np.maximum(peak[left], peak[right]))
+            self._trough.append(np.minimum(trough[left], trough[right]))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                cross = trough[right] / peak[left] - 1
+            self._dd.append(np.minimum(np.minimum(dd[left], dd[right]), cross))
+
+            runs = self._runs[-1]
+            merged = []
+            for offset in (0, 3):
+                prefix, suffix, best = runs[offset:offset + 3]
+                merged.extend(_merge_runs(prefix[left], suffix[left], best[left],
+                                          prefix[right], suffix[right], best[right], half, half))
+            self._runs.append(np.stack(merged))
+            k += 1
+
+    def __len__(self):
+        return len(self.navs)
+
+    def _blocks(self, start, end):
+        """把 [start, end] 拆成左到右相邻的2的幂长度块：生成 (层, 起点)"""
+        pos = start
+        remaining = end - start + 1
+        for level in range(len(self._peak) - 1, -1, -1):
+            if remaining >= (1 << level):
+                yield level, pos
+                pos += 1 << level
+                remaining -= 1 << level
+
+    def max_drawdown(self, start, end):
+        """区间 [start, end] 内的最大回撤（%，不大于0）"""
+        peak = None
+        worst = 0.0
+        for level, pos in self._blocks(start, end):
+            worst = min(worst, float(self._dd[level][pos]))
+            if peak is not None:
+                # 前面各块的最高点到本块最低点
+                worst = min(worst, float(self._trough[level][pos]) / peak - 1)
+                peak = max(peak, float(self._peak[level][pos]))
+            else:
+                peak = float(self._peak[level][pos])
+        return worst * 100
+
+    def longest_runs(self, start, end):
+        """区间内（第start+1到第end个交易日的涨跌）的最长连涨和最长连跌天数"""
+        if end <= start:
+            return 0, 0
+        # 连涨、连跌各自的 [前缀, 后缀, 最长]，逐块向右合并（标量运算，与 _merge_runs 相同）
+        state = [0, 0, 0, 0, 0, 0]
+        length = 0
+        for level, pos in self._blocks(start + 1, end):
+            block = self._runs[level][:, pos].tolist()
+            size = 1 << level
+            for offset in (0, 3):
+                prefix, suffix, best = state[offset:offset + 3]
+                block_prefix, block_suffix, block_best = block[offset:offset + 3]
+                state[offset:offset + 3] = [
+                    length + block_prefix if prefix == length else prefix,
+                    size + suffix if block_prefix == size else block_suffix,
+                    max(best, block_best, suffix + block_prefix),
+                ]
+            length += size
+        return state[2], state[5]
+
+    def query(self, start, end):
+        """区间 [start, end]（下标，含两端）的统计：收益率、最大回撤、年化波动率、上涨天数占比、最长连涨/连跌"""
+        n = len(self)
+        start, end = max(int(start), 0), min(int(end), n - 1)
+        if n == 0 or end < start:
+            return None
+        days = end - start
+        result = {
+            'start': start,
+            'end': end,
+            'days': days,
+            'return': float(self.navs[end] / self.navs[start] - 1) * 100,
+            'max_drawdown': self.max_drawdown(start, end),
+            'volatility': float('nan'),
+            'up_ratio': float('nan'),
+            'longest_up': 0,
+            'longest_down': 0,
+        }
+        if days == 0:
+            return result
+        total = float(self._sum[end] - self._sum[start])
+        squares = float(self._squares[end] - self._squares[start])
+        if days > 1:
+            variance = max(squares - total * total / days, 0.0) / (days - 1)
+            result['volatility'] = float(np.sqrt(variance * TRADING_DAYS) * 100)
+        result['up_ratio'] = float(self._ups[end] - self._ups[start]) / days
+        result['longest_up'], result['longest_down'] = self.longest_runs(start, end)
+        return result
+
+    def query_dates(self, dates, start_date, end_date):
+        """按日期查询（dates为与净值对应的日期数组），返回统计字典并附带实际起止日期"""
+        dates = np.asarray(dates)
+        start = int(np.searchsorted(dates, np.datetime64(start_date, 'D'), side='left'))
+        end = int(np.searchsorted(dates, np.datetime64(end_date, 'D'), side='right')) - 1
+        result = self.query(start, end)
+        if result is not None:
+            result['start_date'] = str(dates[result['start']])
+            result['end_date'] = str(dates[result['end']])
+        return result
+
+
+def _merge_runs(prefix_a, suffix_a, best_a, prefix_b, suffix_b, best_b, length_a, length_b):
+    """合并相邻两块的连续段摘要（length_a、length_b为两块长度）
+
+    前缀：左块全满时延伸到右块；后缀：右块全满时延伸到左块；最长：两块各自最长或跨界拼接
+    """
+    prefix = np.where(prefix_a == length_a, length_a + prefix_b, prefix_a)
+    suffix = np.where(prefix_b == length_b, length_b + suffix_a, suffix_b)
+    best = np.maximum(np.maximum(best_a, best_b), suffix_a + prefix_b)
+    return prefix, suffix, best
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+请求限速器
+多个工作线程共享的令牌桶，替代每次请求前固定的 sleep
+"""
+
+import threading
+import time as time_module
+
+
+class RateLimiter:
+    """线程安全的令牌桶限速器"""
+
+    def __init__(self, rate=5.0, burst=None):
+        """初始化限速器（rate为每秒请求数，burst为允许的突发请求数）"""
+        if rate <= 0:
+            raise ValueError("请求速率必须大于0")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time_module.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """获取一个令牌，不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time_module.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time_module.sleep(wait)
+
+    def __enter__(self):
+        """支持 with 语句"""
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        """with 语句结束"""
+        return False
+
+
+class RetryPolicy:
+    """限速重试：失败后按指数退避重试，成功的请求不再额外等待"""
+
+    def __init__(self, limiter=None, retries=3, backoff=1.0):
+        """初始化重试策略"""
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff = backoff
+
+    def call(self, func, *args, **kwargs):
+        """执行请求，失败时自动重试"""
+        for i in range(self.retries):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if i == self.retries - 1:
+                    raise
+                time_module.sleep(self.backoff * (2 ** i))
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+回撤恢复统计
+按（回撤深度分段, 回撤持续天数分段, 年化波动率分段）统计历史上处于该状态的交易日
+在N个交易日内重新回到前期高点的经验概率，一次向量化计算完成；
+抄底胜率由查表得到，样本不足时依次退回全市场统计和经验分段规则。
+逐日胜率（win_rates，指标图的 win_rate 节点、筛选、回测和情景分析共用）与
+购买建议对话框（bottom_win_rate）使用同一套取值规则
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from fund_core import advice, indicators
+from fund_core.indicators import fill_gaps, last_valid_rows
+
+# 分段边界：回撤深度（%，取绝对值）、持续天数、年化波动率（%）
+DEPTH_EDGES = (5, 10, 15, 20, 30)
+DURATION_EDGES = (5, 20, 60, 120)
+VOLATILITY_EDGES = (15, 30)
+
+DEFAULT_HORIZONS = (20, 60, 120)
+DEFAULT_HORIZON = 60
+
+# 单个分段至少需要的样本数，不足时退回更大范围的统计
+MIN_SAMPLES = 30
+
+UNIVERSE_FILE = 'recovery.npz'
+
+# 构建全市场统计表时每次读入的基金列数（内存占用与块大小成正比，与全市场基金总数无关）
+CHUNK_COLUMNS = 256
+
+_SHAPE = (len(DEPTH_EDGES) + 1, len(DURATION_EDGES) + 1, len(VOLATILITY_EDGES) + 1)
+BUCKETS = int(np.prod(_SHAPE))
+
+# 进程内使用的全市场统计表（界面、命令行和服务读取后通过 use_universe 登记）
+_universe = [None]
+
+
+def bucket_index(drawdown_values, duration, volatility):
+    """状态分段编号（展平后的下标），回撤深度、持续天数和波动率为NaN时按0处理"""
+    depth = np.digitize(-np.nan_to_num(drawdown_values), DEPTH_EDGES)
+    dur = np.digitize(np.nan_to_num(duration), DURATION_EDGES)
+    vol = np.digitize(np.nan_to_num(volatility), VOLATILITY_EDGES)
+    return np.ravel_multi_index((depth, dur, vol), _SHAPE)
+
+
+def recovery_days(values):
+    """每个交易日距离下一次回到前期高点的天数（已在高点为0，数据结束前未恢复为-1）"""
+    x = np.asarray(values, dtype=np.float64)
+    dd = indicators.drawdown(x)
+    n = len(x)
+    t = np.arange(n).reshape((-1,) + (1,) * (x.ndim - 1))
+    at_peak = dd >= 0
+    # 从后往前找下一个高点
+    next_peak = np.where(at_peak, t, n)[::-1]
+    next_peak = np.minimum.accumulate(next_peak, axis=0)[::-1]
+    return np.where(next_peak < n, next_peak - t, -1)
+
+
+def _outcomes(x, horizon):
+    """每个交易日作为样本的结果：返回 (揭晓日, 是否在horizon天内恢复)
+
+    处于回撤中的日期在恢复日（horizon天内恢复）或第horizon天（未恢复）揭晓结果，
+    不在回撤中或剩余数据不足以判断的日期揭晓日为-1
+    """
+    days = recovery_days(x)
+    t = np.arange(len(x)).reshape((-1,) + (1,) * (x.ndim - 1))
+    last = last_valid_rows(x[:, None] if x.ndim == 1 else x)
+    remaining = (last[0] if x.ndim == 1 else last[None, :]) - t
+    recovered = (days > 0) & (days <= horizon)
+    known = (indicators.drawdown(x) < 0) & (recovered | (remaining >= horizon))
+    reveal = np.where(recovered, t + days, t + horizon)
+    return np.where(known, reveal, -1), recovered
+
+
+def _count(x, horizons):
+    """统计 (样本数, 恢复数)，形状均为 (持有期数, 分段数)；x为float64一维数组或矩阵"""
+    dd = indicators.drawdown(x)
+    duration = indicators.underwater_duration(x)
+    volatility = indicators.annualized_volatility(x)
+    days = recovery_days(x)
+
+    t = np.arange(len(x)).reshape((-1,) + (1,) * (x.ndim - 1))
+    # 每只基金到其最后一个净值日的剩余天数
+    last = last_valid_rows(x[:, None] if x.ndim == 1 else x)
+    remaining = (last[0] if x.ndim == 1 else last[None, :]) - t
+    underwater = dd < 0
+    buckets = bucket_index(dd, duration, volatility)
+
+    size = int(np.prod(_SHAPE))
+    samples = np.zeros((len(horizons), size), dtype=np.int64)
+    hits = np.zeros((len(horizons), size), dtype=np.int64)
+    for k, horizon in enumerate(horizons):
+        recovered = (days > 0) & (days <= horizon)
+        # 剩余数据不足horizon天且尚未恢复的日期结果未知，不计入样本
+        known = underwater & (recovered | (remaining >= horizon))
+        samples[k] = np.bincount(buckets[known], minlength=size)
+        hits[k] = np.bincount(buckets[known & recovered], minlength=size)
+    return samples, hits
+
+
+class RecoveryTable:
+    """回撤恢复统计表"""
+
+    def __init__(self, samples, hits, horizons=DEFAULT_HORIZONS, built=0.0):
+        """samples/hits 形状为 (持有期数, 分段数)"""
+        self.samples = samples
+        self.hits = hits
+        self.horizons = tuple(int(h) for h in horizons)
+        self.built = built
+
+    @classmethod
+    def from_values(cls, values, horizons=DEFAULT_HORIZONS, built=0.0):
+        """由一维净值数组或（交易日 × 基金）矩阵统计"""
+        samples, hits = _count(np.asarray(values, dtype=np.float64), horizons)
+        return cls(samples, hits, horizons, built)
+
+    @classmethod
+    def from_archive(cls, archive, horizons=DEFAULT_HORIZONS, chunk=CHUNK_COLUMNS):
+        """按列分块统计全市场归档：每次只把chunk列的有效行区间转为float64，各块的计数累加"""
+        size = int(np.prod(_SHAPE))
+        samples = np.zeros((len(horizons), size), dtype=np.int64)
+        hits = np.zeros((len(horizons), size), dtype=np.int64)
+        for begin in range(0, len(archive), chunk):
+            end = min(begin + chunk, len(archive))
+            first, last = int(archive.first[begin:end].min()), int(archive.last[begin:end].max())
+            if last <= first:
+                continue
+            block = fill_gaps(np.asarray(archive.navs[first:last, begin:end], dtype=np.float64))
+            block_samples, block_hits = _count(block, horizons)
+            samples += block_samples
+            hits += block_hits
+        return cls(samples, hits, horizons, archive.built)
+
+    def _horizon_index(self, horizon):
+        """持有期在表中的位置"""
+        return self.horizons.index(horizon)
+
+    def lookup(self, drawdown_value, duration, volatility, horizon=DEFAULT_HORIZON):
+        """查询某状态的 (恢复概率, 样本数)，无样本时概率为NaN"""
+        k = self._horizon_index(horizon)
+        b = int(bucket_index(drawdown_value, duration, volatility))
+        n = int(self.samples[k, b])
+        if n == 0:
+            return float('nan'), 0
+        return float(self.hits[k, b] / n), n
+
+    def probabilities(self, horizon=DEFAULT_HORIZON):
+        """全部分段的恢复概率，形状为 (深度, 持续天数, 波动率)"""
+        k = self._horizon_index(horizon)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (self.hits[k] / self.samples[k]).reshape(_SHAPE)
+
+    def save(self, path):
+        """保存统计表"""
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f, samples=self.samples, hits=self.hits,
+                     horizons=np.array(self.horizons), built=np.array(self.built),
+                     shape=np.array(_SHAPE))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """读取统计表，文件不存在或分段定义已变化时返回None"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if tuple(data['shape']) != _SHAPE:
+                    return None
+                return cls(data['samples'], data['hits'], tuple(data['horizons']), float(data['built']))
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+# 单只基金统计表缓存：代码 -> (版本号, 统计表)
+_fund_tables = {}
+_fund_lock = threading.Lock()
+
+
+def fund_table(series):
+    """单只基金的统计表（按净值序列版本号缓存）"""
+    with _fund_lock:
+        cached = _fund_tables.get(series.code)
+        if cached is not None and cached[0] == series.version:
+            return cached[1]
+    table = RecoveryTable.from_values(series.navs)
+    with _fund_lock:
+        _fund_tables[series.code] = (series.version, table)
+    return table
+
+
+def universe_table_path(store):
+    """全市场统计表文件路径"""
+    return os.path.join(store.root, UNIVERSE_FILE)
+
+
+def load_universe_table(store):
+    """读取已构建的全市场统计表（不存在时返回None，不触发计算）"""
+    return RecoveryTable.load(universe_table_path(store))
+
+
+def build_universe_table(archive, store):
+    """由全市场归档构建统计表并保存（归档未变化时直接读取已有结果）"""
+    path = universe_table_path(store)
+    table = RecoveryTable.load(path)
+    if table is not None and table.built == archive.built:
+        return table
+    table = RecoveryTable.from_archive(archive)
+    table.save(path)
+    return table
+
+
+def current_state(series):
+    """序列最后一天的 (回撤率, 回撤持续天数, 年化波动率)
+
+    与本基金统计表一样相对完整历史计算（日期范围过滤后的视图不会改变参考高点），
+    视图末尾带估值时在完整历史后接上估值再计算
+    """
+    # graph 的 win_rate 节点依赖本模块，在函数内导入避免循环导入
+    from fund_core import graph
+
+    history = series.history()
+    start = int(np.searchsorted(history.dates, series.dates[0]))
+    if not series.estimates:
+        frame = graph.frame_for(history)
+        i = start + len(series) - 1
+        return frame['drawdown'][i], frame['duration'][i], frame['volatility'][i]
+    x = np.concatenate([history.navs[:start], series.navs])
+    return (indicators.drawdown(x)[-1], indicators.underwater_duration(x)[-1],
+            indicators.annualized_volatility(x)[-1])
+
+
+def bottom_win_rate(series, universe=None, horizon=DEFAULT_HORIZON, min_samples=MIN_SAMPLES):
+    """序列最后一天所处状态的抄底胜率：返回 (胜率, 样本数, 来源)
+
+    本基金统计使用序列的完整历史（series.history()），universe为None时使用 use_universe 登记的表，
+    来源依次为 '本基金'、'全市场'、'经验规则'（样本不足时退回下一级）
+    """
+    if universe is None:
+        universe = _universe[0]
+    dd, duration, volatility = current_state(series)
+    if dd >= 0:
+        # 处于高点时没有“恢复”可言，沿用经验规则
+        return float(advice.drawdown_win_rate(dd)), 0, '经验规则'
+
+    for source, table in (('本基金', fund_table(series.history())), ('全市场', universe)):
+        if table is None or horizon not in table.horizons:
+            continue
+        probability, n = table.lookup(dd, duration, volatility, horizon)
+        if n >= min_samples:
+            return probability, n, source
+    return float(advice.drawdown_win_rate(dd)), 0, '经验规则'
+
+
+
+def use_universe(table):
+    """登记进程内使用的全市场统计表（None表示不使用），统计表有变化时已缓存的指标随之失效"""
+    from fund_core import graph
+
+    previous, _universe[0] = _universe[0], table
+    if (previous is None) != (table is None) or (table is not None and previous.built != table.built):
+        graph.invalidate()
+
+
+def active_universe():
+    """当前登记的全市场统计表"""
+    return _universe[0]
+
+
+def lookup_rates(samples, hits, universe_buckets, drawdown_values, horizon=DEFAULT_HORIZON,
+                 min_samples=MIN_SAMPLES, tiers=advice.WIN_RATE_TIERS, universe=None):
+    """按 bottom_win_rate 的顺序取胜率：本基金样本数足够时用本基金统计，否则用全市场统计表，
+    仍不足或不在回撤中时用经验分段规则；samples/hits为各日期本基金对应分段的计数，
+    universe为None时使用 use_universe 登记的表，为False时不使用全市场统计
+    """
+    universe = _universe[0] if universe is None else universe
+    dd = np.asarray(drawdown_values, dtype=np.float64)
+    rates = np.array(advice.drawdown_win_rate(dd, tiers), dtype=np.float64)
+    underwater = dd < 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if universe and horizon in universe.horizons:
+            k = universe.horizons.index(horizon)
+            n = universe.samples[k][universe_buckets]
+            rates = np.where(underwater & (n >= min_samples), universe.hits[k][universe_buckets] / n, rates)
+        rates = np.where(underwater & (samples >= min_samples), hits / samples, rates)
+    return rates
+
+
+def win_rates(values, drawdown_values, duration, volatility, horizon=DEFAULT_HORIZON,
+              min_samples=MIN_SAMPLES, tiers=advice.WIN_RATE_TIERS, universe=None):
+    """逐日（矩阵时逐只基金）的抄底胜率，取值规则与 bottom_win_rate 相同
+
+    第t天只统计在第t天及之前已揭晓结果的本基金样本（不使用未来数据），最后一天与本基金统计表一致；
+    按 (基金, 分段, 揭晓日) 排序后二分计数，不逐日循环。tiers为经验分段规则（回测可调整），
+    universe 同 lookup_rates
+    """
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    columns = x.reshape(n, -1)
+    buckets = bucket_index(drawdown_values, duration, volatility)
+    group = buckets.reshape(n, -1) + np.arange(columns.shape[1]) * BUCKETS
+
+    reveal, recovered = _outcomes(columns, horizon)
+    known = reveal >= 0
+    size = BUCKETS * columns.shape[1]
+    # 只有处于回撤中的日期需要查表；按键排序后二分查找，查询同样按序进行
+    underwater = np.flatnonzero(np.asarray(drawdown_values).reshape(n, -1) < 0)
+    query_group = group.ravel()[underwater]
+    query = query_group * (n + 1) + underwater // columns.shape[1]
+    order = np.argsort(query, kind='stable')
+    counts = []
+    for mask in (known, known & recovered):
+        keys = np.sort(group[mask] * (n + 1) + reveal[mask])
+        # 各 (基金, 分段) 的事件在排序结果中的起点
+        starts = np.concatenate([[0], np.cumsum(np.bincount(group[mask], minlength=size))])
+        count = np.zeros(n * columns.shape[1], dtype=np.int64)
+        found = np.empty(len(order), dtype=np.int64)
+        found[order] = np.searchsorted(keys, query[order], 'right')
+        count[underwater] = found - starts[query_group]
+        counts.append(count)
+    samples, hits = (c.reshape(x.shape) for c in counts)
+    return lookup_rates(samples, hits, buckets, drawdown_values, horizon, min_samples, tiers, universe)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+远程数据源
+通过本地HTTP分析服务（见 fund_core.service）获取净值和分析结果，代替各客户端直接请求网络；
+响应按URL缓存，再次请求时带 If-None-Match，数据未变化时服务返回304，直接使用缓存
+"""
+
+import json
+import os
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from fund_core.series import FundSeries
+
+# 设置该环境变量（如 http://192.168.1.10:8765）后，界面通过服务获取数据
+SERVICE_URL_ENV = 'FUND_SERVICE_URL'
+
+
+class RemoteSource:
+    """分析服务客户端"""
+
+    def __init__(self, base_url, timeout=30):
+        """base_url为服务地址"""
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        # URL -> (ETag, 解析后的数据)
+        self._cache = {}
+        # 代码 -> (净值数据, 序列)，数据未变化时复用同一序列（版本号不变，下游缓存继续有效）
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, **params):
+        """请求一个接口，返回解析后的JSON数据"""
+        query = urllib.parse.urlencode({key: value for key, value in params.items() if value})
+        url = f"{self.base_url}{path}" + (f"?{query}" if query else '')
+        with self._lock:
+            cached = self._cache.get(url)
+
+        request = urllib.request.Request(url, headers={'Accept': 'application/json'})
+        if cached is not None:
+            request.add_header('If-None-Match', cached[0])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = json.loads(response.read().decode('utf-8'))
+                etag = response.headers.get('ETag')
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and cached is not None:
+                return cached[1]
+            try:
+                message = json.loads(e.read().decode('utf-8')).get('error', '')
+            except ValueError:
+                message = ''
+            raise RuntimeError(f"分析服务返回错误 {e.code}: {message}")
+
+        if etag:
+            with self._lock:
+                self._cache[url] = (etag, payload)
+        return payload
+
+    def fetch_fund(self, code, start_date=None, end_date=None):
+        """获取基金净值序列（与 fetch.fetch_fund 相同，完整历史保留在 series.history() 中）"""
+        payload = self.get(f"/funds/{urllib.parse.quote(code)}/navs")
+        with self._lock:
+            cached = self._series.get(code)
+        if cached is not None and cached[0] is payload:
+            series = cached[1]
+        else:
+            series = FundSeries(code, payload['dates'], payload['navs'],
+                                payload.get('fund_type', ''), payload.get('info') or {})
+            with self._lock:
+                self._series[code] = (payload, series)
+        if start_date or end_date:
+            try:
+                series = series.between(start_date, end_date)
+            except Exception as date_error:
+                print(f"日期过滤失败: {date_error}")
+        return series
+
+    def advice(self, code):
+        """获取基金的完整分析结果（analysis.analyze_fund 的JSON形式）"""
+        return self.get(f"/funds/{urllib.parse.quote(code)}/advice")
+
+
+_default = {'url': None, 'source': None}
+_default_lock = threading.Lock()
+
+
+def remote_source():
+    """按环境变量返回共享的远程数据源，未配置时返回None"""
+    url = os.environ.get(SERVICE_URL_ENV, '').strip()
+    if not url:
+        return None
+    with _default_lock:
+        if _default['url'] != url:
+            _default['url'] = url
+            _default['source'] = RemoteSource(url)
+        return _default['source']
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+风险指标
+年化收益、年化波动率、夏普比率、索提诺比率、卡玛比率、历史VaR/CVaR和溃疡指数。
+输入可以是一维净值数组或（交易日 × 基金）矩阵；收益率、平方和、下行偏差等前缀和只计算一次，
+任意区间的收益/波动类指标都由前缀和相减得到，回撤类指标只扫描所需区间
+"""
+
+import threading
+
+import numpy as np
+
+from fund_core.indicators import fill_gaps
+
+TRADING_DAYS = 252
+
+# 无风险年利率（用于夏普/索提诺比率）
+RISK_FREE = 0.02
+
+# 历史VaR/CVaR的置信水平
+VAR_LEVEL = 0.95
+
+# 计算指标至少需要的收益率个数
+MIN_RETURNS = 20
+
+METRIC_LABELS = {
+    'annual_return': '年化收益',
+    'volatility': '年化波动率',
+    'sharpe': '夏普比率',
+    'sortino': '索提诺比率',
+    'calmar': '卡玛比率',
+    'max_drawdown': '最大回撤',
+    'var': '日VaR(95%)',
+    'cvar': '日CVaR(95%)',
+    'ulcer': '溃疡指数',
+}
+
+# 百分比形式的指标（其余为比率）
+PERCENT_METRICS = ('annual_return', 'volatility', 'max_drawdown', 'var', 'cvar')
+
+
+def _prefix(values):
+    """带首行0的前缀和"""
+    pad = np.zeros((1,) + values.shape[1:])
+    return np.concatenate([pad, np.cumsum(values, axis=0)], axis=0)
+
+
+class RiskProfile:
+    """一只或一组基金的风险指标计算器（前缀和在构造时计算一次）"""
+
+    def __init__(self, values, risk_free=RISK_FREE):
+        """values为一维净值数组或（交易日 × 基金）矩阵"""
+        x = np.asarray(values, dtype=np.float64)
+        self.single = x.ndim == 1
+        x = x[:, None] if self.single else x
+        self.navs = fill_gaps(x)
+        self.risk_free = risk_free
+
+        # returns[t] 为第t-1日到第t日的收益率（第0行为NaN）
+        returns = np.full_like(self.navs, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            returns[1:] = self.navs[1:] / self.navs[:-1] - 1
+        self.returns = returns
+        valid = ~np.isnan(returns)
+        r = np.where(valid, returns, 0.0)
+        downside = np.minimum(r - risk_free / TRADING_DAYS, 0.0) * valid
+
+        self._count = _prefix(valid.astype(np.float64))
+        self._sum = _prefix(r)
+        self._sum_sq = _prefix(r * r)
+        self._log = _prefix(np.log1p(r))
+        self._down_sq = _prefix(downside * downside)
+        # 已计算的区间结果：(start, end) -> 指标字典
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.navs)
+
+    def _bounds(self, start, end, window):
+        """把区间参数转换为 [start, end) 行号（window为截至end的最近N个交易日）"""
+        n = len(self.navs)
+        end = n if end is None else (end + n if end < 0 else min(end, n))
+        if window is not None:
+            start = max(end - window, 0)
+        start = 0 if start is None else (start + n if start < 0 else start)
+        return max(start, 0), max(end, 0)
+
+    def metrics(self, start=None, end=None, window=None):
+        """计算区间内的全部风险指标，返回 {指标名: 值}（一维输入为float，矩阵输入为每只基金一个值的数组）"""
+        start, end = self._bounds(start, end, window)
+        cached = self._memo.get((start, end))
+        if cached is not None:
+            return cached
+        # 区间第一天的收益率依赖区间外的净值，不计入
+        lo, hi = start + 1, end
+        if hi <= lo:
+            return self._pack({key: np.full(self.navs.shape[1], np.nan) for key in METRIC_LABELS})
+
+        n = self._count[hi] - self._count[lo]
+        s1 = self._sum[hi] - self._sum[lo]
+        s2 = self._sum_sq[hi] - self._sum_sq[lo]
+        growth = self._log[hi] - self._log[lo]
+        down = self._down_sq[hi] - self._down_sq[lo]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            enough = n >= MIN_RETURNS
+            mean = s1 / n
+            variance = np.maximum((s2 - s1 * s1 / n) / (n - 1), 0.0)
+            volatility = np.sqrt(variance * TRADING_DAYS)
+            annual_return = np.expm1(growth * TRADING_DAYS / n)
+            excess = mean * TRADING_DAYS - self.risk_free
+            sharpe = np.where(volatility > 0, excess / volatility, np.nan)
+            downside_dev = np.sqrt(down / n * TRADING_DAYS)
+            sortino = np.where(downside_dev > 0, excess / downside_dev, np.nan)
+
+        max_drawdown, ulcer = self._drawdown_stats(start, end)
+        var, cvar = self._tail_stats(lo, hi)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            calmar = np.where(max_drawdown < 0, annual_return * 100 / -max_drawdown, np.nan)
+
+        result = {
+            'annual_return': annual_return * 100,
+            'volatility': volatility * 100,
+            'sharpe': sharpe,
+            'sortino': sortino,
+            'calmar': calmar,
+            'max_drawdown': max_drawdown,
+            'var': var,
+            'cvar': cvar,
+            'ulcer': ulcer,
+        }
+        result = self._pack({key: np.where(enough, value, np.nan) for key, value in result.items()})
+        self._memo[(start, end)] = result
+        return result
+
+    def _drawdown_stats(self, start, end):
+        """区间内相对区间最高净值的最大回撤（%）和溃疡指数"""
+        x = self.navs[start:end]
+        peak = np.fmax.accumulate(x, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dd = (x - peak) / peak * 100
+        valid = ~np.isnan(dd)
+        count = valid.sum(axis=0)
+        max_drawdown = np.where(count > 0, np.where(valid, dd, 0.0).min(axis=0), np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ulcer = np.sqrt(np.where(valid, dd * dd, 0.0).sum(axis=0) / count)
+        return max_drawdown, ulcer
+
+    def _tail_stats(self, lo, hi):
+        """历史VaR和CVaR（日收益率分位数及其以下的平均值，%，为负数）"""
+        r = self.returns[lo:hi]
+        # 只对有收益率数据的列求分位数（全部缺失的列会触发 All-NaN 警告）
+        has_data = (~np.isnan(r)).any(axis=0)
+        var = np.full(r.shape[1], np.nan)
+        if not has_data.any():
+            return var, var.copy()
+        var[has_data] = np.nanpercentile(r[:, has_data], (1 - VAR_LEVEL) * 100, axis=0)
+        with np.errstate(invalid='ignore'):
+            tail = np.where(r <= var[None, :], r, np.nan)
+        counts = np.sum(~np.isnan(tail), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cvar = np.where(counts > 0, np.nansum(tail, axis=0) / counts, np.nan)
+        return var * 100, cvar * 100
+
+    def _pack(self, result):
+        """一维输入时把结果转换为标量"""
+        if self.single:
+            return {key: float(value[0]) for key, value in result.items()}
+        return result
+
+
+# 单只基金的计算器缓存：代码 -> 计算器（按净值序列版本号失效）
+_profiles = {}
+_profiles_lock = threading.Lock()
+
+
+def profile_for(series, cache=None):
+    """获取净值序列的风险计算器（cache为字典时按版本号复用，默认使用模块级缓存）"""
+    cache = _profiles if cache is None else cache
+    with _profiles_lock:
+        cached = cache.get(series.code)
+    if cached is not None and cached[0] == series.version:
+        return cached[1]
+    profile = RiskProfile(series.navs)
+    with _profiles_lock:
+        cache[series.code] = (series.version, profile)
+    return profile
+
+
+def series_metrics(series, window=None, cache=None):
+    """单只基金的风险指标（window为最近N个交易日，None为全部数据）"""
+    return profile_for(series, cache).metrics(window=window)
+
+
+def format_metric(key, value):
+    """格式化单个指标"""
+    if value is None or np.isnan(value):
+        return "N/A"
+    if key in PERCENT_METRICS:
+        return f"{value:.2f}%"
+    return f"{value:.2f}"
+
+
+def metrics_rows(metrics):
+    """指标字典转换为 [(名称, 文本), ...]（用于导出和显示）"""
+    return [(METRIC_LABELS[key], format_metric(key, metrics[key])) for key in METRIC_LABELS]
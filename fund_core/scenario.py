@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+估值情景分析
+在最新交易日的指标状态（最近60个净值、MACD各条EMA、历史最高净值、连续涨跌、回撤恢复计数）之上，
+同时推演一组假设收盘涨跌幅（或多日涨跌路径），每个情景一列，一次批量计算出
+RSI、波段位置、回撤和建议级别，不需要对每个情景重新计算完整历史
+"""
+
+import numpy as np
+
+from fund_core import advice, indicators, recovery
+
+# 滚动指标需要保留的历史净值个数（最长窗口为60日均线）
+TAIL = 60
+
+# 默认情景：收盘涨跌 -3% 到 +3%
+DEFAULT_CHANGES = (-3, -2, -1.5, -1, -0.5, 0, 0.5, 1, 1.5, 2, 3)
+
+MACD_PERIODS = (12, 26, 9)
+
+
+class ScenarioState:
+    """最新交易日的指标状态"""
+
+    def __init__(self, series):
+        """由净值序列（可含估值点）初始化状态"""
+        x = np.asarray(series.navs, dtype=np.float64)
+        if len(x) < 2:
+            raise ValueError("净值数据不足，无法进行情景分析")
+        self.code = series.code
+        self.version = series.version
+        self.last_date = series.last_date
+        self.tail = x[-TAIL:]
+
+        fast, slow, signal = MACD_PERIODS
+        macd_line, macd_signal, _ = indicators.macd(x, fast, slow, signal)
+        self.ema_fast = indicators.ema(x, fast)[-1]
+        self.ema_slow = indicators.ema(x, slow)[-1]
+        self.ema_signal = macd_signal[-1]
+        self.peak = np.nanmax(x)
+
+        streak_length, _ = indicators.streaks(x)
+        self.streak = int(streak_length[-1])
+        self.carried_streak = int(advice.last_streak(streak_length)[-1])
+
+        # 抄底胜率的本基金计数（与 recovery.win_rates 的逐日计数一致）：已揭晓结果的样本数和恢复数，
+        # 以及尚未揭晓的回撤日（距今天数, 分段）
+        dd = indicators.drawdown(x)
+        duration = indicators.duration_from_drawdown(dd)
+        buckets = recovery.bucket_index(dd, duration, indicators.annualized_volatility(x))
+        reveal, recovered = recovery._outcomes(x, recovery.DEFAULT_HORIZON)
+        known = reveal >= 0
+        self.duration = int(duration[-1])
+        self.samples = np.bincount(buckets[known], minlength=recovery.BUCKETS)
+        self.hits = np.bincount(buckets[known & recovered], minlength=recovery.BUCKETS)
+        pending = np.flatnonzero((dd < 0) & ~known)
+        self.pending = np.column_stack([len(x) - 1 - pending, buckets[pending]]).astype(np.int64)
+
+    def to_dict(self):
+        """可保存为JSON的状态（用于跨进程继续递推，见 alerts.AlertEngine）"""
+        return {
+            'code': self.code,
+            'last_date': str(self.last_date),
+            'tail': [float(value) for value in self.tail],
+            'ema': [float(self.ema_fast), float(self.ema_slow), float(self.ema_signal)],
+            'peak': float(self.peak),
+            'streak': [self.streak, self.carried_streak],
+            'recovery': {
+                'duration': self.duration,
+                'samples': self.samples.tolist(),
+                'hits': self.hits.tolist(),
+                'pending': self.pending.tolist(),
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """由 to_dict 的结果恢复状态，内容不完整时抛出ValueError"""
+        state = cls.__new__(cls)
+        try:
+            state.code = data['code']
+            state.version = None
+            state.last_date = np.datetime64(data['last_date'], 'D')
+            state.tail = np.asarray(data['tail'], dtype=np.float64)
+            state.ema_fast, state.ema_slow, state.ema_signal = (float(value) for value in data['ema'])
+            state.peak = float(data['peak'])
+            state.streak, state.carried_streak = (int(value) for value in data['streak'])
+            counts = data['recovery']
+            state.duration = int(counts['duration'])
+            state.samples = np.asarray(counts['samples'], dtype=np.int64)
+            state.hits = np.asarray(counts['hits'], dtype=np.int64)
+            state.pending = np.asarray(counts['pending'], dtype=np.int64).reshape(-1, 2)
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"情景状态不完整: {e}")
+        if state.tail.ndim != 1 or len(state.tail) == 0:
+            raise ValueError("情景状态不完整: tail")
+        if state.samples.shape != (recovery.BUCKETS,) or state.hits.shape != (recovery.BUCKETS,):
+            # 回撤分段定义已变化
+            raise ValueError("情景状态不完整: recovery")
+        return state
+
+    def evaluate(self, paths):
+        """批量推演情景
+
+        paths为每日涨跌幅（%）：一维数组表示单日情景（每个值一个情景），
+        二维数组形状为（情景数 × 天数），每行是一条多日涨跌路径。
+        返回 {指标名: 一维数组（每个情景一个值，取路径最后一天）}
+        """
+        changes = np.asarray(paths, dtype=np.float64)
+        if changes.ndim == 1:
+            changes = changes[:, None]
+
+        # 各情景的假设净值（天数 × 情景数）
+        new_navs = self.tail[-1] * np.cumprod(1 + changes.T / 100, axis=0)
+        return self._project(new_navs)[0]
+
+    def advance(self, navs, last_date=None):
+        """吸收新公布的真实净值（按日期顺序），就地更新状态，返回最后一天的指标（每项为标量）
+
+        只处理新增的几个净值，不重新计算完整历史；last_date为最后一个新净值的日期
+        """
+        navs = np.asarray(navs, dtype=np.float64)
+        if navs.ndim != 1 or len(navs) == 0:
+            raise ValueError("新增净值不能为空")
+        result, (ema_fast, ema_slow, ema_signal, raw, carried, counts) = self._project(navs[:, None])
+        self.tail = np.concatenate([self.tail, navs])[-TAIL:]
+        self.peak = max(self.peak, float(navs.max()))
+        self.ema_fast, self.ema_slow, self.ema_signal = ema_fast[0], ema_slow[0], ema_signal[0]
+        self.streak, self.carried_streak = int(raw[0]), int(carried[0])
+        duration, samples, hits, ages, buckets, alive = counts
+        self.duration = int(duration[0])
+        self.samples, self.hits = samples[0], hits[0]
+        self.pending = np.column_stack([ages[alive[:, 0]], buckets[alive[:, 0], 0]]).astype(np.int64)
+        if last_date is not None:
+            self.last_date = np.datetime64(last_date, 'D')
+        return {key: value[0] for key, value in result.items()}
+
+    def _project(self, new_navs):
+        """在当前状态之后接上新净值（天数 × 情景数），返回 (最后一天的指标, 递推后的状态)"""
+        days, count = new_navs.shape
+        window = np.concatenate([np.repeat(self.tail[:, None], count, axis=1), new_navs], axis=0)
+
+        rsi_values = indicators.rsi(window)[-1]
+        mid, upper, lower = indicators.bollinger(window)
+        volatility = indicators.annualized_volatility(window)[-days:]
+        ma5 = indicators.rolling_mean(window, 5)[-1]
+        ma20 = mid[-1]
+        ma60 = indicators.rolling_mean(window, 60)[-1]
+
+        # EMA与连续涨跌按天递推（天数很少，每步同时处理全部情景）
+        fast, slow, signal = MACD_PERIODS
+        ema_fast = np.full(count, self.ema_fast)
+        ema_slow = np.full(count, self.ema_slow)
+        ema_signal = np.full(count, self.ema_signal)
+        raw = np.full(count, self.streak)
+        carried = np.full(count, self.carried_streak)
+        previous = np.full(count, self.tail[-1])
+
+        # 回撤恢复计数：回到前期高点时所有未揭晓的回撤日计为恢复，满持有期仍未恢复的计为未恢复
+        horizon = recovery.DEFAULT_HORIZON
+        peak = np.full(count, self.peak)
+        duration = np.full(count, self.duration)
+        samples = np.repeat(self.samples[None, :], count, axis=0)
+        hits = np.repeat(self.hits[None, :], count, axis=0)
+        ages = self.pending[:, 0]
+        pending_buckets = np.repeat(self.pending[:, 1:], count, axis=1)
+        alive = np.ones(pending_buckets.shape, dtype=bool)
+        rows = np.arange(count) * recovery.BUCKETS
+        for day in range(days):
+            nav = new_navs[day]
+            ema_fast = ema_fast + 2.0 / (fast + 1) * (nav - ema_fast)
+            ema_slow = ema_slow + 2.0 / (slow + 1) * (nav - ema_slow)
+            ema_signal = ema_signal + 2.0 / (signal + 1) * ((ema_fast - ema_slow) - ema_signal)
+
+            direction = np.sign((nav - previous) / previous * 100).astype(np.int64)
+            continuing = (direction != 0) & (direction == np.sign(raw))
+            raw = np.where(continuing, raw + direction, direction)
+            carried = np.where(raw != 0, raw, carried)
+            previous = nav
+
+            peak = np.maximum(peak, nav)
+            dd = (nav - peak) / peak * 100
+            at_peak = ~(dd < 0)
+            duration = np.where(at_peak, 0, duration + 1)
+            ages = ages + 1
+            recovered = alive & at_peak[None, :]
+            revealed = recovered | (alive & (ages >= horizon)[:, None])
+            flat = rows[None, :] + pending_buckets
+            samples += np.bincount(flat[revealed], minlength=samples.size).reshape(samples.shape)
+            hits += np.bincount(flat[recovered], minlength=hits.size).reshape(hits.shape)
+            alive &= ~revealed
+            bucket = recovery.bucket_index(dd, duration, volatility[day])
+            # 当天处于回撤中的情景新增一个待揭晓的样本，已全部揭晓的行不再保留
+            keep = alive.any(axis=1)
+            ages = np.append(ages[keep], 0)
+            pending_buckets = np.vstack([pending_buckets[keep], bucket[None, :]])
+            alive = np.vstack([alive[keep], ~at_peak[None, :]])
+        macd_line = ema_fast - ema_slow
+
+        nav = new_navs[-1]
+        band = advice.band_signal(nav, np.where(np.isnan(rsi_values), 50, rsi_values), upper[-1], lower[-1])
+        own = np.arange(count), bucket
+        win_rate = recovery.lookup_rates(samples[own], hits[own], bucket, dd)
+        score = advice.summary_score(band, win_rate, carried)
+        purchase = advice.purchase_score(nav, rsi_values, upper[-1], lower[-1], dd, ma5, ma20, ma60,
+                                         macd_line, ema_signal, carried)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            band_position = (nav - lower[-1]) / (upper[-1] - lower[-1]) * 100
+
+        result = {
+            'total_change': (nav / self.tail[-1] - 1) * 100,
+            'nav': nav,
+            'rsi': rsi_values,
+            'band': band,
+            'band_position': band_position,
+            'drawdown': dd,
+            'win_rate': win_rate,
+            'streak': carried,
+            'reversal_prob': advice.reversal_probability(carried),
+            'score': score,
+            'level': advice.summary_level(score),
+            'purchase_score': purchase,
+            'purchase_level': advice.purchase_level(purchase),
+        }
+        counts = (duration, samples, hits, ages, pending_buckets, alive)
+        return result, (ema_fast, ema_slow, ema_signal, raw, carried, counts)
+
+
+def scenario_rows(series, changes=DEFAULT_CHANGES, days=1):
+    """单日或连续多日（每天相同涨跌幅）情景表：每个情景一个字典"""
+    changes = np.asarray(changes, dtype=np.float64)
+    paths = np.repeat(changes[:, None], max(int(days), 1), axis=1)
+    result = ScenarioState(series).evaluate(paths)
+    rows = []
+    for i, change in enumerate(changes):
+        level = int(result['level'][i])
+        purchase_level = int(result['purchase_level'][i])
+        band = int(result['band'][i])
+        rows.append({
+            'change': float(change),
+            'days': paths.shape[1],
+            'total_change': float(result['total_change'][i]),
+            'nav': float(result['nav'][i]),
+            'rsi': float(result['rsi'][i]),
+            'band': band,
+            'band_text': advice.BAND_LABELS[band],
+            'band_position': float(result['band_position'][i]),
+            'drawdown': float(result['drawdown'][i]),
+            'streak': int(result['streak'][i]),
+            'score': int(result['score'][i]),
+            'level': advice.ADVICE_KEYS[level],
+            'level_text': advice.ADVICE_LABELS[level],
+            'purchase_score': int(result['purchase_score'][i]),
+            'purchase_level': advice.ADVICE_KEYS[purchase_level],
+            'purchase_level_text': advice.ADVICE_LABELS[purchase_level],
+        })
+    return rows
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+评分规则
+建议规则以字典描述（可直接存为JSON）：每条规则是一组按顺序判断的条件及其分值（先满足者生效，
+都不满足时取默认值），总分为各条规则分值之和。例如：
+
+    {
+        'inputs': ['rsi', 'nav', 'lower'],
+        'params': {'rsi_low': 30},
+        'fill': {'rsi': 50, 'lower': 'nav'},
+        'rules': [
+            {'name': 'rsi', 'cases': [['rsi < rsi_low', 3], ['rsi > 100 - rsi_low', -3]]},
+            {'name': 'band', 'cases': [['nav <= lower', 3]], 'default': 0},
+        ],
+    }
+
+条件和分值是受限的表达式（比较、and/or/not、四则运算、abs/sign/min/max/isnan、参数下标），
+在创建 Scorecard 时编译成NumPy运算，输入可以是标量（某一天）、一维数组（每一天）
+或二维矩阵（交易日 × 基金），同一套规则即可用于当天建议、回测和全市场筛选
+"""
+
+import ast
+import operator
+
+import numpy as np
+
+# 表达式中可用的函数
+FUNCTIONS = {
+    'abs': np.abs,
+    'sign': np.sign,
+    'min': np.minimum,
+    'max': np.maximum,
+    'isnan': np.isnan,
+}
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+COMPARE_OPERATORS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+
+def compile_expression(source, names):
+    """把表达式编译为函数 env -> 数组，names为可引用的输入和参数名，表达式无效时抛出ValueError"""
+    if isinstance(source, (int, float)) and not isinstance(source, bool):
+        value = float(source)
+        return lambda env: value
+    try:
+        tree = ast.parse(str(source).strip(), mode='eval')
+    except SyntaxError:
+        raise ValueError(f"无法解析表达式: {source}")
+    return _compile_node(tree.body, set(names), source)
+
+
+def _compile_node(node, names, source):
+    """递归编译语法树节点"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        value = float(node.value)
+        return lambda env: value
+
+    if isinstance(node, ast.Name):
+        if node.id not in names:
+            raise ValueError(f"表达式 {source} 中的名称未定义: {node.id}")
+        name = node.id
+        return lambda env: env[name]
+
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+        index = node.slice
+        if not (isinstance(index, ast.Constant) and isinstance(index.value, int)):
+            raise ValueError(f"表达式 {source} 中的下标必须是整数")
+        if node.value.id not in names:
+            raise ValueError(f"表达式 {source} 中的名称未定义: {node.value.id}")
+        name, position = node.value.id, index.value
+        return lambda env: env[name][position]
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile_node(value, names, source) for value in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+
+        def boolean(env):
+            result = parts[0](env)
+            for part in parts[1:]:
+                result = combine(result, part(env))
+            return result
+        return boolean
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile_node(node.operand, names, source)
+        if isinstance(node.op, ast.Not):
+            return lambda env: np.logical_not(operand(env))
+        if isinstance(node.op, ast.USub):
+            return lambda env: -operand(env)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        left = _compile_node(node.left, names, source)
+        right = _compile_node(node.right, names, source)
+        op = BINARY_OPERATORS[type(node.op)]
+        return lambda env: op(left(env), right(env))
+
+    if isinstance(node, ast.Compare) and all(type(op) in COMPARE_OPERATORS for op in node.ops):
+        # 连续比较 a < b < c 等价于 (a < b) and (b < c)
+        operands = [_compile_node(value, names, source) for value in [node.left] + node.comparators]
+        ops = [COMPARE_OPERATORS[type(op)] for op in node.ops]
+
+        def compare(env):
+            values = [operand(env) for operand in operands]
+            result = ops[0](values[0], values[1])
+            for i in range(1, len(ops)):
+                result = np.logical_and(result, ops[i](values[i], values[i + 1]))
+            return result
+        return compare
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS and not node.keywords:
+        function = FUNCTIONS[node.func.id]
+        args = [_compile_node(arg, names, source) for arg in node.args]
+        return lambda env: function(*(arg(env) for arg in args))
+
+    raise ValueError(f"表达式 {source} 中包含不支持的写法: {ast.dump(node)[:40]}")
+
+
+class Scorecard:
+    """编译后的评分规则"""
+
+    def __init__(self, spec):
+        """spec为规则字典（inputs、params、fill、rules、dtype），规则无效时抛出ValueError"""
+        self.inputs = tuple(spec['inputs'])
+        self.params = dict(spec.get('params') or {})
+        self.dtype = np.dtype(spec.get('dtype', 'float64'))
+        names = set(self.inputs) | set(self.params)
+
+        # 输入缺失值的替代：常数或其他输入的表达式
+        self.fill = {name: compile_expression(value, names) for name, value in (spec.get('fill') or {}).items()}
+        unknown = set(self.fill) - set(self.inputs)
+        if unknown:
+            raise ValueError(f"fill 中包含未声明的输入: {', '.join(sorted(unknown))}")
+
+        self.rules = []
+        for rule in spec['rules']:
+            cases = [(compile_expression(condition, names), compile_expression(value, names))
+                     for condition, value in rule['cases']]
+            default = compile_expression(rule.get('default', 0), names)
+            self.rules.append((rule.get('name', ''), cases, default))
+
+    def environment(self, inputs, params=None):
+        """准备计算环境：输入转为数组并替换缺失值，参数可覆盖默认值"""
+        missing = [name for name in self.inputs if name not in inputs]
+        if missing:
+            raise ValueError(f"缺少输入: {', '.join(missing)}")
+        env = dict(self.params)
+        if params:
+            env.update(params)
+        env.update((name, np.asarray(inputs[name], dtype=np.float64)) for name in self.inputs)
+        # 替代值按原始输入计算
+        source = dict(env)
+        with np.errstate(invalid='ignore'):
+            for name, fill in self.fill.items():
+                env[name] = np.where(np.isnan(source[name]), fill(source), source[name])
+        return env
+
+    def score(self, inputs, params=None):
+        """计算总分（形状与输入广播后相同）"""
+        env = self.environment(inputs, params)
+        total = 0.0
+        with np.errstate(invalid='ignore'):
+            for _, cases, default in self.rules:
+                # 倒序套用条件，使先出现的条件优先
+                value = default(env)
+                for condition, case_value in reversed(cases):
+                    value = np.where(condition(env), case_value(env), value)
+                total = total + value
+        return np.asarray(total).astype(self.dtype)
+
+
+def tiers_param(tiers, count):
+    """分段阈值参数：不足count个时用负无穷补齐（对应分段永不满足），多余的忽略"""
+    tiers = tuple(float(tier) for tier in tiers)[:count]
+    return tiers + (-np.inf,) * (count - len(tiers))
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+全市场信号筛选
+把本地存储中的基金对齐成（交易日 × 基金）净值矩阵，按列一次性计算
+RSI/布林带/MACD/回撤/连续涨跌等指标，返回按综合评分排序的候选基金
+"""
+
+import numpy as np
+
+from fund_core import advice, indicators, recovery, risk
+from fund_core.indicators import fill_gaps, last_valid_rows
+from fund_core.store import NavStore
+
+# 计算指标所需的最少净值条数
+MIN_HISTORY = 30
+
+
+def align(series_list, start=None, end=None):
+    """对齐多只基金：返回 (交易日, 代码列表, 净值矩阵)，基金在某日无净值时为NaN"""
+    series_list = [s for s in series_list if s is not None and not s.empty]
+    if start is not None or end is not None:
+        series_list = [s.between(start, end) for s in series_list]
+        series_list = [s for s in series_list if not s.empty]
+    codes = [s.code for s in series_list]
+    if not series_list:
+        return np.array([], dtype='datetime64[D]'), codes, np.empty((0, 0))
+
+    dates = np.unique(np.concatenate([s.dates for s in series_list]))
+    matrix = np.full((len(dates), len(series_list)), np.nan)
+    for column, s in enumerate(series_list):
+        matrix[np.searchsorted(dates, s.dates), column] = s.navs
+    return dates, codes, matrix
+
+
+def compute_scores(matrix, rsi_window=14, bb_window=20, num_std=2):
+    """按列计算每只基金在其最新净值日的指标与综合评分，返回 {指标名: 一维数组}"""
+    x = fill_gaps(np.asarray(matrix, dtype=np.float64))
+    last = last_valid_rows(x)
+    count = np.count_nonzero(~np.isnan(x), axis=0)
+    ok = (last >= 0) & (count >= MIN_HISTORY)
+    rows = np.maximum(last, 0)[None, :]
+
+    def at_last(values):
+        """取每列最新有效日的值"""
+        return np.take_along_axis(values, rows, axis=0)[0]
+
+    rsi_values = indicators.rsi(x, rsi_window)
+    _, upper, lower = indicators.bollinger(x, bb_window, num_std)
+    _, _, macd_hist = indicators.macd(x)
+    dd = indicators.drawdown(x)
+    streak_length, streak_change = indicators.streaks(x)
+
+    nav = at_last(x)
+    prev = np.take_along_axis(x, np.maximum(last - 1, 0)[None, :], axis=0)[0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change = np.where(last >= 1, (nav - prev) / prev * 100, np.nan)
+
+    current_rsi = at_last(rsi_values)
+    band = advice.band_signal(nav, np.where(np.isnan(current_rsi), 50, current_rsi),
+                              at_last(upper), at_last(lower))
+    current_dd = at_last(dd)
+    # 与购买建议相同的回撤恢复统计（本基金样本限于矩阵覆盖的区间）
+    win_rate = at_last(recovery.win_rates(x, dd, indicators.duration_from_drawdown(dd),
+                                          indicators.annualized_volatility(x)))
+    streak = at_last(advice.last_streak(streak_length))
+    score = advice.summary_score(band, win_rate, streak)
+    risk_metrics = risk.RiskProfile(x).metrics()
+
+    scores = {
+        'nav': nav,
+        'change': change,
+        'rsi': current_rsi,
+        'band': band,
+        'drawdown': current_dd,
+        'max_drawdown': np.where(np.isnan(dd), np.inf, dd).min(axis=0),
+        'macd_hist': at_last(macd_hist),
+        'streak': streak,
+        'streak_change': at_last(streak_change),
+        'win_rate': win_rate,
+        'reversal_prob': advice.reversal_probability(streak),
+        'score': score,
+        'level': advice.summary_level(score),
+        'last_row': last,
+        'valid': ok,
+    }
+    for key in ('annual_return', 'volatility', 'sharpe', 'sortino', 'calmar', 'var', 'cvar', 'ulcer'):
+        scores[key] = risk_metrics[key]
+    return scores
+
+
+def rank(scores, band=None, max_drawdown=None, min_level=None, limit=None):
+    """筛选并排序：返回满足条件的列号（综合评分降序，同分时回撤更深者优先）
+
+    band: 波段信号编码（如 advice.BAND_LOW）；max_drawdown: 当前回撤上限（如 -15 表示回撤超过15%）；
+    min_level: 最低建议级别（如 advice.ADVICE_BUY）
+    """
+    mask = scores['valid'].copy()
+    if band is not None:
+        mask &= scores['band'] == band
+    if max_drawdown is not None:
+        with np.errstate(invalid='ignore'):
+            mask &= scores['drawdown'] <= max_drawdown
+    if min_level is not None:
+        mask &= scores['level'] >= min_level
+
+    candidates = np.flatnonzero(mask)
+    order = np.lexsort((scores['drawdown'][candidates], -scores['score'][candidates]))
+    candidates = candidates[order]
+    if limit is not None:
+        candidates = candidates[:limit]
+    return candidates
+
+
+class Screener:
+    """全市场筛选器：加载一次矩阵，可按不同条件反复筛选"""
+
+    def __init__(self, dates, codes, matrix, names=None):
+        """初始化筛选器（matrix为 交易日 × 基金 的净值矩阵）"""
+        self.dates = dates
+        self.codes = list(codes)
+        self.matrix = matrix
+        self.names = names or {}
+        self._scores = None
+
+    @classmethod
+    def from_store(cls, store=None, codes=None, lookback=250, names=None):
+        """从本地存储构建（lookback为最近的交易日数，回撤相对该区间内的最高净值；None表示全部历史）"""
+        store = store or NavStore()
+        codes = store.codes() if codes is None else codes
+        series_list = [store.load(code) for code in codes]
+        if names is None:
+            names = {s.code: s.info.get('基金名称', '') for s in series_list if s is not None}
+        start = None
+        if lookback:
+            last_dates = [s.last_date for s in series_list if s is not None and not s.empty]
+            if last_dates:
+                start = max(last_dates) - np.timedelta64(int(lookback * 7 / 5), 'D')
+        dates, codes, matrix = align(series_list, start=start)
+        return cls(dates, codes, matrix, names)
+
+    @classmethod
+    def from_archive(cls, archive, codes=None, lookback=250):
+        """从全市场归档构建（只读取所需的行和列）"""
+        start = None
+        if lookback and len(archive.days) > lookback:
+            start = archive.dates[-lookback]
+        dates, codes, matrix = archive.matrix(codes, start=start)
+        return cls(dates, codes, matrix, archive.names())
+
+    @property
+    def scores(self):
+        """各基金最新指标（首次访问时计算）"""
+        if self._scores is None:
+            self._scores = compute_scores(self.matrix)
+        return self._scores
+
+    def screen(self, band=None, max_drawdown=None, min_level=None, limit=None):
+        """返回排序后的候选基金列表（每只基金一个字典）"""
+        if not self.codes or len(self.dates) == 0:
+            return []
+        scores = self.scores
+        rows = []
+        for column in rank(scores, band, max_drawdown, min_level, limit):
+            code = self.codes[column]
+            last = scores['last_row'][column]
+            rows.append({
+                'code': code,
+                'name': self.names.get(code, ''),
+                'date': str(self.dates[last]),
+                'nav': float(scores['nav'][column]),
+                'change': float(scores['change'][column]),
+                'rsi': float(scores['rsi'][column]),
+                'band': int(scores['band'][column]),
+                'band_text': advice.BAND_LABELS[int(scores['band'][column])],
+                'drawdown': float(scores['drawdown'][column]),
+                'max_drawdown': float(scores['max_drawdown'][column]),
+                'macd_hist': float(scores['macd_hist'][column]),
+                'streak': int(scores['streak'][column]),
+                'win_rate': float(scores['win_rate'][column]),
+                'score': int(scores['score'][column]),
+                'level': advice.ADVICE_KEYS[int(scores['level'][column])],
+                'level_text': advice.ADVICE_LABELS[int(scores['level'][column])],
+                'annual_return': float(scores['annual_return'][column]),
+                'volatility': float(scores['volatility'][column]),
+                'sharpe': float(scores['sharpe'][column]),
+                'sortino': float(scores['sortino'][column]),
+                'calmar': float(scores['calmar'][column]),
+                'var': float(scores['var'][column]),
+                'cvar': float(scores['cvar'][column]),
+                'ulcer': float(scores['ulcer'][column]),
+            })
+        return rows
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+基金净值序列
+在数据获取时一次性构建紧凑的类型化数据集，后续图表、建议和分析直接复用，避免重复解析日期和净值
+"""
+
+import itertools
+import weakref
+
+import numpy as np
+import pandas as pd
+
+# 全局版本计数器：每个新构建的数据集都会获得唯一的版本号，便于下游按版本缓存
+_version_counter = itertools.count(1)
+
+# 缓冲区尾部预留的估值空间（条数），估值叠加层直接写入这里而无需复制基础数据
+ESTIMATE_RESERVE = 16
+
+
+def next_version():
+    """获取新的数据版本号"""
+    return next(_version_counter)
+
+
+class NavBuffer:
+    """净值序列共享的底层缓冲区：[0, stop) 为不可变的真实数据，其后为估值预留空间"""
+
+    __slots__ = ('dates', 'navs', 'stop', 'holder', 'views', 'version')
+
+    def __init__(self, dates, navs, reserve=ESTIMATE_RESERVE):
+        """复制数据并在尾部预留空间"""
+        n = len(navs)
+        self.dates = np.empty(n + reserve, dtype='datetime64[D]')
+        self.navs = np.empty(n + reserve, dtype=np.float64)
+        self.dates[:n] = dates
+        self.navs[:n] = navs
+        self.stop = n
+        # 当前占用预留空间的估值叠加层（弱引用），None表示空闲
+        self.holder = None
+        # 仍被引用的含估值视图：其覆盖的预留空间行不能再被改写
+        self.views = weakref.WeakSet()
+        # 真实数据部分不可变，完整历史视图使用固定的版本号
+        self.version = next_version()
+
+    @property
+    def capacity(self):
+        """缓冲区总容量"""
+        return len(self.navs)
+
+
+class FundSeries:
+    """基金净值序列：datetime64[D] 日期数组 + float64 净值数组"""
+
+    __slots__ = ('code', 'fund_type', 'info', 'version', 'estimates',
+                 '_buf', '_start', '_end', '_dates', '_navs', '__weakref__')
+
+    def __init__(self, code, dates, navs, fund_type='', info=None, version=None):
+        """初始化净值序列（日期需已升序排列）"""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        navs = np.asarray(navs, dtype=np.float64)
+        if dates.shape != navs.shape or dates.ndim != 1:
+            raise ValueError("日期与净值数组长度不一致")
+
+        self.code = code
+        self.fund_type = fund_type
+        self.info = info if info is not None else {}
+        self.version = version if version is not None else next_version()
+        self.estimates = 0
+        self._bind(NavBuffer(dates, navs), 0, len(navs))
+
+    @classmethod
+    def from_buffer(cls, template, buf, start, end, estimates=0, version=None):
+        """基于已有缓冲区创建视图（零拷贝），元数据沿用template"""
+        series = cls.__new__(cls)
+        series.code = template.code
+        series.fund_type = template.fund_type
+        series.info = template.info
+        series.version = version if version is not None else next_version()
+        series.estimates = estimates
+        series._bind(buf, start, end)
+        return series
+
+    def _bind(self, buf, start, end):
+        """绑定缓冲区区间"""
+        self._buf = buf
+        self._start = start
+        self._end = end
+        self._dates = _readonly(buf.dates[start:end])
+        self._navs = _readonly(buf.navs[start:end])
+
+    @classmethod
+    def from_frame(cls, df, code='', fund_type='', info=None):
+        """从原始数据框构建净值序列（只解析一次日期和净值）"""
+        if df is None or df.empty or '日期' not in df.columns or '净值' not in df.columns:
+            return cls(code, [], [], fund_type, info)
+
+        dates = pd.to_datetime(df['日期'], errors='coerce').to_numpy(dtype='datetime64[D]')
+        navs = pd.to_numeric(df['净值'], errors='coerce').to_numpy(dtype=np.float64)
+
+        # 去除无效行，按日期排序并去重（保留同一日期的最后一条）
+        valid = ~(np.isnat(dates) | np.isnan(navs))
+        dates = dates[valid]
+        navs = navs[valid]
+        order = np.argsort(dates, kind='stable')
+        dates = dates[order]
+        navs = navs[order]
+        if len(dates) > 1:
+            keep = np.append(dates[1:] != dates[:-1], True)
+            dates = dates[keep]
+            navs = navs[keep]
+
+        return cls(code, dates, navs, fund_type, info)
+
+    def __len__(self):
+        """数据点数量"""
+        return len(self._navs)
+
+    def __repr__(self):
+        """调试用字符串表示"""
+        if len(self):
+            span = f"{self._dates[0]}~{self._dates[-1]}"
+        else:
+            span = "空"
+        return f"FundSeries({self.code!r}, {len(self)}条, {span}, v{self.version})"
+
+    @property
+    def dates(self):
+        """日期数组（datetime64[D]，只读）"""
+        return self._dates
+
+    @property
+    def navs(self):
+        """净值数组（float64，只读）"""
+        return self._navs
+
+    @property
+    def days(self):
+        """日期序号数组（自1970-01-01起的天数，int32）"""
+        return self._dates.astype(np.int32)
+
+    @property
+    def empty(self):
+        """是否为空数据集"""
+        return len(self._navs) == 0
+
+    @property
+    def last_date(self):
+        """最新净值日期"""
+        return self._dates[-1] if len(self) else None
+
+    @property
+    def last_nav(self):
+        """最新净值"""
+        return float(self._navs[-1]) if len(self) else None
+
+    def between(self, start=None, end=None):
+        """按日期范围截取（零拷贝视图）"""
+        lo = 0
+        hi = len(self)
+        if start is not None:
+            lo = int(np.searchsorted(self._dates, np.datetime64(start, 'D'), side='left'))
+        if end is not None:
+            hi = int(np.searchsorted(self._dates, np.datetime64(end, 'D'), side='right'))
+        if lo == 0 and hi == len(self):
+            return self
+        return FundSeries.from_buffer(self, self._buf, self._start + lo, self._start + hi)
+
+    def history(self):
+        """底层缓冲区中的完整真实净值（日期范围过滤之前的全部历史，不含估值，零拷贝）"""
+        buf = self._buf
+        if self._start == 0 and self._end == buf.stop and not self.estimates:
+            return self
+        return FundSeries.from_buffer(self, buf, 0, buf.stop, version=buf.version)
+
+    def overlay(self):
+        """创建估值叠加层（见 fund_core.overlay.ValuationOverlay）"""
+        from fund_core.overlay import ValuationOverlay
+        return ValuationOverlay(self)
+
+    def daily_change(self):
+        """日涨跌幅（百分比，首日为NaN）"""
+        change = np.full(len(self), np.nan)
+        if len(self) > 1:
+            change[1:] = np.diff(self._navs) / self._navs[:-1] * 100
+        return change
+
+    def date_series(self):
+        """日期的pandas序列视图（用于绘图，无需再次解析）"""
+        return pd.Series(self._dates.astype('datetime64[ns]'))
+
+    def nav_series(self):
+        """净值的pandas序列视图（用于rolling/ewm等指标计算）"""
+        return pd.Series(self._navs, copy=False)
+
+    def date_strings(self):
+        """日期字符串数组（仅用于表格显示和导出）"""
+        return np.datetime_as_string(self._dates, unit='D')
+
+    def to_frame(self):
+        """转换为数据框（用于导出）"""
+        return pd.DataFrame({
+            '日期': self.date_strings(),
+            '净值': self._navs,
+            '日增长率': np.round(self.daily_change(), 2)
+        })
+
+
+def _readonly(array):
+    """返回只读视图，防止调用方原地修改共享数组"""
+    view = array.view()
+    view.flags.writeable = False
+    return view
@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+"""
+本地HTTP分析服务
+基于asyncio的轻量HTTP/1.1服务，多个客户端共用一个本地净值存储：
+同一基金的并发请求只向网络请求一次，响应体按（路径, 参数, 数据版本）放在内存LRU中，
+ETag为响应体摘要，客户端带 If-None-Match 且数据未变化时返回304，不再重复传输
+
+接口（均为GET，返回JSON）：
+    /health                          服务状态
+    /funds/<代码>                     基本信息和最新净值
+    /funds/<代码>/navs?start=&end=    历史净值
+    /funds/<代码>/indicators?start=&end=  图表指标（均线、RSI、布林带、MACD、回撤）
+    /funds/<代码>/advice              波段、回撤、反转、综合建议和购买建议
+    /events?codes=<代码,代码>          订阅信号变化（Server-Sent Events 推送，见 fund_core.subscriptions）
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time as time_module
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+from fund_core import analysis
+from fund_core.fetch import fetch_fund
+from fund_core.recovery import load_universe_table, use_universe
+from fund_core.store import NavStore
+from fund_core.subscriptions import SignalWatcher
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# 内存中保留的响应体个数
+CACHE_SIZE = 256
+
+# 本地数据有效期（秒），超过后请求时先从网络更新
+MAX_AGE = 6 * 3600
+
+# 单个请求头的最大长度
+MAX_HEADER = 16 * 1024
+
+# 订阅基金的检查间隔（秒）：只比较文件修改时间和数据版本，数据过期时才联网更新
+POLL_INTERVAL = 60
+
+# 推送连接的心跳间隔（秒）
+HEARTBEAT = 30
+
+# 单个连接最多订阅的基金数
+MAX_SUBSCRIPTIONS = 1000
+
+RESOURCES = ('navs', 'indicators', 'advice')
+
+# 基金代码：6位数字（在访问本地存储和联网更新之前校验）
+CODE_PATTERN = re.compile(r'[0-9]{6}')
+
+STATUS_TEXTS = {
+    200: 'OK',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+    502: 'Bad Gateway',
+}
+
+
+def to_builtin(value):
+    """把numpy数组和标量转换为可JSON序列化的Python对象（NaN转换为None）"""
+    if isinstance(value, dict):
+        return {str(key): to_builtin(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_builtin(item) for item in value]
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == 'M':
+            return [str(item) for item in value]
+        if value.dtype.kind == 'f':
+            return [None if np.isnan(item) else item for item in value.tolist()]
+        return value.tolist()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def encode(payload):
+    """序列化响应体，返回 (字节串, ETag)"""
+    body = json.dumps(to_builtin(payload), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+class ResponseCache:
+    """响应体LRU缓存：键 -> (字节串, ETag)"""
+
+    def __init__(self, size=CACHE_SIZE):
+        """size为保留的响应个数"""
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """读取缓存，不存在时返回None"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
+
+    def put(self, key, item):
+        """写入缓存，超出容量时淘汰最久未使用的响应"""
+        with self._lock:
+            self._items[key] = item
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ServiceError(Exception):
+    """带HTTP状态码的请求错误"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def check_code(code):
+    """校验基金代码，无效时抛出ServiceError(400)"""
+    if not CODE_PATTERN.fullmatch(code):
+        raise ServiceError(400, f"基金代码无效: {code[:20]}")
+    return code
+
+
+def _date_param(params, name):
+    """日期查询参数（YYYY-MM-DD），未提供时为None"""
+    value = params.get(name, [''])[0].strip()
+    if not value:
+        return None
+    try:
+        np.datetime64(value, 'D')
+    except ValueError:
+        raise ServiceError(400, f"日期格式错误: {name}={value}")
+    return value
+
+
+def render(resource, series, params, universe=None):
+    """生成资源的响应数据"""
+    if resource is None:
+        return {
+            'code': series.code,
+            'fund_type': series.fund_type,
+            'info': series.info,
+            'first_date': str(series.dates[0]),
+            'last_date': str(series.last_date),
+            'last_nav': series.last_nav,
+            'count': len(series),
+        }
+    if resource == 'advice':
+        return analysis.analyze_fund(series, universe)
+
+    view = series.between(_date_param(params, 'start'), _date_param(params, 'end'))
+    payload = {'code': series.code, 'dates': view.dates}
+    if resource == 'navs':
+        payload.update({'fund_type': series.fund_type, 'info': series.info, 'navs': view.navs})
+    else:
+        # 指标在完整历史上计算后再截取，区间开头的均线等不受截取影响
+        offset = int(np.searchsorted(series.dates, view.dates[0])) if len(view) else 0
+        ind = analysis.chart_indicators(series)
+        payload.update({'navs': view.navs})
+        payload.update({key: values[offset:offset + len(view)] for key, values in ind.items()})
+    return payload
+
+
+class AnalysisService:
+    """分析服务：共享本地净值存储、同一基金的并发更新合并为一次网络请求"""
+
+    def __init__(self, store=None, max_age=MAX_AGE, cache_size=CACHE_SIZE, offline=False):
+        """offline为True时只使用本地数据"""
+        self.store = store or NavStore()
+        self.max_age = max_age
+        self.offline = offline
+        self.cache = ResponseCache(cache_size)
+        self.universe = load_universe_table(self.store)
+        use_universe(self.universe)
+        self.started = time_module.time()
+        self.requests = 0
+        self.not_modified = 0
+        # 正在更新的基金：代码 -> asyncio.Future
+        self._inflight = {}
+        # 信号变化订阅：代码 -> 订阅连接的事件队列集合
+        self.watcher = SignalWatcher(self.store)
+        self._subscribers = {}
+        # 同一基金的信号检查依次进行（检查在线程池中执行，避免重复推送同一变化）
+        self._check_locks = {}
+
+    async def series(self, code, refresh=False):
+        """获取基金净值序列（过期时先更新本地存储），没有任何数据时抛出ServiceError
+
+        检查有效期和读取存储都会访问磁盘，均在线程池中执行
+        """
+        check_code(code)
+        loop = asyncio.get_running_loop()
+        if not self.offline and (refresh or not await loop.run_in_executor(
+                None, self.store.is_fresh, code, self.max_age)):
+            task = self._inflight.get(code)
+            if task is None:
+                task = loop.run_in_executor(None, self._update, code)
+                self._inflight[code] = task
+                task.add_done_callback(lambda _: self._inflight.pop(code, None))
+            try:
+                await asyncio.shield(task)
+            except Exception as e:
+                print(f"更新基金失败 {code}: {e}")
+            await self.publish(code)
+
+        series = await loop.run_in_executor(None, self.store.load, code)
+        if series is None or series.empty:
+            raise ServiceError(404, f"未获取到基金 {code} 的数据")
+        return series
+
+    def _update(self, code):
+        """从网络更新一只基金（在线程池中执行）"""
+        series = fetch_fund(code, store=self.store)
+        if series.empty:
+            raise ValueError("未获取到净值数据")
+
+    async def publish(self, code):
+        """检查一只被订阅基金的信号，有变化时推送给全部订阅连接
+
+        检查需要读取存储，历史被修订时还会重算完整时间线，放在线程池中执行，不阻塞其他连接
+        """
+        if not self._subscribers.get(code):
+            return
+        lock = self._check_locks.setdefault(code, asyncio.Lock())
+        async with lock:
+            event = await asyncio.get_running_loop().run_in_executor(None, self.watcher.check, code)
+        # 回到事件循环后再推送（检查期间订阅连接可能已变化）
+        queues = self._subscribers.get(code)
+        if event is not None and queues:
+            for events in queues:
+                events.put_nowait(('signal', event))
+
+    async def poll(self, interval=POLL_INTERVAL):
+        """定期检查订阅的基金（数据过期时更新，新净值入库后推送信号变化）"""
+        while True:
+            await asyncio.sleep(interval)
+            codes = list(self._subscribers)
+            await asyncio.gather(*(self.series(code) for code in codes), return_exceptions=True)
+            # 其他程序（命令行、自选刷新）写入存储的新净值同样会被发现
+            await asyncio.gather(*(self.publish(code) for code in codes), return_exceptions=True)
+
+    async def subscribe(self, codes, events):
+        """登记订阅并发送各基金的当前信号快照"""
+        for code in codes:
+            try:
+                await self.series(code)
+            except ServiceError as e:
+                events.put_nowait(('error', {'code': code, 'error': str(e)}))
+                continue
+            signal = await asyncio.get_running_loop().run_in_executor(None, self.watcher.track, code)
+            if signal is None:
+                events.put_nowait(('error', {'code': code, 'error': "净值数据不足"}))
+                continue
+            self._subscribers.setdefault(code, set()).add(events)
+            events.put_nowait(('snapshot', {'code': code, 'signal': signal}))
+
+    def unsubscribe(self, codes, events):
+        """取消订阅，没有连接订阅的基金停止跟踪"""
+        for code in codes:
+            queues = self._subscribers.get(code)
+            if queues is None:
+                continue
+            queues.discard(events)
+            if not queues:
+                del self._subscribers[code]
+                self._check_locks.pop(code, None)
+                self.watcher.untrack(code)
+
+    async def stream_events(self, reader, writer, query):
+        """Server-Sent Events 推送连接：先发送快照，之后只在信号变化时推送"""
+        codes = [code.strip() for value in parse_qs(query).get('codes', [])
+                 for code in value.split(',') if code.strip()]
+        codes = list(dict.fromkeys(codes))[:MAX_SUBSCRIPTIONS]
+        if not codes:
+            await self._send(writer, 400, *encode({'error': "请提供 codes 参数"}), keep_alive=False)
+            return
+        invalid = [code for code in codes if not CODE_PATTERN.fullmatch(code)]
+        if invalid:
+            await self._send(writer, 400, *encode({'error': f"基金代码无效: {invalid[0][:20]}"}), keep_alive=False)
+            return
+
+        writer.write(("HTTP/1.1 200 OK\r\n"
+                      "Content-Type: text/event-stream; charset=utf-8\r\n"
+                      "Cache-Control: no-cache\r\n"
+                      "Connection: keep-alive\r\n\r\n").encode('latin-1'))
+        events = asyncio.Queue()
+        # 客户端断开时读到EOF，立即结束推送
+        closed = asyncio.ensure_future(reader.read())
+        try:
+            await self.subscribe(codes, events)
+            while not closed.done():
+                getter = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait({getter, closed}, timeout=HEARTBEAT,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    if closed in done:
+                        break
+                    writer.write(b": ping\n\n")
+                else:
+                    name, data = getter.result()
+                    body = json.dumps(to_builtin(data), ensure_ascii=False)
+                    event_id = f"{data.get('code', '')}-{data.get('signal', {}).get('date', '')}"
+                    writer.write(f"id: {event_id}\nevent: {name}\ndata: {body}\n\n".encode('utf-8'))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            closed.cancel()
+            self.unsubscribe(codes, events)
+
+    async def respond(self, path, query, if_none_match=None):
+        """处理一个GET请求，返回 (状态码, 响应体, ETag)"""
+        self.requests += 1
+        parts = [unquote(part) for part in path.strip('/').split('/') if part]
+        params = parse_qs(query)
+
+        if parts == ['health']:
+            body, etag = encode({
+                'status': 'ok',
+                'uptime': time_module.time() - self.started,
+                'requests': self.requests,
+                'not_modified': self.not_modified,
+                'cached_responses': len(self.cache),
+                'offline': self.offline,
+            })
+            return 200, body, etag
+
+        if len(parts) not in (2, 3) or parts[0] != 'funds' or (len(parts) == 3 and parts[2] not in RESOURCES):
+            raise ServiceError(404, f"未知路径: {path}")
+        code = check_code(parts[1])
+        resource = parts[2] if len(parts) == 3 else None
+        series = await self.series(code, refresh=params.get('refresh', ['0'])[0] == '1')
+
+        # 数据版本不变时直接使用缓存的响应体
+        key = (code, resource, series.version, tuple(sorted(
+            (name, tuple(values)) for name, values in params.items() if name != 'refresh')))
+        cached = self.cache.get(key)
+        if cached is None:
+            payload = await asyncio.get_running_loop().run_in_executor(
+                None, render, resource, series, params, self.universe)
+            cached = encode(payload)
+            self.cache.put(key, cached)
+        body, etag = cached
+
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+            self.not_modified += 1
+            return 304, b'', etag
+        return 200, body, etag
+
+    async def handle_client(self, reader, writer):
+        """处理一个连接（支持keep-alive，按顺序处理多个请求）"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, 400, *encode({'error': "请求头过长"}), keep_alive=False)
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self._send(writer, 400, *encode({'error': "请求行格式错误"}), keep_alive=False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(':')
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+                url = urlsplit(target)
+                if method == 'GET' and url.path.rstrip('/') == '/events':
+                    await self.stream_events(reader, writer, url.query)
+                    break
+                if method not in ('GET', 'HEAD'):
+                    await self._send(writer, 405, *encode({'error': "只支持GET请求"}), keep_alive=keep_alive)
+                else:
+                    try:
+                        status, body, etag = await self.respond(url.path, url.query, headers.get('if-none-match'))
+                    except ServiceError as e:
+                        status, (body, etag) = e.status, encode({'error': str(e)})
+                    except Exception as e:
+                        print(f"处理请求失败 {target}: {e}")
+                        status, (body, etag) = 500, encode({'error': str(e)[:200]})
+                    await self._send(writer, status, body, etag, keep_alive, head_only=method == 'HEAD')
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def _send(writer, status, body, etag, keep_alive=True, head_only=False):
+        """写出响应"""
+        header = [
+            f"HTTP/1.1 {status} {STATUS_TEXTS.get(status, '')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            f"ETag: {etag}",
+            "Cache-Control: no-cache",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        writer.write(("\r\n".join(header) + "\r\n\r\n").encode('latin-1'))
+        if not head_only and status != 304:
+            writer.write(body)
+        await writer.drain()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, poll_interval=POLL_INTERVAL):
+        """启动服务（同时启动订阅检查任务），返回asyncio.Server"""
+        self._poller = asyncio.get_running_loop().create_task(self.poll(poll_interval))
+        return await asyncio.start_server(self.handle_client, host, port, limit=MAX_HEADER)
+
+
+def serve(store=None, host=DEFAULT_HOST, port=DEFAULT_PORT, max_age=MAX_AGE, offline=False):
+    """运行服务直到中断"""
+    service = AnalysisService(store, max_age=max_age, offline=offline)
+
+    async def main():
+        server = await service.start(host, port)
+        print(f"分析服务已启动: http://{host}:{port}/")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
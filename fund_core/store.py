@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+本地净值存储
+每只基金一个 .npz 文件（日期序号 + 净值 + 元数据），支持增量合并，
+自选刷新、筛选和回测都从这里读取，避免重复请求网络
+"""
+
+import json
+import os
+import threading
+import time as time_module
+from collections import OrderedDict
+
+import numpy as np
+
+from fund_core.series import FundSeries
+
+
+def default_store_root():
+    """默认存储目录（可通过环境变量 FUND_STORE_DIR 覆盖）"""
+    root = os.environ.get('FUND_STORE_DIR')
+    if root:
+        return root
+    return os.path.join(os.path.expanduser('~'), '.yangjibao', 'store')
+
+
+class NavStore:
+    """本地净值存储"""
+
+    def __init__(self, root=None, cache_size=256):
+        """初始化存储（cache_size为内存中保留的基金数量）"""
+        self.root = root or default_store_root()
+        self.nav_dir = os.path.join(self.root, 'navs')
+        os.makedirs(self.nav_dir, exist_ok=True)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+
+    def path(self, code):
+        """基金数据文件路径（代码中不能包含路径分隔符，无效时抛出ValueError）"""
+        code = str(code)
+        if not code or code in ('.', '..') or any(sep and sep in code for sep in ('/', os.sep, os.altsep)):
+            raise ValueError(f"基金代码无效: {code!r}")
+        return os.path.join(self.nav_dir, f"{code}.npz")
+
+    def codes(self):
+        """已存储的基金代码列表"""
+        return sorted(name[:-4] for name in os.listdir(self.nav_dir) if name.endswith('.npz'))
+
+    def has(self, code):
+        """是否已存储该基金"""
+        return os.path.exists(self.path(code))
+
+    def updated_at(self, code):
+        """最近一次写入或确认的时间戳，未存储时返回None"""
+        try:
+            return os.path.getmtime(self.path(code))
+        except OSError:
+            return None
+
+    def is_fresh(self, code, max_age=6 * 3600):
+        """数据是否在max_age秒内更新过"""
+        updated = self.updated_at(code)
+        return updated is not None and time_module.time() - updated < max_age
+
+    def load(self, code):
+        """读取基金净值序列，文件未变化时返回同一对象（版本号不变）"""
+        path = self.path(code)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(code)
+            if cached is not None and cached[0] == mtime:
+                self._cache.move_to_end(code)
+                return cached[1]
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                days = data['days']
+                navs = data['navs']
+                meta = json.loads(str(data['meta']))
+        except Exception as e:
+            print(f"读取本地净值失败 {code}: {e}")
+            return None
+
+        series = FundSeries(code, days.astype('datetime64[D]'), navs,
+                            meta.get('fund_type', ''), meta.get('info', {}))
+        self._remember(code, mtime, series)
+        return series
+
+    def save(self, series):
+        """写入基金净值序列（先写临时文件再替换，保证原子性）"""
+        if series.estimates:
+            raise ValueError("估值数据不能写入本地净值存储")
+        path = self.path(series.code)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        meta = json.dumps({'fund_type': series.fund_type, 'info': series.info},
+                          ensure_ascii=False, default=str)
+        with open(tmp, 'wb') as f:
+            np.savez(f, days=series.days, navs=series.navs, meta=np.array(meta))
+        os.replace(tmp, path)
+        self._remember(series.code, os.stat(path).st_mtime_ns, series)
+
+    def touch(self, code):
+        """标记数据已确认为最新（无新增净值时使用）"""
+        path = self.path(code)
+        try:
+            os.utime(path, None)
+        except OSError:
+            return
+        with self._lock:
+            cached = self._cache.pop(code, None)
+        if cached is not None:
+            self._remember(code, os.stat(path).st_mtime_ns, cached[1])
+
+    def merge(self, series):
+        """增量合并：只追加比本地更新的净值，返回 (合并后的序列, 新增条数)"""
+        existing = self.load(series.code)
+        if existing is None or existing.empty:
+            if not series.empty:
+                self.save(series)
+            return series, len(series)
+
+        info = series.info or existing.info
+        fund_type = series.fund_type or existing.fund_type
+        newer = series.dates > existing.last_date
+        added = int(np.count_nonzero(newer))
+
+        # 历史净值被修订（如分红调整）时整体替换
+        overlap = np.isin(series.dates, existing.dates)
+        if np.any(overlap):
+            idx = np.searchsorted(existing.dates, series.dates[overlap])
+            if not np.allclose(existing.navs[idx], series.navs[overlap], rtol=1e-6, atol=1e-8):
+                replaced = FundSeries(series.code, series.dates, series.navs, fund_type, info)
+                self.save(replaced)
+                return replaced, added
+
+        if added == 0:
+            if info != existing.info:
+                existing = FundSeries(existing.code, existing.dates, existing.navs, fund_type, info)
+                self.save(existing)
+            else:
+                self.touch(series.code)
+            return existing, 0
+
+        merged = FundSeries(
+            series.code,
+            np.concatenate([existing.dates, series.dates[newer]]),
+            np.concatenate([existing.navs, series.navs[newer]]),
+            fund_type, info
+        )
+        self.save(merged)
+        return merged, added
+
+    def _remember(self, code, mtime, series):
+        """放入内存缓存（LRU）"""
+        with self._lock:
+            self._cache[code] = (mtime, series)
+            self._cache.move_to_end(code)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
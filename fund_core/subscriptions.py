@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+信号变化订阅
+为每只被订阅的基金保存最新交易日的指标状态（见 scenario.ScenarioState），
+本地存储中出现新净值时只用新增的几个净值递推状态，比较波段状态、回撤分段、连续涨跌和建议级别，
+有变化时生成事件；没有新净值时只比较数据版本号，不做任何计算
+"""
+
+import threading
+
+import numpy as np
+
+from fund_core import advice
+from fund_core.scenario import ScenarioState
+from fund_core.timeline import SignalTimeline
+
+# 参与比较的信号字段
+WATCHED_FIELDS = ('band', 'drawdown_tier', 'streak_state', 'level', 'purchase_level')
+
+# 连续涨跌达到该天数时反转概率达到0.7（与综合建议中的反向操作阈值一致）
+REVERSAL_STREAK = 5
+
+
+def drawdown_tier(drawdown_value):
+    """回撤分段：0 为回撤小于5%，依次加深，4 为回撤超过20%（与抄底胜率的经验规则分段一致）"""
+    return int(sum(drawdown_value < tier for tier in advice.WIN_RATE_TIERS))
+
+
+def streak_state(streak):
+    """连续涨跌状态：连涨达到反转阈值为1，连跌达到反转阈值为-1，否则为0
+
+    只在跨过反转阈值时变化，避免每天的天数变化都触发事件
+    """
+    streak = int(streak)
+    if abs(streak) < REVERSAL_STREAK:
+        return 0
+    return int(np.sign(streak))
+
+
+def snapshot(date, values):
+    """由单日指标（SignalTimeline.at_index 或 ScenarioState.advance 的结果）生成信号快照"""
+    band = int(values['band'])
+    level = values['level']
+    purchase_level = values['purchase_level']
+    # 时间线给出的是级别名称，情景推演给出的是级别编码
+    level = advice.ADVICE_KEYS[int(level)] if not isinstance(level, str) else level
+    purchase_level = (advice.ADVICE_KEYS[int(purchase_level)]
+                      if not isinstance(purchase_level, str) else purchase_level)
+    streak = int(values['streak'])
+    return {
+        'date': str(date),
+        'nav': float(values['nav']),
+        'band': band,
+        'band_text': advice.BAND_LABELS[band],
+        'drawdown': float(values['drawdown']),
+        'drawdown_tier': drawdown_tier(float(values['drawdown'])),
+        'streak': streak,
+        'streak_state': streak_state(streak),
+        'level': level,
+        'purchase_level': purchase_level,
+    }
+
+
+def diff(old, new):
+    """两个快照之间变化的字段：{字段: [旧值, 新值]}"""
+    return {field: [old[field], new[field]] for field in WATCHED_FIELDS if old[field] != new[field]}
+
+
+class _Tracked:
+    """单只基金的跟踪状态"""
+
+    __slots__ = ('version', 'last_date', 'last_nav', 'state', 'snapshot')
+
+    def __init__(self, series):
+        """由完整净值序列初始化（只在首次订阅或历史被修订时计算一次完整历史）"""
+        timeline = SignalTimeline(series)
+        self.version = series.version
+        self.last_date = series.last_date
+        self.last_nav = series.last_nav
+        self.state = ScenarioState(series)
+        self.snapshot = snapshot(series.last_date, timeline.at_index(len(timeline) - 1))
+
+
+class SignalWatcher:
+    """订阅基金的信号变化检测器"""
+
+    def __init__(self, store):
+        """store为本地净值存储"""
+        self.store = store
+        self._tracked = {}
+        self._lock = threading.Lock()
+
+    def codes(self):
+        """正在跟踪的基金代码"""
+        with self._lock:
+            return list(self._tracked)
+
+    def track(self, code):
+        """开始跟踪一只基金，返回当前信号快照（本地没有数据时返回None）"""
+        with self._lock:
+            tracked = self._tracked.get(code)
+        if tracked is not None:
+            return tracked.snapshot
+        series = self.store.load(code)
+        if series is None or len(series) < 2:
+            return None
+        tracked = _Tracked(series)
+        with self._lock:
+            self._tracked.setdefault(code, tracked)
+        return tracked.snapshot
+
+    def untrack(self, code):
+        """停止跟踪"""
+        with self._lock:
+            self._tracked.pop(code, None)
+
+    def snapshot(self, code):
+        """当前信号快照（未跟踪时返回None）"""
+        with self._lock:
+            tracked = self._tracked.get(code)
+        return tracked.snapshot if tracked is not None else None
+
+    def check(self, code):
+        """检查一只基金是否有新净值，信号有变化时返回事件字典，否则返回None"""
+        with self._lock:
+            tracked = self._tracked.get(code)
+        if tracked is None:
+            return None
+        series = self.store.load(code)
+        if series is None or series.empty or series.version == tracked.version:
+            return None
+
+        old = tracked.snapshot
+        new_index = int(np.searchsorted(series.dates, tracked.last_date, side='right'))
+        revised = (new_index == 0 or series.dates[new_index - 1] != tracked.last_date
+                   or not np.isclose(series.navs[new_index - 1], tracked.last_nav, rtol=1e-6, atol=1e-8))
+        if revised:
+            # 历史净值被修订（如分红调整），重新计算一次完整历史
+            tracked = _Tracked(series)
+        elif new_index < len(series):
+            values = tracked.state.advance(series.navs[new_index:], series.last_date)
+            tracked.snapshot = snapshot(series.last_date, values)
+            tracked.last_date = series.last_date
+            tracked.last_nav = series.last_nav
+        tracked.version = series.version
+        with self._lock:
+            if code in self._tracked:
+                self._tracked[code] = tracked
+
+        changes = diff(old, tracked.snapshot)
+        if not changes:
+            return None
+        return {
+            'code': code,
+            'date': tracked.snapshot['date'],
+            'changes': changes,
+            'signal': tracked.snapshot,
+            'revised': revised,
+        }
+
+    def check_all(self):
+        """检查全部跟踪的基金，返回事件列表"""
+        events = []
+        for code in self.codes():
+            event = self.check(code)
+            if event is not None:
+                events.append(event)
+        return events
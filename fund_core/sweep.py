@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+参数扫描
+对RSI/布林带/MACD窗口、RSI阈值和回撤分段做网格搜索，用向量化回测评估每组参数。
+净值矩阵放在共享内存中，工作进程启动时映射一次，任务只传递参数；
+结果按参数哈希缓存到本地，输出排序后的结果表
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from fund_core import backtest
+
+# 排序指标：买入信号出现后持有期的胜率，样本不足的参数组排在最后
+DEFAULT_RANK_HORIZON = 60
+MIN_ENTRIES = 30
+
+# 建议规则的计算方式变化时递增，已缓存的回测结果随之失效
+RULES_VERSION = 2
+
+# 工作进程中映射的共享矩阵及复用的未来收益
+_worker = {'shm': None, 'matrix': None, 'outcomes': None, 'horizons': None}
+
+
+def param_grid(**choices):
+    """生成参数网格：每个参数给出候选值列表，返回参数字典列表（跳过快线不短于慢线的MACD组合）"""
+    keys = sorted(choices)
+    grid = []
+    for values in itertools.product(*(choices[key] for key in keys)):
+        params = dict(zip(keys, values))
+        merged = dict(backtest.DEFAULT_PARAMS, **params)
+        if merged['macd_fast'] >= merged['macd_slow'] or merged['rsi_low'] >= merged['rsi_high']:
+            continue
+        grid.append(params)
+    return grid
+
+
+def matrix_fingerprint(matrix):
+    """净值矩阵指纹（参与缓存键，数据变化时缓存自动失效）"""
+    digest = hashlib.sha1()
+    digest.update(str(matrix.shape).encode())
+    digest.update(np.ascontiguousarray(matrix).view(np.uint8))
+    return digest.hexdigest()
+
+
+def param_hash(params, rule, horizons, fingerprint):
+    """参数组的缓存键"""
+    merged = dict(backtest.DEFAULT_PARAMS, **params)
+    key = json.dumps({'params': merged, 'rule': rule, 'horizons': list(horizons), 'data': fingerprint,
+                      'rules': RULES_VERSION},
+                     sort_keys=True, default=list)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _open_shared(name):
+    """工作进程映射父进程创建的共享内存（只由父进程负责删除）
+
+    Python 3.13起使用 track=False，不登记到资源跟踪器；更早的版本中进程池的工作进程
+    （fork/spawn/forkserver）与父进程共用父进程启动的跟踪器，重复登记没有影响，
+    父进程 unlink 时统一注销
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _attach(name, shape, dtype, horizons):
+    """工作进程初始化：映射共享矩阵并预先计算未来收益"""
+    shm = _open_shared(name)
+    _worker['shm'] = shm
+    _worker['matrix'] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _worker['horizons'] = tuple(horizons)
+    _worker['outcomes'] = None
+
+
+def _run_task(params, rule):
+    """在工作进程中回测一组参数"""
+    matrix = _worker['matrix']
+    if _worker['outcomes'] is None:
+        _worker['outcomes'] = backtest.forward_outcomes(matrix, _worker['horizons'])
+    result = backtest.backtest(matrix, _worker['horizons'], rule, params=params,
+                               prepared=True, outcomes=_worker['outcomes'])
+    return summarize(result)
+
+
+def summarize(result):
+    """压缩回测结果为一行（便于缓存和排序）"""
+    row = {'params': result['params'], 'rule': result['rule'], 'entries': result['entries']['count']}
+    for horizon in result['horizons']:
+        row[f'hit_{horizon}'] = result['entries'][f'hit_{horizon}']
+        row[f'return_{horizon}'] = result['entries'][f'return_{horizon}']
+        # 推荐购买及以上级别的平均持有期跌幅
+        buy_rows = [level for level in result['levels'] if level['level'] in ('strong_buy', 'buy')]
+        weights = np.array([level[f'n_{horizon}'] for level in buy_rows], dtype=np.float64)
+        drawdowns = np.array([level[f'drawdown_{horizon}'] for level in buy_rows])
+        ok = (weights > 0) & ~np.isnan(drawdowns)
+        row[f'drawdown_{horizon}'] = (float(np.average(drawdowns[ok], weights=weights[ok]))
+                                      if ok.any() else float('nan'))
+    return row
+
+
+def rank_rows(rows, horizon=DEFAULT_RANK_HORIZON, min_entries=MIN_ENTRIES):
+    """按买入信号胜率排序（同胜率按平均收益），信号次数不足的排在最后"""
+    def key(row):
+        hit = row.get(f'hit_{horizon}', float('nan'))
+        ret = row.get(f'return_{horizon}', float('nan'))
+        enough = row['entries'] >= min_entries and not np.isnan(hit)
+        return (not enough, -(hit if not np.isnan(hit) else 0), -(ret if not np.isnan(ret) else 0))
+    return sorted(rows, key=key)
+
+
+class SweepRunner:
+    """参数扫描执行器"""
+
+    def __init__(self, cache_dir=None, max_workers=None):
+        """初始化执行器（cache_dir为空时不缓存）"""
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, key):
+        """缓存文件路径"""
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_cached(self, key):
+        """读取缓存结果"""
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_cached(self, key, row):
+        """写入缓存结果"""
+        if not self.cache_dir:
+            return
+        tmp = self._cache_path(key) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(row, f, ensure_ascii=False, default=list)
+        os.replace(tmp, self._cache_path(key))
+
+    def run(self, matrix, grid, rule=backtest.RULE_PURCHASE, horizons=backtest.DEFAULT_HORIZONS,
+            rank_horizon=DEFAULT_RANK_HORIZON, progress=None):
+        """执行扫描，返回排序后的结果行；progress(已完成数, 总数) 在主进程中回调"""
+        x = backtest.prepare(matrix)
+        fingerprint = matrix_fingerprint(x)
+        total = len(grid)
+        rows = []
+        pending = []
+        for params in grid:
+            key = param_hash(params, rule, horizons, fingerprint)
+            cached = self._load_cached(key)
+            if cached is not None:
+                cached['cached'] = True
+                rows.append(cached)
+            else:
+                pending.append((key, params))
+
+        done = len(rows)
+        if progress is not None and done:
+            progress(done, total)
+
+        if pending:
+            shm = shared_memory.SharedMemory(create=True, size=max(x.nbytes, 1))
+            try:
+                shared = np.ndarray(x.shape, dtype=x.dtype, buffer=shm.buf)
+                shared[:] = x
+                with ProcessPoolExecutor(max_workers=min(self.max_workers, len(pending)),
+                                         initializer=_attach,
+                                         initargs=(shm.name, x.shape, x.dtype.str, tuple(horizons))) as pool:
+                    futures = {pool.submit(_run_task, params, rule): key for key, params in pending}
+                    for future in as_completed(futures):
+                        row = future.result()
+                        self._save_cached(futures[future], row)
+                        row['cached'] = False
+                        rows.append(row)
+                        done += 1
+                        if progress is not None:
+                            progress(done, total)
+                del shared
+            finally:
+                shm.close()
+                shm.unlink()
+
+        return rank_rows(rows, rank_horizon)
+
+
+def format_table(rows, horizon=DEFAULT_RANK_HORIZON, limit=20):
+    """生成文字版排序结果表"""
+    lines = [f"{'排名':<4}{'信号次数':>8}{f'{horizon}日胜率':>10}{f'{horizon}日收益':>10}{f'{horizon}日回撤':>10}  参数"]
+    for position, row in enumerate(rows[:limit], 1):
+        changed = {key: value for key, value in row['params'].items()
+                   if _normalize(backtest.DEFAULT_PARAMS.get(key)) != _normalize(value)}
+        text = ", ".join(f"{key}={value}" for key, value in sorted(changed.items())) or "默认参数"
+        lines.append(f"{position:<4}{row['entries']:>8}"
+                     f"{backtest.format_pct(row[f'hit_{horizon}'] * 100):>10}"
+                     f"{backtest.format_pct(row[f'return_{horizon}']):>10}"
+                     f"{backtest.format_pct(row[f'drawdown_{horizon}']):>10}  {text}")
+    return "\n".join(lines)
+
+
+def _normalize(value):
+    """元组和列表统一比较（缓存中的元组会被读成列表）"""
+    return list(value) if isinstance(value, (tuple, list)) else value
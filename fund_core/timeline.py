@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+历史信号时间线
+一次向量化计算出每个交易日的波段状态、回撤胜率分段、连续涨跌反转概率和综合建议级别，
+之后按日期查询只需一次二分查找，无需重新计算
+"""
+
+import numpy as np
+
+from fund_core import advice, graph
+
+# 综合建议级别对应的颜色（与界面中建议级别的配色一致）
+LEVEL_COLORS = {
+    advice.ADVICE_STRONG_BUY: 'green',
+    advice.ADVICE_BUY: 'lightgreen',
+    advice.ADVICE_NEUTRAL: 'blue',
+    advice.ADVICE_SELL: 'orange',
+    advice.ADVICE_STRONG_SELL: 'red',
+}
+
+
+class SignalTimeline:
+    """单只基金的历史信号时间线"""
+
+    def __init__(self, series):
+        """根据净值序列计算全部日期的信号"""
+        self.code = series.code
+        self.version = series.version
+        self.dates = series.dates
+        self.navs = series.navs
+
+        # 指标与图表、分析共用（见 fund_core.graph，按版本号缓存）
+        frame = graph.frame_for(series)
+        self.rsi = frame['rsi']
+        self.band = frame['band']
+        self.drawdown = frame['drawdown']
+        self.win_rate = frame['win_rate']
+        self.streak = frame['streak']
+        self.streak_change = frame['streak_change']
+        self.reversal_prob = frame['reversal_prob']
+        self.score = frame['score']
+        self.level = frame['level']
+        self.purchase_score = frame['purchase_score']
+        self.purchase_level = frame['purchase_level']
+
+    def __len__(self):
+        return len(self.dates)
+
+    def index_of(self, date):
+        """不晚于date的最后一个交易日的下标（早于第一个交易日时为-1）"""
+        return int(np.searchsorted(self.dates, np.datetime64(date, 'D'), side='right')) - 1
+
+    def at_index(self, i):
+        """第i个交易日的信号"""
+        band = int(self.band[i])
+        level = int(self.level[i])
+        purchase_level = int(self.purchase_level[i])
+        return {
+            'date': str(self.dates[i]),
+            'nav': float(self.navs[i]),
+            'rsi': float(self.rsi[i]),
+            'band': band,
+            'band_text': advice.BAND_LABELS[band],
+            'drawdown': float(self.drawdown[i]),
+            'win_rate': float(self.win_rate[i]),
+            'streak': int(self.streak[i]),
+            'reversal_prob': float(self.reversal_prob[i]),
+            'score': int(self.score[i]),
+            'level': advice.ADVICE_KEYS[level],
+            'level_text': advice.ADVICE_LABELS[level],
+            'purchase_score': int(self.purchase_score[i]),
+            'purchase_level': advice.ADVICE_KEYS[purchase_level],
+            'purchase_level_text': advice.ADVICE_LABELS[purchase_level],
+        }
+
+    def at(self, date):
+        """查询某日（或之前最近一个交易日）的信号，早于第一个交易日时返回None"""
+        i = self.index_of(date)
+        if i < 0:
+            return None
+        return self.at_index(i)
+
+
+def timeline_for(series, cache=None):
+    """获取净值序列的时间线（cache为字典时按版本号复用）"""
+    if cache is None:
+        return SignalTimeline(series)
+    timeline = cache.get(series.code)
+    if timeline is None or timeline.version != series.version:
+        timeline = SignalTimeline(series)
+        cache[series.code] = timeline
+    return timeline
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+自选基金批量刷新
+通过有界线程池并发更新全部自选基金，共享同一个限速器和本地净值存储，
+逐只报告进度，并给出最新净值、今日涨跌幅和信号状态
+"""
+
+import json
+import os
+import threading
+import time as time_module
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from fund_core import advice
+from fund_core.fetch import default_policy, fetch_fund_names, fetch_nav_history
+from fund_core.store import NavStore
+
+# 从归档生成摘要时读取的最近净值条数（足够计算波段信号）
+SUMMARY_TAIL = 40
+
+
+def watchlist_path(store):
+    """自选列表文件路径（与本地存储放在一起）"""
+    return os.path.join(store.root, 'watchlist.json')
+
+
+def load_watchlist(path):
+    """读取自选列表（JSON数组或每行一个代码的文本文件）"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    try:
+        codes = json.loads(text)
+    except ValueError:
+        codes = text.replace(',', '\n').split()
+    return _unique([str(code).strip() for code in codes if str(code).strip()])
+
+
+def save_watchlist(path, codes):
+    """保存自选列表"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(_unique(codes), f, ensure_ascii=False, indent=2)
+
+
+def _unique(codes):
+    """去重并保持顺序"""
+    return list(dict.fromkeys(codes))
+
+
+def _empty_row(code, name=''):
+    """没有净值数据时的摘要"""
+    return {
+        'code': code,
+        'name': name,
+        'date': '',
+        'nav': None,
+        'change': None,
+        'signal': None,
+        'signal_text': '',
+    }
+
+
+def summarize(series, name=''):
+    """根据净值序列生成自选行情摘要"""
+    row = _empty_row(series.code, name or series.info.get('基金名称', ''))
+    if series.empty:
+        return row
+
+    navs = series.navs
+    row['date'] = str(series.last_date)
+    row['nav'] = float(navs[-1])
+    if len(navs) >= 2:
+        row['change'] = float((navs[-1] - navs[-2]) / navs[-2] * 100)
+    signal = advice.latest_band_signal(navs)
+    row['signal'] = signal
+    row['signal_text'] = advice.BAND_LABELS[signal]
+    return row
+
+
+class WatchlistRefresher:
+    """自选基金批量刷新器"""
+
+    def __init__(self, store=None, policy=None, max_workers=8, max_age=6 * 3600, archive=None):
+        """初始化刷新器（max_age秒内更新过的基金直接使用本地数据，archive为可选的全市场归档）"""
+        self.store = store or NavStore()
+        self.archive = archive
+        self.policy = policy or default_policy()
+        self.max_workers = max_workers
+        self.max_age = max_age
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """取消正在进行的刷新（已开始的请求会完成）"""
+        self._cancelled.set()
+
+    def refresh(self, codes, progress=None, force=False):
+        """刷新全部基金，progress(已完成数, 总数, 行情摘要) 在工作线程中回调"""
+        self._cancelled.clear()
+        codes = _unique(codes)
+        total = len(codes)
+        results = {}
+
+        try:
+            names = fetch_fund_names(self.policy)
+        except Exception as e:
+            print(f"获取基金名称失败: {e}")
+            names = {}
+
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._refresh_one, code, names.get(code, ''), force): code
+                       for code in codes}
+            for future in as_completed(futures):
+                code = futures[future]
+                try:
+                    row = future.result()
+                except Exception as e:
+                    # 单只基金的意外错误不影响其余基金
+                    row = _empty_row(code, names.get(code, ''))
+                    row['status'] = 'error'
+                    row['error'] = str(e)[:70]
+                    row['elapsed'] = 0.0
+                results[code] = row
+                done += 1
+                if progress is not None:
+                    progress(done, total, row)
+
+        return [results[code] for code in codes]
+
+    def _refresh_one(self, code, name, force):
+        """刷新单只基金"""
+        started = time_module.monotonic()
+        try:
+            self.store.path(code)
+        except ValueError as e:
+            # 代码无效（如含路径分隔符），本地存储和网络都无从查询
+            row = _empty_row(code, name)
+            row['status'] = 'error'
+            row['error'] = str(e)[:70]
+            row['elapsed'] = 0.0
+            return row
+
+        if self._cancelled.is_set():
+            row = self._summarize_local(code, name)
+            row['status'] = 'cancelled'
+            row['elapsed'] = 0.0
+            return row
+
+        if not force and self.store.is_fresh(code, self.max_age):
+            row = self._summarize_local(code, name)
+            row['status'] = 'cached'
+            row['elapsed'] = time_module.monotonic() - started
+            return row
+
+        try:
+            fetched = fetch_nav_history(code, self.policy, info={'基金名称': name} if name else None)
+            if fetched.empty:
+                raise ValueError("未获取到净值数据")
+            series, added = self.store.merge(fetched)
+            row = summarize(series, name)
+            row['status'] = 'ok'
+            row['added'] = added
+        except Exception as e:
+            # 网络失败时退回本地数据
+            row = self._summarize_local(code, name)
+            row['status'] = 'error'
+            row['error'] = str(e)[:70]
+
+        row['elapsed'] = time_module.monotonic() - started
+        return row
+
+    def _summarize_local(self, code, name):
+        """使用本地数据生成摘要"""
+        series = self.store.load(code)
+        if series is None and self.archive is not None and code in self.archive:
+            # 只读取归档中最近的一段净值
+            series = self.archive.series(code, tail=SUMMARY_TAIL)
+        if series is None:
+            return _empty_row(code, name)
+        return summarize(series, name)
+
+
+def format_change(change):
+    """格式化涨跌幅"""
+    if change is None or np.isnan(change):
+        return ''
+    return f"{change:+.2f}%"
@@ -5,11 +5,9 @@
 """
 
 import sys
-import akshare as ak
 import pandas as pd
 import numpy as np
 from datetime import datetime
-import time as time_module
 import warnings
 import json
 import os
@@ -17,15 +15,33 @@ from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QLabel, QLineEdit, QPushButton, QTableWidget, QTableWidgetItem, 
     QHeaderView, QMessageBox, QStatusBar, QDateEdit, QComboBox, QStackedWidget,
-    QFileDialog, QDoubleSpinBox, QSpinBox, QTabWidget, QDialog, QFormLayout, QFrame
+    QFileDialog, QDoubleSpinBox, QSpinBox, QTabWidget, QDialog, QFormLayout, QFrame,
+    QProgressBar, QSlider, QCheckBox
 )
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QDate
-from PyQt5.QtGui import QFont
+from PyQt5.QtGui import QColor, QFont
 import matplotlib
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
+from matplotlib.colors import ListedColormap
+from matplotlib.widgets import SpanSelector
+
+from fund_core import advice, alerts, analysis, crosshair, graph, indicators
+from fund_core import backtest, correlation, dca, montecarlo, risk
+from fund_core.archive import NavArchive
+from fund_core.fetch import fetch_fund
+from fund_core.portfolio import Ledger, nav_on, revalue_from_store
+from fund_core.screener import Screener
+from fund_core.recovery import build_universe_table, load_universe_table, use_universe
+from fund_core.remote import remote_source
+from fund_core.scenario import DEFAULT_CHANGES, scenario_rows
+from fund_core.store import NavStore
+from fund_core.timeline import LEVEL_COLORS, timeline_for
+from fund_core.watchlist import (
+    WatchlistRefresher, format_change, load_watchlist, save_watchlist, watchlist_path
+)
 
 # 抑制Matplotlib字体警告
 matplotlib.rcParams.update({
@@ -45,29 +61,11 @@ matplotlib.rcParams.update({
 # 忽略所有警告
 warnings.filterwarnings('ignore')
 
-class SafeRequest:
-    """安全请求类：自动重试 + 指数退避"""
-    
-    @staticmethod
-    def request(func, *args, retries=5, delay=1.2, **kwargs):
-        """执行安全请求，自动重试失败的请求"""
-        for i in range(retries):
-            try:
-                time_module.sleep(delay * (0.8 + i * 0.3))  # 智能延迟：1.0~2.5秒
-                result = func(*args, **kwargs)
-                if isinstance(result, pd.DataFrame):
-                    return result if not result.empty else pd.DataFrame()
-                return result
-            except Exception as e:
-                if i == retries - 1:
-                    raise e
-        return pd.DataFrame()
-
 class FundDataFetcher(QThread):
-    """基金数据获取线程"""
+    """基金数据获取线程（数据获取见 fund_core.fetch.fetch_fund）"""
     
     # 信号定义
-    data_fetched = pyqtSignal(pd.DataFrame, str, dict)
+    data_fetched = pyqtSignal(object, str, dict)
     error_occurred = pyqtSignal(str)
     
     def __init__(self, fund_code, start_date=None, end_date=None):
@@ -80,100 +78,510 @@ class FundDataFetcher(QThread):
     def run(self):
         """运行数据获取任务"""
         try:
-            # 尝试获取场外基金数据
-            df = SafeRequest.request(
-                ak.fund_open_fund_info_em,
-                symbol=self.fund_code,
-                indicator="单位净值走势"
-            )
-            
-            fund_type = "场外基金"
-            fund_info = {}
-            
-            # 获取基金基本信息
-            try:
-                if fund_type == "场外基金":
-                    info_df = SafeRequest.request(
-                        ak.fund_open_fund_info_em,
-                        symbol=self.fund_code,
-                        indicator="基本信息"
-                    )
-                    if not info_df.empty:
-                        fund_info['基金名称'] = info_df.get('基金名称', [''])[0]
-                        fund_info['基金类型'] = info_df.get('基金类型', [''])[0]
-                        fund_info['成立日期'] = info_df.get('成立日期', [''])[0]
-                        fund_info['基金经理'] = info_df.get('基金经理', [''])[0]
-                        fund_info['基金规模'] = info_df.get('基金规模', [''])[0]
-            except Exception as info_error:
-                print(f"获取基金信息失败: {info_error}")
-            
-            # 如果未获取到基金名称，尝试从基金列表中获取
-            if not fund_info.get('基金名称'):
-                try:
-                    fund_list = SafeRequest.request(ak.fund_name_em)
-                    if not fund_list.empty:
-                        # 查找对应基金代码的基金名称
-                        fund_row = fund_list[fund_list['基金代码'] == self.fund_code]
-                        if not fund_row.empty:
-                            fund_info['基金名称'] = fund_row['基金简称'].values[0]
-                except Exception as list_error:
-                    print(f"从基金列表获取基金名称失败: {list_error}")
-            
-            # 如果场外基金数据为空，尝试获取ETF数据
-            if df.empty or '净值日期' not in df.columns:
-                df = SafeRequest.request(ak.fund_etf_hist_sina, symbol=self.fund_code)
-                fund_type = "ETF"
-            
-            # 处理数据
-            if not df.empty:
-                # 统一数据格式
-                if fund_type == "场外基金":
-                    # 重命名列以统一格式
-                    if '净值日期' in df.columns:
-                        df.rename(columns={'净值日期': '日期'}, inplace=True)
-                    if '单位净值' in df.columns:
-                        df.rename(columns={'单位净值': '净值'}, inplace=True)
-                else:  # ETF
-                    if '日期' in df.columns:
-                        # 确保日期格式正确
-                        df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y-%m-%d')
-                    if '单位净值' in df.columns:
-                        df.rename(columns={'单位净值': '净值'}, inplace=True)
-                
-                # 按日期范围过滤数据
-                if self.start_date and self.end_date:
-                    try:
-                        # 确保日期列是 datetime 类型
-                        df['日期'] = pd.to_datetime(df['日期'])
-                        start = pd.to_datetime(self.start_date)
-                        end = pd.to_datetime(self.end_date)
-                        # 过滤日期范围内的数据
-                        df = df[(df['日期'] >= start) & (df['日期'] <= end)]
-                        # 重新格式化为字符串
-                        df['日期'] = df['日期'].dt.strftime('%Y-%m-%d')
-                    except Exception as date_error:
-                        print(f"日期过滤失败: {date_error}")
-                        # 如果日期过滤失败，使用全部数据
-                
-                if not df.empty:
-                    self.data_fetched.emit(df, fund_type, fund_info)
-                else:
-                    self.error_occurred.emit(f"指定日期范围内未获取到基金 {self.fund_code} 的数据")
-            else:
+            # 配置了分析服务地址时通过服务获取（见 fund_core.remote）
+            source = remote_source()
+            fetch = source.fetch_fund if source is not None else fetch_fund
+            series = fetch(self.fund_code, self.start_date, self.end_date)
+            if series.empty and series.history().empty:
                 self.error_occurred.emit(f"未获取到基金 {self.fund_code} 的数据")
-                
+            elif series.empty:
+                self.error_occurred.emit(f"指定日期范围内未获取到基金 {self.fund_code} 的数据")
+            else:
+                self.data_fetched.emit(series, series.fund_type, series.info)
         except Exception as e:
             self.error_occurred.emit(f"获取数据失败: {str(e)[:70]}")
 
+class WatchlistFetcher(QThread):
+    """自选基金批量刷新线程"""
+    
+    # 信号定义
+    progress = pyqtSignal(int, int, dict)
+    rows_ready = pyqtSignal(list)
+    alerts_ready = pyqtSignal(list)
+    error_occurred = pyqtSignal(str)
+    
+    def __init__(self, codes, store, force=False, alert_engine=None):
+        """初始化自选刷新线程（alert_engine不为空时刷新后检查提醒规则）"""
+        super().__init__()
+        self.codes = codes
+        self.force = force
+        self.refresher = WatchlistRefresher(store)
+        self.alert_engine = alert_engine
+    
+    def run(self):
+        """运行批量刷新任务"""
+        try:
+            rows = self.refresher.refresh(self.codes, progress=self.progress.emit, force=self.force)
+            self.rows_ready.emit(rows)
+        except Exception as e:
+            self.error_occurred.emit(f"刷新自选失败: {str(e)[:70]}")
+            return
+        if self.alert_engine is not None:
+            try:
+                self.alerts_ready.emit(self.alert_engine.sync(self.codes))
+            except Exception as e:
+                self.error_occurred.emit(f"检查提醒失败: {str(e)[:70]}")
+    
+    def cancel(self):
+        """取消刷新"""
+        self.refresher.cancel()
+
+class ScreenerWorker(QThread):
+    """全市场筛选线程"""
+    
+    # 信号定义
+    rows_ready = pyqtSignal(list, int)
+    error_occurred = pyqtSignal(str)
+    
+    def __init__(self, store, band=None, max_drawdown=None, limit=200):
+        """初始化筛选线程"""
+        super().__init__()
+        self.store = store
+        self.band = band
+        self.max_drawdown = max_drawdown
+        self.limit = limit
+    
+    def run(self):
+        """运行筛选任务"""
+        try:
+            # 优先使用全市场归档（本地存储有更新时自动重建）
+            archive = NavArchive.open_or_build(self.store)
+            # 顺带更新全市场回撤恢复统计（归档未变化时直接复用）
+            build_universe_table(archive, self.store)
+            screener = Screener.from_archive(archive)
+            rows = screener.screen(band=self.band, max_drawdown=self.max_drawdown, limit=self.limit)
+            self.rows_ready.emit(rows, len(screener.codes))
+        except Exception as e:
+            self.error_occurred.emit(f"筛选失败: {str(e)[:70]}")
+
+class BacktestWorker(QThread):
+    """建议规则回测线程"""
+    
+    # 信号定义
+    result_ready = pyqtSignal(dict)
+    error_occurred = pyqtSignal(str)
+    
+    def __init__(self, store, rule=backtest.RULE_PURCHASE):
+        """初始化回测线程"""
+        super().__init__()
+        self.store = store
+        self.rule = rule
+    
+    def run(self):
+        """运行回测任务"""
+        try:
+            archive = NavArchive.open_or_build(self.store)
+            self.result_ready.emit(backtest.backtest_archive(archive, rule=self.rule))
+        except Exception as e:
+            self.error_occurred.emit(f"回测失败: {str(e)[:70]}")
+
+class BacktestDialog(QDialog):
+    """回测结果对话框"""
+    
+    def __init__(self, parent=None, result=None):
+        """初始化回测结果对话框"""
+        super().__init__(parent)
+        self.setWindowTitle("建议规则回测")
+        self.setGeometry(250, 200, 900, 360)
+        
+        layout = QVBoxLayout(self)
+        
+        rule_text = backtest.RULE_LABELS.get(result['rule'], result['rule'])
+        title = QLabel(f"{rule_text}回测（{result['funds']} 只基金）")
+        title.setAlignment(Qt.AlignCenter)
+        title.setFont(QFont("Microsoft YaHei", 12, QFont.Bold))
+        layout.addWidget(title)
+        
+        # 各建议级别的统计表格
+        horizons = result['horizons']
+        headers = ["建议级别", "样本数"]
+        for horizon in horizons:
+            headers += [f"{horizon}日胜率", f"{horizon}日平均收益", f"{horizon}日平均回撤"]
+        table = QTableWidget(len(result['levels']), len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        for row_position, row in enumerate(result['levels']):
+            values = [row['label'], str(row['samples'])]
+            for horizon in horizons:
+                values += [
+                    backtest.format_pct(row[f'hit_{horizon}'] * 100),
+                    backtest.format_pct(row[f'return_{horizon}']),
+                    backtest.format_pct(row[f'drawdown_{horizon}'])
+                ]
+            for column, value in enumerate(values):
+                table.setItem(row_position, column, QTableWidgetItem(value))
+        layout.addWidget(table)
+        
+        # 买入信号统计
+        entries = result['entries']
+        entry_text = f"买入信号次数: {entries['count']}"
+        for horizon in horizons:
+            entry_text += f"    持有{horizon}日胜率 {backtest.format_pct(entries[f'hit_{horizon}'] * 100)}"
+        layout.addWidget(QLabel(entry_text))
+        
+        close_button = QPushButton("关闭")
+        close_button.clicked.connect(self.accept)
+        layout.addWidget(close_button)
+
+class DcaDialog(QDialog):
+    """定投模拟对话框"""
+    
+    def __init__(self, parent=None, series=None, fund_name=''):
+        """初始化定投模拟对话框"""
+        super().__init__(parent)
+        self.setWindowTitle(f"定投模拟 - {fund_name or series.code}")
+        self.setGeometry(250, 150, 800, 560)
+        self.series = series
+        
+        layout = QVBoxLayout(self)
+        
+        # 定投参数
+        param_layout = QHBoxLayout()
+        param_layout.addWidget(QLabel("定投频率:"))
+        self.frequency_combo = QComboBox()
+        for key, label in dca.FREQUENCY_LABELS.items():
+            self.frequency_combo.addItem(label, key)
+        param_layout.addWidget(self.frequency_combo)
+        
+        param_layout.addWidget(QLabel("每期金额:"))
+        self.amount_input = QSpinBox()
+        self.amount_input.setRange(10, 1000000)
+        self.amount_input.setValue(1000)
+        param_layout.addWidget(self.amount_input)
+        
+        self.advice_checkbox = QCheckBox("按购买建议调整金额")
+        param_layout.addWidget(self.advice_checkbox)
+        
+        run_button = QPushButton("开始模拟")
+        run_button.clicked.connect(self.run_simulation)
+        param_layout.addWidget(run_button)
+        param_layout.addStretch()
+        layout.addLayout(param_layout)
+        
+        # 汇总结果
+        self.summary_label = QLabel("")
+        layout.addWidget(self.summary_label)
+        
+        # 各开始日期的收益率曲线
+        self.figure = Figure(figsize=(8, 4), dpi=100)
+        self.canvas = FigureCanvas(self.figure)
+        self.ax = self.figure.add_subplot(111)
+        layout.addWidget(self.canvas)
+        
+        self.run_simulation()
+    
+    def run_simulation(self):
+        """对全部开始日期进行定投模拟"""
+        try:
+            frequency = self.frequency_combo.currentData()
+            amount = self.amount_input.value()
+            amounts = None
+            if self.advice_checkbox.isChecked():
+                amounts = dca.advice_amounts(self.series, amount)
+            result = dca.simulate(self.series, frequency, amount, amounts)
+            summary = dca.summarize(result)
+            if not summary:
+                self.summary_label.setText("数据不足，无法模拟")
+                return
+            
+            self.summary_label.setText(
+                f"共 {summary['starts']} 个开始日期  |  盈利概率: {summary['win_rate'] * 100:.1f}%  |  "
+                f"收益率中位数: {summary['median_return']:.2f}%  |  最好: {summary['best_return']:.2f}%  |  "
+                f"最差: {summary['worst_return']:.2f}%  |  年化中位数: {summary['median_irr']:.2f}%  |  "
+                f"最大回撤中位数: {summary['median_drawdown']:.2f}%"
+            )
+            
+            dates = self.series.date_series()
+            self.ax.clear()
+            self.ax.plot(dates, result['final_return'], 'b-', linewidth=1.5, label='定投到期末收益率 (%)')
+            self.ax.plot(dates, result['max_drawdown'], 'g-', linewidth=1, alpha=0.7, label='持仓最大回撤 (%)')
+            self.ax.axhline(y=0, color='gray', linestyle='--', alpha=0.5)
+            self.ax.set_title("不同开始日期的定投结果")
+            self.ax.set_xlabel("开始日期")
+            self.ax.set_ylabel("百分比 (%)")
+            self.ax.grid(True, linestyle='--', alpha=0.7)
+            self.ax.legend()
+            self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+            self.figure.autofmt_xdate()
+            self.canvas.draw()
+        except Exception as e:
+            print(f"定投模拟失败: {e}")
+            self.summary_label.setText(f"定投模拟失败: {str(e)[:50]}")
+
+class CorrelationDialog(QDialog):
+    """自选基金相关性对话框"""
+    
+    def __init__(self, parent=None, store=None, codes=None):
+        """初始化相关性对话框"""
+        super().__init__(parent)
+        self.setWindowTitle("自选基金相关性")
+        self.setGeometry(200, 100, 820, 820)
+        self.store = store
+        self.codes = codes or []
+        self.rolling = None
+        self.pair = None
+        
+        layout = QVBoxLayout(self)
+        
+        # 计算区间
+        param_layout = QHBoxLayout()
+        param_layout.addWidget(QLabel("计算区间:"))
+        self.window_combo = QComboBox()
+        for window in correlation.WINDOWS:
+            self.window_combo.addItem("全部历史" if window is None else f"最近{window}个交易日", window)
+        self.window_combo.currentIndexChanged.connect(self.update_heatmap)
+        param_layout.addWidget(self.window_combo)
+        
+        # 滚动窗口：拖动滑块查看各时期的相关系数矩阵
+        param_layout.addWidget(QLabel("滚动窗口:"))
+        self.rolling_combo = QComboBox()
+        self.rolling_combo.addItem("不滚动", None)
+        for window in correlation.ROLLING_WINDOWS:
+            self.rolling_combo.addItem(f"{window}个交易日", window)
+        self.rolling_combo.currentIndexChanged.connect(self.update_heatmap)
+        param_layout.addWidget(self.rolling_combo)
+        param_layout.addStretch()
+        layout.addLayout(param_layout)
+        
+        # 相关系数热力图（按层次聚类排序）
+        self.figure = Figure(figsize=(7, 7), dpi=100)
+        self.canvas = FigureCanvas(self.figure)
+        self.canvas.mpl_connect('button_press_event', self.on_heatmap_click)
+        layout.addWidget(self.canvas)
+        
+        # 滚动窗口的结束日期
+        self.slider_widget = QWidget()
+        slider_layout = QHBoxLayout(self.slider_widget)
+        slider_layout.setContentsMargins(0, 0, 0, 0)
+        slider_layout.addWidget(QLabel("窗口结束:"))
+        self.rolling_slider = QSlider(Qt.Horizontal)
+        self.rolling_slider.valueChanged.connect(self.show_window)
+        slider_layout.addWidget(self.rolling_slider)
+        self.rolling_date_label = QLabel("")
+        slider_layout.addWidget(self.rolling_date_label)
+        self.slider_widget.hide()
+        layout.addWidget(self.slider_widget)
+        
+        # 相关性最高的基金对
+        self.pairs_label = QLabel("")
+        self.pairs_label.setWordWrap(True)
+        layout.addWidget(self.pairs_label)
+        
+        self.update_heatmap()
+    
+    def draw_matrix(self, ax, names, corr):
+        """绘制相关系数矩阵，返回 (图像, 单元格数值文字)"""
+        image = ax.imshow(corr, cmap='RdYlGn_r', vmin=-1, vmax=1)
+        ax.set_xticks(range(len(names)))
+        ax.set_yticks(range(len(names)))
+        font_size = 8 if len(names) <= 30 else 5
+        ax.set_xticklabels(names, rotation=90, fontsize=font_size)
+        ax.set_yticklabels(names, fontsize=font_size)
+        texts = {}
+        if len(names) <= 12:
+            for i in range(len(names)):
+                for j in range(len(names)):
+                    label = "" if np.isnan(corr[i, j]) else f"{corr[i, j]:.2f}"
+                    texts[i, j] = ax.text(j, i, label, ha='center', va='center', fontsize=8)
+        return image, texts
+    
+    def pairs_text(self, result, missing):
+        """相关性最高的基金对及缺少数据的代码"""
+        text = "相关性最高: " + "；".join(f"{a} / {b}: {value:.2f}" for a, b, value in result.pairs(5))
+        if missing:
+            text += f"\n缺少本地数据: {', '.join(missing)}"
+        return text
+    
+    def update_heatmap(self):
+        """按所选区间计算并绘制相关系数热力图"""
+        rolling_window = self.rolling_combo.currentData()
+        self.window_combo.setEnabled(rolling_window is None)
+        if rolling_window is not None:
+            self.update_rolling(rolling_window)
+            return
+        self.rolling = None
+        self.slider_widget.hide()
+        try:
+            result, missing = correlation.analyze_store(self.store, self.codes, self.window_combo.currentData())
+            self.figure.clear()
+            if len(result.codes) < 2:
+                self.pairs_label.setText("本地数据不足两只基金，请先刷新自选")
+                self.canvas.draw()
+                return
+            
+            ax = self.figure.add_subplot(111)
+            image, _ = self.draw_matrix(ax, result.codes, result.corr)
+            ax.set_title("日收益率相关系数")
+            self.figure.colorbar(image, ax=ax)
+            self.figure.tight_layout()
+            self.canvas.draw()
+            self.pairs_label.setText(self.pairs_text(result, missing))
+        except Exception as e:
+            print(f"相关性分析失败: {e}")
+            self.pairs_label.setText(f"相关性分析失败: {str(e)[:50]}")
+    
+    def update_rolling(self, window):
+        """计算滚动相关系数矩阵序列，显示最新窗口"""
+        try:
+            self.rolling, self.missing = correlation.rolling_store(self.store, self.codes, window)
+            self.figure.clear()
+            if len(self.rolling.codes) < 2 or not len(self.rolling):
+                self.rolling = None
+                self.slider_widget.hide()
+                self.pairs_label.setText(f"本地数据不足两只基金或不足{window}个交易日，请先刷新自选")
+                self.canvas.draw()
+                return
+            
+            rolling = self.rolling
+            grid = self.figure.add_gridspec(2, 1, height_ratios=(3, 1))
+            self.heatmap_ax = self.figure.add_subplot(grid[0])
+            self.pair_ax = self.figure.add_subplot(grid[1])
+            self.image, self.cell_texts = self.draw_matrix(self.heatmap_ax, rolling.codes, rolling.corr[-1])
+            self.figure.colorbar(self.image, ax=self.heatmap_ax)
+            
+            # 默认显示最新窗口中相关性最高的一对
+            top = rolling.at(len(rolling) - 1).pairs(1)
+            self.pair = (rolling.codes.index(top[0][0]), rolling.codes.index(top[0][1])) if top else (0, 1)
+            self.current = len(rolling) - 1
+            self.draw_pair()
+            self.figure.tight_layout()
+            
+            self.rolling_slider.blockSignals(True)
+            self.rolling_slider.setRange(0, len(rolling) - 1)
+            self.rolling_slider.setValue(len(rolling) - 1)
+            self.rolling_slider.blockSignals(False)
+            self.slider_widget.show()
+            self.show_window(len(rolling) - 1)
+        except Exception as e:
+            print(f"滚动相关性分析失败: {e}")
+            self.rolling = None
+            self.pairs_label.setText(f"滚动相关性分析失败: {str(e)[:50]}")
+    
+    def show_window(self, k):
+        """显示第k个滚动窗口的相关系数矩阵"""
+        if self.rolling is None:
+            return
+        self.current = k
+        result = self.rolling.at(k)
+        end_date = str(self.rolling.end_dates[k])
+        self.image.set_data(result.corr)
+        for (i, j), text in self.cell_texts.items():
+            text.set_text("" if np.isnan(result.corr[i, j]) else f"{result.corr[i, j]:.2f}")
+        self.heatmap_ax.set_title(f"{self.rolling.window}日滚动相关系数（截至 {end_date}）")
+        self.pair_cursor.set_xdata([self.rolling.end_dates[k]] * 2)
+        self.rolling_date_label.setText(end_date)
+        self.pairs_label.setText(self.pairs_text(result, self.missing))
+        self.canvas.draw_idle()
+    
+    def draw_pair(self):
+        """绘制所选基金对的滚动相关系数走势"""
+        i, j = self.pair
+        rolling = self.rolling
+        ax = self.pair_ax
+        ax.clear()
+        ax.plot(rolling.dates, rolling.pair(i, j), linewidth=1)
+        ax.axhline(0, color='gray', linestyle='--', linewidth=0.8)
+        self.pair_cursor = ax.axvline(rolling.end_dates[self.current], color='red', linewidth=0.8)
+        ax.set_ylim(-1.05, 1.05)
+        ax.set_title(f"{rolling.codes[i]} / {rolling.codes[j]} 滚动相关系数（点击热力图切换）", fontsize=9)
+        ax.grid(True, linestyle='--', alpha=0.5)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
+    
+    def on_heatmap_click(self, event):
+        """点击热力图单元格，显示该基金对的滚动相关系数走势"""
+        if self.rolling is None or event.inaxes is not self.heatmap_ax or event.xdata is None:
+            return
+        i, j = int(round(event.ydata)), int(round(event.xdata))
+        size = len(self.rolling.codes)
+        if i == j or not (0 <= i < size and 0 <= j < size):
+            return
+        self.pair = (i, j)
+        self.draw_pair()
+        self.canvas.draw_idle()
+
+class ScenarioDialog(QDialog):
+    """估值情景分析对话框"""
+    
+    def __init__(self, parent=None, series=None):
+        """初始化情景分析对话框"""
+        super().__init__(parent)
+        self.setWindowTitle(f"估值情景分析 - {series.code}")
+        self.setGeometry(250, 150, 900, 460)
+        self.series = series
+        
+        layout = QVBoxLayout(self)
+        
+        # 情景参数
+        param_layout = QHBoxLayout()
+        param_layout.addWidget(QLabel("每日涨跌幅(%):"))
+        self.changes_input = QLineEdit(",".join(f"{change:g}" for change in DEFAULT_CHANGES))
+        param_layout.addWidget(self.changes_input)
+        param_layout.addWidget(QLabel("连续天数:"))
+        self.days_input = QSpinBox()
+        self.days_input.setRange(1, 10)
+        self.days_input.setValue(1)
+        param_layout.addWidget(self.days_input)
+        run_button = QPushButton("计算")
+        run_button.clicked.connect(self.run_scenarios)
+        param_layout.addWidget(run_button)
+        layout.addLayout(param_layout)
+        
+        layout.addWidget(QLabel(f"基于 {series.last_date} 的指标状态，假设之后每天按相同涨跌幅收盘"))
+        
+        # 情景结果表格
+        self.table = QTableWidget()
+        self.table.setColumnCount(9)
+        self.table.setHorizontalHeaderLabels(["每日涨跌幅", "累计涨跌幅", "估算净值", "RSI", "布林带位置", "波段信号", "当前回撤", "综合建议", "购买建议"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.table)
+        
+        self.run_scenarios()
+    
+    def run_scenarios(self):
+        """计算全部情景并填充表格"""
+        try:
+            text = self.changes_input.text().replace('，', ',').replace('%', '')
+            changes = [float(item) for item in text.replace(',', ' ').split()]
+        except ValueError:
+            QMessageBox.warning(self, "输入错误", "涨跌幅格式错误，请输入用逗号分隔的数字")
+            return
+        if not changes:
+            return
+        
+        try:
+            rows = scenario_rows(self.series, changes, self.days_input.value())
+        except Exception as e:
+            QMessageBox.warning(self, "错误", f"情景分析失败: {str(e)}")
+            return
+        
+        level_colors = {key: LEVEL_COLORS[level] for level, key in advice.ADVICE_KEYS.items()}
+        self.table.setRowCount(len(rows))
+        for row_position, row in enumerate(rows):
+            values = [
+                f"{row['change']:+.2f}%",
+                f"{row['total_change']:+.2f}%",
+                f"{row['nav']:.4f}",
+                f"{row['rsi']:.1f}",
+                f"{row['band_position']:.0f}%",
+                row['band_text'],
+                f"{row['drawdown']:.2f}%",
+                row['level_text'],
+                row['purchase_level_text']
+            ]
+            for column, value in enumerate(values):
+                self.table.setItem(row_position, column, QTableWidgetItem(value))
+            self.table.item(row_position, 8).setForeground(QColor(level_colors[row['purchase_level']]))
+
 class PurchaseAdviceDialog(QDialog):
     """购买建议对话框"""
     
-    def __init__(self, parent=None, advice_data=None):
-        """初始化购买建议对话框"""
+    def __init__(self, parent=None, advice_data=None, series=None):
+        """初始化购买建议对话框（series用于未来风险模拟）"""
         super().__init__(parent)
         self.setWindowTitle("当日购买建议")
-        self.setGeometry(300, 200, 500, 400)
+        self.setGeometry(300, 150, 640, 560)
         self.setModal(True)
+        self.series = series
         
         # 创建布局
         layout = QVBoxLayout(self)
@@ -270,6 +678,36 @@ class PurchaseAdviceDialog(QDialog):
             level_label.setStyleSheet(f"background-color: {level_color}; padding: 5px;")
             summary_layout.addWidget(level_label)
             layout.addWidget(summary_widget)
+            
+            # 未来风险模拟（历史收益率自助抽样）
+            if series is not None and not series.empty:
+                separator3 = QFrame()
+                separator3.setFrameShape(QFrame.HLine)
+                separator3.setFrameShadow(QFrame.Sunken)
+                layout.addWidget(separator3)
+                
+                simulation_layout = QHBoxLayout()
+                simulation_layout.addWidget(QLabel("<b>未来风险模拟:</b>"))
+                self.method_combo = QComboBox()
+                for key, label in montecarlo.METHOD_LABELS.items():
+                    self.method_combo.addItem(label, key)
+                simulation_layout.addWidget(self.method_combo)
+                simulation_layout.addWidget(QLabel("随机种子:"))
+                self.seed_input = QSpinBox()
+                self.seed_input.setRange(0, 999999)
+                self.seed_input.setValue(montecarlo.DEFAULT_SEED)
+                simulation_layout.addWidget(self.seed_input)
+                simulate_button = QPushButton("重新模拟")
+                simulate_button.clicked.connect(self.run_simulation)
+                simulation_layout.addWidget(simulate_button)
+                simulation_layout.addStretch()
+                layout.addLayout(simulation_layout)
+                
+                self.simulation_label = QLabel("")
+                self.simulation_label.setWordWrap(True)
+                self.simulation_label.setStyleSheet("background-color: #f0f0f0; padding: 5px;")
+                layout.addWidget(self.simulation_label)
+                self.run_simulation()
         else:
             layout.addWidget(QLabel("暂无足够数据生成购买建议"))
         
@@ -283,6 +721,18 @@ class PurchaseAdviceDialog(QDialog):
         button_layout.addWidget(ok_button)
         
         layout.addWidget(button_widget)
+    
+    def run_simulation(self):
+        """按所选方法和随机种子模拟未来净值路径"""
+        try:
+            # 使用完整历史的收益率，与查询区间无关
+            result = montecarlo.simulate(self.series.history().navs,
+                                         method=self.method_combo.currentData(),
+                                         seed=self.seed_input.value())
+            self.simulation_label.setText(montecarlo.format_summary(result))
+        except Exception as e:
+            print(f"风险模拟失败: {e}")
+            self.simulation_label.setText(f"风险模拟失败: {str(e)[:50]}")
 
 class FundGUI(QMainWindow):
     """基金净值可视化GUI主窗口"""
@@ -296,6 +746,16 @@ class FundGUI(QMainWindow):
         # 设置字体
         self.setFont(QFont("Microsoft YaHei", 9))
         
+        # 本地净值存储（自选刷新等批量功能共用）
+        self.nav_store = NavStore()
+        # 全市场回撤恢复统计（筛选时构建）
+        self.recovery_universe = load_universe_table(self.nav_store)
+        use_universe(self.recovery_universe)
+        # 风险指标计算器缓存（按净值序列版本号复用）
+        self.risk_cache = {}
+        # 提醒引擎（首次刷新自选时读取规则，之后只检查新增交易日）
+        self.alert_engine = None
+        
         # 创建主布局
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -346,6 +806,12 @@ class FundGUI(QMainWindow):
         top_layout.addWidget(self.fund_name_display)
         top_layout.addWidget(self.query_button)
         top_layout.addWidget(self.export_button)
+        
+        # 定投模拟按钮
+        self.dca_button = QPushButton("定投模拟")
+        self.dca_button.clicked.connect(self.show_dca_simulation)
+        self.dca_button.setEnabled(False)  # 默认禁用
+        top_layout.addWidget(self.dca_button)
         top_layout.addStretch()
         
         # 第二行：日期选择
@@ -418,6 +884,11 @@ class FundGUI(QMainWindow):
         self.export_valuation_button.clicked.connect(self.export_valuation)
         self.valuation_layout.addWidget(self.export_valuation_button)
         
+        # 情景分析按钮
+        self.scenario_button = QPushButton("情景分析")
+        self.scenario_button.clicked.connect(self.show_scenarios)
+        self.valuation_layout.addWidget(self.scenario_button)
+        
         self.valuation_layout.addStretch()
         
         # 添加到主输入布局
@@ -448,13 +919,54 @@ class FundGUI(QMainWindow):
         # 创建Matplotlib画布
         self.net_value_figure = Figure(figsize=(8, 4), dpi=100)
         self.net_value_canvas = FigureCanvas(self.net_value_figure)
-        # 初始化图表
-        self.net_value_ax = self.net_value_figure.add_subplot(111)
+        # 初始化图表（下方为历史信号色带）
+        grid = self.net_value_figure.add_gridspec(2, 1, height_ratios=[12, 1], hspace=0.05)
+        self.net_value_ax = self.net_value_figure.add_subplot(grid[0])
+        self.timeline_ax = self.net_value_figure.add_subplot(grid[1], sharex=self.net_value_ax)
         self.net_value_ax.set_title("净值走势与波段信号")
         self.net_value_ax.set_xlabel("日期")
         self.net_value_ax.set_ylabel("净值")
         self.net_value_ax.grid(True, linestyle='--', alpha=0.7)
+        self.timeline_ax.set_yticks([])
         self.net_value_layout.addWidget(self.net_value_canvas)
+        
+        # 历史信号回看
+        timeline_layout = QHBoxLayout()
+        timeline_layout.addWidget(QLabel("历史回看:"))
+        self.timeline_slider = QSlider(Qt.Horizontal)
+        self.timeline_slider.setEnabled(False)
+        self.timeline_slider.valueChanged.connect(self.handle_timeline_scrub)
+        timeline_layout.addWidget(self.timeline_slider)
+        self.timeline_label = QLabel("")
+        timeline_layout.addWidget(self.timeline_label)
+        self.net_value_layout.addLayout(timeline_layout)
+        
+        # 均线与布林带参数（拖动时只用滚动统计核重新计算这几条线）
+        window_layout = QHBoxLayout()
+        self.ma_window_slider = self.create_window_slider(window_layout, "均线周期:", 2, 120, 20)
+        self.bb_window_slider = self.create_window_slider(window_layout, "布林带窗口:", 5, 120, 20)
+        self.bb_width_slider = self.create_window_slider(window_layout, "带宽:", 10, 30, 20)
+        self.window_label = QLabel("")
+        window_layout.addWidget(self.window_label)
+        self.net_value_layout.addLayout(window_layout)
+        self.reset_window_lines()
+        
+        # 区间统计：在净值图上拖动选择日期区间
+        self.range_label = QLabel("在净值图上拖动选择区间，查看区间收益、最大回撤、波动率和连续涨跌")
+        self.range_label.setWordWrap(True)
+        self.net_value_layout.addWidget(self.range_label)
+        self.range_selector = None
+        self.range_stats = None
+        self.range_dates = None
+        
+        # 净值图和回撤图的悬停十字线
+        self.crosshairs = {}
+        
+        # 时间线缓存（按净值序列版本号复用）
+        self.timeline_cache = {}
+        self.timeline = None
+        self.timeline_cursor = None
+        self.timeline_dates = None
         self.chart_tab_widget.addTab(self.net_value_tab, "净值走势")
         
         # 2. 神奇反转模块
@@ -505,6 +1017,15 @@ class FundGUI(QMainWindow):
         self.table_layout.addWidget(self.table)
         self.chart_tab_widget.addTab(self.table_tab, "数据表格")
         
+        # 5. 自选基金模块
+        self.create_watchlist_tab()
+        
+        # 6. 基金筛选模块
+        self.create_screener_tab()
+        
+        # 7. 模拟持仓模块
+        self.create_portfolio_tab()
+        
         # 添加到布局
         chart_layout.addWidget(self.chart_tab_widget)
         
@@ -534,6 +1055,492 @@ class FundGUI(QMainWindow):
     
 
     
+    def create_window_slider(self, layout, label, minimum, maximum, value):
+        """创建一个指标参数滑块"""
+        layout.addWidget(QLabel(label))
+        slider = QSlider(Qt.Horizontal)
+        slider.setRange(minimum, maximum)
+        slider.setValue(value)
+        slider.valueChanged.connect(self.handle_window_change)
+        layout.addWidget(slider)
+        return slider
+    
+    def create_watchlist_tab(self):
+        """创建自选基金选项卡"""
+        self.watchlist_tab = QWidget()
+        self.watchlist_layout = QVBoxLayout(self.watchlist_tab)
+        
+        # 自选代码编辑
+        edit_layout = QHBoxLayout()
+        edit_layout.addWidget(QLabel("自选代码:"))
+        self.watchlist_input = QLineEdit()
+        self.watchlist_input.setPlaceholderText("多个代码用逗号分隔，例如: 270042,110011")
+        self.watchlist_input.setText(",".join(load_watchlist(watchlist_path(self.nav_store))))
+        edit_layout.addWidget(self.watchlist_input)
+        
+        add_button = QPushButton("添加当前基金")
+        add_button.clicked.connect(self.add_current_to_watchlist)
+        edit_layout.addWidget(add_button)
+        
+        save_button = QPushButton("保存自选")
+        save_button.clicked.connect(self.save_watchlist)
+        edit_layout.addWidget(save_button)
+        
+        self.watchlist_refresh_button = QPushButton("刷新自选")
+        self.watchlist_refresh_button.clicked.connect(self.refresh_watchlist)
+        edit_layout.addWidget(self.watchlist_refresh_button)
+        
+        correlation_button = QPushButton("相关性分析")
+        correlation_button.clicked.connect(self.show_watchlist_correlation)
+        edit_layout.addWidget(correlation_button)
+        self.watchlist_layout.addLayout(edit_layout)
+        
+        # 刷新进度
+        self.watchlist_progress = QProgressBar()
+        self.watchlist_progress.setValue(0)
+        self.watchlist_layout.addWidget(self.watchlist_progress)
+        
+        # 自选行情表格
+        self.watchlist_table = QTableWidget()
+        self.watchlist_table.setColumnCount(7)
+        self.watchlist_table.setHorizontalHeaderLabels(["代码", "名称", "净值日期", "最新净值", "今日涨跌幅", "信号状态", "更新状态"])
+        self.watchlist_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.watchlist_table.cellDoubleClicked.connect(self.open_watchlist_fund)
+        self.watchlist_layout.addWidget(self.watchlist_table)
+        
+        self.chart_tab_widget.addTab(self.watchlist_tab, "自选基金")
+        
+        # 自选刷新线程
+        self.watchlist_thread = None
+        self.watchlist_rows = {}
+    
+    def create_screener_tab(self):
+        """创建基金筛选选项卡"""
+        self.screener_tab = QWidget()
+        self.screener_layout = QVBoxLayout(self.screener_tab)
+        
+        # 筛选条件
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("波段信号:"))
+        self.screener_band_combo = QComboBox()
+        self.screener_band_combo.addItems(["全部", "低位区", "震荡区", "高位区"])
+        self.screener_band_combo.setCurrentIndex(1)
+        filter_layout.addWidget(self.screener_band_combo)
+        
+        filter_layout.addWidget(QLabel("回撤不高于(%):"))
+        self.screener_drawdown_input = QDoubleSpinBox()
+        self.screener_drawdown_input.setRange(-100, 0)
+        self.screener_drawdown_input.setValue(-15)
+        self.screener_drawdown_input.setSingleStep(5)
+        filter_layout.addWidget(self.screener_drawdown_input)
+        
+        self.screener_button = QPushButton("开始筛选")
+        self.screener_button.clicked.connect(self.run_screener)
+        filter_layout.addWidget(self.screener_button)
+        
+        self.backtest_button = QPushButton("规则回测")
+        self.backtest_button.clicked.connect(self.run_backtest)
+        filter_layout.addWidget(self.backtest_button)
+        filter_layout.addStretch()
+        self.screener_layout.addLayout(filter_layout)
+        
+        # 筛选结果表格
+        self.screener_table = QTableWidget()
+        self.screener_table.setColumnCount(11)
+        self.screener_table.setHorizontalHeaderLabels(["代码", "名称", "净值日期", "最新净值", "RSI", "信号状态", "当前回撤", "年化波动率", "夏普比率", "综合评分", "建议"])
+        self.screener_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.screener_table.cellDoubleClicked.connect(self.open_screener_fund)
+        self.screener_layout.addWidget(self.screener_table)
+        
+        self.chart_tab_widget.addTab(self.screener_tab, "基金筛选")
+        
+        # 筛选和回测线程
+        self.screener_thread = None
+        self.backtest_thread = None
+    
+    def create_portfolio_tab(self):
+        """创建模拟持仓选项卡"""
+        self.portfolio_tab = QWidget()
+        self.portfolio_layout = QVBoxLayout(self.portfolio_tab)
+        self.ledger = Ledger(store=self.nav_store)
+        
+        # 交易录入
+        trade_layout = QHBoxLayout()
+        trade_layout.addWidget(QLabel("代码:"))
+        self.portfolio_code_input = QLineEdit()
+        self.portfolio_code_input.setPlaceholderText("默认当前基金")
+        self.portfolio_code_input.setMaximumWidth(90)
+        trade_layout.addWidget(self.portfolio_code_input)
+        
+        trade_layout.addWidget(QLabel("日期:"))
+        self.portfolio_date_input = QDateEdit()
+        self.portfolio_date_input.setCalendarPopup(True)
+        self.portfolio_date_input.setDate(QDate.currentDate())
+        trade_layout.addWidget(self.portfolio_date_input)
+        
+        trade_layout.addWidget(QLabel("金额/份额:"))
+        self.portfolio_amount_input = QDoubleSpinBox()
+        self.portfolio_amount_input.setRange(0, 100000000)
+        self.portfolio_amount_input.setDecimals(2)
+        self.portfolio_amount_input.setValue(1000)
+        trade_layout.addWidget(self.portfolio_amount_input)
+        
+        trade_layout.addWidget(QLabel("净值:"))
+        self.portfolio_nav_input = QDoubleSpinBox()
+        self.portfolio_nav_input.setRange(0, 10000)
+        self.portfolio_nav_input.setDecimals(4)
+        self.portfolio_nav_input.setSpecialValueText("自动")
+        trade_layout.addWidget(self.portfolio_nav_input)
+        
+        trade_layout.addWidget(QLabel("手续费:"))
+        self.portfolio_fee_input = QDoubleSpinBox()
+        self.portfolio_fee_input.setRange(0, 100000)
+        self.portfolio_fee_input.setDecimals(2)
+        trade_layout.addWidget(self.portfolio_fee_input)
+        
+        buy_button = QPushButton("买入")
+        buy_button.clicked.connect(lambda: self.record_trade(True))
+        trade_layout.addWidget(buy_button)
+        
+        sell_button = QPushButton("卖出")
+        sell_button.clicked.connect(lambda: self.record_trade(False))
+        trade_layout.addWidget(sell_button)
+        
+        self.portfolio_refresh_button = QPushButton("更新净值")
+        self.portfolio_refresh_button.clicked.connect(self.refresh_portfolio_navs)
+        trade_layout.addWidget(self.portfolio_refresh_button)
+        self.portfolio_layout.addLayout(trade_layout)
+        
+        # 持仓汇总
+        self.portfolio_summary = QLabel("暂无持仓（买入时金额为支付金额，卖出时为卖出份额）")
+        self.portfolio_summary.setStyleSheet("background-color: #f0f0f0; padding: 6px; border-radius: 5px;")
+        self.portfolio_layout.addWidget(self.portfolio_summary)
+        
+        # 持仓表格
+        self.portfolio_table = QTableWidget()
+        self.portfolio_table.setColumnCount(8)
+        self.portfolio_table.setHorizontalHeaderLabels(["代码", "持有份额", "最新净值", "持仓成本", "市值", "持仓盈亏", "收益率", "仓位"])
+        self.portfolio_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.portfolio_table.cellDoubleClicked.connect(self.open_portfolio_fund)
+        self.portfolio_layout.addWidget(self.portfolio_table)
+        
+        self.chart_tab_widget.addTab(self.portfolio_tab, "模拟持仓")
+        
+        # 持仓净值更新线程
+        self.portfolio_thread = None
+        self.update_portfolio()
+    
+    def record_trade(self, is_buy):
+        """记录一笔买入或卖出"""
+        fund_code = self.portfolio_code_input.text().strip() or self.code_input.text().strip()
+        if not fund_code:
+            QMessageBox.warning(self, "输入错误", "请输入基金代码")
+            return
+        trade_date = self.portfolio_date_input.date().toString('yyyy-MM-dd')
+        
+        # 当前查询的基金写入本地存储，便于之后估值
+        current = getattr(self, 'current_data', None)
+        if current is not None and not current.empty and current.code == fund_code:
+            try:
+                self.nav_store.merge(current.history())
+            except Exception as e:
+                print(f"保存基金净值失败: {e}")
+        
+        nav = self.portfolio_nav_input.value()
+        if nav <= 0:
+            series = self.nav_store.load(fund_code)
+            nav = nav_on(series, trade_date) if series is not None and not series.empty else None
+            if nav is None:
+                QMessageBox.warning(self, "输入错误", "本地没有该日期的净值，请手动输入成交净值")
+                return
+        
+        try:
+            if is_buy:
+                self.ledger.buy(fund_code, trade_date, self.portfolio_amount_input.value(), nav,
+                                self.portfolio_fee_input.value())
+            else:
+                self.ledger.sell(fund_code, trade_date, self.portfolio_amount_input.value(), nav,
+                                 self.portfolio_fee_input.value())
+        except ValueError as e:
+            QMessageBox.warning(self, "交易错误", str(e))
+            return
+        self.status_bar.showMessage(f"已记录{'买入' if is_buy else '卖出'} {fund_code}，成交净值 {nav:.4f}")
+        self.update_portfolio()
+    
+    def update_portfolio(self):
+        """重新估值模拟持仓（当前基金应用了估值时使用估值后的净值）"""
+        if not self.ledger.transactions:
+            return
+        overrides = {}
+        current = getattr(self, 'current_data', None)
+        if current is not None and not current.empty and current.estimates:
+            overrides[current.code] = current
+        try:
+            valuation = revalue_from_store(self.ledger, self.nav_store, overrides)
+        except Exception as e:
+            self.portfolio_summary.setText(f"持仓估值失败: {str(e)}")
+            return
+        
+        rows = valuation.latest(self.ledger.lots())
+        self.portfolio_table.setRowCount(len(rows))
+        for row_position, row in enumerate(rows):
+            values = [
+                row['code'],
+                f"{row['units']:.2f}",
+                f"{row['nav']:.4f}",
+                f"{row['cost']:.2f}",
+                f"{row['value']:.2f}",
+                f"{row['holding_pnl']:+.2f}",
+                f"{row['holding_return']:+.2f}%",
+                f"{row['weight'] * 100:.1f}%"
+            ]
+            for column, value in enumerate(values):
+                self.portfolio_table.setItem(row_position, column, QTableWidgetItem(value))
+        
+        missing = [code for code in self.ledger.codes() if code not in valuation.codes]
+        if len(valuation.dates) == 0:
+            text = "本地没有持仓基金的净值，请点击“更新净值”"
+        else:
+            text = (f"估值日期: {valuation.dates[-1]}  总市值: {valuation.total_value[-1]:.2f}  "
+                    f"累计投入: {valuation.total_invested[-1]:.2f}  "
+                    f"累计盈亏: {valuation.total_pnl[-1]:+.2f} ({valuation.total_return[-1]:+.2f}%)")
+        if missing:
+            text += f"\n缺少净值: {', '.join(missing)}"
+        if overrides:
+            text += "\n（含当前基金估值）"
+        self.portfolio_summary.setText(text)
+    
+    def refresh_portfolio_navs(self):
+        """联网更新持仓基金净值后重新估值"""
+        if self.portfolio_thread is not None and self.portfolio_thread.isRunning():
+            return
+        codes = self.ledger.codes()
+        if not codes:
+            QMessageBox.information(self, "提示", "暂无持仓")
+            return
+        self.portfolio_refresh_button.setEnabled(False)
+        self.status_bar.showMessage(f"正在更新 {len(codes)} 只持仓基金净值...")
+        
+        self.portfolio_thread = WatchlistFetcher(codes, self.nav_store)
+        self.portfolio_thread.rows_ready.connect(lambda rows: self.update_portfolio())
+        self.portfolio_thread.error_occurred.connect(self.handle_error)
+        self.portfolio_thread.finished.connect(lambda: self.portfolio_refresh_button.setEnabled(True))
+        self.portfolio_thread.start()
+    
+    def open_portfolio_fund(self, row_position, column):
+        """双击持仓行查看基金详情"""
+        item = self.portfolio_table.item(row_position, 0)
+        if item is None:
+            return
+        self.code_input.setText(item.text())
+        self.chart_tab_widget.setCurrentIndex(0)
+        self.query_fund_data()
+    
+    def run_screener(self):
+        """对本地存储中的全部基金进行筛选"""
+        if self.screener_thread is not None and self.screener_thread.isRunning():
+            return
+        
+        band = {
+            1: advice.BAND_LOW,
+            2: advice.BAND_NEUTRAL,
+            3: advice.BAND_HIGH
+        }.get(self.screener_band_combo.currentIndex())
+        max_drawdown = self.screener_drawdown_input.value()
+        
+        self.screener_button.setEnabled(False)
+        self.status_bar.showMessage("正在筛选本地基金...")
+        
+        self.screener_thread = ScreenerWorker(self.nav_store, band, max_drawdown if max_drawdown < 0 else None)
+        self.screener_thread.rows_ready.connect(self.handle_screener_rows)
+        self.screener_thread.error_occurred.connect(self.handle_error)
+        self.screener_thread.finished.connect(lambda: self.screener_button.setEnabled(True))
+        self.screener_thread.start()
+    
+    def handle_screener_rows(self, rows, total):
+        """显示筛选结果"""
+        self.recovery_universe = load_universe_table(self.nav_store)
+        use_universe(self.recovery_universe)
+        self.screener_table.setRowCount(len(rows))
+        for row_position, row in enumerate(rows):
+            values = [
+                row['code'],
+                row['name'],
+                row['date'],
+                f"{row['nav']:.4f}",
+                f"{row['rsi']:.1f}",
+                row['band_text'],
+                f"{row['drawdown']:.2f}%",
+                risk.format_metric('volatility', row['volatility']),
+                risk.format_metric('sharpe', row['sharpe']),
+                str(row['score']),
+                row['level_text']
+            ]
+            for column, value in enumerate(values):
+                self.screener_table.setItem(row_position, column, QTableWidgetItem(value))
+        self.status_bar.showMessage(f"筛选完成：{total} 只基金中 {len(rows)} 只符合条件")
+    
+    def run_backtest(self):
+        """在本地全部基金上回测购买建议规则"""
+        if self.backtest_thread is not None and self.backtest_thread.isRunning():
+            return
+        
+        self.backtest_button.setEnabled(False)
+        self.status_bar.showMessage("正在回测购买建议规则...")
+        
+        self.backtest_thread = BacktestWorker(self.nav_store)
+        self.backtest_thread.result_ready.connect(self.show_backtest_result)
+        self.backtest_thread.error_occurred.connect(self.handle_error)
+        self.backtest_thread.finished.connect(lambda: self.backtest_button.setEnabled(True))
+        self.backtest_thread.start()
+    
+    def show_backtest_result(self, result):
+        """显示回测结果"""
+        self.status_bar.showMessage("回测完成")
+        dialog = BacktestDialog(self, result)
+        dialog.exec_()
+    
+    def open_screener_fund(self, row_position, column):
+        """双击筛选结果查看基金详情"""
+        item = self.screener_table.item(row_position, 0)
+        if item is None:
+            return
+        self.code_input.setText(item.text())
+        self.chart_tab_widget.setCurrentIndex(0)
+        self.query_fund_data()
+    
+    def watchlist_codes(self):
+        """解析自选代码输入"""
+        text = self.watchlist_input.text().replace('，', ',')
+        codes = [code.strip() for code in text.replace(',', ' ').split() if code.strip()]
+        return list(dict.fromkeys(codes))
+    
+    def add_current_to_watchlist(self):
+        """将当前查询的基金加入自选"""
+        fund_code = self.code_input.text().strip()
+        if not fund_code:
+            return
+        codes = self.watchlist_codes()
+        if fund_code not in codes:
+            codes.append(fund_code)
+        self.watchlist_input.setText(",".join(codes))
+        self.save_watchlist()
+    
+    def save_watchlist(self):
+        """保存自选列表"""
+        try:
+            save_watchlist(watchlist_path(self.nav_store), self.watchlist_codes())
+            self.status_bar.showMessage("自选列表已保存")
+        except Exception as e:
+            QMessageBox.warning(self, "错误", f"保存自选失败: {str(e)}")
+    
+    def refresh_watchlist(self):
+        """批量刷新自选基金"""
+        if self.watchlist_thread is not None and self.watchlist_thread.isRunning():
+            # 再次点击视为取消
+            self.watchlist_thread.cancel()
+            self.status_bar.showMessage("正在取消自选刷新...")
+            return
+        
+        codes = self.watchlist_codes()
+        if not codes:
+            QMessageBox.warning(self, "输入错误", "请先添加自选基金代码")
+            return
+        self.save_watchlist()
+        
+        # 初始化表格
+        self.watchlist_rows = {}
+        self.watchlist_table.setRowCount(len(codes))
+        for row_position, code in enumerate(codes):
+            self.watchlist_rows[code] = row_position
+            self.watchlist_table.setItem(row_position, 0, QTableWidgetItem(code))
+            self.watchlist_table.setItem(row_position, 6, QTableWidgetItem("等待中"))
+        self.watchlist_progress.setMaximum(len(codes))
+        self.watchlist_progress.setValue(0)
+        
+        self.watchlist_refresh_button.setText("取消刷新")
+        self.status_bar.showMessage(f"正在刷新 {len(codes)} 只自选基金...")
+        
+        self.watchlist_thread = WatchlistFetcher(codes, self.nav_store, alert_engine=self.load_alert_engine())
+        self.watchlist_thread.progress.connect(self.handle_watchlist_progress)
+        self.watchlist_thread.rows_ready.connect(self.handle_watchlist_done)
+        self.watchlist_thread.alerts_ready.connect(self.handle_alerts)
+        self.watchlist_thread.error_occurred.connect(self.handle_error)
+        self.watchlist_thread.finished.connect(lambda: self.watchlist_refresh_button.setText("刷新自选"))
+        self.watchlist_thread.start()
+    
+    def handle_watchlist_progress(self, done, total, row):
+        """处理单只基金刷新完成"""
+        self.watchlist_progress.setValue(done)
+        row_position = self.watchlist_rows.get(row.get('code'))
+        if row_position is None:
+            return
+        
+        status_text = {
+            'ok': "已更新",
+            'cached': "本地数据",
+            'error': f"失败: {row.get('error', '')}",
+            'cancelled': "已取消"
+        }.get(row.get('status'), "")
+        nav = row.get('nav')
+        values = [
+            row.get('code', ''),
+            row.get('name', ''),
+            row.get('date', ''),
+            f"{nav:.4f}" if nav is not None else "",
+            format_change(row.get('change')),
+            row.get('signal_text', ''),
+            status_text
+        ]
+        for column, value in enumerate(values):
+            self.watchlist_table.setItem(row_position, column, QTableWidgetItem(value))
+        self.status_bar.showMessage(f"自选刷新进度: {done}/{total}")
+    
+    def handle_watchlist_done(self, rows):
+        """处理自选刷新完成"""
+        failed = sum(1 for row in rows if row.get('status') == 'error')
+        message = f"自选刷新完成，共 {len(rows)} 只"
+        if failed:
+            message += f"，{failed} 只失败"
+        self.status_bar.showMessage(message)
+    
+    def load_alert_engine(self):
+        """读取提醒规则（没有规则文件时返回None）"""
+        path = alerts.rules_path(self.nav_store)
+        if self.alert_engine is None and os.path.exists(path):
+            try:
+                self.alert_engine = alerts.AlertEngine(self.nav_store)
+            except ValueError as e:
+                print(f"提醒规则无效: {e}")
+        return self.alert_engine
+    
+    def handle_alerts(self, fired):
+        """显示新触发的提醒"""
+        if not fired:
+            return
+        lines = [alerts.alert_message(alert) for alert in fired[:20]]
+        if len(fired) > len(lines):
+            lines.append(f"……共 {len(fired)} 条")
+        QMessageBox.information(self, "指标提醒", "\n".join(lines))
+    
+    def show_watchlist_correlation(self):
+        """显示自选基金相关性热力图（使用本地存储的净值）"""
+        codes = self.watchlist_codes()
+        if len(codes) < 2:
+            QMessageBox.warning(self, "输入错误", "至少需要两只自选基金")
+            return
+        dialog = CorrelationDialog(self, self.nav_store, codes)
+        dialog.exec_()
+    
+    def open_watchlist_fund(self, row_position, column):
+        """双击自选行查看基金详情"""
+        item = self.watchlist_table.item(row_position, 0)
+        if item is None:
+            return
+        self.code_input.setText(item.text())
+        self.chart_tab_widget.setCurrentIndex(0)
+        self.query_fund_data()
+    
     def query_fund_data(self):
         """查询基金数据"""
         fund_code = self.code_input.text().strip()
@@ -552,7 +1559,7 @@ class FundGUI(QMainWindow):
         if cache_key in self.chart_data_cache:
             # 使用缓存数据
             cached_data = self.chart_data_cache[cache_key]
-            self.handle_data(cached_data['df'], cached_data['fund_type'], cached_data['fund_info'])
+            self.handle_data(cached_data['series'], cached_data['fund_type'], cached_data['fund_info'])
             self.query_button.setEnabled(True)
             self.status_bar.showMessage("使用缓存数据")
             return
@@ -572,8 +1579,8 @@ class FundGUI(QMainWindow):
         self.data_thread.finished.connect(self.reset_ui)
         self.data_thread.start()
     
-    def handle_data(self, df, fund_type, fund_info):
-        """处理获取到的数据"""
+    def handle_data(self, series, fund_type, fund_info):
+        """处理获取到的数据（series为FundSeries净值序列）"""
         fund_code = self.code_input.text().strip()
         fund_name = fund_info.get('基金名称', '')
         
@@ -587,21 +1594,24 @@ class FundGUI(QMainWindow):
         else:
             self.chart_title.setText(f"{fund_type} {fund_code} 分析")
         
-        # 保存当前数据
-        self.current_data = df
+        # 保存当前数据，估值通过叠加层应用，不修改基础数据
+        if getattr(self, 'valuation', None) is not None:
+            self.valuation.reset()
+        self.current_data = series
+        self.valuation = series.overlay()
         self.current_fund_type = fund_type
         self.current_fund_info = fund_info
         
         # 缓存数据
         cache_key = f"{fund_code}_{self.start_date_input.date().toString('yyyy-MM-dd')}_{self.end_date_input.date().toString('yyyy-MM-dd')}"
         self.chart_data_cache[cache_key] = {
-            'df': df,
+            'series': series,
             'fund_type': fund_type,
             'fund_info': fund_info
         }
         
         # 计算并添加涨跌幅信息
-        fund_analysis = self.calculate_fund_analysis(df, fund_code)
+        fund_analysis = self.calculate_fund_analysis(series, fund_code)
         self.current_fund_analysis = fund_analysis
         
             # 显示基金基本信息
@@ -610,20 +1620,21 @@ class FundGUI(QMainWindow):
         # 只更新当前激活的图表模块，其他模块在切换时按需更新
         current_tab_index = self.chart_tab_widget.currentIndex()
         if current_tab_index == 0:  # 净值走势（合并了波段信号）
-            self.update_net_value_chart(df)
+            self.update_net_value_chart(series)
         elif current_tab_index == 1:  # 神奇反转
-            self.update_magic_reversal_chart(df)
+            self.update_magic_reversal_chart(series)
         elif current_tab_index == 2:  # 回撤抄底
-            self.update_drawdown_chart(df)
+            self.update_drawdown_chart(series)
         
         # 更新表格（无论当前选中哪个选项卡，都更新表格数据）
-        self.update_table(df)
+        self.update_table(series)
         
-        # 启用导出按钮
+        # 启用导出和定投模拟按钮
         self.export_button.setEnabled(True)
+        self.dca_button.setEnabled(True)
         
         # 更新购买建议
-        self.update_purchase_advice(df)
+        self.update_purchase_advice(series)
         
         # 更新状态栏
         self.status_bar.showMessage(f"成功获取 {fund_type} {fund_code} 的数据")
@@ -676,46 +1687,28 @@ class FundGUI(QMainWindow):
             QMessageBox.warning(self, "输入错误", "涨跌幅格式错误，请输入有效的数字")
             return
         
-        # 基于当前净值和涨跌幅计算新的净值
-        current_value = self.current_data['净值'].iloc[-1].astype(float)
-        new_value = current_value * (1 + change_pct / 100)
-        
-        # 创建包含估值的新数据框
-        valuation_df = self.current_data.copy()
-        
-        # 保存原始数据，用于恢复
-        if not hasattr(self, 'original_data'):
-            self.original_data = self.current_data.copy()
-        
-        # 更新数据框，添加估值数据
-        # 创建新的行数据
-        last_date = pd.to_datetime(valuation_df['日期'].iloc[-1])
-        next_date = last_date + pd.DateOffset(days=1)
+        # 基于当前净值和涨跌幅计算新的净值，追加到估值叠加层（可连续叠加多日估值）
+        new_value = self.valuation.push(change_pct)
         
-        # 创建新行
-        new_row = {
-            '日期': next_date.strftime('%Y-%m-%d'),
-            '净值': new_value
-        }
-        
-        # 添加新行到数据框
-        new_row_df = pd.DataFrame([new_row])
-        valuation_df = pd.concat([valuation_df, new_row_df], ignore_index=True)
-        
-        # 更新当前数据为估值数据
-        self.current_data = valuation_df
+        # 更新当前数据为估值视图（与基础数据共享缓冲区，无需复制）
+        valuation_series = self.valuation.view()
+        self.current_data = valuation_series
         
         # 重新生成购买建议
-        self.update_purchase_advice(valuation_df)
+        self.update_purchase_advice(valuation_series)
         
         # 更新图表
         current_tab_index = self.chart_tab_widget.currentIndex()
         if current_tab_index == 0:  # 净值走势
-            self.update_net_value_chart(valuation_df)
+            self.update_net_value_chart(valuation_series)
         elif current_tab_index == 1:  # 神奇反转
-            self.update_magic_reversal_chart(valuation_df)
+            self.update_magic_reversal_chart(valuation_series)
         elif current_tab_index == 2:  # 回撤抄底
-            self.update_drawdown_chart(valuation_df)
+            self.update_drawdown_chart(valuation_series)
+        
+        # 持仓中含当前基金时按估值重新计算
+        if valuation_series.code in self.ledger.codes():
+            self.update_portfolio()
         
         # 显示成功消息
         QMessageBox.information(self, "成功", f"估值应用成功！\n输入涨跌幅: {change_pct:.2f}%\n计算后净值: {new_value:.4f}")
@@ -726,9 +1719,9 @@ class FundGUI(QMainWindow):
         self.change_input.clear()
         
         # 恢复原始数据
-        if hasattr(self, 'original_data'):
-            self.current_data = self.original_data.copy()
-            delattr(self, 'original_data')
+        if getattr(self, 'valuation', None) is not None and self.valuation.active:
+            self.valuation.reset()
+            self.current_data = self.valuation.view()
             
             # 重新生成购买建议
             self.update_purchase_advice(self.current_data)
@@ -742,6 +1735,10 @@ class FundGUI(QMainWindow):
             elif current_tab_index == 2:  # 回撤抄底
                 self.update_drawdown_chart(self.current_data)
             
+            # 持仓估值恢复为实际净值
+            if self.current_data.code in self.ledger.codes():
+                self.update_portfolio()
+            
             QMessageBox.information(self, "成功", "估值已重置，恢复原始数据")
         else:
             QMessageBox.information(self, "提示", "当前没有应用估值")
@@ -760,19 +1757,28 @@ class FundGUI(QMainWindow):
         
         # 导出为CSV
         try:
-            self.current_data.to_csv(filename, index=False, encoding='utf-8-sig')
+            self.current_data.to_frame().to_csv(filename, index=False, encoding='utf-8-sig')
             QMessageBox.information(self, "成功", f"估值数据已导出到 {filename}")
         except Exception as e:
             QMessageBox.warning(self, "错误", f"导出失败: {str(e)}")
     
     def clear_chart(self):
         """清空所有图表"""
+        self.detach_crosshair('net_value')
+        self.detach_crosshair('drawdown')
         # 清空净值走势图表
         self.net_value_ax.clear()
+        self.reset_window_lines()
         self.net_value_ax.set_title("净值走势与波段信号")
         self.net_value_ax.set_xlabel("日期")
         self.net_value_ax.set_ylabel("净值")
         self.net_value_ax.grid(True, linestyle='--', alpha=0.7)
+        self.timeline_ax.clear()
+        self.timeline_ax.set_yticks([])
+        self.timeline = None
+        self.timeline_cursor = None
+        self.timeline_slider.setEnabled(False)
+        self.timeline_label.setText("")
         self.net_value_canvas.draw()
         
         # 清空神奇反转图表
@@ -795,20 +1801,17 @@ class FundGUI(QMainWindow):
         """清空表格"""
         self.table.setRowCount(0)
     
-    def update_net_value_chart(self, df):
+    def update_net_value_chart(self, series):
         """更新净值走势图表（合并了波段信号）"""
-        # 确保日期列存在
-        if '日期' not in df.columns:
-            return
-        
-        # 确保净值列存在
-        if '净值' not in df.columns:
+        # 确保数据存在
+        if series.empty:
             return
         
+        self.detach_crosshair('net_value')
         try:
-            # 转换日期格式
-            dates = pd.to_datetime(df['日期'])
-            values = df['净值'].astype(float)
+            # 直接使用类型化数组，无需再次解析
+            dates = series.date_series()
+            values = series.nav_series()
             
             # 优化：对于大数据集，限制绘制的数据点数量
             max_points = 1000
@@ -819,89 +1822,33 @@ class FundGUI(QMainWindow):
             
             # 绘制图表
             self.net_value_ax.clear()
+            self.reset_window_lines()
             # 绘制净值曲线
             self.net_value_ax.plot(dates, values, 'b-', linewidth=2, label='净值')
             
             # 添加波段信号分析（升级版）
             if len(values) > 0:
-                # 计算技术分析指标
-                # 1. 移动平均线
-                ma5 = values.rolling(window=5).mean()  # 5日均线
-                ma20 = values.rolling(window=20).mean()  # 20日均线
-                ma60 = values.rolling(window=60).mean()  # 60日均线
-                
-                # 2. 相对强弱指数（RSI）
-                def calculate_rsi(data, window=14):
-                    delta = data.diff()
-                    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-                    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-                    rs = gain / loss
-                    rsi = 100 - (100 / (1 + rs))
-                    return rsi
-                
-                rsi = calculate_rsi(values)
-                
-                # 3. 布林带
-                def calculate_bollinger_bands(data, window=20, num_std=2):
-                    ma = data.rolling(window=window).mean()
-                    std = data.rolling(window=window).std()
-                    upper_band = ma + (std * num_std)
-                    lower_band = ma - (std * num_std)
-                    return ma, upper_band, lower_band
+                # 技术分析指标（见 fund_core.analysis.CHART_INDICATORS），滚动统计核留给参数滑块使用
+                frame = graph.IndicatorFrame(values.to_numpy())
+                ind = frame.get(analysis.CHART_INDICATORS)
+                self.net_value_kernel = frame['kernel']
+                self.net_value_dates = dates
                 
-                bb_ma, upper_band, lower_band = calculate_bollinger_bands(values)
-                
-                # 4. MACD
-                def calculate_macd(data, fast_period=12, slow_period=26, signal_period=9):
-                    exp1 = data.ewm(span=fast_period, adjust=False).mean()
-                    exp2 = data.ewm(span=slow_period, adjust=False).mean()
-                    macd = exp1 - exp2
-                    signal = macd.ewm(span=signal_period, adjust=False).mean()
-                    histogram = macd - signal
-                    return macd, signal, histogram
-                
-                macd, macd_signal, macd_hist = calculate_macd(values)
-                
-                # 绘制技术分析指标
-                # 绘制移动平均线
-                self.net_value_ax.plot(dates, ma5, 'g-', linewidth=1.5, label='5日均线', alpha=0.7)
-                self.net_value_ax.plot(dates, ma20, 'r-', linewidth=1.5, label='20日均线', alpha=0.7)
-                self.net_value_ax.plot(dates, ma60, 'y-', linewidth=1.5, label='60日均线', alpha=0.7)
+                # 绘制移动平均线（中间一条的周期由滑块调整）
+                self.net_value_ax.plot(dates, ind['ma5'], 'g-', linewidth=1.5, label='5日均线', alpha=0.7)
+                self.ma_line, = self.net_value_ax.plot(dates, ind['ma20'], 'r-', linewidth=1.5, label='20日均线', alpha=0.7)
+                self.net_value_ax.plot(dates, ind['ma60'], 'y-', linewidth=1.5, label='60日均线', alpha=0.7)
                 
                 # 绘制布林带
-                self.net_value_ax.plot(dates, upper_band, 'k--', linewidth=1, label='布林带上轨', alpha=0.7)
-                self.net_value_ax.plot(dates, lower_band, 'k--', linewidth=1, label='布林带下轨', alpha=0.7)
-                self.net_value_ax.fill_between(dates, upper_band, lower_band, color='gray', alpha=0.1)
-                
-                # 确定高位区和低位区
-                # 基于布林带和RSI的综合判断
-                current_value = values.iloc[-1]
-                current_rsi = rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else 50
-                current_upper_band = upper_band.iloc[-1] if not pd.isna(upper_band.iloc[-1]) else current_value
-                current_lower_band = lower_band.iloc[-1] if not pd.isna(lower_band.iloc[-1]) else current_value
+                upper_line, = self.net_value_ax.plot(dates, ind['upper'], 'k--', linewidth=1, label='布林带上轨', alpha=0.7)
+                lower_line, = self.net_value_ax.plot(dates, ind['lower'], 'k--', linewidth=1, label='布林带下轨', alpha=0.7)
+                self.bb_lines = (upper_line, lower_line)
+                self.bb_fill = self.net_value_ax.fill_between(dates, ind['upper'], ind['lower'], color='gray', alpha=0.1)
+                self.apply_window_settings()
                 
-                # 信号状态判定
-                if current_value >= current_upper_band or current_rsi >= 70:
-                    signal_status = "高位区 - 谨慎"
-                    signal_color = 'red'
-                elif current_value <= current_lower_band or current_rsi <= 30:
-                    signal_status = "低位区 - 关注"
-                    signal_color = 'green'
-                else:
-                    # 基于MACD和均线判断趋势
-                    if not pd.isna(macd.iloc[-1]) and not pd.isna(macd_signal.iloc[-1]):
-                        if macd.iloc[-1] > macd_signal.iloc[-1] and ma5.iloc[-1] > ma20.iloc[-1]:
-                            signal_status = "上升趋势 - 持有"
-                            signal_color = 'blue'
-                        elif macd.iloc[-1] < macd_signal.iloc[-1] and ma5.iloc[-1] < ma20.iloc[-1]:
-                            signal_status = "下降趋势 - 观望"
-                            signal_color = 'purple'
-                        else:
-                            signal_status = "震荡区 - 观望"
-                            signal_color = 'orange'
-                    else:
-                        signal_status = "震荡区 - 观望"
-                        signal_color = 'orange'
+                # 信号状态判定（布林带和RSI，震荡区再按MACD和均线判断趋势）
+                signal_status, signal_color = analysis.trend_signal(values.to_numpy(), ind)
+                current_rsi = analysis.band_analysis(values.to_numpy(), ind)['rsi']
                 
                 # 添加信号状态文本
                 self.net_value_ax.text(0.05, 0.95, f"当前信号: {signal_status}", 
@@ -910,42 +1857,17 @@ class FundGUI(QMainWindow):
                                       bbox=dict(facecolor=signal_color, alpha=0.2))
                 
                 # 添加RSI指标信息
-                if not pd.isna(current_rsi):
-                    self.net_value_ax.text(0.05, 0.85, f"RSI: {current_rsi:.1f}", 
-                                          transform=self.net_value_ax.transAxes, 
-                                          fontsize=10, 
-                                          bbox=dict(facecolor='yellow', alpha=0.2))
-                
-                # 在净值曲线上标注抄底和高位信号
-                # 计算历史信号点
-                signal_points = []
-                for i in range(len(values)):
-                    if i < 14:  # 确保有足够的数据计算指标
-                        continue
-                    
-                    # 获取当前点的指标值
-                    value = values.iloc[i]
-                    rsi_val = rsi.iloc[i] if not pd.isna(rsi.iloc[i]) else 50
-                    upper_band_val = upper_band.iloc[i] if not pd.isna(upper_band.iloc[i]) else value
-                    lower_band_val = lower_band.iloc[i] if not pd.isna(lower_band.iloc[i]) else value
-                    
-                    # 判断信号
-                    if value >= upper_band_val or rsi_val >= 70:
-                        # 高位信号
-                        signal_points.append((dates.iloc[i], value, 'high'))
-                    elif value <= lower_band_val or rsi_val <= 30:
-                        # 低位信号（抄底）
-                        signal_points.append((dates.iloc[i], value, 'low'))
+                self.net_value_ax.text(0.05, 0.85, f"RSI: {current_rsi:.1f}", 
+                                      transform=self.net_value_ax.transAxes, 
+                                      fontsize=10, 
+                                      bbox=dict(facecolor='yellow', alpha=0.2))
                 
-                # 绘制信号点
-                # 先绘制所有信号点，不添加标签
-                for date, value, signal_type in signal_points:
-                    if signal_type == 'high':
-                        # 高位信号：红色倒三角
-                        self.net_value_ax.scatter(date, value, marker='v', color='red', s=100, alpha=0.8)
-                    elif signal_type == 'low':
-                        # 低位信号：绿色倒三角
-                        self.net_value_ax.scatter(date, value, marker='v', color='green', s=100, alpha=0.8)
+                # 在净值曲线上标注历史高位（红色）和低位（绿色）信号点
+                high, low = analysis.band_points(values.to_numpy(), ind)
+                if high.any():
+                    self.net_value_ax.scatter(dates[high], values[high], marker='v', color='red', s=100, alpha=0.8)
+                if low.any():
+                    self.net_value_ax.scatter(dates[low], values[low], marker='v', color='green', s=100, alpha=0.8)
                 
                 # 手动创建所有图例条目，确保包含所有必要的元素
                 from matplotlib.lines import Line2D
@@ -976,6 +1898,14 @@ class FundGUI(QMainWindow):
             self.net_value_ax.grid(True, linestyle='--', alpha=0.7)
             self.net_value_ax.legend()
             
+            # 绘制历史信号色带
+            self.update_signal_timeline(series)
+            
+            # 区间选择（统计使用完整数据，不受净值曲线抽样影响）
+            self.update_range_selector(series)
+            # 悬停十字线（拖动用于区间选择，拖动时隐藏）
+            self.attach_crosshair('net_value', self.net_value_ax, series, series.navs, follow_drag=False)
+            
             # 设置日期格式
             self.net_value_ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
             self.net_value_ax.xaxis.set_major_locator(mdates.AutoDateLocator())
@@ -989,6 +1919,7 @@ class FundGUI(QMainWindow):
             print(f"更新净值走势图表失败: {e}")
             # 显示错误信息
             self.net_value_ax.clear()
+            self.reset_window_lines()
             self.net_value_ax.set_title("净值走势与波段信号")
             self.net_value_ax.text(0.5, 0.5, f"图表加载失败: {str(e)[:50]}", 
                                  transform=self.net_value_ax.transAxes, 
@@ -996,20 +1927,141 @@ class FundGUI(QMainWindow):
                                  bbox=dict(facecolor='red', alpha=0.2))
             self.net_value_canvas.draw()
     
-    def update_band_signal_chart(self, df):
-        """更新波段信号图表"""
-        # 确保日期列存在
-        if '日期' not in df.columns:
+    def update_signal_timeline(self, series):
+        """在净值图下方绘制每日综合建议色带，并重置历史回看滑块"""
+        self.timeline = timeline_for(series, self.timeline_cache)
+        self.timeline_ax.clear()
+        self.timeline_ax.set_yticks([])
+        self.timeline_ax.set_ylabel("信号", rotation=0, labelpad=15)
+        
+        # 色带使用完整数据（不受净值曲线抽样影响）
+        levels = sorted(LEVEL_COLORS)
+        cmap = ListedColormap([LEVEL_COLORS[level] for level in levels])
+        day_numbers = mdates.date2num(series.date_series())
+        step = day_numbers[-1] - day_numbers[-2] if len(day_numbers) > 1 else 1
+        self.timeline_ax.imshow(
+            self.timeline.level[None, :], aspect='auto', cmap=cmap,
+            vmin=levels[0] - 0.5, vmax=levels[-1] + 0.5, interpolation='nearest',
+            extent=[day_numbers[0], day_numbers[-1] + step, 0, 1]
+        )
+        self.net_value_ax.set_xlabel("")
+        self.timeline_ax.set_xlabel("日期")
+        
+        # 回看游标
+        self.timeline_cursor = self.net_value_ax.axvline(day_numbers[-1], color='gray', linestyle=':', linewidth=1)
+        self.timeline_dates = day_numbers
+        self.timeline_slider.blockSignals(True)
+        self.timeline_slider.setRange(0, len(self.timeline) - 1)
+        self.timeline_slider.setValue(len(self.timeline) - 1)
+        self.timeline_slider.blockSignals(False)
+        self.timeline_slider.setEnabled(True)
+        self.show_timeline_info(len(self.timeline) - 1)
+    
+    def attach_crosshair(self, key, ax, series, y, follow_drag=True):
+        """为图表绑定悬停十字线（按完整数据定位交易日，替换该图表原有的十字线）"""
+        self.detach_crosshair(key)
+        table = crosshair.HoverTable(series, mdates.date2num(series.date_series()))
+        self.crosshairs[key] = crosshair.Crosshair(ax, table, y, follow_drag)
+    
+    def detach_crosshair(self, key):
+        """移除图表的悬停十字线（清空坐标轴前调用）"""
+        old = self.crosshairs.pop(key, None)
+        if old is not None:
+            old.disconnect()
+    
+    def update_range_selector(self, series):
+        """为净值图建立区间选择器（区间统计结构按净值序列版本号复用）"""
+        self.range_stats = graph.frame_for(series)['range_stats']
+        self.range_dates = mdates.date2num(series.date_series())
+        if self.range_selector is not None:
+            self.range_selector.set_active(False)
+        self.range_selector = SpanSelector(
+            self.net_value_ax, self.handle_range_select, 'horizontal', useblit=True, interactive=True,
+            onmove_callback=self.handle_range_select, props=dict(facecolor='tab:blue', alpha=0.15)
+        )
+    
+    def handle_range_select(self, xmin, xmax):
+        """拖动选择区间：每次移动都直接查询区间统计"""
+        if self.range_stats is None or len(self.range_dates) == 0:
             return
-        
-        # 确保净值列存在
-        if '净值' not in df.columns:
+        start = int(np.searchsorted(self.range_dates, min(xmin, xmax), side='left'))
+        end = int(np.searchsorted(self.range_dates, max(xmin, xmax), side='right')) - 1
+        stats = self.range_stats.query(start, end)
+        if stats is None or stats['days'] == 0:
+            self.range_label.setText("所选区间内不足两个交易日")
+            return
+        dates = mdates.num2date(self.range_dates[[stats['start'], stats['end']]])
+        volatility = "N/A" if np.isnan(stats['volatility']) else f"{stats['volatility']:.2f}%"
+        self.range_label.setText(
+            f"{dates[0]:%Y-%m-%d} ~ {dates[1]:%Y-%m-%d}（{stats['days']}个交易日）  "
+            f"收益 {stats['return']:+.2f}%  最大回撤 {stats['max_drawdown']:.2f}%  "
+            f"年化波动率 {volatility}  上涨天数占比 {stats['up_ratio']:.0%}  "
+            f"最长连涨 {stats['longest_up']}天  最长连跌 {stats['longest_down']}天"
+        )
+    
+    def reset_window_lines(self):
+        """净值图清空后，参数滑块不再指向旧的线"""
+        self.net_value_kernel = None
+        self.ma_line = None
+        self.bb_lines = None
+        self.bb_fill = None
+        self.net_value_dates = None
+    
+    def apply_window_settings(self):
+        """按滑块的均线周期和布林带参数更新图中的线（每次只做几次O(n)相减）"""
+        if self.net_value_kernel is None or self.ma_line is None:
+            return False
+        kernel = self.net_value_kernel
+        ma_window = self.ma_window_slider.value()
+        bb_window = self.bb_window_slider.value()
+        num_std = self.bb_width_slider.value() / 10
+        self.window_label.setText(f"MA{ma_window}  BOLL({bb_window}, {num_std:.1f})")
+        
+        self.ma_line.set_ydata(kernel.mean(ma_window))
+        self.ma_line.set_label(f"{ma_window}日均线")
+        _, upper, lower = indicators.bollinger_bands(kernel.mean(bb_window), kernel.std(bb_window), num_std)
+        self.bb_lines[0].set_ydata(upper)
+        self.bb_lines[1].set_ydata(lower)
+        if self.bb_fill is not None:
+            self.bb_fill.remove()
+        self.bb_fill = self.net_value_ax.fill_between(self.net_value_dates, upper, lower, color='gray', alpha=0.1)
+        return True
+    
+    def handle_window_change(self, _value=None):
+        """拖动参数滑块：实时重绘均线和布林带"""
+        if self.apply_window_settings():
+            self.net_value_ax.legend()
+            self.net_value_canvas.draw_idle()
+    
+    def handle_timeline_scrub(self, index):
+        """拖动历史回看滑块：直接查询预先计算好的时间线"""
+        if self.timeline is None or not 0 <= index < len(self.timeline):
+            return
+        self.show_timeline_info(index)
+        if self.timeline_cursor is not None:
+            x = self.timeline_dates[index]
+            self.timeline_cursor.set_xdata([x, x])
+            self.net_value_canvas.draw_idle()
+    
+    def show_timeline_info(self, index):
+        """显示某日的历史信号"""
+        info = self.timeline.at_index(index)
+        self.timeline_label.setText(
+            f"{info['date']}  {info['band_text']}  回撤 {info['drawdown']:.1f}%  "
+            f"胜率 {info['win_rate']:.2f}  反转概率 {info['reversal_prob']:.2f}  "
+            f"建议: {info['level_text']}"
+        )
+    
+    def update_band_signal_chart(self, series):
+        """更新波段信号图表"""
+        # 确保数据存在
+        if series.empty:
             return
         
         try:
-            # 转换日期格式
-            dates = pd.to_datetime(df['日期'])
-            values = df['净值'].astype(float)
+            # 直接使用类型化数组，无需再次解析
+            dates = series.date_series()
+            values = series.nav_series()
             
             # 优化：对于大数据集，限制绘制的数据点数量
             max_points = 1000
@@ -1096,129 +2148,21 @@ class FundGUI(QMainWindow):
                                   bbox=dict(facecolor='red', alpha=0.2))
             self.band_signal_canvas.draw()
     
-    def update_magic_reversal_chart(self, df):
+    def update_magic_reversal_chart(self, series):
         """更新神奇反转图表"""
-        # 确保净值列存在
-        if '净值' not in df.columns:
+        # 确保数据存在
+        if series.empty:
             return
         
         try:
-            # 计算连续涨跌天数和幅度
-            values = df['净值'].astype(float)
-            changes = np.diff(values)
-            direction = np.sign(changes)
-            change_percent = changes / values[:-1] * 100  # 涨跌幅百分比
-            
-            # 计算连续涨跌天数和累计幅度
-            consecutive_days = []
-            current_streak = 0
-            current_direction = 0
-            current_total_change = 0
-            
-            for d, change_pct in zip(direction, change_percent):
-                if d == current_direction and d != 0:
-                    current_streak += 1
-                    current_total_change += change_pct
-                else:
-                    if current_direction != 0:
-                        consecutive_days.append((current_streak, current_direction, current_total_change))
-                    current_streak = 1 if d != 0 else 0
-                    current_direction = d
-                    current_total_change = change_pct if d != 0 else 0
-            
-            if current_direction != 0:
-                consecutive_days.append((current_streak, current_direction, current_total_change))
-            
-            # 计算技术指标
-            # 1. 波动率
-            volatility = values.pct_change().rolling(window=20).std() * np.sqrt(252) * 100  # 年化波动率
-            current_volatility = volatility.iloc[-1] if not pd.isna(volatility.iloc[-1]) else 0
-            
-            # 2. RSI
-            def calculate_rsi(data, window=14):
-                delta = data.diff()
-                gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-                rs = gain / loss
-                rsi = 100 - (100 / (1 + rs))
-                return rsi
-            
-            rsi = calculate_rsi(values)
-            current_rsi = rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else 50
-            
-            # 分析历史反转情况
-            def analyze_reversals(consecutive_days):
-                reversals = []
-                for i in range(1, len(consecutive_days)):
-                    prev_streak, prev_dir, prev_change = consecutive_days[i-1]
-                    curr_streak, curr_dir, curr_change = consecutive_days[i]
-                    # 如果方向相反，视为一次反转
-                    if prev_dir != curr_dir:
-                        reversals.append({
-                            'prev_streak': prev_streak,
-                            'prev_dir': prev_dir,
-                            'prev_change': prev_change,
-                            'curr_streak': curr_streak,
-                            'curr_dir': curr_dir,
-                            'curr_change': curr_change
-                        })
-                return reversals
-            
-            reversals = analyze_reversals(consecutive_days)
-            
-            # 计算反转概率（升级版）
-            def calculate_reversal_probability(streak, direction, total_change, volatility, rsi, reversals):
-                # 基础概率：基于连续天数
-                base_prob = min(0.9, streak * 0.15)
-                
-                # 考虑涨跌幅度
-                magnitude_factor = 1.0
-                if abs(total_change) > 10:
-                    magnitude_factor = 1.3  # 大幅涨跌增加反转概率
-                elif abs(total_change) < 2:
-                    magnitude_factor = 0.7  # 小幅涨跌减少反转概率
-                
-                # 考虑波动率
-                volatility_factor = 1.0
-                if volatility > 30:
-                    volatility_factor = 1.2  # 高波动增加反转概率
-                elif volatility < 15:
-                    volatility_factor = 0.8  # 低波动减少反转概率
-                
-                # 考虑RSI
-                rsi_factor = 1.0
-                if direction > 0 and rsi > 70:
-                    rsi_factor = 1.4  # 超买增加反转概率
-                elif direction < 0 and rsi < 30:
-                    rsi_factor = 1.4  # 超卖增加反转概率
-                
-                # 考虑历史反转情况
-                history_factor = 1.0
-                if reversals:
-                    # 计算历史平均反转概率
-                    similar_reversals = [r for r in reversals if abs(r['prev_streak'] - streak) <= 2]
-                    if similar_reversals:
-                        avg_prev_streak = np.mean([r['prev_streak'] for r in similar_reversals])
-                        if avg_prev_streak > streak:
-                            history_factor = 1.2  # 历史上类似情况反转概率高
-                        else:
-                            history_factor = 0.9  # 历史上类似情况反转概率低
-                
-                # 综合概率
-                prob = base_prob * magnitude_factor * volatility_factor * rsi_factor * history_factor
-                prob = min(0.95, max(0.05, prob))  # 限制在0.05-0.95之间
-                
-                return prob
+            # 波动率（最近20个交易日收益率的年化波动率）
+            current_volatility = risk.profile_for(series, self.risk_cache).metrics(window=21)['volatility']
+            current_volatility = 0 if np.isnan(current_volatility) else current_volatility
             
-            # 计算不同连续天数的反转概率
-            max_streak = max([abs(day) for day, _, _ in consecutive_days]) if consecutive_days else 1
-            reversal_probabilities = []
-            streak_range = range(1, max_streak + 1)
-            
-            for streak in streak_range:
-                # 假设当前为上涨趋势，计算反转概率
-                prob = calculate_reversal_probability(streak, 1, streak * 0.5, current_volatility, 70, reversals)
-                reversal_probabilities.append(prob)
+            # 连续涨跌、历史反转和各连续天数的反转概率（见 fund_core.analysis.reversal_analysis）
+            reversal = analysis.reversal_analysis(series.navs, current_volatility)
+            reversal_probabilities = reversal['curve']
+            streak_range = range(1, len(reversal_probabilities) + 1)
             
             # 绘制图表
             self.magic_reversal_ax.clear()
@@ -1246,9 +2190,10 @@ class FundGUI(QMainWindow):
                                              ha='center', va='bottom', fontsize=8)
             
             # 显示当前连续涨跌状态
-            if consecutive_days:
-                current_streak, current_direction, current_total_change = consecutive_days[-1]
-                if current_direction > 0:
+            if reversal['segments']:
+                current_streak = abs(reversal['streak'])
+                current_total_change = reversal['total_change']
+                if reversal['direction'] > 0:
                     streak_status = f"当前连涨: {current_streak}天 (累计+{current_total_change:.2f}%)"
                     streak_color = 'red'
                 else:
@@ -1261,28 +2206,14 @@ class FundGUI(QMainWindow):
                                          fontsize=10, 
                                          bbox=dict(facecolor=streak_color, alpha=0.2))
                 
-                # 计算并显示当前反转概率
-                current_prob = calculate_reversal_probability(current_streak, current_direction, current_total_change, current_volatility, current_rsi, reversals)
-                self.magic_reversal_ax.text(0.05, 0.85, f"反转概率: {current_prob:.2f}", 
+                # 显示当前反转概率
+                self.magic_reversal_ax.text(0.05, 0.85, f"反转概率: {reversal['detail_probability']:.2f}", 
                                          transform=self.magic_reversal_ax.transAxes, 
                                          fontsize=10, 
                                          bbox=dict(facecolor='blue', alpha=0.2))
                 
                 # 添加市场环境信息
-                market_env = ""
-                if current_volatility > 30:
-                    market_env += "高波动 "
-                elif current_volatility < 15:
-                    market_env += "低波动 "
-                
-                if current_rsi > 70:
-                    market_env += "超买"
-                elif current_rsi < 30:
-                    market_env += "超卖"
-                else:
-                    market_env += "正常"
-                
-                self.magic_reversal_ax.text(0.05, 0.75, f"市场环境: {market_env}", 
+                self.magic_reversal_ax.text(0.05, 0.75, f"市场环境: {reversal['market_env']}", 
                                          transform=self.magic_reversal_ax.transAxes, 
                                          fontsize=10, 
                                          bbox=dict(facecolor='yellow', alpha=0.2))
@@ -1310,206 +2241,19 @@ class FundGUI(QMainWindow):
                                      bbox=dict(facecolor='red', alpha=0.2))
             self.magic_reversal_canvas.draw()
     
-    def update_purchase_advice(self, df):
+    def update_purchase_advice(self, series):
         """更新购买建议文本框"""
-        # 确保净值列存在
-        if '净值' not in df.columns:
+        # 确保数据存在
+        if series.empty:
             self.advice_text.setText("数据不足，无法生成购买建议")
             return
         
         try:
-            # 计算技术分析指标
-            values = df['净值'].astype(float)
-            
-            # 1. 移动平均线
-            ma5 = values.rolling(window=5).mean()  # 5日均线
-            ma20 = values.rolling(window=20).mean()  # 20日均线
-            ma60 = values.rolling(window=60).mean()  # 60日均线
-            
-            # 2. 相对强弱指数（RSI）
-            def calculate_rsi(data, window=14):
-                delta = data.diff()
-                gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-                rs = gain / loss
-                rsi = 100 - (100 / (1 + rs))
-                return rsi
-            
-            rsi = calculate_rsi(values)
-            current_rsi = rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else 50
-            
-            # 3. 布林带
-            def calculate_bollinger_bands(data, window=20, num_std=2):
-                ma = data.rolling(window=window).mean()
-                std = data.rolling(window=window).std()
-                upper_band = ma + (std * num_std)
-                lower_band = ma - (std * num_std)
-                return ma, upper_band, lower_band
-            
-            bb_ma, upper_band, lower_band = calculate_bollinger_bands(values)
-            current_upper_band = upper_band.iloc[-1] if not pd.isna(upper_band.iloc[-1]) else values.iloc[-1]
-            current_lower_band = lower_band.iloc[-1] if not pd.isna(lower_band.iloc[-1]) else values.iloc[-1]
-            
-            # 4. MACD
-            def calculate_macd(data, fast_period=12, slow_period=26, signal_period=9):
-                exp1 = data.ewm(span=fast_period, adjust=False).mean()
-                exp2 = data.ewm(span=slow_period, adjust=False).mean()
-                macd = exp1 - exp2
-                signal = macd.ewm(span=signal_period, adjust=False).mean()
-                histogram = macd - signal
-                return macd, signal, histogram
-            
-            macd, macd_signal, macd_hist = calculate_macd(values)
-            
-            # 5. 回撤率
-            import numpy as np
-            running_max = np.maximum.accumulate(values)
-            drawdown = (values - running_max) / running_max * 100
-            current_drawdown = drawdown.iloc[-1] if not pd.isna(drawdown.iloc[-1]) else 0
-            
-            # 6. 连续涨跌分析
-            changes = np.diff(values)
-            direction = np.sign(changes)
-            change_percent = changes / values[:-1] * 100  # 涨跌幅百分比
-            
-            # 计算连续涨跌天数和累计幅度
-            consecutive_days = []
-            current_streak = 0
-            current_direction = 0
-            current_total_change = 0
-            
-            for d, change_pct in zip(direction, change_percent):
-                if d == current_direction and d != 0:
-                    current_streak += 1
-                    current_total_change += change_pct
-                else:
-                    if current_direction != 0:
-                        consecutive_days.append((current_streak, current_direction, current_total_change))
-                    current_streak = 1 if d != 0 else 0
-                    current_direction = d
-                    current_total_change = change_pct if d != 0 else 0
-            
-            if current_direction != 0:
-                consecutive_days.append((current_streak, current_direction, current_total_change))
-            
-            # 获取当前连续涨跌状态
-            current_streak = 0
-            current_direction = 0
-            current_total_change = 0
-            if consecutive_days:
-                current_streak, current_direction, current_total_change = consecutive_days[-1]
-            
-            # 分析市场状态和生成建议
-            market_status = ""
-            advice = ""
-            advice_level = "neutral"
-            
-            # 基于多指标综合分析
-            buy_score = 0
-            
-            # RSI分析
-            if current_rsi < 30:
-                market_status += "超卖状态，"
-                buy_score += 3
-            elif current_rsi > 70:
-                market_status += "超买状态，"
-                buy_score -= 3
-            else:
-                market_status += "正常状态，"
-            
-            # 布林带分析
-            current_value = values.iloc[-1]
-            if current_value <= current_lower_band:
-                market_status += "触及布林带下轨，"
-                buy_score += 3
-            elif current_value >= current_upper_band:
-                market_status += "触及布林带上轨，"
-                buy_score -= 3
-            
-            # 回撤分析
-            if current_drawdown < -20:
-                market_status += "深度回撤，"
-                buy_score += 4
-            elif current_drawdown < -10:
-                market_status += "中度回撤，"
-                buy_score += 2
-            elif current_drawdown < -5:
-                market_status += "轻度回撤，"
-                buy_score += 1
-            
-            # 均线分析
-            if not pd.isna(ma5.iloc[-1]) and not pd.isna(ma20.iloc[-1]):
-                if ma5.iloc[-1] > ma20.iloc[-1] > ma60.iloc[-1]:
-                    market_status += "多头排列，"
-                    buy_score += 2
-                elif ma5.iloc[-1] < ma20.iloc[-1] < ma60.iloc[-1]:
-                    market_status += "空头排列，"
-                    buy_score -= 2
-            
-            # MACD分析
-            if not pd.isna(macd.iloc[-1]) and not pd.isna(macd_signal.iloc[-1]):
-                if macd.iloc[-1] > macd_signal.iloc[-1]:
-                    market_status += "MACD金叉，"
-                    buy_score += 2
-                else:
-                    market_status += "MACD死叉，"
-                    buy_score -= 2
-            
-            # 连续涨跌分析
-            if current_streak >= 3:
-                if current_direction > 0:
-                    market_status += f"连续上涨{current_streak}天，"
-                    buy_score -= 1  # 连续上涨过多可能回调
-                else:
-                    market_status += f"连续下跌{current_streak}天，"
-                    buy_score += 1  # 连续下跌过多可能反弹
-            
-            # 确定建议级别
-            if buy_score >= 6:
-                advice_level = "strong_buy"
-                advice = "强烈推荐购买：多指标显示当前为极佳买点，建议积极布局。"
-            elif buy_score >= 3:
-                advice_level = "buy"
-                advice = "推荐购买：当前市场处于较好买入区间，建议适量配置。"
-            elif buy_score >= -2:
-                advice_level = "neutral"
-                advice = "观望：市场处于震荡区间，建议暂时观望或小额试探性建仓。"
-            elif buy_score >= -4:
-                advice_level = "sell"
-                advice = "不推荐购买：市场处于弱势，建议等待更好买点。"
-            else:
-                advice_level = "strong_sell"
-                advice = "强烈不推荐购买：多指标显示当前风险较高，建议避免入场。"
-            
-            # 建议级别文本和颜色
-            level_text = {
-                'strong_buy': '强烈推荐购买',
-                'buy': '推荐购买',
-                'neutral': '观望',
-                'sell': '不推荐购买',
-                'strong_sell': '强烈不推荐购买'
-            }.get(advice_level, '观望')
-            
-            level_color = {
-                'strong_buy': 'green',
-                'buy': 'lightgreen',
-                'neutral': 'blue',
-                'sell': 'orange',
-                'strong_sell': 'red'
-            }.get(advice_level, 'blue')
-            
-            # 生成完整建议文本
-            full_advice = f"{market_status[:-1]}。\n\n"
-            full_advice += f"{advice}\n\n"
-            full_advice += f"当前指标：\n"
-            full_advice += f"RSI: {current_rsi:.1f}\n"
-            full_advice += f"回撤率: {current_drawdown:.1f}%\n"
-            if current_streak > 0:
-                trend = "上涨" if current_direction > 0 else "下跌"
-                full_advice += f"连续{trend}: {current_streak}天\n"
-                if current_total_change != 0:
-                    full_advice += f"累计幅度: {current_total_change:.2f}%\n"
-            full_advice += f"建议级别: <span style='color:{level_color}; font-weight:bold'>{level_text}</span>"
+            # 多指标评分（见 fund_core.analysis.purchase_advice）
+            result = analysis.purchase_advice(series.navs)
+            full_advice = analysis.purchase_message(result).replace("\n", "<br>")
+            full_advice += (f"<br>建议级别: <span style='color:{result['level_color']}; font-weight:bold'>"
+                            f"{result['level_text']}</span>")
             
             # 更新建议文本框
             self.advice_text.setText(full_advice)
@@ -1519,20 +2263,17 @@ class FundGUI(QMainWindow):
             print(f"更新购买建议失败: {e}")
             self.advice_text.setText("生成购买建议时出错，请稍后重试")
     
-    def update_drawdown_chart(self, df):
+    def update_drawdown_chart(self, series):
         """更新回撤抄底图表"""
-        # 确保日期列存在
-        if '日期' not in df.columns:
-            return
-        
-        # 确保净值列存在
-        if '净值' not in df.columns:
+        # 确保数据存在
+        if series.empty:
             return
         
+        self.detach_crosshair('drawdown')
         try:
-            # 转换日期格式
-            dates = pd.to_datetime(df['日期'])
-            values = df['净值'].astype(float)
+            # 直接使用类型化数组，无需再次解析
+            dates = series.date_series()
+            values = series.nav_series()
             
             # 优化：对于大数据集，限制绘制的数据点数量
             max_points = 1000
@@ -1541,68 +2282,16 @@ class FundGUI(QMainWindow):
                 dates = dates[::step]
                 values = values[::step]
             
-            # 计算回撤率
-            import numpy as np
-            running_max = np.maximum.accumulate(values)
-            drawdown = (values - running_max) / running_max * 100
-            
-            # 计算其他技术分析指标
-            # 1. 波动率
-            volatility = values.pct_change().rolling(window=20).std() * np.sqrt(252) * 100  # 年化波动率
-            
-            # 2. MACD
-            def calculate_macd(data, fast_period=12, slow_period=26, signal_period=9):
-                exp1 = data.ewm(span=fast_period, adjust=False).mean()
-                exp2 = data.ewm(span=slow_period, adjust=False).mean()
-                macd = exp1 - exp2
-                signal = macd.ewm(span=signal_period, adjust=False).mean()
-                histogram = macd - signal
-                return macd, signal, histogram
-            
-            macd, macd_signal, macd_hist = calculate_macd(values)
-            
-            # 3. 回撤持续时间
-            def calculate_drawdown_duration(drawdown):
-                duration = []
-                current_duration = 0
-                for d in drawdown:
-                    if d < 0:
-                        current_duration += 1
-                    else:
-                        current_duration = 0
-                    duration.append(current_duration)
-                return pd.Series(duration, index=drawdown.index)
-            
-            drawdown_duration = calculate_drawdown_duration(drawdown)
-            
-            # 4. 回撤恢复情况分析
-            def analyze_drawdown_recovery(drawdown):
-                recoveries = []
-                in_drawdown = False
-                drawdown_start = 0
-                max_drawdown_in_period = 0
-                
-                for i, d in enumerate(drawdown):
-                    if d < 0 and not in_drawdown:
-                        in_drawdown = True
-                        drawdown_start = i
-                        max_drawdown_in_period = d
-                    elif d < 0 and in_drawdown:
-                        if d < max_drawdown_in_period:
-                            max_drawdown_in_period = d
-                    elif d >= 0 and in_drawdown:
-                        in_drawdown = False
-                        recovery_period = i - drawdown_start
-                        if recovery_period > 0:
-                            recoveries.append({
-                                'start': drawdown_start,
-                                'end': i,
-                                'duration': recovery_period,
-                                'max_drawdown': max_drawdown_in_period
-                            })
-                return recoveries
-            
-            drawdown_recoveries = analyze_drawdown_recovery(drawdown)
+            # 回撤率（按抽样后的数据绘制）和已结束的回撤区间
+            drawdown = pd.Series(indicators.drawdown(values.to_numpy()), index=values.index)
+            drawdown_recoveries = analysis.drawdown_recoveries(drawdown.to_numpy())
+            
+            # 波动率（使用完整数据计算，不受抽样影响）
+            current_volatility = risk.profile_for(series, self.risk_cache).metrics(window=21)['volatility']
+            current_volatility = 0 if np.isnan(current_volatility) else current_volatility
+            
+            # 回撤指标、抄底胜率和市场状态（使用完整数据，见 fund_core.analysis.drawdown_analysis）
+            stats = analysis.drawdown_analysis(series, self.recovery_universe)
             
             # 绘制图表
             self.drawdown_ax.clear()
@@ -1614,76 +2303,13 @@ class FundGUI(QMainWindow):
             self.drawdown_ax.fill_between(dates, drawdown, -20, where=(drawdown < -15), color='red', alpha=0.2, label='抄底区')
             self.drawdown_ax.fill_between(dates, drawdown, -10, where=(drawdown < -10) & (drawdown >= -15), color='orange', alpha=0.2, label='关注区')
             
-            # 计算关键回撤指标
-            current_drawdown = drawdown.iloc[-1]
-            max_drawdown = min(drawdown)
-            drawdown_diff = max_drawdown - current_drawdown
-            current_duration = drawdown_duration.iloc[-1]
-            current_volatility = volatility.iloc[-1] if not pd.isna(volatility.iloc[-1]) else 0
-            
-            # 计算抄底胜率（升级版）
-            def calculate_bottom_win_rate(current_drawdown, current_duration, current_volatility, drawdown_recoveries):
-                # 基础胜率
-                base_win_rate = 0
-                if current_drawdown < -20:
-                    base_win_rate = 0.8
-                elif current_drawdown < -15:
-                    base_win_rate = 0.65
-                elif current_drawdown < -10:
-                    base_win_rate = 0.45
-                elif current_drawdown < -5:
-                    base_win_rate = 0.3
-                else:
-                    base_win_rate = 0.1
-                
-                # 考虑回撤持续时间
-                duration_factor = min(1.5, 1 + current_duration / 30)  # 持续时间越长，胜率越高
-                
-                # 考虑波动率
-                volatility_factor = 1.0
-                if current_volatility > 30:
-                    volatility_factor = 0.8  # 高波动降低胜率
-                elif current_volatility < 15:
-                    volatility_factor = 1.2  # 低波动提高胜率
-                
-                # 考虑历史回撤恢复情况
-                recovery_factor = 1.0
-                if drawdown_recoveries:
-                    avg_recovery_duration = np.mean([r['duration'] for r in drawdown_recoveries])
-                    avg_max_drawdown = np.mean([abs(r['max_drawdown']) for r in drawdown_recoveries])
-                    if avg_recovery_duration < 20:
-                        recovery_factor = 1.3  # 历史恢复快，提高胜率
-                    elif avg_recovery_duration > 60:
-                        recovery_factor = 0.8  # 历史恢复慢，降低胜率
-                
-                # 综合胜率
-                win_rate = base_win_rate * duration_factor * volatility_factor * recovery_factor
-                win_rate = min(0.95, max(0.05, win_rate))  # 限制在0.05-0.95之间
-                
-                return win_rate
-            
-            win_rate = calculate_bottom_win_rate(current_drawdown, current_duration, current_volatility, drawdown_recoveries)
-            
-            # 胜率等级判定
-            if win_rate >= 0.7:
-                bottom_win_rate = f"高胜率 ({win_rate:.2f})"
-                win_rate_color = 'green'
-            elif win_rate >= 0.4:
-                bottom_win_rate = f"中等胜率 ({win_rate:.2f})"
-                win_rate_color = 'orange'
-            else:
-                bottom_win_rate = f"低胜率 ({win_rate:.2f})"
-                win_rate_color = 'red'
-            
-            # 计算当前市场状态
-            current_macd = macd.iloc[-1] if not pd.isna(macd.iloc[-1]) else 0
-            current_macd_signal = macd_signal.iloc[-1] if not pd.isna(macd_signal.iloc[-1]) else 0
-            
-            market_status = "震荡"
-            if current_macd > current_macd_signal and current_drawdown > -10:
-                market_status = "上升"
-            elif current_macd < current_macd_signal and current_drawdown < -15:
-                market_status = "下跌"
+            current_drawdown = stats['current_drawdown']
+            max_drawdown = stats['max_drawdown']
+            current_duration = stats['duration']
+            market_status = stats['market_status']
+            win_rate_text = f"{stats['win_level']} ({stats['win_rate']:.2f})"
+            win_rate_color = stats['win_color']
+            win_source = stats['win_source']
             
             # 添加回撤指标文本
             self.drawdown_ax.text(0.05, 0.95, f"当前回撤: {current_drawdown:.2f}%", 
@@ -1706,7 +2332,7 @@ class FundGUI(QMainWindow):
                                transform=self.drawdown_ax.transAxes, 
                                fontsize=10, 
                                bbox=dict(facecolor='cyan', alpha=0.2))
-            self.drawdown_ax.text(0.05, 0.60, f"抄底胜率: {bottom_win_rate}", 
+            self.drawdown_ax.text(0.05, 0.60, f"抄底胜率: {win_rate_text} - {win_source}", 
                                transform=self.drawdown_ax.transAxes, 
                                fontsize=10, 
                                bbox=dict(facecolor=win_rate_color, alpha=0.2))
@@ -1735,6 +2361,9 @@ class FundGUI(QMainWindow):
             # 自动调整日期标签角度
             self.drawdown_figure.autofmt_xdate()
             
+            # 悬停十字线（使用完整数据的回撤率）
+            self.attach_crosshair('drawdown', self.drawdown_ax, series, graph.frame_for(series)['drawdown'])
+            
             # 绘制
             self.drawdown_canvas.draw()
         except Exception as e:
@@ -1748,117 +2377,53 @@ class FundGUI(QMainWindow):
                                bbox=dict(facecolor='red', alpha=0.2))
             self.drawdown_canvas.draw()
     
-    def update_table(self, df):
+    def update_table(self, series):
         """更新表格"""
         # 清空表格
         self.table.setRowCount(0)
         
-        # 按日期降序排序，确保最近的数据显示在上面
-        if '日期' in df.columns:
-            try:
-                # 尝试转换日期格式并排序
-                df_sorted = df.sort_values(by='日期', ascending=False)
-            except:
-                # 如果排序失败，使用原始数据
-                df_sorted = df
-        else:
-            df_sorted = df
+        # 按日期降序显示，确保最近的数据显示在上面（序列已按日期升序排列）
+        date_strings = series.date_strings()[::-1]
+        navs = series.navs[::-1]
+        changes = series.daily_change()[::-1]
         
-        # 添加数据行
-        for index, row in df_sorted.iterrows():
-            row_position = self.table.rowCount()
-            self.table.insertRow(row_position)
-            
+        # 一次性设置行数，避免逐行插入
+        self.table.setRowCount(len(navs))
+        for row_position in range(len(navs)):
             # 日期
-            if '日期' in row:
-                date_item = QTableWidgetItem(str(row['日期']))
-                self.table.setItem(row_position, 0, date_item)
+            self.table.setItem(row_position, 0, QTableWidgetItem(str(date_strings[row_position])))
             
             # 净值
-            if '净值' in row:
-                value_item = QTableWidgetItem(str(row['净值']))
-                self.table.setItem(row_position, 1, value_item)
+            self.table.setItem(row_position, 1, QTableWidgetItem(f"{navs[row_position]:.4f}"))
             
             # 日增长率
-            if '日增长率' in row:
-                growth_item = QTableWidgetItem(str(row['日增长率']))
-                self.table.setItem(row_position, 2, growth_item)
-            elif '日涨幅' in row:
-                growth_item = QTableWidgetItem(str(row['日涨幅']))
-                self.table.setItem(row_position, 2, growth_item)
-    
-    def calculate_fund_analysis(self, df, fund_code):
-        """计算基金分析数据"""
-        analysis = {
+            change = changes[row_position]
+            growth_text = f"{change:.2f}" if not np.isnan(change) else ""
+            self.table.setItem(row_position, 2, QTableWidgetItem(growth_text))
+    
+    def calculate_fund_analysis(self, series, fund_code):
+        """计算基金分析数据（近一年涨跌幅在完整历史中查找，不再单独请求网络）"""
+        fund_analysis = {
             'current_nav': '',
             'today_change': '',
             'one_year_change': ''
         }
         
-        if not df.empty and '净值' in df.columns:
+        if not series.empty:
             try:
-                # 获取当前净值
-                values = df['净值'].astype(float)
-                current_nav = values.iloc[-1]
-                analysis['current_nav'] = f"{current_nav:.4f}"
-                
-                # 计算今日涨跌幅
-                if len(values) >= 2:
-                    today_change = (values.iloc[-1] - values.iloc[-2]) / values.iloc[-2] * 100
-                    analysis['today_change'] = f"{today_change:+.2f}%"
-                
-                # 计算近一年涨跌幅
-                # 找到一年前的日期
-                one_year_ago = pd.Timestamp.now() - pd.DateOffset(years=1)
-                
-                # 尝试从当前数据集中找到一年前的净值
-                one_year_ago_nav = None
-                if '日期' in df.columns:
-                    df['日期'] = pd.to_datetime(df['日期'])
-                    one_year_ago_df = df[df['日期'] <= one_year_ago]
-                    if not one_year_ago_df.empty:
-                        one_year_ago_nav = one_year_ago_df['净值'].iloc[-1].astype(float)
-                
-                # 如果当前数据集不包含一年前的数据，单独获取基金的历史数据
-                if one_year_ago_nav is None:
-                    try:
-                        # 获取基金的历史数据
-                        # 首先尝试获取场外基金数据
-                        history_df = SafeRequest.request(
-                            ak.fund_open_fund_info_em,
-                            symbol=fund_code,
-                            indicator="单位净值走势"
-                        )
-                        
-                        # 如果场外基金数据为空，尝试获取ETF数据
-                        if history_df.empty or '净值日期' not in history_df.columns:
-                            history_df = SafeRequest.request(ak.fund_etf_hist_sina, symbol=fund_code)
-                        
-                        # 处理数据
-                        if not history_df.empty:
-                            # 统一数据格式
-                            if '净值日期' in history_df.columns:
-                                history_df.rename(columns={'净值日期': '日期'}, inplace=True)
-                            if '单位净值' in history_df.columns:
-                                history_df.rename(columns={'单位净值': '净值'}, inplace=True)
-                            
-                            # 找到一年前或最接近一年前的净值
-                            if '日期' in history_df.columns:
-                                history_df['日期'] = pd.to_datetime(history_df['日期'])
-                                one_year_ago_history_df = history_df[history_df['日期'] <= one_year_ago]
-                                if not one_year_ago_history_df.empty:
-                                    one_year_ago_nav = one_year_ago_history_df['净值'].iloc[-1].astype(float)
-                    except Exception as e:
-                        print(f"获取历史数据失败: {e}")
+                overview = analysis.fund_overview(series)
+                fund_analysis['current_nav'] = f"{overview['current_nav']:.4f}"
+                if overview['today_change'] is not None:
+                    fund_analysis['today_change'] = f"{overview['today_change']:+.2f}%"
+                if overview['one_year_change'] is not None:
+                    fund_analysis['one_year_change'] = f"{overview['one_year_change']:+.2f}%"
                 
-                # 计算近一年涨跌幅
-                if one_year_ago_nav is not None:
-                    one_year_change = (current_nav - one_year_ago_nav) / one_year_ago_nav * 100
-                    analysis['one_year_change'] = f"{one_year_change:+.2f}%"
+                # 风险指标（查询区间内）
+                fund_analysis['risk'] = risk.profile_for(series, self.risk_cache).metrics()
             except Exception as e:
                 print(f"计算基金分析数据失败: {e}")
         
-        return analysis
+        return fund_analysis
     
     def show_fund_info(self, fund_info, fund_code, fund_type, fund_analysis=None):
         """显示基金基本信息"""
@@ -1882,6 +2447,10 @@ class FundGUI(QMainWindow):
             info_text += f" | 净值: {fund_analysis.get('current_nav', 'N/A')}"
             info_text += f" | 今日涨跌幅: {fund_analysis.get('today_change', 'N/A')}"
             info_text += f" | 近一年涨跌幅: {fund_analysis.get('one_year_change', 'N/A')}"
+            metrics = fund_analysis.get('risk')
+            if metrics:
+                for key in ('annual_return', 'volatility', 'sharpe', 'max_drawdown'):
+                    info_text += f" | {risk.METRIC_LABELS[key]}: {risk.format_metric(key, metrics[key])}"
         
         info_label = QLabel(info_text)
         info_label.setStyleSheet("color: #333; font-size: 9pt;")
@@ -1903,12 +2472,36 @@ class FundGUI(QMainWindow):
             filename = f"fund_{fund_code}_{timestamp}.csv"
             
             # 导出为CSV
-            self.current_data.to_csv(filename, index=False, encoding='utf-8-sig')
+            self.current_data.to_frame().to_csv(filename, index=False, encoding='utf-8-sig')
             
-            QMessageBox.information(self, "成功", f"数据已导出到 {filename}")
+            # 风险指标单独导出
+            risk_filename = f"fund_{fund_code}_{timestamp}_risk.csv"
+            metrics = risk.profile_for(self.current_data, self.risk_cache).metrics()
+            pd.DataFrame(risk.metrics_rows(metrics), columns=['指标', '数值']).to_csv(
+                risk_filename, index=False, encoding='utf-8-sig')
+            
+            QMessageBox.information(self, "成功", f"数据已导出到 {filename}\n风险指标已导出到 {risk_filename}")
         except Exception as e:
             QMessageBox.warning(self, "错误", f"导出失败: {str(e)}")
     
+    def show_dca_simulation(self):
+        """显示定投模拟对话框"""
+        if not hasattr(self, 'current_data') or self.current_data.empty:
+            QMessageBox.warning(self, "错误", "没有可用于定投模拟的数据")
+            return
+        
+        fund_name = self.current_fund_info.get('基金名称', '') if hasattr(self, 'current_fund_info') else ''
+        dialog = DcaDialog(self, self.current_data, fund_name)
+        dialog.exec_()
+    
+    def show_scenarios(self):
+        """显示估值情景分析（在当前数据和已应用的估值之上推演）"""
+        if not hasattr(self, 'current_data') or self.current_data.empty:
+            QMessageBox.warning(self, "数据错误", "请先查询基金数据")
+            return
+        dialog = ScenarioDialog(self, self.current_data)
+        dialog.exec_()
+    
     def show_purchase_advice(self):
         """显示购买建议对话框"""
         if not hasattr(self, 'current_data') or self.current_data.empty:
@@ -1920,237 +2513,15 @@ class FundGUI(QMainWindow):
             advice_data = self.generate_purchase_advice()
             
             # 显示购买建议对话框
-            dialog = PurchaseAdviceDialog(self, advice_data)
+            dialog = PurchaseAdviceDialog(self, advice_data, self.current_data)
             dialog.exec_()
         except Exception as e:
             QMessageBox.warning(self, "错误", f"生成购买建议失败: {str(e)}")
     
     def generate_purchase_advice(self):
-        """生成购买建议数据"""
-        # 基金基本信息
-        fund_code = self.code_input.text().strip()
-        fund_name = self.current_fund_info.get('基金名称', fund_code) if hasattr(self, 'current_fund_info') else fund_code
-        analysis_date = datetime.now().strftime("%Y-%m-%d")
-        
-        # 准备数据
-        df = self.current_data
-        values = df['净值'].astype(float)
-        dates = pd.to_datetime(df['日期'])
-        
-        # 1. 波段信号分析
-        band_signal = self.analyze_band_signal(values, dates)
-        
-        # 2. 回撤抄底分析
-        drawdown = self.analyze_drawdown(values, dates)
-        
-        # 3. 神奇反转分析
-        magic_reversal = self.analyze_magic_reversal(values)
-        
-        # 4. 综合建议
-        summary_advice, advice_level = self.generate_summary_advice(band_signal, drawdown, magic_reversal)
-        
-        # 构建建议数据
-        advice_data = {
-            'fund_code': fund_code,
-            'fund_name': fund_name,
-            'analysis_date': analysis_date,
-            'band_signal': band_signal,
-            'drawdown': drawdown,
-            'magic_reversal': magic_reversal,
-            'summary_advice': summary_advice,
-            'advice_level': advice_level
-        }
-        
-        return advice_data
-    
-    def analyze_band_signal(self, values, dates):
-        """分析波段信号"""
-        # 计算技术指标
-        ma5 = values.rolling(window=5).mean()
-        ma20 = values.rolling(window=20).mean()
-        
-        # 计算RSI
-        def calculate_rsi(data, window=14):
-            delta = data.diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
-            return rsi
-        
-        rsi = calculate_rsi(values)
-        current_rsi = rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else 50
-        
-        # 计算布林带
-        def calculate_bollinger_bands(data, window=20, num_std=2):
-            ma = data.rolling(window=window).mean()
-            std = data.rolling(window=window).std()
-            upper_band = ma + (std * num_std)
-            lower_band = ma - (std * num_std)
-            return ma, upper_band, lower_band
-        
-        bb_ma, upper_band, lower_band = calculate_bollinger_bands(values)
-        current_upper_band = upper_band.iloc[-1] if not pd.isna(upper_band.iloc[-1]) else values.iloc[-1]
-        current_lower_band = lower_band.iloc[-1] if not pd.isna(lower_band.iloc[-1]) else values.iloc[-1]
-        
-        # 信号状态判定
-        current_value = values.iloc[-1]
-        if current_value >= current_upper_band or current_rsi >= 70:
-            status = "高位区 - 谨慎"
-            advice = "不建议购买"
-        elif current_value <= current_lower_band or current_rsi <= 30:
-            status = "低位区 - 关注"
-            advice = "建议购买"
-        else:
-            status = "震荡区 - 观望"
-            advice = "观望"
-        
-        return {
-            'status': status,
-            'rsi': f"{current_rsi:.2f}",
-            'advice': advice
-        }
-    
-    def analyze_drawdown(self, values, dates):
-        """分析回撤抄底"""
-        # 计算回撤率
-        import numpy as np
-        running_max = np.maximum.accumulate(values)
-        drawdown = (values - running_max) / running_max * 100
-        
-        # 计算关键指标
-        current_drawdown = drawdown.iloc[-1]
-        max_drawdown = min(drawdown)
-        
-        # 计算抄底胜率
-        def calculate_bottom_win_rate(current_drawdown):
-            if current_drawdown < -20:
-                return 0.8
-            elif current_drawdown < -15:
-                return 0.65
-            elif current_drawdown < -10:
-                return 0.45
-            elif current_drawdown < -5:
-                return 0.3
-            else:
-                return 0.1
-        
-        win_rate = calculate_bottom_win_rate(current_drawdown)
-        
-        # 建议操作
-        if win_rate >= 0.7:
-            advice = "强烈建议购买"
-        elif win_rate >= 0.4:
-            advice = "建议购买"
-        else:
-            advice = "不建议购买"
-        
-        return {
-            'current_drawdown': f"{current_drawdown:.2f}%",
-            'max_drawdown': f"{max_drawdown:.2f}%",
-            'win_rate': f"{win_rate:.2f}",
-            'advice': advice
-        }
-    
-    def analyze_magic_reversal(self, values):
-        """分析神奇反转"""
-        # 计算连续涨跌天数和幅度
-        changes = np.diff(values)
-        direction = np.sign(changes)
-        
-        # 计算连续涨跌天数
-        consecutive_days = []
-        current_streak = 0
-        current_direction = 0
-        
-        for d in direction:
-            if d == current_direction and d != 0:
-                current_streak += 1
-            else:
-                if current_direction != 0:
-                    consecutive_days.append((current_streak, current_direction))
-                current_streak = 1 if d != 0 else 0
-                current_direction = d
-        
-        if current_direction != 0:
-            consecutive_days.append((current_streak, current_direction))
-        
-        # 计算反转概率
-        if consecutive_days:
-            current_streak, current_direction = consecutive_days[-1]
-            if current_direction > 0:
-                streak_status = f"连涨 {current_streak}天"
-            else:
-                streak_status = f"连跌 {current_streak}天"
-            
-            # 计算反转概率
-            reversal_prob = min(0.9, current_streak * 0.15)
-            
-            # 建议操作
-            if reversal_prob >= 0.7:
-                advice = "建议反向操作"
-            else:
-                advice = "观望"
-        else:
-            streak_status = "无明显趋势"
-            reversal_prob = 0.5
-            advice = "观望"
-        
-        return {
-            'streak': streak_status,
-            'probability': f"{reversal_prob:.2f}",
-            'advice': advice
-        }
-    
-    def generate_summary_advice(self, band_signal, drawdown, magic_reversal):
-        """生成综合建议"""
-        # 评分系统
-        score = 0
-        
-        # 波段信号评分
-        band_advice = band_signal.get('advice', '观望')
-        if band_advice == "建议购买":
-            score += 2
-        elif band_advice == "不建议购买":
-            score -= 2
-        
-        # 回撤抄底评分
-        drawdown_advice = drawdown.get('advice', '观望')
-        if drawdown_advice == "强烈建议购买":
-            score += 3
-        elif drawdown_advice == "建议购买":
-            score += 1
-        elif drawdown_advice == "不建议购买":
-            score -= 1
-        
-        # 神奇反转评分
-        magic_advice = magic_reversal.get('advice', '观望')
-        if magic_advice == "建议反向操作":
-            # 根据当前趋势调整评分
-            streak = magic_reversal.get('streak', '')
-            if "连涨" in streak:
-                score -= 2  # 连涨后反转，不建议购买
-            elif "连跌" in streak:
-                score += 2  # 连跌后反转，建议购买
-        
-        # 确定建议级别
-        if score >= 5:
-            advice_level = 'strong_buy'
-            summary_advice = "综合多个指标分析，当前基金处于较好的买入时机，建议积极购买。"
-        elif score >= 2:
-            advice_level = 'buy'
-            summary_advice = "综合多个指标分析，当前基金存在买入机会，建议适量购买。"
-        elif score >= -2:
-            advice_level = 'neutral'
-            summary_advice = "综合多个指标分析，当前基金处于震荡状态，建议观望为主。"
-        elif score >= -5:
-            advice_level = 'sell'
-            summary_advice = "综合多个指标分析，当前基金不建议购买，建议观望。"
-        else:
-            advice_level = 'strong_sell'
-            summary_advice = "综合多个指标分析，当前基金处于不利状态，强烈不建议购买。"
-        
-        return summary_advice, advice_level
+        """生成购买建议数据（波段、回撤、反转和综合建议，见 fund_core.analysis）"""
+        result = analysis.analyze_fund(self.current_data, self.recovery_universe, self.risk_cache)
+        return analysis.advice_report(result)
     
     def handle_quick_date_change(self, index):
         """处理快速日期选择变化"""
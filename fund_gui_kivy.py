@@ -5,11 +5,9 @@
 """
 
 import sys
-import akshare as ak
 import pandas as pd
 import numpy as np
 from datetime import datetime
-import time as time_module
 import warnings
 import json
 import os
@@ -21,6 +19,8 @@ from kivy.uix.textinput import TextInput
 from kivy.uix.button import Button
 from kivy.uix.tabbedpanel import TabbedPanel, TabbedPanelItem
 from kivy.uix.scrollview import ScrollView
+from kivy.uix.slider import Slider
+from kivy.uix.spinner import Spinner
 from kivy.uix.popup import Popup
 from kivy.uix.datepicker import DatePicker
 from kivy.uix.screenmanager import ScreenManager, Screen
@@ -31,6 +31,10 @@ from matplotlib.figure import Figure
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 
+from fund_core import analysis, correlation, crosshair, graph, risk
+from fund_core.fetch import fetch_fund
+from fund_core.remote import remote_source
+
 # 配置Matplotlib字体
 matplotlib.rcParams.update({
     'font.family': ['SimHei', 'Microsoft YaHei', 'sans-serif'],
@@ -49,26 +53,8 @@ matplotlib.rcParams.update({
 # 忽略所有警告
 warnings.filterwarnings('ignore')
 
-class SafeRequest:
-    """安全请求类：自动重试 + 指数退避"""
-    
-    @staticmethod
-    def request(func, *args, retries=5, delay=1.2, **kwargs):
-        """执行安全请求，自动重试失败的请求"""
-        for i in range(retries):
-            try:
-                time_module.sleep(delay * (0.8 + i * 0.3))  # 智能延迟：1.0~2.5秒
-                result = func(*args, **kwargs)
-                if isinstance(result, pd.DataFrame):
-                    return result if not result.empty else pd.DataFrame()
-                return result
-            except Exception as e:
-                if i == retries - 1:
-                    raise e
-        return pd.DataFrame()
-
 class FundDataFetcher:
-    """基金数据获取类"""
+    """基金数据获取类（数据获取见 fund_core.fetch.fetch_fund）"""
     
     def __init__(self, fund_code, start_date=None, end_date=None):
         """初始化数据获取"""
@@ -77,87 +63,13 @@ class FundDataFetcher:
         self.end_date = end_date
     
     def fetch_data(self):
-        """获取基金数据"""
+        """获取基金数据，返回 (净值序列或None, 基金类型, 基金信息)"""
         try:
-            # 尝试获取场外基金数据
-            df = SafeRequest.request(
-                ak.fund_open_fund_info_em,
-                symbol=self.fund_code,
-                indicator="单位净值走势"
-            )
-            
-            fund_type = "场外基金"
-            fund_info = {}
-            
-            # 获取基金基本信息
-            try:
-                if fund_type == "场外基金":
-                    info_df = SafeRequest.request(
-                        ak.fund_open_fund_info_em,
-                        symbol=self.fund_code,
-                        indicator="基本信息"
-                    )
-                    if not info_df.empty:
-                        fund_info['基金名称'] = info_df.get('基金名称', [''])[0]
-                        fund_info['基金类型'] = info_df.get('基金类型', [''])[0]
-                        fund_info['成立日期'] = info_df.get('成立日期', [''])[0]
-                        fund_info['基金经理'] = info_df.get('基金经理', [''])[0]
-                        fund_info['基金规模'] = info_df.get('基金规模', [''])[0]
-            except Exception as info_error:
-                print(f"获取基金信息失败: {info_error}")
-            
-            # 如果未获取到基金名称，尝试从基金列表中获取
-            if not fund_info.get('基金名称'):
-                try:
-                    fund_list = SafeRequest.request(ak.fund_name_em)
-                    if not fund_list.empty:
-                        # 查找对应基金代码的基金名称
-                        fund_row = fund_list[fund_list['基金代码'] == self.fund_code]
-                        if not fund_row.empty:
-                            fund_info['基金名称'] = fund_row['基金简称'].values[0]
-                except Exception as list_error:
-                    print(f"从基金列表获取基金名称失败: {list_error}")
-            
-            # 如果场外基金数据为空，尝试获取ETF数据
-            if df.empty or '净值日期' not in df.columns:
-                df = SafeRequest.request(ak.fund_etf_hist_sina, symbol=self.fund_code)
-                fund_type = "ETF"
-            
-            # 处理数据
-            if not df.empty:
-                # 统一数据格式
-                if fund_type == "场外基金":
-                    # 重命名列以统一格式
-                    if '净值日期' in df.columns:
-                        df.rename(columns={'净值日期': '日期'}, inplace=True)
-                    if '单位净值' in df.columns:
-                        df.rename(columns={'单位净值': '净值'}, inplace=True)
-                else:  # ETF
-                    if '日期' in df.columns:
-                        # 确保日期格式正确
-                        df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y-%m-%d')
-                    if '单位净值' in df.columns:
-                        df.rename(columns={'单位净值': '净值'}, inplace=True)
-                
-                # 按日期范围过滤数据
-                if self.start_date and self.end_date:
-                    try:
-                        # 确保日期列是 datetime 类型
-                        df['日期'] = pd.to_datetime(df['日期'])
-                        start = pd.to_datetime(self.start_date)
-                        end = pd.to_datetime(self.end_date)
-                        # 过滤日期范围内的数据
-                        df = df[(df['日期'] >= start) & (df['日期'] <= end)]
-                        # 重新格式化为字符串
-                        df['日期'] = df['日期'].dt.strftime('%Y-%m-%d')
-                    except Exception as date_error:
-                        print(f"日期过滤失败: {date_error}")
-                        # 如果日期过滤失败，使用全部数据
-                
-                return df, fund_type, fund_info
-            else:
-                return None, fund_type, fund_info
-                
+            # 配置了分析服务地址时通过服务获取（见 fund_core.remote）
+            source = remote_source()
+            fetch = source.fetch_fund if source is not None else fetch_fund
+            series = fetch(self.fund_code, self.start_date, self.end_date)
+            return (series if not series.empty else None), series.fund_type, series.info
         except Exception as e:
             print(f"获取数据失败: {str(e)[:70]}")
             return None, None, None
@@ -248,6 +160,8 @@ class FundGUI(App):
         self.net_value_ax.set_ylabel("净值")
         self.net_value_ax.grid(True, linestyle='--', alpha=0.7)
         self.net_value_layout.add_widget(self.net_value_canvas)
+        # 净值图和回撤图的悬停十字线（触摸拖动时跟随）
+        self.crosshairs = {}
         net_value_content.add_widget(self.net_value_layout)
         net_value_tab.add_widget(net_value_content)
         self.tab_panel.add_widget(net_value_tab)
@@ -298,6 +212,36 @@ class FundGUI(App):
         table_tab.add_widget(table_content)
         self.tab_panel.add_widget(table_tab)
         
+        # 相关性标签：与对比基金的滚动相关系数（拖动滑块查看各时期）
+        correlation_tab = TabbedPanelItem(text="相关性")
+        correlation_content = BoxLayout(orientation='vertical', spacing=5, padding=10)
+        compare_layout = BoxLayout(orientation='horizontal', spacing=5, size_hint_y=None, height=40)
+        compare_label = Label(text="对比基金:", size_hint_x=0.2)
+        self.compare_input = TextInput(hint_text="例如: 110011 161725", size_hint_x=0.4)
+        self.rolling_windows = {f"{window}日窗口": window for window in correlation.ROLLING_WINDOWS}
+        self.rolling_spinner = Spinner(text=next(iter(self.rolling_windows)), values=list(self.rolling_windows),
+                                       size_hint_x=0.2)
+        self.correlation_button = Button(text="计算", size_hint_x=0.2)
+        self.correlation_button.bind(on_press=self.query_correlation)
+        compare_layout.add_widget(compare_label)
+        compare_layout.add_widget(self.compare_input)
+        compare_layout.add_widget(self.rolling_spinner)
+        compare_layout.add_widget(self.correlation_button)
+        self.correlation_figure = Figure(figsize=(6, 5), dpi=100)
+        self.correlation_canvas = FigureCanvasKivyAgg(self.correlation_figure)
+        # 点击热力图单元格切换下方的基金对走势
+        self.correlation_canvas.mpl_connect('button_press_event', self.on_correlation_click)
+        self.rolling_slider = Slider(min=0, max=0, step=1, size_hint_y=None, height=40)
+        self.rolling_slider.bind(value=self.show_rolling_window)
+        self.correlation_label = Label(text="输入对比基金代码后点击计算", size_hint_y=None, height=40)
+        correlation_content.add_widget(compare_layout)
+        correlation_content.add_widget(self.correlation_canvas)
+        correlation_content.add_widget(self.rolling_slider)
+        correlation_content.add_widget(self.correlation_label)
+        correlation_tab.add_widget(correlation_content)
+        self.tab_panel.add_widget(correlation_tab)
+        self.rolling = None
+        
         # 购买建议区域
         advice_layout = BoxLayout(orientation='vertical', spacing=5, size_hint_y=None, height=150)
         advice_title = Label(text="当日购买建议", bold=True, size_hint_y=None, height=30)
@@ -354,7 +298,7 @@ class FundGUI(App):
         if cache_key in self.chart_data_cache:
             # 使用缓存数据
             cached_data = self.chart_data_cache[cache_key]
-            self.handle_data(cached_data['df'], cached_data['fund_type'], cached_data['fund_info'])
+            self.handle_data(cached_data['series'], cached_data['fund_type'], cached_data['fund_info'])
             self.status_bar.text = "使用缓存数据"
             return
         
@@ -368,15 +312,15 @@ class FundGUI(App):
         # 创建并启动数据获取
         def fetch_data():
             fetcher = FundDataFetcher(fund_code, start_date, end_date)
-            df, fund_type, fund_info = fetcher.fetch_data()
-            Clock.schedule_once(lambda dt: self.handle_data(df, fund_type, fund_info), 0)
+            series, fund_type, fund_info = fetcher.fetch_data()
+            Clock.schedule_once(lambda dt: self.handle_data(series, fund_type, fund_info), 0)
         
         # 在后台线程中执行
         Clock.schedule_once(lambda dt: fetch_data(), 0.1)
     
-    def handle_data(self, df, fund_type, fund_info):
-        """处理获取到的数据"""
-        if df is None:
+    def handle_data(self, series, fund_type, fund_info):
+        """处理获取到的数据（series为FundSeries净值序列）"""
+        if series is None:
             self.status_bar.text = "获取数据失败"
             self.show_popup("错误", "未获取到基金数据")
             return
@@ -388,21 +332,24 @@ class FundGUI(App):
         if fund_name:
             self.fund_name_display.text = fund_name
         
-        # 保存当前数据
-        self.current_data = df
+        # 保存当前数据，估值通过叠加层应用，不修改基础数据
+        if getattr(self, 'valuation', None) is not None:
+            self.valuation.reset()
+        self.current_data = series
+        self.valuation = series.overlay()
         self.current_fund_type = fund_type
         self.current_fund_info = fund_info
         
         # 缓存数据
         cache_key = f"{fund_code}_{self.start_date_input.text}_{self.end_date_input.text}"
         self.chart_data_cache[cache_key] = {
-            'df': df,
+            'series': series,
             'fund_type': fund_type,
             'fund_info': fund_info
         }
         
         # 计算并添加涨跌幅信息
-        self.calculate_fund_analysis(df, fund_code)
+        self.calculate_fund_analysis(series, fund_code)
         
         # 显示基金基本信息
         self.show_fund_info(fund_info, fund_code, fund_type)
@@ -410,23 +357,31 @@ class FundGUI(App):
         # 更新当前激活的图表
         current_tab = self.tab_panel.current_tab
         if current_tab.text == "净值走势":
-            self.update_net_value_chart(df)
+            self.update_net_value_chart(series)
         elif current_tab.text == "神奇反转":
-            self.update_magic_reversal_chart(df)
+            self.update_magic_reversal_chart(series)
         elif current_tab.text == "回撤抄底":
-            self.update_drawdown_chart(df)
-        elif current_tab.text == "数据表格":
-            self.update_table(df)
+            self.update_drawdown_chart(series)
         
         # 更新表格
-        self.update_table(df)
+        self.update_table(series)
         
         # 更新购买建议
-        self.update_purchase_advice(df)
+        self.update_purchase_advice(series)
         
         # 更新状态栏
         self.status_bar.text = f"成功获取 {fund_type} {fund_code} 的数据"
     
+    def calculate_fund_analysis(self, series, fund_code):
+        """计算最新净值、今日涨跌幅和近一年涨跌幅"""
+        fund_analysis = {}
+        try:
+            fund_analysis = analysis.fund_overview(series)
+        except Exception as e:
+            print(f"计算基金分析数据失败: {e}")
+        self.current_fund_analysis = fund_analysis
+        return fund_analysis
+    
     def show_fund_info(self, fund_info, fund_code, fund_type):
         """显示基金基本信息"""
         info_text = f"基金代码: {fund_code}\n"
@@ -439,16 +394,17 @@ class FundGUI(App):
         # 这里可以添加一个信息弹窗
         # self.show_popup("基金基本信息", info_text)
     
-    def update_net_value_chart(self, df):
+    def update_net_value_chart(self, series):
         """更新净值走势图表"""
-        # 确保日期列存在
-        if '日期' not in df.columns or '净值' not in df.columns:
+        # 确保数据存在
+        if series.empty:
             return
         
+        self.detach_crosshair('net_value')
         try:
-            # 转换日期格式
-            dates = pd.to_datetime(df['日期'])
-            values = df['净值'].astype(float)
+            # 直接使用类型化数组，无需再次解析
+            dates = series.date_series()
+            values = series.nav_series()
             
             # 优化：对于大数据集，限制绘制的数据点数量
             max_points = 500
@@ -465,28 +421,17 @@ class FundGUI(App):
             
             # 添加技术分析指标
             if len(values) > 0:
-                # 计算移动平均线
-                ma5 = values.rolling(window=5).mean()
-                ma20 = values.rolling(window=20).mean()
+                # 技术分析指标（见 fund_core.analysis.chart_indicators）
+                ind = analysis.chart_indicators(values.to_numpy())
                 
                 # 绘制移动平均线
-                self.net_value_ax.plot(dates, ma5, 'g-', linewidth=1.5, label='5日均线', alpha=0.7)
-                self.net_value_ax.plot(dates, ma20, 'r-', linewidth=1.5, label='20日均线', alpha=0.7)
-                
-                # 计算布林带
-                def calculate_bollinger_bands(data, window=20, num_std=2):
-                    ma = data.rolling(window=window).mean()
-                    std = data.rolling(window=window).std()
-                    upper_band = ma + (std * num_std)
-                    lower_band = ma - (std * num_std)
-                    return ma, upper_band, lower_band
-                
-                bb_ma, upper_band, lower_band = calculate_bollinger_bands(values)
+                self.net_value_ax.plot(dates, ind['ma5'], 'g-', linewidth=1.5, label='5日均线', alpha=0.7)
+                self.net_value_ax.plot(dates, ind['ma20'], 'r-', linewidth=1.5, label='20日均线', alpha=0.7)
                 
                 # 绘制布林带
-                self.net_value_ax.plot(dates, upper_band, 'k--', linewidth=1, label='布林带上轨', alpha=0.7)
-                self.net_value_ax.plot(dates, lower_band, 'k--', linewidth=1, label='布林带下轨', alpha=0.7)
-                self.net_value_ax.fill_between(dates, upper_band, lower_band, color='gray', alpha=0.1)
+                self.net_value_ax.plot(dates, ind['upper'], 'k--', linewidth=1, label='布林带上轨', alpha=0.7)
+                self.net_value_ax.plot(dates, ind['lower'], 'k--', linewidth=1, label='布林带下轨', alpha=0.7)
+                self.net_value_ax.fill_between(dates, ind['upper'], ind['lower'], color='gray', alpha=0.1)
             
             # 设置图表属性
             self.net_value_ax.set_title("净值走势与技术指标")
@@ -502,6 +447,9 @@ class FundGUI(App):
             # 自动调整日期标签角度
             plt.setp(self.net_value_ax.get_xticklabels(), rotation=45, ha='right')
             
+            # 悬停十字线（触摸拖动时跟随）
+            self.attach_crosshair('net_value', self.net_value_ax, series, series.navs)
+            
             # 重绘
             self.net_value_figure.tight_layout()
             self.net_value_canvas.draw_idle()
@@ -514,66 +462,30 @@ class FundGUI(App):
                                  ha='center', va='center')
             self.net_value_canvas.draw_idle()
     
-    def update_magic_reversal_chart(self, df):
+    def update_magic_reversal_chart(self, series):
         """更新神奇反转图表"""
-        if '净值' not in df.columns:
+        if series.empty:
             return
         
         try:
-            # 计算连续涨跌天数和幅度
-            values = df['净值'].astype(float)
-            changes = np.diff(values)
-            direction = np.sign(changes)
-            change_percent = changes / values[:-1] * 100  # 涨跌幅百分比
-            
-            # 计算连续涨跌天数
-            consecutive_days = []
-            current_streak = 0
-            current_direction = 0
-            
-            for d in direction:
-                if d == current_direction and d != 0:
-                    current_streak += 1
-                else:
-                    if current_direction != 0:
-                        consecutive_days.append((current_streak, current_direction))
-                    current_streak = 1 if d != 0 else 0
-                    current_direction = d
-            
-            if current_direction != 0:
-                consecutive_days.append((current_streak, current_direction))
-            
-            # 分析反转概率
-            max_streak = 10
-            up_probabilities = []
-            down_probabilities = []
-            
-            for i in range(1, max_streak + 1):
-                # 计算连续上涨i天后反转的概率
-                up_streaks = [s for s, d in consecutive_days if d == 1 and s >= i]
-                if up_streaks:
-                    # 简单模拟反转概率
-                    prob = min(0.9, 0.3 + i * 0.08)
-                    up_probabilities.append((i, prob))
-                
-                # 计算连续下跌i天后反转的概率
-                down_streaks = [s for s, d in consecutive_days if d == -1 and s >= i]
-                if down_streaks:
-                    # 简单模拟反转概率
-                    prob = min(0.9, 0.3 + i * 0.08)
-                    down_probabilities.append((i, prob))
+            # 各连续天数的反转概率（与桌面版一致，见 fund_core.analysis.reversal_analysis）
+            volatility = risk.series_metrics(series, window=21)['volatility']
+            reversal = analysis.reversal_analysis(series.navs, 0.0 if np.isnan(volatility) else volatility)
+            probabilities = reversal['curve']
             
             # 清空图表
             self.magic_reversal_ax.clear()
             
             # 绘制反转概率曲线
-            if up_probabilities:
-                x_up, y_up = zip(*up_probabilities)
-                self.magic_reversal_ax.plot(x_up, y_up, 'r-', linewidth=2, label='连续上涨反转概率')
+            if probabilities:
+                self.magic_reversal_ax.plot(range(1, len(probabilities) + 1), probabilities, 'r-',
+                                            linewidth=2, label='反转概率')
             
-            if down_probabilities:
-                x_down, y_down = zip(*down_probabilities)
-                self.magic_reversal_ax.plot(x_down, y_down, 'g-', linewidth=2, label='连续下跌反转概率')
+            # 显示当前连续涨跌状态和反转概率
+            if reversal['segments']:
+                self.magic_reversal_ax.text(0.05, 0.95,
+                                            f"{reversal['streak_text']} 反转概率: {reversal['detail_probability']:.2f}",
+                                            transform=self.magic_reversal_ax.transAxes, va='top')
             
             # 设置图表属性
             self.magic_reversal_ax.set_title("神奇反转分析")
@@ -595,22 +507,19 @@ class FundGUI(App):
                                      ha='center', va='center')
             self.magic_reversal_canvas.draw_idle()
     
-    def update_drawdown_chart(self, df):
+    def update_drawdown_chart(self, series):
         """更新回撤抄底图表"""
-        if '净值' not in df.columns:
+        if series.empty:
             return
         
+        self.detach_crosshair('drawdown')
         try:
             # 计算回撤
-            values = df['净值'].astype(float)
-            rolling_max = values.cummax()
-            drawdown = (values - rolling_max) / rolling_max * 100
+            full_drawdown = graph.frame_for(series)['drawdown']
+            drawdown = full_drawdown
             
-            # 确保日期列存在
-            if '日期' in df.columns:
-                dates = pd.to_datetime(df['日期'])
-            else:
-                dates = pd.date_range(start=datetime.now() - pd.DateOffset(days=len(values)-1), periods=len(values))
+            # 日期已在获取时解析
+            dates = series.date_series().to_numpy()
             
             # 优化：对于大数据集，限制绘制的数据点数量
             max_points = 500
@@ -628,14 +537,10 @@ class FundGUI(App):
             # 添加零轴
             self.drawdown_ax.axhline(y=0, color='black', linestyle='--', alpha=0.5)
             
-            # 标记重要回撤点
-            significant_drawdowns = []
-            for i, d in enumerate(drawdown):
-                if d < -10:  # 10%以上的回撤
-                    significant_drawdowns.append((dates[i], d))
-            
-            for date, value in significant_drawdowns:
-                self.drawdown_ax.scatter(date, value, marker='v', color='red', s=50)
+            # 标记10%以上的回撤点
+            significant = drawdown < -10
+            if significant.any():
+                self.drawdown_ax.scatter(dates[significant], drawdown[significant], marker='v', color='red', s=50)
             
             # 设置图表属性
             self.drawdown_ax.set_title("回撤抄底分析")
@@ -651,6 +556,9 @@ class FundGUI(App):
             # 自动调整日期标签角度
             plt.setp(self.drawdown_ax.get_xticklabels(), rotation=45, ha='right')
             
+            # 悬停十字线（使用完整数据的回撤率）
+            self.attach_crosshair('drawdown', self.drawdown_ax, series, full_drawdown)
+            
             # 重绘
             self.drawdown_figure.tight_layout()
             self.drawdown_canvas.draw_idle()
@@ -663,27 +571,25 @@ class FundGUI(App):
                                ha='center', va='center')
             self.drawdown_canvas.draw_idle()
     
-    def update_table(self, df):
+    def update_table(self, series):
         """更新数据表格"""
         # 清空表格
         self.clear_table()
         
         try:
             # 计算涨跌幅
-            if '净值' in df.columns:
-                values = df['净值'].astype(float)
-                changes = np.diff(values)
-                change_percent = (changes / values[:-1] * 100).round(2)
+            if not series.empty:
+                date_strings = series.date_strings()
+                values = series.navs
+                change_percent = series.daily_change()
                 
                 # 添加数据行
-                for i, row in df.iterrows():
-                    date = row.get('日期', '')
-                    value = row.get('净值', '')
-                    change = "{:.2f}%" .format(change_percent[i-1]) if i > 0 else ""
+                for i in range(len(values)):
+                    change = "{:.2f}%" .format(change_percent[i]) if i > 0 else ""
                     
                     # 添加到表格
-                    date_label = Label(text=str(date), size_hint_y=None, height=30, halign='left')
-                    value_label = Label(text=str(value), size_hint_y=None, height=30, halign='right')
+                    date_label = Label(text=str(date_strings[i]), size_hint_y=None, height=30, halign='left')
+                    value_label = Label(text=f"{values[i]:.4f}", size_hint_y=None, height=30, halign='right')
                     change_label = Label(text=change, size_hint_y=None, height=30, halign='right')
                     
                     self.table_layout.add_widget(date_label)
@@ -692,65 +598,16 @@ class FundGUI(App):
         except Exception as e:
             print(f"更新表格失败: {e}")
     
-    def update_purchase_advice(self, df):
+    def update_purchase_advice(self, series):
         """更新购买建议"""
-        if df is None or df.empty:
+        if series is None or series.empty:
             self.advice_text.text = "请查询基金数据以获取购买建议"
             return
         
         try:
-            # 计算基本指标
-            values = df['净值'].astype(float)
-            latest_value = values.iloc[-1]
-            
-            # 计算技术指标
-            # RSI
-            def calculate_rsi(data, window=14):
-                delta = data.diff()
-                gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-                rs = gain / loss
-                rsi = 100 - (100 / (1 + rs))
-                return rsi
-            
-            rsi = calculate_rsi(values)
-            current_rsi = rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else 50
-            
-            # 移动平均线
-            ma5 = values.rolling(window=5).mean().iloc[-1]
-            ma20 = values.rolling(window=20).mean().iloc[-1]
-            
-            # 生成建议
-            advice = "基于技术分析的购买建议:\n\n"
-            
-            if current_rsi <= 30:
-                advice += "RSI指标: 超卖状态，可能是买入机会\n"
-            elif current_rsi >= 70:
-                advice += "RSI指标: 超买状态，建议谨慎\n"
-            else:
-                advice += f"RSI指标: {current_rsi:.1f}，处于正常区间\n"
-            
-            if ma5 > ma20:
-                advice += "均线状态: 短期均线高于长期均线，处于上升趋势\n"
-            else:
-                advice += "均线状态: 短期均线低于长期均线，处于下降趋势\n"
-            
-            # 计算回撤
-            rolling_max = values.cummax()
-            current_drawdown = (latest_value - rolling_max.iloc[-1]) / rolling_max.iloc[-1] * 100
-            advice += f"当前回撤: {current_drawdown:.2f}%\n"
-            
-            # 综合建议
-            if current_rsi <= 30 and current_drawdown < -10:
-                advice += "\n综合建议: 强烈推荐购买"
-            elif current_rsi <= 40 or (ma5 > ma20 and current_rsi < 60):
-                advice += "\n综合建议: 推荐购买"
-            elif current_rsi >= 70:
-                advice += "\n综合建议: 不推荐购买"
-            else:
-                advice += "\n综合建议: 观望"
-            
-            self.advice_text.text = advice
+            # 多指标评分（与桌面版一致，见 fund_core.analysis.purchase_advice）
+            result = analysis.purchase_advice(series.navs)
+            self.advice_text.text = f"{analysis.purchase_message(result)}\n建议级别: {result['level_text']}"
         except Exception as e:
             print(f"更新购买建议失败: {e}")
             self.advice_text.text = "生成购买建议失败"
@@ -777,46 +634,26 @@ class FundGUI(App):
             self.show_popup("输入错误", "涨跌幅格式错误，请输入有效的数字")
             return
         
-        # 基于当前净值和涨跌幅计算新的净值
-        current_value = self.current_data['净值'].iloc[-1].astype(float)
-        new_value = current_value * (1 + change_pct / 100)
-        
-        # 创建包含估值的新数据框
-        valuation_df = self.current_data.copy()
-        
-        # 保存原始数据，用于恢复
-        if not hasattr(self, 'original_data'):
-            self.original_data = self.current_data.copy()
-        
-        # 更新数据框，添加估值数据
-        last_date = pd.to_datetime(valuation_df['日期'].iloc[-1])
-        next_date = last_date + pd.DateOffset(days=1)
+        # 基于当前净值和涨跌幅计算新的净值，追加到估值叠加层（可连续叠加多日估值）
+        new_value = self.valuation.push(change_pct)
         
-        # 创建新行
-        new_row = pd.DataFrame([{
-            '日期': next_date.strftime('%Y-%m-%d'),
-            '净值': new_value
-        }])
-        
-        # 添加新行到数据框
-        valuation_df = pd.concat([valuation_df, new_row], ignore_index=True)
-        
-        # 更新当前数据为估值数据
-        self.current_data = valuation_df
+        # 更新当前数据为估值视图（与基础数据共享缓冲区，无需复制）
+        valuation_series = self.valuation.view()
+        self.current_data = valuation_series
         
         # 重新生成购买建议
-        self.update_purchase_advice(valuation_df)
+        self.update_purchase_advice(valuation_series)
         
         # 更新图表
         current_tab = self.tab_panel.current_tab
         if current_tab.text == "净值走势":
-            self.update_net_value_chart(valuation_df)
+            self.update_net_value_chart(valuation_series)
         elif current_tab.text == "神奇反转":
-            self.update_magic_reversal_chart(valuation_df)
+            self.update_magic_reversal_chart(valuation_series)
         elif current_tab.text == "回撤抄底":
-            self.update_drawdown_chart(valuation_df)
+            self.update_drawdown_chart(valuation_series)
         elif current_tab.text == "数据表格":
-            self.update_table(valuation_df)
+            self.update_table(valuation_series)
         
         # 显示成功消息
         self.show_popup("成功", f"估值应用成功！\n输入涨跌幅: {change_pct:.2f}%\n计算后净值: {new_value:.4f}")
@@ -827,9 +664,9 @@ class FundGUI(App):
         self.change_input.text = ""
         
         # 恢复原始数据
-        if hasattr(self, 'original_data'):
-            self.current_data = self.original_data.copy()
-            delattr(self, 'original_data')
+        if getattr(self, 'valuation', None) is not None and self.valuation.active:
+            self.valuation.reset()
+            self.current_data = self.valuation.view()
             
             # 重新生成购买建议
             self.update_purchase_advice(self.current_data)
@@ -849,8 +686,134 @@ class FundGUI(App):
         else:
             self.show_popup("提示", "当前没有应用估值")
     
+    def query_correlation(self, instance):
+        """获取当前基金和对比基金的完整净值历史，计算滚动相关系数"""
+        codes = [self.code_input.text.strip()] + self.compare_input.text.replace(',', ' ').split()
+        codes = list(dict.fromkeys(code for code in codes if code))
+        if len(codes) < 2:
+            self.show_popup("输入错误", "请输入至少一只对比基金")
+            return
+        window = self.rolling_windows[self.rolling_spinner.text]
+        self.status_bar.text = "正在计算相关性..."
+        
+        def fetch_data():
+            series_list, missing = [], []
+            for code in codes:
+                series, _, _ = FundDataFetcher(code).fetch_data()
+                if series is None:
+                    missing.append(code)
+                else:
+                    series_list.append(series)
+            Clock.schedule_once(lambda dt: self.handle_correlation(series_list, missing, window), 0)
+        
+        Clock.schedule_once(lambda dt: fetch_data(), 0.1)
+    
+    def handle_correlation(self, series_list, missing, window):
+        """绘制滚动相关系数热力图（最新窗口）和相关性最高的基金对走势"""
+        try:
+            rolling = correlation.rolling_series(series_list, window)
+            self.correlation_missing = missing
+            self.correlation_figure.clear()
+            if len(rolling.codes) < 2 or not len(rolling):
+                self.rolling = None
+                self.correlation_label.text = f"数据不足两只基金或不足{window}个交易日"
+                self.correlation_canvas.draw_idle()
+                return
+            
+            self.rolling = rolling
+            grid = self.correlation_figure.add_gridspec(2, 1, height_ratios=(3, 1))
+            self.heatmap_ax = self.correlation_figure.add_subplot(grid[0])
+            self.rolling_pair_ax = self.correlation_figure.add_subplot(grid[1])
+            names = rolling.codes
+            self.heatmap_image = self.heatmap_ax.imshow(rolling.corr[-1], cmap='RdYlGn_r', vmin=-1, vmax=1)
+            self.heatmap_ax.set_xticks(range(len(names)))
+            self.heatmap_ax.set_yticks(range(len(names)))
+            self.heatmap_ax.set_xticklabels(names, rotation=90, fontsize=8)
+            self.heatmap_ax.set_yticklabels(names, fontsize=8)
+            self.heatmap_texts = {}
+            if len(names) <= 12:
+                for i in range(len(names)):
+                    for j in range(len(names)):
+                        self.heatmap_texts[i, j] = self.heatmap_ax.text(j, i, "", ha='center', va='center', fontsize=8)
+            self.correlation_figure.colorbar(self.heatmap_image, ax=self.heatmap_ax)
+            
+            # 默认显示最新窗口中相关性最高的一对
+            top = rolling.at(len(rolling) - 1).pairs(1)
+            self.selected_pair = (names.index(top[0][0]), names.index(top[0][1])) if top else (0, 1)
+            self.rolling_current = len(rolling) - 1
+            self.draw_rolling_pair()
+            self.correlation_figure.tight_layout()
+            
+            self.rolling_slider.max = max(len(rolling) - 1, 1)
+            self.rolling_slider.value = len(rolling) - 1
+            self.show_rolling_window(self.rolling_slider, len(rolling) - 1)
+            self.status_bar.text = f"已计算 {len(names)} 只基金的{window}日滚动相关系数"
+        except Exception as e:
+            print(f"相关性分析失败: {e}")
+            self.rolling = None
+            self.correlation_label.text = f"相关性分析失败: {str(e)[:50]}"
+    
+    def show_rolling_window(self, instance, value):
+        """显示第value个滚动窗口的相关系数矩阵"""
+        k = int(value)
+        if self.rolling is None or k >= len(self.rolling):
+            return
+        self.rolling_current = k
+        result = self.rolling.at(k)
+        end_date = str(self.rolling.end_dates[k])
+        self.heatmap_image.set_data(result.corr)
+        for (i, j), text in self.heatmap_texts.items():
+            text.set_text("" if np.isnan(result.corr[i, j]) else f"{result.corr[i, j]:.2f}")
+        self.heatmap_ax.set_title(f"{self.rolling.window}日滚动相关系数（截至 {end_date}）")
+        self.rolling_cursor.set_xdata([self.rolling.end_dates[k]] * 2)
+        text = "相关性最高: " + "；".join(f"{a}/{b}: {v:.2f}" for a, b, v in result.pairs(3))
+        if self.correlation_missing:
+            text += f"  获取失败: {', '.join(self.correlation_missing)}"
+        self.correlation_label.text = text
+        self.correlation_canvas.draw_idle()
+    
+    def draw_rolling_pair(self):
+        """绘制所选基金对的滚动相关系数走势"""
+        i, j = self.selected_pair
+        rolling = self.rolling
+        ax = self.rolling_pair_ax
+        ax.clear()
+        ax.plot(rolling.dates, rolling.pair(i, j), linewidth=1)
+        ax.axhline(0, color='gray', linestyle='--', linewidth=0.8)
+        self.rolling_cursor = ax.axvline(rolling.end_dates[self.rolling_current], color='red', linewidth=0.8)
+        ax.set_ylim(-1.05, 1.05)
+        ax.set_title(f"{rolling.codes[i]} / {rolling.codes[j]} 滚动相关系数", fontsize=9)
+        ax.grid(True, linestyle='--', alpha=0.5)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
+    
+    def on_correlation_click(self, event):
+        """点击热力图单元格，显示该基金对的滚动相关系数走势"""
+        if self.rolling is None or event.inaxes is not self.heatmap_ax or event.xdata is None:
+            return
+        i, j = int(round(event.ydata)), int(round(event.xdata))
+        size = len(self.rolling.codes)
+        if i == j or not (0 <= i < size and 0 <= j < size):
+            return
+        self.selected_pair = (i, j)
+        self.draw_rolling_pair()
+        self.correlation_canvas.draw_idle()
+    
+    def attach_crosshair(self, key, ax, series, y):
+        """为图表绑定悬停十字线（按完整数据定位交易日，替换该图表原有的十字线）"""
+        self.detach_crosshair(key)
+        table = crosshair.HoverTable(series, mdates.date2num(series.date_series()))
+        self.crosshairs[key] = crosshair.Crosshair(ax, table, y)
+    
+    def detach_crosshair(self, key):
+        """移除图表的悬停十字线（清空坐标轴前调用）"""
+        old = self.crosshairs.pop(key, None)
+        if old is not None:
+            old.disconnect()
+    
     def clear_chart(self):
         """清空所有图表"""
+        self.detach_crosshair('net_value')
+        self.detach_crosshair('drawdown')
         # 清空净值走势图表
         self.net_value_ax.clear()
         self.net_value_ax.set_title("净值走势与技术指标")
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""提醒引擎的增量递推与完整重算一致"""
+
+import numpy as np
+
+from fund_core import alerts
+from fund_core.series import FundSeries
+from fund_core.store import NavStore
+
+RULES = [
+    {'id': 'dd', 'when': 'drawdown < -8 and rsi < 45'},
+    {'id': 'win', 'when': 'win_rate >= 0.4'},
+    {'id': 'buy', 'when': 'level becomes buy'},
+    {'id': 'high', 'when': 'band == high'},
+    {'id': 'ps', 'when': 'purchase_score >= 3'},
+]
+
+
+def _data(count=2, n=700, seed=5):
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64('2016-01-04') + np.arange(n)
+    return {f"{i:06d}": (dates, np.cumprod(1 + rng.normal(0.0002, 0.012, n))) for i in range(count)}
+
+
+def _replay(root, data, start, full):
+    """逐日追加净值并同步；full为True时每次同步前丢弃递推状态，强制按完整历史重算"""
+    store = NavStore(str(root))
+    for code, (dates, navs) in data.items():
+        store.save(FundSeries(code, dates[:start], navs[:start]))
+    engine = alerts.AlertEngine(store, RULES)
+    engine.sync()
+    fired = []
+    n = len(next(iter(data.values()))[0])
+    for end in range(start + 1, n + 1, 3):
+        for code, (dates, navs) in data.items():
+            store.merge(FundSeries(code, dates[:end], navs[:end]))
+        # 每次同步都是新的引擎（相当于命令行的一次运行），增量时从状态文件恢复递推状态
+        engine = alerts.AlertEngine(store, RULES)
+        if full:
+            engine._tracked = {}
+        fired += [(alert['code'], alert['date'], alert['rule'], alert['values']) for alert in engine.sync()]
+    return fired
+
+
+def test_incremental_sync_matches_full_recompute(tmp_path):
+    data = _data()
+    incremental = _replay(tmp_path / 'incremental', data, 600, full=False)
+    full = _replay(tmp_path / 'full', data, 600, full=True)
+    assert incremental
+    assert {rule for _, _, rule, _ in incremental} >= {'dd', 'buy', 'high'}
+    assert incremental == full
+
+
+def test_revised_history_falls_back_to_full_recompute(tmp_path):
+    data = _data(count=1)
+    (code, (dates, navs)), = data.items()
+    store = NavStore(str(tmp_path))
+    store.save(FundSeries(code, dates[:600], navs[:600]))
+    engine = alerts.AlertEngine(store, RULES)
+    engine.sync()
+
+    revised = navs.copy()
+    revised[590:] *= 0.9
+    store.save(FundSeries(code, dates[:610], revised[:610]))
+    assert not engine._tracked[code].continues(store.load(code), 600)
+    engine.sync()
+    assert engine._tracked[code].last_date == dates[609]
+    assert engine._tracked[code].last_nav == revised[609]
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""全市场归档的有效区间：first 为首个净值所在行，last 为最后一个净值的下一行（不含）"""
+
+import numpy as np
+import pytest
+
+from fund_core import archive, recovery
+from fund_core.indicators import fill_gaps
+from fund_core.screener import align
+from fund_core.series import FundSeries
+from fund_core.store import NavStore
+
+
+def _funds():
+    rng = np.random.default_rng(11)
+    axis = np.datetime64('2020-01-01') + np.arange(400)
+
+    def make(code, start, end, gaps=()):
+        rows = np.setdiff1d(np.arange(start, end), gaps)
+        navs = np.cumprod(1 + rng.normal(0, 0.01, len(rows))).astype(np.float32).astype(np.float64)
+        return FundSeries(code, axis[rows], navs)
+
+    return [
+        make('000001', 0, 400),
+        # 提前结束（最后一个净值在倒数第51行）
+        make('000002', 0, 350),
+        # 较晚开始、区间内有缺失日期
+        make('000003', 120, 400, gaps=(150, 151, 399)),
+        # 只有一个净值
+        make('000004', 200, 201),
+    ]
+
+
+@pytest.fixture
+def built(tmp_path):
+    store = NavStore(str(tmp_path))
+    funds = _funds()
+    for series in funds:
+        store.save(series)
+    return archive.build_archive(store), {series.code: series for series in funds}
+
+
+def test_valid_range_is_last_exclusive(built):
+    nav_archive, funds = built
+    days = nav_archive.dates
+    for code, series in funds.items():
+        column = nav_archive.column_index(code)
+        first, last = nav_archive.first[column], nav_archive.last[column]
+        assert days[first] == series.dates[0]
+        assert days[last - 1] == series.last_date
+        values = nav_archive.column(code)
+        assert len(values) == last - first
+        assert values[-1] == np.float32(series.last_nav)
+        # 有效区间之外全部为NaN
+        assert np.isnan(nav_archive.navs[:first, column]).all()
+        assert np.isnan(nav_archive.navs[last:, column]).all()
+
+
+def test_series_round_trip(built):
+    nav_archive, funds = built
+    for code, series in funds.items():
+        restored = nav_archive.series(code)
+        assert np.array_equal(restored.dates, series.dates)
+        assert np.array_equal(restored.navs, series.navs)
+        tail = nav_archive.series(code, tail=5)
+        assert tail.last_date == series.last_date
+        assert np.array_equal(tail.navs, series.navs[-len(tail):])
+
+
+def test_matrix_bounds_are_inclusive(built):
+    nav_archive, funds = built
+    dates, codes, matrix = nav_archive.matrix(['000003', '000001'], start='2020-05-01', end='2020-06-01')
+    assert dates[0] == np.datetime64('2020-05-01') and dates[-1] == np.datetime64('2020-06-01')
+    assert codes == ['000003', '000001']
+    expected_dates, _, expected = align([funds['000003'], funds['000001']], '2020-05-01', '2020-06-01')
+    assert np.array_equal(dates, expected_dates)
+    assert np.array_equal(matrix, expected.astype(np.float32), equal_nan=True)
+
+
+@pytest.mark.parametrize('chunk', [1, 3, 256])
+def test_recovery_table_from_archive_matches_full_matrix(built, chunk):
+    nav_archive, funds = built
+    _, _, matrix = align(list(funds.values()))
+    expected = recovery.RecoveryTable.from_values(fill_gaps(matrix))
+    table = recovery.RecoveryTable.from_archive(nav_archive, chunk=chunk)
+    assert np.array_equal(table.samples, expected.samples)
+    assert np.array_equal(table.hits, expected.hits)
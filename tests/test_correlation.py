@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""滚动相关系数矩阵序列与逐窗口直接计算一致"""
+
+import numpy as np
+import pytest
+
+from fund_core import correlation
+from fund_core.series import FundSeries
+from fund_core.store import NavStore
+
+
+def _data(n=400, size=5, seed=2):
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64('2020-01-01') + np.arange(n)
+    common = rng.normal(0, 0.01, n)
+    matrix = np.cumprod(1 + common[:, None] * np.linspace(0, 1, size) + rng.normal(0, 0.01, (n, size)), axis=0)
+    # 较晚开始、中间停牌
+    matrix[:150, 3] = np.nan
+    matrix[200:230, 4] = np.nan
+    return dates, [f"{i:06d}" for i in range(size)], matrix
+
+
+@pytest.mark.parametrize('step', [1, 7])
+def test_rolling_matches_each_window(step):
+    dates, codes, matrix = _data()
+    rolling = correlation.RollingCorrelation(dates, codes, matrix, window=60, step=step)
+    order = [codes.index(code) for code in rolling.codes]
+    returns = correlation.daily_returns(matrix)[:, order]
+    assert rolling.rows[-1] == len(dates)
+    assert np.all(np.diff(rolling.rows) == step)
+    for k in range(len(rolling)):
+        end = rolling.rows[k]
+        expected, overlap = correlation.correlation(returns[end - 60:end])
+        result = rolling.at(k)
+        assert result.dates[-1] == rolling.end_dates[k] == dates[end - 1]
+        np.testing.assert_allclose(result.corr, expected, atol=1e-9)
+        assert np.array_equal(result.overlap, overlap)
+
+    # 基金对的逐日序列与对应窗口的矩阵元素一致
+    pair = rolling.pair(1, 3)
+    assert len(pair) == len(dates)
+    np.testing.assert_allclose(pair[rolling.rows - 1], rolling.corr[:, 1, 3], atol=1e-9)
+
+
+def test_step_keeps_cells_bounded(monkeypatch):
+    monkeypatch.setattr(correlation, 'ROLLING_CELLS', 2000)
+    dates, codes, matrix = _data()
+    rolling = correlation.RollingCorrelation(dates, codes, matrix, window=60)
+    assert rolling.corr.size <= 2000 + len(codes) ** 2
+    assert rolling.rows[-1] == len(dates)
+
+
+def test_rolling_store_is_cached_by_version(tmp_path):
+    dates, codes, matrix = _data()
+    store = NavStore(str(tmp_path))
+    for column, code in enumerate(codes[:3]):
+        store.save(FundSeries(code, dates, matrix[:, column]))
+    rolling, missing = correlation.rolling_store(store, codes[:3] + ['999999'], window=120)
+    assert missing == ['999999']
+    assert sorted(rolling.codes) == codes[:3]
+    assert correlation.rolling_store(store, codes[:3], window=120)[0] is rolling
+
+    store.save(FundSeries(codes[0], dates[:-1], matrix[:-1, 0]))
+    updated, _ = correlation.rolling_store(store, codes[:3], window=120)
+    assert updated is not rolling and updated.dates[-1] == dates[-1]
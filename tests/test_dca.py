@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""定投模拟的余数类前缀和/后缀和与逐期循环一致"""
+
+import numpy as np
+import pytest
+
+from fund_core import dca
+from fund_core.series import FundSeries
+
+
+def _series(n=900, seed=7):
+    rng = np.random.default_rng(seed)
+    dates = np.busday_offset('2015-01-05', np.arange(n), roll='forward')
+    return FundSeries('000001', dates, np.cumprod(1 + rng.normal(0.0003, 0.012, n)))
+
+
+def _naive(navs, dates, cash, start, period):
+    """逐期循环：从start开始每period个交易日买入一次"""
+    buys = np.arange(start, len(navs), period)
+    invested = cash[buys].sum()
+    units = (cash[buys] / navs[buys]).sum()
+    value = units * navs[-1]
+
+    held_units = held_cash = 0.0
+    peak, worst = -np.inf, 0.0
+    for t in range(start, len(navs)):
+        if (t - start) % period == 0:
+            held_units += cash[t] / navs[t]
+            held_cash += cash[t]
+        ratio = held_units * navs[t] / held_cash
+        peak = max(peak, ratio)
+        worst = min(worst, (ratio - peak) / peak * 100)
+
+    years = (dates[-1] - dates[buys]).astype(np.float64) / 365.0
+
+    def excess(rate):
+        return (cash[buys] * (1 + rate) ** years).sum() - value
+
+    low, high = -0.95, 3.0
+    for _ in range(100):
+        middle = (low + high) / 2
+        low, high = (middle, high) if excess(middle) < 0 else (low, middle)
+    return invested, value, (value / invested - 1) * 100, worst, low * 100, len(buys)
+
+
+@pytest.mark.parametrize('frequency', sorted(dca.FREQUENCIES))
+@pytest.mark.parametrize('weighted', [False, True])
+def test_simulate_matches_naive_loop(frequency, weighted):
+    series = _series()
+    period = dca.FREQUENCIES[frequency]
+    amounts = dca.advice_amounts(series, 100) if weighted else None
+    cash = amounts if weighted else np.full(len(series), 100.0)
+    result = dca.simulate(series, frequency, amount=100, amounts=amounts)
+
+    for start in list(range(0, len(series), 37)) + [len(series) - period - 1, len(series) - 1]:
+        invested, value, final_return, worst, irr, periods = _naive(series.navs, series.dates, cash, start, period)
+        assert result['invested'][start] == pytest.approx(invested, rel=1e-12)
+        assert result['value'][start] == pytest.approx(value, rel=1e-12)
+        assert result['final_return'][start] == pytest.approx(final_return, rel=1e-9, abs=1e-9)
+        assert result['max_drawdown'][start] == pytest.approx(worst, rel=1e-9, abs=1e-9)
+        assert result['periods'][start] == periods
+        if not np.isnan(result['irr'][start]):
+            # 网格插值的精度
+            assert result['irr'][start] == pytest.approx(irr, abs=0.05)
+
+
+def test_class_suffix_sum_on_rows():
+    rng = np.random.default_rng(1)
+    values = rng.normal(size=(3, 50))
+    out = dca.class_suffix_sum(values, 7)
+    for t in range(50):
+        assert np.allclose(out[:, t], values[:, t::7].sum(axis=1))
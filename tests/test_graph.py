@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""指标依赖图的结果复用与按版本号失效"""
+
+import numpy as np
+import pytest
+
+from fund_core import graph, indicators
+from fund_core.series import FundSeries
+
+
+def _series(code='000001', version=None, scale=1.0):
+    dates = np.datetime64('2024-01-01') + np.arange(120)
+    navs = np.cumprod(1 + np.random.default_rng(0).normal(0, 0.01, 120)) * scale
+    return FundSeries(code, dates, navs, version=version)
+
+
+def test_same_version_reuses_frame_and_values():
+    series = _series()
+    frame = graph.frame_for(series)
+    rsi = frame['rsi']
+    assert graph.frame_for(series) is frame
+    assert graph.frame_for(series)['rsi'] is rsi
+    # 按需计算：只算了RSI及其依赖
+    assert 'macd' not in frame.computed()
+
+
+def test_new_version_gets_new_frame():
+    old = _series(version=1)
+    new = _series(version=2, scale=2.0)
+    cache = {}
+    old_frame = graph.frame_for(old, cache)
+    new_frame = graph.frame_for(new, cache)
+    assert new_frame is not old_frame
+    assert np.allclose(new_frame['ma20'], indicators.rolling_mean(new.navs, 20), equal_nan=True)
+    assert np.allclose(old_frame['ma20'], indicators.rolling_mean(old.navs, 20), equal_nan=True)
+    # 同一基金的不同视图互不挤占
+    assert graph.frame_for(old, cache) is old_frame
+
+
+def test_shared_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(graph, 'FRAME_CACHE_SIZE', 2)
+    monkeypatch.setattr(graph, '_frames', type(graph._frames)())
+    a, b, c = _series('000001'), _series('000002'), _series('000003')
+    frame_a = graph.frame_for(a)
+    graph.frame_for(b)
+    assert graph.frame_for(a) is frame_a
+    graph.frame_for(c)
+    assert graph.frame_for(a) is frame_a
+    assert (b.code, b.version) not in graph._frames
+
+
+def test_replacing_indicator_invalidates_cached_values():
+    frame = graph.IndicatorFrame(_series().navs)
+    graph.register('test_double', (graph.SOURCE,), lambda nav: nav * 2)
+    try:
+        doubled = frame['test_double']
+        assert np.array_equal(doubled, frame.navs * 2)
+        graph.register('test_double', (graph.SOURCE,), lambda nav: nav * 3, replace=True)
+        assert np.array_equal(frame['test_double'], frame.navs * 3)
+        with pytest.raises(ValueError):
+            graph.register('test_double', (graph.SOURCE,), lambda nav: nav)
+    finally:
+        graph.REGISTRY.pop('test_double', None)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""滚动统计在净值不变区间上的回归测试"""
+
+import statistics
+
+import numpy as np
+
+from fund_core import advice, graph
+
+
+def _exact_rolling(values, window, func):
+    """逐窗口用 statistics 模块精确计算（与原先pandas实现一致，净值不变的窗口均值等于净值、标准差为0）"""
+    out = np.full(len(values), np.nan)
+    for i in range(window - 1, len(values)):
+        out[i] = func(values[i - window + 1:i + 1].tolist())
+    return out
+
+
+def _flat_tail_navs():
+    rng = np.random.default_rng(0)
+    history = np.cumprod(1 + rng.normal(0, 0.01, 300)) * 1.2345
+    return np.r_[history, np.full(80, 1.0371)]
+
+
+def test_flat_tail_matches_exact_rolling():
+    navs = _flat_tail_navs()
+    frame = graph.IndicatorFrame(navs)
+    kernel = frame['kernel']
+    for window in (2, 5, 20, 60):
+        assert kernel.mean(window)[-1] == navs[-1]
+        assert kernel.std(window)[-1] == 0.0
+        np.testing.assert_allclose(kernel.mean(window), _exact_rolling(navs, window, statistics.fmean),
+                                   rtol=1e-12, equal_nan=True)
+        np.testing.assert_allclose(kernel.std(window), _exact_rolling(navs, window, statistics.stdev),
+                                   atol=1e-10, equal_nan=True)
+
+
+def test_flat_tail_band_and_purchase_score():
+    navs = _flat_tail_navs()
+    frame = graph.IndicatorFrame(navs)
+
+    ma5 = _exact_rolling(navs, 5, statistics.fmean)
+    ma20 = _exact_rolling(navs, 20, statistics.fmean)
+    ma60 = _exact_rolling(navs, 60, statistics.fmean)
+    std20 = _exact_rolling(navs, 20, statistics.stdev)
+    upper, lower = ma20 + 2 * std20, ma20 - 2 * std20
+    rsi = np.where(np.isnan(frame['rsi']), 50, frame['rsi'])
+
+    band = advice.band_signal(navs, rsi, upper, lower)
+    assert band[-1] == advice.BAND_HIGH
+    np.testing.assert_array_equal(frame['band'], band)
+
+    score = advice.purchase_score(navs, frame['rsi'], upper, lower, frame['drawdown'], ma5, ma20, ma60,
+                                  frame['macd'], frame['macd_signal'], frame['streak'])
+    np.testing.assert_array_equal(frame['purchase_score'], score)
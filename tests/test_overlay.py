@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""估值叠加层的写时复制：任何叠加层的改动都不会改变基础序列或已取得的视图"""
+
+import numpy as np
+
+from fund_core.series import FundSeries
+
+
+def _series(code='000001'):
+    dates = np.datetime64('2024-01-01') + np.arange(100)
+    return FundSeries(code, dates, np.linspace(1.0, 2.0, 100))
+
+
+def _snapshot(series):
+    return series.dates.copy(), series.navs.copy()
+
+
+def _unchanged(series, snapshot):
+    dates, navs = snapshot
+    return np.array_equal(series.dates, dates) and np.array_equal(series.navs, navs)
+
+
+def test_overlays_on_same_base_are_isolated():
+    base = _series()
+    before = _snapshot(base)
+    a, b = base.overlay(), base.overlay()
+    a.push(1)
+    view_a = a.view()
+    seen_a = _snapshot(view_a)
+    b.push(-5)
+    b.push(2)
+
+    assert _unchanged(view_a, seen_a)
+    assert _unchanged(a.view(), seen_a)
+    assert _unchanged(base, before)
+    assert len(b.view()) == len(base) + 2
+    assert b.view().navs[-2] == base.last_nav * 0.95
+
+
+def test_view_taken_before_reset_survives_new_estimates():
+    base = _series()
+    a = base.overlay()
+    a.push(1)
+    stale = a.view()
+    seen = _snapshot(stale)
+    a.reset()
+
+    b = base.overlay()
+    b.push(-3)
+    a.push(4)
+
+    assert _unchanged(stale, seen)
+    assert a.view().navs[-1] == base.last_nav * 1.04
+    assert b.view().navs[-1] == base.last_nav * 0.97
+
+
+def test_pop_then_push_keeps_earlier_view():
+    base = _series()
+    overlay = base.overlay()
+    overlay.push(1)
+    overlay.push(2)
+    kept = overlay.view()
+    seen = _snapshot(kept)
+    overlay.pop()
+    overlay.push(7)
+
+    assert _unchanged(kept, seen)
+    assert overlay.view().navs[-1] == base.last_nav * 1.01 * 1.07
+    assert overlay.view().version != kept.version
+
+
+def test_estimates_reuse_buffer_without_live_views():
+    base = _series()
+    overlay = base.overlay()
+    for _ in range(5):
+        overlay.push(1)
+    for _ in range(5):
+        overlay.pop()
+    overlay.push(1)
+
+    assert overlay._buf is base._buf
+    assert overlay.view().estimates == 1
+    overlay.reset()
+    assert overlay.view() is base
+    assert not overlay.active
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""情景递推与完整重算一致"""
+
+import json
+
+import numpy as np
+import pytest
+
+from fund_core import advice, scenario
+from fund_core.series import FundSeries
+from fund_core.timeline import SignalTimeline
+
+DISCRETE = ('band', 'win_rate', 'streak', 'score', 'level', 'purchase_score', 'purchase_level')
+CONTINUOUS = ('nav', 'rsi', 'drawdown', 'reversal_prob')
+
+
+def _series(n=1400, seed=3):
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64('2015-01-01') + np.arange(n)
+    return FundSeries('000001', dates, np.cumprod(1 + rng.normal(0.0002, 0.012, n)))
+
+
+def _head(series, end):
+    return FundSeries(series.code, series.dates[:end], series.navs[:end])
+
+
+def _assert_matches(result, timeline, i):
+    for key in DISCRETE:
+        assert result[key] == getattr(timeline, key)[i], (key, i)
+    for key in CONTINUOUS:
+        expected = timeline.navs[i] if key == 'nav' else getattr(timeline, key)[i]
+        assert result[key] == pytest.approx(expected, rel=1e-9, abs=1e-9, nan_ok=True), (key, i)
+
+
+def test_advance_matches_full_recompute():
+    series = _series()
+    timeline = SignalTimeline(series)
+    start = 1000
+    state = scenario.ScenarioState(_head(series, start))
+    for i in range(start, len(series)):
+        if i % 50 == 0:
+            # 跨进程保存后继续递推
+            state = scenario.ScenarioState.from_dict(json.loads(json.dumps(state.to_dict())))
+        result = state.advance(series.navs[i:i + 1], series.dates[i])
+        _assert_matches(result, timeline, i)
+    # 数据足够长时胜率来自回撤恢复统计而非经验规则
+    heuristic = advice.drawdown_win_rate(timeline.drawdown[start:])
+    assert np.any(timeline.win_rate[start:] != heuristic)
+
+
+def test_multi_day_path_matches_appended_history():
+    series = _series()
+    timeline = SignalTimeline(series)
+    start, days = 1100, 5
+    state = scenario.ScenarioState(_head(series, start))
+    navs = series.navs[start - 1:start + days]
+    actual = (navs[1:] / navs[:-1] - 1) * 100
+    paths = np.vstack([actual, np.zeros(days), np.full(days, -2.0)])
+    result = state.evaluate(paths)
+    _assert_matches({key: value[0] for key, value in result.items()}, timeline, start + days - 1)
+
+    # 每个情景都与把该路径接到历史之后的完整计算一致
+    for row in range(1, len(paths)):
+        projected = series.navs[start - 1] * np.cumprod(1 + paths[row] / 100)
+        extended = FundSeries(series.code, series.dates[:start + days],
+                              np.concatenate([series.navs[:start], projected]))
+        _assert_matches({key: value[row] for key, value in result.items()}, SignalTimeline(extended), -1)
+
+
+def test_state_from_incomplete_dict_is_rejected():
+    data = scenario.ScenarioState(_head(_series(), 200)).to_dict()
+    del data['recovery']
+    with pytest.raises(ValueError):
+        scenario.ScenarioState.from_dict(data)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""评分规则（Scorecard）与原先写死在代码中的建议规则逐元素一致"""
+
+import numpy as np
+import pytest
+
+from fund_core import advice
+
+SHAPES = [(), (400,), (200, 30)]
+
+
+# 原先的实现（改为规则描述之前），作为参照
+def _band_signal(x, rsi, upper, lower, rsi_high=70, rsi_low=30):
+    with np.errstate(invalid='ignore'):
+        high = (x >= upper) | (rsi >= rsi_high)
+        low = (x <= lower) | (rsi <= rsi_low)
+    return np.where(high, advice.BAND_HIGH, np.where(low, advice.BAND_LOW, advice.BAND_NEUTRAL)).astype(np.int8)
+
+
+def _drawdown_win_rate(dd, tiers=advice.WIN_RATE_TIERS):
+    with np.errstate(invalid='ignore'):
+        return np.select([dd < tier for tier in tiers], advice.WIN_RATES[:len(tiers)], advice.WIN_RATES[-1])
+
+
+def _summary_score(band, win_rate, streak):
+    score = np.where(band == advice.BAND_LOW, 2, np.where(band == advice.BAND_HIGH, -2, 0))
+    score = score + np.where(win_rate >= 0.7, 3, np.where(win_rate >= 0.4, 1, -1))
+    reverse = np.minimum(0.9, np.abs(streak) * 0.15) >= 0.7
+    score = score + np.where(reverse, -2 * np.sign(streak), 0)
+    return score.astype(np.int16)
+
+
+def _levels(score, edges):
+    return np.select([score >= edge for edge in edges],
+                     [advice.ADVICE_STRONG_BUY, advice.ADVICE_BUY, advice.ADVICE_NEUTRAL, advice.ADVICE_SELL],
+                     advice.ADVICE_STRONG_SELL).astype(np.int8)
+
+
+def _purchase_score(x, rsi, upper, lower, dd, ma5, ma20, ma60, macd_line, macd_signal, streak,
+                    rsi_low=30, rsi_high=70, tiers=advice.PURCHASE_TIERS):
+    rsi = np.where(np.isnan(rsi), 50, rsi)
+    with np.errstate(invalid='ignore'):
+        score = np.where(rsi < rsi_low, 3, np.where(rsi > rsi_high, -3, 0))
+        upper = np.where(np.isnan(upper), x, upper)
+        lower = np.where(np.isnan(lower), x, lower)
+        score = score + np.where(x <= lower, 3, np.where(x >= upper, -3, 0))
+        dd = np.where(np.isnan(dd), 0, dd)
+        score = score + np.select([dd < tier for tier in tiers], advice.PURCHASE_TIER_SCORES[:len(tiers)], 0)
+        has_ma = ~np.isnan(ma5) & ~np.isnan(ma20)
+        bull = (ma5 > ma20) & (ma20 > ma60)
+        bear = (ma5 < ma20) & (ma20 < ma60)
+        score = score + np.where(has_ma & bull, 2, np.where(has_ma & bear, -2, 0))
+        has_macd = ~np.isnan(macd_line) & ~np.isnan(macd_signal)
+        score = score + np.where(has_macd, np.where(macd_line > macd_signal, 2, -2), 0)
+    score = score + np.where(np.abs(streak) >= 3, -np.sign(streak), 0)
+    return score.astype(np.int16)
+
+
+def _same(expected, actual):
+    assert np.shape(actual) == np.shape(expected)
+    assert np.asarray(actual).dtype == np.asarray(expected).dtype
+    assert np.array_equal(actual, expected, equal_nan=True)
+
+
+def _random(rng, shape, low, high, missing=0.1):
+    values = rng.uniform(low, high, shape)
+    if np.ndim(values):
+        values[rng.random(shape) < missing] = np.nan
+    return values
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+@pytest.mark.parametrize('seed', range(5))
+def test_scorecards_match_original_rules(shape, seed):
+    rng = np.random.default_rng(seed)
+    x = _random(rng, shape, 0.8, 1.2, 0.02)
+    rsi = _random(rng, shape, 0, 100)
+    upper, lower = _random(rng, shape, 0.9, 1.3), _random(rng, shape, 0.7, 1.1)
+    dd = _random(rng, shape, -30, 0)
+    ma5, ma20, ma60 = (_random(rng, shape, 0.9, 1.1) for _ in range(3))
+    macd_line, macd_signal = _random(rng, shape, -1, 1), _random(rng, shape, -1, 1)
+    streak = rng.integers(-8, 9, shape)
+    band = rng.integers(-1, 2, shape)
+    win_rate = _random(rng, shape, 0, 1, 0)
+    rsi_high, rsi_low = int(rng.integers(60, 80)), int(rng.integers(20, 40))
+    win_tiers = [(-20, -15, -10, -5), (-18, -9), (-25, -20, -15, -10)][seed % 3]
+    purchase_tiers = [(-20, -10, -5), (-25, -12), (-30, -20, -10)][seed % 3]
+
+    _same(_band_signal(x, rsi, upper, lower, rsi_high, rsi_low),
+          advice.band_signal(x, rsi, upper, lower, rsi_high, rsi_low))
+    _same(_drawdown_win_rate(dd, win_tiers), advice.drawdown_win_rate(dd, win_tiers))
+    _same(_summary_score(band, win_rate, streak), advice.summary_score(band, win_rate, streak))
+    _same(_purchase_score(x, rsi, upper, lower, dd, ma5, ma20, ma60, macd_line, macd_signal, streak,
+                          rsi_low, rsi_high, purchase_tiers),
+          advice.purchase_score(x, rsi, upper, lower, dd, ma5, ma20, ma60, macd_line, macd_signal, streak,
+                                rsi_low, rsi_high, purchase_tiers))
+    _same(_levels(streak * 2, (6, 3, -2, -4)), advice.purchase_level(streak * 2))
+    _same(_levels(streak, (5, 2, -2, -5)), advice.summary_level(streak))
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""分析服务的条件请求（ETag/304）和基金代码校验"""
+
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from fund_core import service
+from fund_core.series import FundSeries
+from fund_core.store import NavStore
+
+
+def _series(n=200):
+    dates = np.datetime64('2024-01-01') + np.arange(n)
+    return FundSeries('000001', dates, np.linspace(1.0, 1.5, n) + np.sin(np.arange(n) / 5) * 0.05)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = NavStore(str(tmp_path))
+    store.save(_series())
+    return store
+
+
+def _respond(analysis_service, path, query='', if_none_match=None):
+    return asyncio.run(analysis_service.respond(path, query, if_none_match))
+
+
+def test_etag_revalidation(store):
+    analysis_service = service.AnalysisService(store, offline=True)
+    status, body, etag = _respond(analysis_service, '/funds/000001/navs')
+    assert status == 200 and etag
+    assert len(json.loads(body)['navs']) == 200
+
+    status, body, same = _respond(analysis_service, '/funds/000001/navs', if_none_match=f'"other", {etag}')
+    assert (status, body, same) == (304, b'', etag)
+    # 查询参数不同的响应各自有ETag
+    status, _, ranged = _respond(analysis_service, '/funds/000001/navs', 'start=2024-03-01', if_none_match=etag)
+    assert status == 200 and ranged != etag
+
+    # 数据更新后旧ETag失效
+    store.save(_series(201))
+    status, body, updated = _respond(analysis_service, '/funds/000001/navs', if_none_match=etag)
+    assert status == 200 and updated != etag
+    assert len(json.loads(body)['navs']) == 201
+    assert json.loads(_respond(analysis_service, '/health')[1])['not_modified'] == 1
+
+
+@pytest.mark.parametrize('code', ['00001', '0000012', 'abcdef', '..', '%2e%2e', '000001%2f..'])
+def test_invalid_code_is_rejected(store, code):
+    analysis_service = service.AnalysisService(store, offline=True)
+    with pytest.raises(service.ServiceError) as raised:
+        _respond(analysis_service, f'/funds/{code}/navs')
+    assert raised.value.status == 400
+
+
+def test_unknown_code_and_path(store):
+    analysis_service = service.AnalysisService(store, offline=True)
+    with pytest.raises(service.ServiceError) as raised:
+        _respond(analysis_service, '/funds/999999/navs')
+    assert raised.value.status == 404
+    for path in ('/funds/000001/unknown', '/funds/../000001/navs'):
+        with pytest.raises(service.ServiceError) as raised:
+            _respond(analysis_service, path)
+        assert raised.value.status == 404
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""自选刷新对无效代码的处理"""
+
+import numpy as np
+
+from fund_core import watchlist
+from fund_core.series import FundSeries
+from fund_core.store import NavStore
+
+
+def _series(code):
+    dates = np.datetime64('2024-01-01') + np.arange(40)
+    return FundSeries(code, dates, np.linspace(1.0, 1.2, 40))
+
+
+def test_invalid_code_reports_error_row(tmp_path, monkeypatch):
+    store = NavStore(str(tmp_path))
+    store.save(_series('000001'))
+    fetched = []
+    monkeypatch.setattr(watchlist, 'fetch_fund_names', lambda policy: {})
+    monkeypatch.setattr(watchlist, 'fetch_nav_history',
+                        lambda code, policy, info=None: fetched.append(code) or _series(code))
+
+    progress = []
+    rows = watchlist.WatchlistRefresher(store, policy=object()).refresh(
+        ['000001', '../000002', '000003'], progress=lambda done, total, row: progress.append(row['code']))
+
+    assert [row['code'] for row in rows] == ['000001', '../000002', '000003']
+    assert [row['status'] for row in rows] == ['cached', 'error', 'ok']
+    assert rows[1]['nav'] is None and rows[1]['error']
+    assert fetched == ['000003']
+    assert sorted(progress) == sorted(['000001', '../000002', '000003'])